@@ -0,0 +1,57 @@
+"""Shared helpers for the Trendvisor benchmark scripts."""
+import json
+import math
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Returns the `pct` percentile (0-100) of `values` using nearest-rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Summarizes a list of latencies (in seconds) as milliseconds."""
+    if not latencies:
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "mean_ms": 1000 * sum(latencies) / len(latencies),
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p90_ms": 1000 * percentile(latencies, 90),
+        "p99_ms": 1000 * percentile(latencies, 99),
+        "max_ms": 1000 * max(latencies),
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Returns the current commit hash, if the benchmark runs inside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def emit_results(name: str, results: Dict[str, Any], output: Optional[str] = None):
+    """Prints benchmark results as JSON and optionally writes them to `output`."""
+    document = {
+        "benchmark": name,
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
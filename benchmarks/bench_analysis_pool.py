@@ -0,0 +1,74 @@
+"""
+Compares per-task analysis latency between the legacy subprocess path
+(`python3 analyze_and_visualize.py` per task) and the warm worker pool.
+
+Usage:
+    python -m benchmarks.bench_analysis_pool --iterations 10
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.tools.analysis_pool import AnalysisWorkerPool
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+TOOL_PATH = os.path.join(REPO_ROOT, 'trendvisor', 'tools', 'analyze_and_visualize.py')
+SAMPLE_DATA = os.path.join(REPO_ROOT, 'data', 'task_sunscreen_1751183660_reviews.json')
+RESULTS_DIR = os.path.join(REPO_ROOT, 'results')
+
+
+def run_subprocess(input_path: str, task_id: str) -> str:
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    process = subprocess.run(
+        [sys.executable, TOOL_PATH, '--input', input_path, '--task_id', task_id],
+        capture_output=True, text=True, check=True, env=env,
+    )
+    return process.stdout.strip()
+
+
+def time_jobs(run, input_path: str, prefix: str, iterations: int):
+    latencies = []
+    for i in range(iterations):
+        task_id = f"bench_{prefix}_{i}"
+        start = time.perf_counter()
+        run(input_path, task_id)
+        latencies.append(time.perf_counter() - start)
+        for path in glob.glob(os.path.join(RESULTS_DIR, f"{task_id}_*")):
+            os.remove(path)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis worker pool against the subprocess path.")
+    parser.add_argument("--input", default=SAMPLE_DATA, help="Review dataset to analyze.")
+    parser.add_argument("--iterations", type=int, default=10, help="Analysis jobs per path.")
+    parser.add_argument("--pool-size", type=int, default=2, help="Worker pool size.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    subprocess_latencies = time_jobs(run_subprocess, args.input, "subprocess", args.iterations)
+
+    pool = AnalysisWorkerPool(pool_size=args.pool_size)
+    warm_start = time.perf_counter()
+    pool.warm_up()
+    warm_up_seconds = time.perf_counter() - warm_start
+    try:
+        pool_latencies = time_jobs(pool.submit, args.input, "pool", args.iterations)
+    finally:
+        pool.close()
+
+    emit_results("analysis_pool", {
+        "input": os.path.relpath(args.input, REPO_ROOT),
+        "pool_size": args.pool_size,
+        "pool_warm_up_s": warm_up_seconds,
+        "subprocess": summarize(subprocess_latencies),
+        "pool": summarize(pool_latencies),
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
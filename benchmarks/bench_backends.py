@@ -0,0 +1,158 @@
+"""
+Compares the Redis backend with the in-process local backend
+(LocalMessageBus and LocalStateStore):
+
+- events: events/sec from publish to handler, for a burst of events to one
+  subscriber, in both bus modes.
+- relay: latency of one agent step, i.e. a handler that transitions a task
+  and publishes the next event, measured over a chain of steps.
+- e2e: end-to-end task latency through the agent network (see
+  bench_pipeline), with a fast stub collector so the backend dominates.
+
+Usage:
+    python -m benchmarks.bench_backends --fake
+    python -m benchmarks.bench_backends --events 20000 --tasks 20
+"""
+import argparse
+import contextlib
+import copy
+import sys
+import threading
+import time
+
+from benchmarks._common import emit_results, summarize
+from benchmarks.bench_pipeline import Backend, bench_e2e
+from trendvisor.core.message_bus import PUBSUB_MODE, STREAMS_MODE
+from trendvisor.core.state_store import TaskState
+
+RELAY_STATUSES = ("COLLECTING", "COLLECTION_COMPLETE", "ANALYZING", "ANALYSIS_COMPLETE")
+
+
+def bench_events(backend: Backend, mode: str, n: int, timeout: float):
+    """Publishes `n` events and times how long one subscriber takes to receive them all."""
+    channel = f"bench:events:{time.time_ns()}"
+    received = 0
+    done = threading.Event()
+
+    def on_event(message):
+        nonlocal received
+        received += 1
+        if received >= n:
+            done.set()
+
+    subscriber, publisher = backend.bus(mode), backend.bus(mode)
+    subscriber.subscribe(channel, on_event, group="bench_events")
+    subscriber.listen()
+    subscriber.wait_for_subscribers([channel])
+    message = {"task_id": "bench_0", "data_path": "data/bench_0_reviews.ndjson", "start_offset": 0, "end_offset": 4096}
+    start = time.perf_counter()
+    for _ in range(n):
+        publisher.publish(channel, message)
+    completed = done.wait(timeout)
+    elapsed = time.perf_counter() - start
+    subscriber.close()
+    if mode == STREAMS_MODE and backend.broker is None:
+        publisher.redis_client.delete(publisher.stream_key(channel))
+    return {"events": n, "received": received, "timed_out": not completed, "events_per_sec": received / elapsed}
+
+
+def bench_relay(backend: Backend, mode: str, tasks: int, timeout: float):
+    """
+    Moves each task through RELAY_STATUSES, one handler step per status:
+    every step is an atomic transition that publishes the event the next
+    step handles. Returns the latency per step and per task.
+    """
+    store = backend.state_store()
+    bus = backend.bus(mode)
+    channels = [f"bench:relay:{time.time_ns()}:{status}" for status in RELAY_STATUSES]
+    step_latencies, task_latencies = [], []
+    started = {}
+    done = threading.Event()
+
+    def make_step(index):
+        def step(message):
+            task_id = message['data']['task_id']
+            step_latencies.append(time.perf_counter() - message['data']['sent'])
+            if index + 1 == len(channels):
+                task_latencies.append(time.perf_counter() - started[task_id])
+                if len(task_latencies) >= tasks:
+                    done.set()
+                return
+            store.transition(task_id, RELAY_STATUSES[index + 1], {"history": f"step {index + 1}"},
+                             bus.prepare(channels[index + 1], {"task_id": task_id, "sent": time.perf_counter()}))
+        step.__qualname__ = f"relay_step_{index}"
+        return step
+
+    for index, channel in enumerate(channels):
+        bus.subscribe(channel, make_step(index))
+    bus.listen()
+    bus.wait_for_subscribers(channels)
+    store.save_states([TaskState(task_id=f"relay_{i}", goal="relay benchmark") for i in range(tasks)])
+    start = time.perf_counter()
+    for i in range(tasks):
+        task_id = f"relay_{i}"
+        started[task_id] = time.perf_counter()
+        store.transition(task_id, RELAY_STATUSES[0], None,
+                         bus.prepare(channels[0], {"task_id": task_id, "sent": time.perf_counter()}))
+    completed = done.wait(timeout)
+    elapsed = time.perf_counter() - start
+    bus.close()
+    backend.reset()
+    return {
+        "tasks": tasks,
+        "timed_out": not completed,
+        "events_per_sec": len(step_latencies) / elapsed,
+        "step": summarize(step_latencies),
+        "task": summarize(task_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Redis and local in-process backends.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15, help="Scratch database for task state; it is flushed.")
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a redis-server.")
+    parser.add_argument("--events", type=int, default=5000, help="Events per throughput run.")
+    parser.add_argument("--relay-tasks", type=int, default=500, help="Tasks relayed through the step chain.")
+    parser.add_argument("--tasks", type=int, default=10, help="End-to-end tasks per backend (0 skips e2e).")
+    parser.add_argument("--reviews-per-task", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    results = {}
+    # Agent and tool progress output goes to stderr; stdout carries the JSON results.
+    with contextlib.redirect_stdout(sys.stderr):
+        for name in ("redis", "local"):
+            backend_args = copy.copy(args)
+            backend_args.backend = name
+            backend = Backend(backend_args)
+            runs = {"backend": backend.describe()}
+            for mode in (PUBSUB_MODE, STREAMS_MODE):
+                runs[mode] = {
+                    "events": bench_events(backend, mode, args.events, args.timeout),
+                    "relay": bench_relay(backend, mode, args.relay_tasks, args.timeout),
+                }
+            if args.tasks:
+                e2e_args = copy.copy(backend_args)
+                e2e_args.bus_mode, e2e_args.collect_latency = PUBSUB_MODE, 0.0
+                e2e_args.collection_concurrency, e2e_args.analysis_workers = 4, 2
+                runs["e2e"] = bench_e2e(e2e_args, backend)
+            results[name] = runs
+
+    speedup = {}
+    for mode in (PUBSUB_MODE, STREAMS_MODE):
+        redis_run, local_run = results["redis"][mode], results["local"][mode]
+        speedup[mode] = {
+            "events_per_sec": local_run["events"]["events_per_sec"] / redis_run["events"]["events_per_sec"],
+            "relay_step_p50": redis_run["relay"]["step"]["p50_ms"] / max(local_run["relay"]["step"]["p50_ms"], 1e-9),
+        }
+    if args.tasks:
+        speedup["e2e_total_p50"] = (results["redis"]["e2e"]["stages"]["total"].get("p50_ms", 0.0)
+                                    / max(results["local"]["e2e"]["stages"]["total"].get("p50_ms", 0.0), 1e-9))
+    emit_results("backends", {"results": results, "local_speedup": speedup}, args.output)
+
+
+if __name__ == '__main__':
+    main()
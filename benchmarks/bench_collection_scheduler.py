@@ -0,0 +1,72 @@
+"""
+Shows how collection throughput scales with the CollectionScheduler's
+concurrency limit, using a stub collector with configurable latency.
+
+Usage:
+    python -m benchmarks.bench_collection_scheduler --jobs 64 --latency 0.2
+"""
+import argparse
+import tempfile
+import threading
+import time
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.agents.collection_scheduler import CollectionScheduler, SiteLimit, StubCollector
+
+
+def run_once(concurrency: int, args, output_dir: str):
+    done = threading.Event()
+    latencies = []
+    lock = threading.Lock()
+
+    def on_finished(job, _result):
+        with lock:
+            latencies.append(time.time() - job.submitted_at)
+            if len(latencies) == args.jobs:
+                done.set()
+
+    scheduler = CollectionScheduler(
+        StubCollector(latency=args.latency, output_dir=output_dir),
+        on_complete=on_finished,
+        on_failure=on_finished,
+        max_concurrency=concurrency,
+        default_site_limit=SiteLimit(max_concurrency=args.site_concurrency, rate_per_sec=args.site_rate),
+    )
+    scheduler.start()
+    start = time.perf_counter()
+    for i in range(args.jobs):
+        scheduler.submit(f"bench_{concurrency}_{i}", "benchmark goal", site=f"site_{i % args.sites}")
+    done.wait()
+    elapsed = time.perf_counter() - start
+    scheduler.stop()
+    return {
+        "concurrency": concurrency,
+        "jobs_per_sec": args.jobs / elapsed,
+        "completion_latency": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collection scheduler.")
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub collection latency in seconds.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--sites", type=int, default=4, help="Number of distinct target sites.")
+    parser.add_argument("--site-concurrency", type=int, default=8)
+    parser.add_argument("--site-rate", type=float, default=1000.0, help="Collection starts per second per site.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        runs = [run_once(c, args, output_dir) for c in args.concurrency]
+
+    emit_results("collection_scheduler", {
+        "jobs": args.jobs,
+        "stub_latency_s": args.latency,
+        "sites": args.sites,
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Compares load time and peak RSS of the columnar review format against
+`json.load` + `pd.DataFrame` at several dataset sizes. Each load runs in a
+fresh interpreter so that peak RSS is measured per case.
+
+Usage:
+    python -m benchmarks.bench_columnar --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._common import emit_results
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+LOADERS = ("json_dataframe", "columnar_numeric", "columnar_full")
+
+
+def synthetic_reviews(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = ["great", "terrible", "sunscreen", "texture", "sticky", "light", "scent", "price", "love", "hate",
+             "white", "cast", "skin", "packaging", "greasy", "smooth", "again", "never", "buy", "product"]
+    for i in range(n):
+        yield {
+            "id": f"review_{i + 1}",
+            "rating": rng.randint(1, 5),
+            "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "text": " ".join(rng.choice(words) for _ in range(rng.randint(8, 40))),
+        }
+
+
+def write_json_array(path: str, n: int):
+    """Writes a JSON array without building it in memory."""
+    with open(path, 'w') as f:
+        f.write("[")
+        for i, review in enumerate(synthetic_reviews(n)):
+            if i:
+                f.write(",")
+            f.write(json.dumps(review))
+        f.write("]")
+
+
+def child_load(loader: str, path: str):
+    """Runs one load in this (fresh) process and prints time and RSS growth."""
+    import pandas as pd  # Imported before the baseline so import cost is excluded
+    from trendvisor.tools.columnar import ColumnarDataset
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if loader == "json_dataframe":
+        with open(path) as f:
+            df = pd.DataFrame(json.load(f))
+    elif loader == "columnar_numeric":
+        df = ColumnarDataset(path).to_dataframe(columns=["rating", "date"])
+    else:
+        df = ColumnarDataset(path).to_dataframe()
+    # Touch the rating column so lazily mapped pages are actually read.
+    mean_rating = float(df["rating"].mean())
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        "load_s": elapsed,
+        "peak_rss_growth_mb": (peak_kb - baseline_kb) / 1024,
+        "rows": len(df),
+        "mean_rating": mean_rating,
+    }))
+
+
+def run_case(loader: str, path: str):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    process = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_columnar", "--child", loader, path],
+        capture_output=True, text=True, check=True, cwd=REPO_ROOT, env=env,
+    )
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the columnar review format.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--child", nargs=2, metavar=("LOADER", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    if args.child:
+        child_load(*args.child)
+        return
+
+    from trendvisor.tools.columnar import convert_json_to_columnar
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            json_path = os.path.join(workdir, f"reviews_{n}.json")
+            columnar_path = os.path.join(workdir, f"reviews_{n}.tvcol")
+            write_json_array(json_path, n)
+            convert_start = time.perf_counter()
+            convert_json_to_columnar(json_path, columnar_path)
+            case = {
+                "reviews": n,
+                "json_mb": os.path.getsize(json_path) / 2**20,
+                "columnar_mb": sum(
+                    os.path.getsize(os.path.join(columnar_path, name)) for name in os.listdir(columnar_path)
+                ) / 2**20,
+                "convert_s": time.perf_counter() - convert_start,
+            }
+            for loader in LOADERS:
+                path = json_path if loader == "json_dataframe" else columnar_path
+                case[loader] = run_case(loader, path)
+            results.append(case)
+
+    emit_results("columnar_load", {"cases": results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Measures what console output costs the calling handler threads: printing
+directly (the previous display_* behaviour) against queueing for the
+background ConsoleRenderer. Output goes to a sink that simulates a slow
+terminal (a fixed delay per write). The report covers the per-call
+latency seen by the threads and, for the renderer, how many messages were
+written, coalesced or dropped.
+
+Usage:
+    python -m benchmarks.bench_console --threads 4 --messages 5000 --write-delay-us 50
+"""
+import argparse
+import contextlib
+import threading
+import time
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.core import ui
+
+
+class SlowSink:
+    """A text stream whose writes take `delay` seconds, like a busy terminal."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.writes = 0
+        self._lock = threading.Lock()   # A terminal serializes writers, too
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            self.writes += 1
+            time.sleep(self.delay)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def run_threads(threads: int, messages: int):
+    """Every thread emits `messages` status lines; returns the per-call latencies."""
+    latencies = [[] for _ in range(threads)]
+
+    def emit(index):
+        for i in range(messages):
+            start = time.perf_counter()
+            ui.display_status(f"Processed chunk {i} of task task_bench_{index}", category=f"Agent{index}")
+            latencies[index].append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=emit, args=(index,)) for index in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return [latency for per_thread in latencies for latency in per_thread], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark direct vs background console output.")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=5000, help="Messages per thread.")
+    parser.add_argument("--write-delay-us", type=float, default=50.0, help="Simulated terminal time per write.")
+    parser.add_argument("--refresh", type=float, default=10.0, help="Renderer refreshes per second.")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    results = {}
+    sink = SlowSink(args.write_delay_us / 1e6)
+    with contextlib.redirect_stdout(sink):
+        latencies, elapsed = run_threads(args.threads, args.messages)
+        results["direct"] = {"seconds": elapsed, "call": summarize(latencies), "writes": sink.writes}
+
+        sink.writes = 0
+        renderer = ui.start_renderer(args.refresh, args.queue_size)
+        latencies, elapsed = run_threads(args.threads, args.messages)
+        ui.stop_renderer()
+        results["renderer"] = {
+            "seconds": elapsed,
+            "call": summarize(latencies),
+            "writes": sink.writes,
+            "rendered": renderer.rendered,
+            "dropped": renderer.dropped,
+        }
+
+    emit_results("console_output", {
+        "threads": args.threads,
+        "messages_per_thread": args.messages,
+        "write_delay_us": args.write_delay_us,
+        "results": results,
+        "call_p99_speedup": results["direct"]["call"]["p99_ms"] / max(results["renderer"]["call"]["p99_ms"], 1e-9),
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Measures MinHash/LSH near-duplicate detection on synthetic reviews:
+throughput at several dataset sizes, and pair recall/precision against an
+exact all-pairs Jaccard baseline on a smaller sample.
+
+Usage:
+    python -m benchmarks.bench_dedup --sizes 10000 100000 1000000 --exact-size 5000
+"""
+import argparse
+import itertools
+import random
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from benchmarks._common import emit_results
+from trendvisor.tools.dedup import MinHashDeduplicator, shingles
+
+WORDS = ("great terrible sunscreen texture sticky light scent price love hate white cast skin packaging greasy "
+         "smooth again never buy product bottle pump sensitive spf summer beach daily face body moisturizer "
+         "fragrance cheap expensive value broke acne gentle burn protection absorbs quickly heavy oily").split()
+
+
+def synthetic_texts(n: int, duplicate_share: float = 0.5, seed: int = 7):
+    """Unique reviews plus perturbed copies (a few words replaced, inserted or dropped)."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        if texts and rng.random() < duplicate_share:
+            words = rng.choice(texts).split()
+            for _ in range(rng.randint(0, max(1, len(words) // 8))):
+                position = rng.randrange(len(words))
+                operation = rng.random()
+                if operation < 0.5:
+                    words[position] = rng.choice(WORDS)
+                elif operation < 0.75:
+                    words.insert(position, rng.choice(WORDS))
+                elif len(words) > 5:
+                    del words[position]
+            texts.append(" ".join(words))
+        else:
+            texts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 60))))
+    return texts
+
+
+def exact_pairs(texts, threshold: float, shingle_size: int):
+    """All pairs with shingle Jaccard >= threshold, via one sparse intersection-count product."""
+    vocabulary = {}
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        for shingle in shingles(text, shingle_size):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(shingle, len(vocabulary)))
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(texts), len(vocabulary)))
+    sizes = np.asarray(matrix.sum(axis=1)).ravel()
+    intersections = sp.triu(matrix @ matrix.T, k=1).tocoo()
+    unions = sizes[intersections.row] + sizes[intersections.col] - intersections.data
+    similar = intersections.data >= threshold * unions
+    return set(zip(intersections.row[similar].tolist(), intersections.col[similar].tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MinHash/LSH deduplication.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--exact-size", type=int, default=5000, help="Sample size for the exact all-pairs baseline.")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    deduplicator = MinHashDeduplicator(threshold=args.threshold, num_perm=args.num_perm)
+
+    # Quality against the exact baseline
+    texts = synthetic_texts(args.exact_size)
+    start = time.perf_counter()
+    truth = exact_pairs(texts, args.threshold, deduplicator.shingle_size)
+    exact_s = time.perf_counter() - start
+    start = time.perf_counter()
+    result = deduplicator.deduplicate(texts)
+    lsh_s = time.perf_counter() - start
+    found = {
+        pair for group in result.clusters()
+        for pair in itertools.combinations(sorted(group.tolist()), 2)
+    }
+    quality = {
+        "reviews": len(texts),
+        "exact_pairs": len(truth),
+        "exact_s": exact_s,
+        "lsh_s": lsh_s,
+        "recall": len(truth & found) / len(truth) if truth else 1.0,
+        # Clusters are connected components, so chained copies (A~B, B~C)
+        # also pair A with C; this counts such pairs against precision.
+        "cluster_pair_precision": len(truth & found) / len(found) if found else 1.0,
+    }
+
+    # Throughput
+    throughput = []
+    for n in args.sizes:
+        texts = synthetic_texts(n)
+        start = time.perf_counter()
+        result = deduplicator.deduplicate(texts)
+        elapsed = time.perf_counter() - start
+        throughput.append({
+            "reviews": n,
+            "seconds": elapsed,
+            "reviews_per_s": n / elapsed,
+            "representatives": int(len(result.representatives)),
+        })
+
+    emit_results("dedup", {
+        "threshold": args.threshold,
+        "num_perm": args.num_perm,
+        "bands": deduplicator.bands,
+        "rows": deduplicator.rows,
+        "quality": quality,
+        "throughput": throughput,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
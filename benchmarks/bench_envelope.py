@@ -0,0 +1,90 @@
+"""
+Compares event encodings: the previous JSON path (json.dumps on publish,
+json.loads in every handler) against the versioned envelope with the JSON
+and msgpack codecs. For each representative message it reports encode and
+decode time and bytes on the wire. It also covers a large payload, which
+the envelope claim-checks into a store so that only a reference travels.
+
+Usage:
+    python -m benchmarks.bench_envelope --iterations 20000
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+
+from benchmarks._common import emit_results
+from trendvisor.core import tracing
+from trendvisor.core.envelope import CODECS, Envelope, FileClaimStore
+
+TASK_ID = "task_sunscreen_1751183660_3fa2c1d9"
+
+
+def sample_messages(review_batch: int):
+    """Typical events plus a deliberately oversized one (a batch of reviews)."""
+    rng = random.Random(7)
+    words = ["촉촉", "산뜻", "백탁", "끈적임", "가성비", "향", "자극", "흡수", "재구매", "sunscreen"]
+    return {
+        "task_created": {"task_id": TASK_ID, "goal": "analyze sunscreen reviews on Olive Young"},
+        "collection_progress": {"task_id": TASK_ID, "data_path": f"data/{TASK_ID}_reviews.ndjson",
+                                "start_offset": 409600, "end_offset": 413696, "count": 25},
+        "task_failed": {"task_id": TASK_ID, "error": "Analysis tool failed: 다운로드 실패 (timeout after 300s)"},
+        "review_batch": {"task_id": TASK_ID, "reviews": [
+            {"rating": rng.randint(1, 5), "review": " ".join(rng.choice(words) for _ in range(30))}
+            for _ in range(review_batch)
+        ]},
+    }
+
+
+def time_per_call(fn, arg, iterations: int) -> float:
+    """Best of three runs, in microseconds per call."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(arg)
+        best = min(best, (time.perf_counter() - start) / iterations)
+    return 1e6 * best
+
+
+def measure(encode, decode, message, iterations: int):
+    payload = encode(message)
+    return {
+        "wire_bytes": len(payload if isinstance(payload, bytes) else payload.encode("utf-8")),
+        "encode_us": time_per_call(encode, message, iterations),
+        "decode_us": time_per_call(decode, payload, iterations),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark event envelope codecs against the JSON path.")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--review-batch", type=int, default=2000, help="Reviews in the oversized message.")
+    parser.add_argument("--max-inline-kb", type=int, default=64)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as claim_dir:
+        store = FileClaimStore(claim_dir)
+        for name, message in sample_messages(args.review_batch).items():
+            message = tracing.inject(message)
+            iterations = max(10, args.iterations // 100) if name == "review_batch" else args.iterations
+            variants = {"legacy_json": measure(json.dumps, json.loads, message, iterations)}
+            for codec in CODECS:
+                inline = Envelope(codec, claim_store=None)
+                variants[codec] = measure(inline.encode, inline.decode, message, iterations)
+                claimed = Envelope(codec, claim_store=store, max_inline_bytes=args.max_inline_kb * 1024)
+                if len(claimed.encode(message)) < variants[codec]["wire_bytes"]:
+                    variants[f"{codec}_claim_check"] = measure(claimed.encode, claimed.decode, message, iterations)
+            baseline = variants["legacy_json"]["wire_bytes"]
+            for variant in variants.values():
+                variant["bytes_vs_legacy"] = variant["wire_bytes"] / baseline
+            results[name] = variants
+
+    emit_results("event_envelope", {"iterations": args.iterations, "messages": results}, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Measures MessageBus throughput (messages/sec) and delivery latency
+percentiles for the pub/sub and streams modes.
+
+Usage:
+    python -m benchmarks.bench_message_bus --messages 20000
+    python -m benchmarks.bench_message_bus --fake   # in-process fakeredis
+"""
+import argparse
+import threading
+import time
+
+import redis
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.core.message_bus import MessageBus, PUBSUB_MODE, STREAMS_MODE
+
+
+def make_client(args, server=None):
+    if args.fake:
+        import fakeredis  # Optional, only needed for server-less runs
+        return fakeredis.FakeRedis(server=server, decode_responses=True)
+    return redis.Redis(host=args.host, port=args.port, db=0, decode_responses=True)
+
+
+def run_mode(args, mode: str, server=None):
+    channel = f"bench:{mode}:{time.time_ns()}"
+    publisher = MessageBus(mode=mode, redis_client=make_client(args, server), max_stream_length=args.messages)
+    consumer = MessageBus(mode=mode, redis_client=make_client(args, server), batch_size=100, block_ms=100)
+
+    latencies = []
+    done = threading.Event()
+
+    def on_message(message):
+        received_at = time.time()
+        sent_at = message["data"]["sent_at"]
+        latencies.append(received_at - sent_at)
+        if len(latencies) >= args.messages:
+            done.set()
+
+    consumer.subscribe(channel, on_message, group="bench")
+    listener = consumer.listen()
+    consumer.wait_for_subscribers([channel])
+
+    start = time.perf_counter()
+    for i in range(args.messages):
+        publisher.publish(channel, {"seq": i, "sent_at": time.time(), "task_id": f"bench_{i}"})
+    publish_seconds = time.perf_counter() - start
+    done.wait(args.timeout)
+    elapsed = time.perf_counter() - start
+    listener.stop()
+
+    if mode == STREAMS_MODE:
+        publisher.redis_client.delete(MessageBus.stream_key(channel))
+
+    return {
+        "published": args.messages,
+        "delivered": len(latencies),
+        "publish_msgs_per_sec": args.messages / publish_seconds,
+        "end_to_end_msgs_per_sec": len(latencies) / elapsed,
+        "delivery_latency": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MessageBus throughput and latency.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a redis-server.")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for delivery.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    server = None
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+
+    emit_results("message_bus", {
+        "backend": "fakeredis" if args.fake else f"redis://{args.host}:{args.port}",
+        PUBSUB_MODE: run_mode(args, PUBSUB_MODE, server),
+        STREAMS_MODE: run_mode(args, STREAMS_MODE, server),
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+End-to-end and per-component benchmarks of the agent pipeline:
+
+- e2e: runs the Orchestrator -> Collection -> Analysis flow with a stub
+  collector, measuring tasks/sec and per-stage latency percentiles
+  (dispatch, collection, analysis and total) from the pipeline's events.
+- micro: StateStore operation latencies and MessageBus.publish latency in
+  both delivery modes.
+- analysis: the analysis tool (in-process run_analysis) at several dataset
+  sizes.
+
+--fake runs against an in-process fakeredis server instead of a
+redis-server. The state store's transitions and updates are Lua scripts,
+so it needs fakeredis with Lua support (`pip install "fakeredis[lua]"`,
+which pulls in lupa); without it, fakeredis fails with "unknown command
+'script'". --backend local needs neither.
+
+Usage:
+    python -m benchmarks.bench_pipeline --fake --tasks 20
+    python -m benchmarks.bench_pipeline --backend local --tasks 20
+    python -m benchmarks.bench_pipeline --parts micro analysis --sizes 1000 10000 100000
+"""
+import argparse
+import contextlib
+import glob
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import redis
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.agents.analysis_agent import AnalysisAgent
+from trendvisor.agents.collection_agent import CollectionAgent
+from trendvisor.agents.collection_scheduler import StubCollector, _synthetic_review
+from trendvisor.agents.orchestrator_agent import OrchestratorAgent
+from trendvisor.core.local_backend import LocalBroker, LocalMessageBus, LocalStateStore
+from trendvisor.core.message_bus import MessageBus, PUBSUB_MODE, STREAMS_MODE
+from trendvisor.core.state_store import StateStore, TaskState
+from trendvisor.tools.analyze_and_visualize import run_analysis
+from trendvisor.tools.review_io import append_reviews
+from trendvisor.tools.streaming_analysis import RESULTS_DIR
+
+PARTS = ("e2e", "micro", "analysis")
+TERMINAL_EVENTS = ("TASK_COMPLETE", "TASK_FAILED")
+PIPELINE_EVENTS = ("TASK_CREATED", "COLLECTION_COMPLETE") + TERMINAL_EVENTS
+
+
+class Backend:
+    """
+    Creates the state store and buses for one benchmark run: Redis (a
+    redis-server, or a shared in-process fakeredis server) or the local
+    in-process backend.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.server = None
+        self.broker = None
+        if getattr(args, "backend", "redis") == "local":
+            self.broker = LocalBroker()
+        elif args.fake:
+            import fakeredis  # Optional, only needed for server-less runs
+            self.server = fakeredis.FakeServer()
+
+    def client(self, db: int = 0):
+        if self.server is not None:
+            import fakeredis
+            return fakeredis.FakeRedis(server=self.server, db=db, decode_responses=True)
+        return redis.Redis(host=self.args.host, port=self.args.port, db=db, decode_responses=True)
+
+    def state_store(self):
+        """An empty state store (the scratch database is flushed)."""
+        if self.broker is not None:
+            return LocalStateStore()
+        client = self.client(db=self.args.db)
+        client.flushdb()
+        return StateStore(redis_client=client)
+
+    def bus(self, mode: str = PUBSUB_MODE, **kwargs):
+        if self.broker is not None:
+            return LocalMessageBus(mode=mode, broker=self.broker)
+        return MessageBus(mode=mode, redis_client=self.client(), **kwargs)
+
+    def reset(self):
+        """Drops the state written by a run."""
+        if self.broker is None:
+            self.client(db=self.args.db).flushdb()
+
+    def describe(self) -> str:
+        if self.broker is not None:
+            return "local"
+        return "fakeredis" if self.server is not None else f"redis://{self.args.host}:{self.args.port}"
+
+
+def _remove_task_files(task_ids, *directories):
+    for task_id in task_ids:
+        for directory in directories:
+            for path in glob.glob(os.path.join(directory, f"{task_id}_*")):
+                os.remove(path)
+
+
+def bench_e2e(args, backend: Backend):
+    """Runs `args.tasks` tasks through the agent network and times each stage from the published events."""
+    state_store = backend.state_store()
+    buses = []
+
+    def bus():
+        buses.append(backend.bus(args.bus_mode))
+        return buses[-1]
+
+    # Event timestamps per task, recorded by an observer subscribed like any agent
+    seen = defaultdict(dict)
+    done = threading.Event()
+    observer = bus()
+
+    def on_event(message):
+        event_type = message['channel'].split(':')[-1]
+        task_id = message['data'].get('task_id')
+        seen[task_id][event_type] = time.perf_counter()
+        if sum(1 for events in seen.values() if any(e in events for e in TERMINAL_EVENTS)) >= args.tasks:
+            done.set()
+
+    data_dir = tempfile.mkdtemp(prefix="trendvisor_bench_")
+    orchestrator = OrchestratorAgent(bus(), state_store)
+    collection_agent = CollectionAgent(
+        bus(), state_store,
+        collector=StubCollector(latency=args.collect_latency, output_dir=data_dir, n_reviews=args.reviews_per_task),
+        max_concurrency=args.collection_concurrency,
+    )
+    analysis_agent = AnalysisAgent(
+        bus(), state_store, pool_size=args.analysis_workers,
+        report_cache_max_bytes=None,  # Every task is analyzed: its reviews are unique anyway
+    )
+    analysis_agent.worker_pool.warm_up()
+
+    for event_type in PIPELINE_EVENTS:
+        observer.subscribe(f"events:{event_type}", on_event, group="bench_observer")
+    observer.listen()
+    for agent in (collection_agent, analysis_agent):
+        threading.Thread(target=agent.run, daemon=True).start()
+    observer.wait_for_subscribers([f"events:{event_type}" for event_type in PIPELINE_EVENTS])
+    for agent in (collection_agent, analysis_agent):
+        agent.wait_until_ready()
+
+    started = {}
+    start = time.perf_counter()
+    for i in range(args.tasks):
+        submitted = time.perf_counter()
+        task_id = orchestrator.start_task(f"bench{i:05d}_{time.time_ns()} sunscreen reviews")
+        started[task_id] = submitted
+    completed = done.wait(args.timeout)
+    elapsed = time.perf_counter() - start
+
+    collection_agent.scheduler.stop(timeout=5)
+    analysis_agent.worker_pool.close()
+    for event_bus in buses:
+        event_bus.close()
+    _remove_task_files(started, RESULTS_DIR)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    backend.reset()
+
+    stages = defaultdict(list)
+    failed = 0
+    for task_id, submitted in started.items():
+        events = seen.get(task_id, {})
+        if "TASK_FAILED" in events:
+            failed += 1
+        if "TASK_CREATED" in events:
+            stages["dispatch"].append(events["TASK_CREATED"] - submitted)
+        if "TASK_CREATED" in events and "COLLECTION_COMPLETE" in events:
+            stages["collection"].append(events["COLLECTION_COMPLETE"] - events["TASK_CREATED"])
+        if "COLLECTION_COMPLETE" in events and "TASK_COMPLETE" in events:
+            stages["analysis"].append(events["TASK_COMPLETE"] - events["COLLECTION_COMPLETE"])
+        if "TASK_COMPLETE" in events:
+            stages["total"].append(events["TASK_COMPLETE"] - submitted)
+
+    return {
+        "backend": backend.describe(),
+        "bus_mode": args.bus_mode,
+        "tasks": args.tasks,
+        "completed": len(stages["total"]),
+        "failed": failed,
+        "timed_out": not completed,
+        "seconds": elapsed,
+        "tasks_per_sec": len(stages["total"]) / elapsed,
+        "collect_latency_s": args.collect_latency,
+        "reviews_per_task": args.reviews_per_task,
+        "stages": {name: summarize(stages[name]) for name in ("dispatch", "collection", "analysis", "total")},
+    }
+
+
+def _time_calls(fn, n: int):
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_micro(args, backend: Backend):
+    """Latency of individual StateStore operations and of MessageBus.publish."""
+    store = backend.state_store()
+    n = args.operations
+    task_ids = [f"bench_{i}" for i in range(n)]
+    try:
+        state_store = {
+            "save_state": _time_calls(lambda i: store.save_state(TaskState(task_id=task_ids[i], goal="benchmark task")), n),
+            "update_state": _time_calls(lambda i: store.update_state(task_ids[i], {
+                "artifacts": {"report_path": f"results/{task_ids[i]}_report.html"},
+            }), n),
+            "get_field": _time_calls(lambda i: store.get_field(task_ids[i], "status"), n),
+            "get_state": _time_calls(lambda i: store.get_state(task_ids[i]), n),
+            "log_history": _time_calls(lambda i: store.log_history(task_ids[i], "benchmark event"), n),
+        }
+
+        # One agent step (status change, artifact and event): separate calls vs one atomic transition
+        bus = backend.bus()
+        channel = f"bench:step:{time.time_ns()}"
+
+        def step_update(i):
+            store.update_state(task_ids[i], {"status": "COLLECTION_COMPLETE", "artifacts": {"raw_data_path": "data.ndjson"}})
+            bus.publish(channel, {"task_id": task_ids[i], "data_path": "data.ndjson"})
+
+        def step_transition(i):
+            store.transition(task_ids[i], "COLLECTION_COMPLETE", {"artifacts": {"raw_data_path": "data.ndjson"}},
+                             bus.prepare(channel, {"task_id": task_ids[i], "data_path": "data.ndjson"}))
+
+        store.save_states([TaskState(task_id=task_id, goal="benchmark task", status="COLLECTING") for task_id in task_ids])
+        state_store["step_update_then_publish"] = _time_calls(step_update, n)
+        store.save_states([TaskState(task_id=task_id, goal="benchmark task", status="COLLECTING") for task_id in task_ids])
+        state_store["step_transition"] = _time_calls(step_transition, n)
+    finally:
+        backend.reset()
+
+    publish = {}
+    message = {"task_id": "bench_0", "data_path": "data/bench_0_reviews.ndjson", "start_offset": 0, "end_offset": 4096}
+    for mode in (PUBSUB_MODE, STREAMS_MODE):
+        kwargs = {"max_stream_length": n} if backend.broker is None else {}
+        bus = backend.bus(mode, **kwargs)
+        channel = f"bench:publish:{time.time_ns()}"
+        publish[mode] = _time_calls(lambda i: bus.publish(channel, message), n)
+        if mode == STREAMS_MODE and backend.broker is None:
+            bus.redis_client.delete(MessageBus.stream_key(channel))
+    return {"operations": n, "state_store": state_store, "message_bus_publish": publish}
+
+
+def bench_analysis(args):
+    """Runs the analysis tool in-process on synthetic NDJSON datasets of each size."""
+    cases = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            path = os.path.join(workdir, f"reviews_{size}.ndjson")
+            rng = random.Random(size)
+            for first in range(0, size, 10000):
+                append_reviews(path, [_synthetic_review(rng, "sunscreen", i) for i in range(first, min(first + 10000, size))])
+            task_id = f"bench_analysis_{size}_{time.time_ns()}"
+            start = time.perf_counter()
+            artifacts = run_analysis(path, task_id, feature_cache_path=None)
+            elapsed = time.perf_counter() - start
+            cases.append({
+                "reviews": size,
+                "seconds": elapsed,
+                "reviews_per_s": size / elapsed,
+                "report_kb": os.path.getsize(artifacts['report_path']) / 1024,
+            })
+            _remove_task_files([task_id], RESULTS_DIR)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline end to end and per component.")
+    parser.add_argument("--parts", nargs="+", choices=PARTS, default=list(PARTS))
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15, help="Scratch database for task state; it is flushed.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Use fakeredis (with Lua support: fakeredis[lua]) instead of a redis-server.")
+    parser.add_argument("--backend", choices=["redis", "local"], default="redis",
+                        help="'local' runs on the in-process bus and state store instead of Redis.")
+    parser.add_argument("--bus-mode", choices=[PUBSUB_MODE, STREAMS_MODE], default=PUBSUB_MODE)
+    parser.add_argument("--tasks", type=int, default=20, help="End-to-end tasks to run.")
+    parser.add_argument("--collect-latency", type=float, default=0.5, help="Stub collector latency per task in seconds.")
+    parser.add_argument("--reviews-per-task", type=int, default=200)
+    parser.add_argument("--collection-concurrency", type=int, default=4)
+    parser.add_argument("--analysis-workers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for the end-to-end tasks.")
+    parser.add_argument("--operations", type=int, default=2000, help="Calls per microbenchmarked operation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Analysis dataset sizes.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    backend = Backend(args)
+    results = {"backend": backend.describe()}
+    # Agent and tool progress output goes to stderr; stdout carries the JSON results.
+    with contextlib.redirect_stdout(sys.stderr):
+        if "micro" in args.parts:
+            results["micro"] = bench_micro(args, backend)
+        if "analysis" in args.parts:
+            results["analysis"] = bench_analysis(args)
+        if "e2e" in args.parts:
+            results["e2e"] = bench_e2e(args, backend)
+    emit_results("pipeline", results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares report size and render time of the legacy `fig.write_html`
+histogram report (inlined plotly.js, one row per review) against the
+ReportRenderer (shared plotly.js asset, pre-aggregated charts) at several
+dataset sizes.
+
+Usage:
+    python -m benchmarks.bench_report_render --sizes 1000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from benchmarks._common import emit_results
+from trendvisor.tools.report_renderer import (
+    ReportRenderer, bar_chart, binned_counts, downsample_series, histogram_chart, plotly_asset, series_chart,
+    value_counts,
+)
+
+
+def synthetic_frame(n: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "rating": rng.integers(1, 6, n),
+        "date": np.datetime64("2022-01-01") + rng.integers(0, 3 * 365, n).astype("timedelta64[D]"),
+        "sentiment": rng.uniform(-1, 1, n),
+    })
+
+
+def render_legacy(df: pd.DataFrame, path: str):
+    px.histogram(df, x="rating", title="Distribution of Star Ratings").write_html(path)
+
+
+def render_aggregated(df: pd.DataFrame, path: str):
+    report = ReportRenderer(f"{len(df)} reviews")
+    report.add_chart("Ratings", bar_chart(*value_counts(df["rating"])))
+    series, period = downsample_series(df["date"], df["rating"])
+    report.add_chart(f"Reviews per {period}", series_chart(series, "Mean rating"))
+    report.add_chart("Sentiment", histogram_chart(*binned_counts(df["sentiment"], bins=21, value_range=(-1, 1))))
+    report.render(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report rendering.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    cases = []
+    with tempfile.TemporaryDirectory() as workdir:
+        asset = plotly_asset(workdir)  # Written once, shared by every aggregated report
+        for n in args.sizes:
+            df = synthetic_frame(n)
+            case = {"reviews": n}
+            for name, render in (("legacy", render_legacy), ("aggregated", render_aggregated)):
+                path = os.path.join(workdir, f"{name}_{n}.html")
+                start = time.perf_counter()
+                render(df, path)
+                case[name] = {"render_s": time.perf_counter() - start, "report_kb": os.path.getsize(path) / 1024}
+            cases.append(case)
+        shared_asset_kb = os.path.getsize(asset) / 1024
+
+    emit_results("report_render", {"shared_asset_kb": shared_asset_kb, "cases": cases}, args.output)
+
+
+if __name__ == '__main__':
+    main()
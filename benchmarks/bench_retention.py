@@ -0,0 +1,119 @@
+"""
+Runs rounds of tasks through their lifecycle (created, collected, analyzed)
+and reports the Redis key count after each round, with and without
+archiving finished tasks to SQLite. With archival only the tasks still in
+progress remain in Redis; without it, every finished task stays. It also
+compares listing the tasks in a status through the indexes
+(StateStore.list_tasks) against the previous way: scanning every task key
+and reading its status.
+
+Usage:
+    python -m benchmarks.bench_retention --rounds 10 --tasks-per-round 1000
+    python -m benchmarks.bench_retention --fake   # in-process fakeredis
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import redis
+
+from benchmarks._common import emit_results
+from trendvisor.agents.task_scheduler import new_task_id
+from trendvisor.core.state_store import StateStore, TaskState
+from trendvisor.core.task_archive import TaskArchive
+
+LIFECYCLE = ("COLLECTING", "COLLECTION_COMPLETE", "ANALYZING", "ANALYSIS_COMPLETE")
+
+
+def make_client(args):
+    if args.fake:
+        import fakeredis  # Optional, only needed for server-less runs
+        return fakeredis.FakeRedis(server=fakeredis.FakeServer(), db=args.db, decode_responses=True)
+    return redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+
+
+def run_round(store: StateStore, round_no: int, tasks: int, finished_fraction: float):
+    """Creates `tasks` tasks and finishes `finished_fraction` of them."""
+    states = [TaskState(task_id=new_task_id(f"round{round_no} product{i}"), goal=f"round{round_no} product{i}")
+              for i in range(tasks)]
+    store.save_states(states)
+    for state in states[:int(tasks * finished_fraction)]:
+        for status in LIFECYCLE:
+            store.transition(state.task_id, status, {"artifacts": {"report": f"results/{state.task_id}.html"}}
+                             if status == "ANALYSIS_COMPLETE" else None)
+
+
+def list_by_scan(client, status: str):
+    """Task ids in `status` found by scanning every task key."""
+    task_ids = []
+    for key in client.scan_iter(match="task:*", count=1000, _type="hash"):
+        if client.hget(key, "status") == status:
+            task_ids.append(key[len("task:"):])
+    return task_ids
+
+
+def best_of(fn, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return 1000 * best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark task retention and status indexes.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15, help="Scratch database for task state; it is flushed.")
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a redis-server.")
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--tasks-per-round", type=int, default=1000)
+    parser.add_argument("--finished-fraction", type=float, default=0.9,
+                        help="Share of each round's tasks that finish; the rest stay in progress.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    client = make_client(args)
+    results = {}
+    with tempfile.TemporaryDirectory() as archive_dir:
+        for variant in ("no_archival", "archival"):
+            client.flushdb()
+            archive = TaskArchive(os.path.join(archive_dir, "tasks.sqlite3")) if variant == "archival" else None
+            store = StateStore(redis_client=client, archive=archive, retention_seconds=0)
+            key_counts, archive_ms = [], []
+            for round_no in range(args.rounds):
+                run_round(store, round_no, args.tasks_per_round, args.finished_fraction)
+                if archive is not None:
+                    start = time.perf_counter()
+                    store.archive_finished()
+                    archive_ms.append(1000 * (time.perf_counter() - start))
+                key_counts.append(client.dbsize())
+
+            in_progress = store.list_tasks("CREATED", limit=10**9)
+            assert sorted(in_progress) == sorted(list_by_scan(client, "CREATED"))
+            results[variant] = {
+                "keys_per_round": key_counts,
+                "archive_ms_per_round": archive_ms,
+                "list_in_progress_index_ms": best_of(lambda: store.list_tasks("CREATED", limit=10**9)),
+                "list_in_progress_scan_ms": best_of(lambda: list_by_scan(client, "CREATED")),
+                "count_by_status": store.count_by_status(),
+            }
+            if archive is not None:
+                archived_id = store.list_tasks("ANALYSIS_COMPLETE", limit=1)[0]
+                results[variant]["archived_get_state_ms"] = best_of(lambda: store.get_state(archived_id))
+                archive.close()
+    client.flushdb()
+
+    emit_results("task_retention", {
+        "backend": "fakeredis" if args.fake else f"redis://{args.host}:{args.port}/{args.db}",
+        "rounds": args.rounds,
+        "tasks_per_round": args.tasks_per_round,
+        "finished_fraction": args.finished_fraction,
+        "variants": results,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Builds a SimilarityIndex over synthetic reviews and reports build and
+training time, recall@k of the IVF search against exact (brute-force)
+search over the same vectors for several nprobe values, and query
+latency, both for vector-only search and for the full search() path
+(vectorizing the query text and fetching the matches' metadata).
+
+Usage:
+    python -m benchmarks.bench_similarity --reviews 1000000
+    python -m benchmarks.bench_similarity --reviews 100000 --queries 100
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.tools.similarity_index import SimilarityIndex
+
+OPENINGS = ["Love this", "Really disappointed with this", "Decent", "My favourite", "Not worth it,", "Okay"]
+PRODUCTS = ["sunscreen", "toner", "serum", "cleanser", "moisturizer", "essence", "ampoule", "lip balm"]
+COMPLAINTS = ["too greasy", "sticky texture", "strong scent", "white cast", "broke me out", "leaked in transit",
+              "overpriced", "burning sensation", "pills under makeup", "dries out my skin"]
+PRAISES = ["absorbs quickly", "no white cast", "gentle on sensitive skin", "great value", "lovely light texture",
+           "keeps me hydrated", "works under makeup", "fresh scent", "calmed my redness", "long lasting"]
+
+
+def synthetic_vocabulary(size: int, seed: int):
+    rng = random.Random(seed)
+    syllables = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "da", "fu", "gi", "ha", "je"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_reviews(n: int, seed: int, vocabulary, start_id: int = 0, n_topics: int = 2000, topic_seed: int = 0):
+    """
+    Reviews drawn from latent topics, as real corpora cluster by product and
+    complaint: each topic fixes a product, an opening, a few complaint and
+    praise phrases and eight topic words; a review keeps each of its topic's
+    phrases with probability 0.8, takes four topic words and adds two
+    Zipf-distributed filler words. Query sets use the same topics
+    (`topic_seed`) with a different `seed`.
+    """
+    topic_rng = np.random.default_rng(topic_seed)
+    topics = []
+    for _ in range(n_topics):
+        phrases = [COMPLAINTS[j] for j in topic_rng.choice(len(COMPLAINTS), topic_rng.integers(0, 3), replace=False)]
+        phrases += [PRAISES[j] for j in topic_rng.choice(len(PRAISES), topic_rng.integers(1, 3), replace=False)]
+        topics.append((OPENINGS[topic_rng.integers(len(OPENINGS))], PRODUCTS[topic_rng.integers(len(PRODUCTS))],
+                       phrases, topic_rng.choice(len(vocabulary), 8, replace=False)))
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    fillers = rng.choice(len(vocabulary), size=(n, 2), p=weights / weights.sum())
+    for i in range(n):
+        opening, product, phrases, words = topics[rng.integers(n_topics)]
+        kept = [phrase for phrase in phrases if rng.random() < 0.8]
+        chosen = list(rng.choice(words, 4, replace=False)) + list(fillers[i])
+        text = (f"{opening} {product}: {', '.join(kept) or 'no strong opinion'}. "
+                + " ".join(vocabulary[w] for w in chosen))
+        yield {"id": f"review_{start_id + i}", "rating": int(rng.integers(1, 6)), "date": "2026-01-01", "text": text}
+
+
+def exact_neighbours(index: SimilarityIndex, queries: np.ndarray, k: int, block: int = 65536) -> np.ndarray:
+    """Brute-force top-k rows of every query, scanning the vectors once for all queries."""
+    vectors = index.vectors()
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+    for start in range(0, index.rows, block):
+        scores = queries @ np.asarray(vectors[start:start + block], dtype=np.float32).T
+        rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores, rows = np.hstack([best_scores, scores]), np.hstack([best_rows, rows])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores, best_rows = np.take_along_axis(scores, top, 1), np.take_along_axis(rows, top, 1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, 1)
+
+
+def recall_at_k(index: SimilarityIndex, queries: np.ndarray, found: np.ndarray, exact: np.ndarray) -> float:
+    """
+    Share of the true k nearest neighbours found. Reviews often tie (same
+    phrases), so a found row scoring at least the k-th exact score counts as
+    a hit even if the exact search returned a different row of equal score.
+    """
+    vectors = index.vectors()
+    hits = []
+    for query, found_rows, exact_rows in zip(queries, found, exact):
+        kth = float(np.asarray(vectors[exact_rows[-1]], dtype=np.float32) @ query)
+        scores = np.asarray(vectors[np.sort(found_rows)], dtype=np.float32) @ query
+        hits.append(min(len(exact_rows), int(np.sum(scores >= kth - 1e-4))) / len(exact_rows))
+    return float(np.mean(hits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the review similarity index (recall@k and latency).")
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct topic and filler words.")
+    parser.add_argument("--topics", type=int, default=None, help="Latent review topics (default: reviews / 500).")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    vocabulary = synthetic_vocabulary(args.vocabulary, seed=1)
+    n_topics = args.topics or max(100, args.reviews // 500)
+    with tempfile.TemporaryDirectory() as directory:
+        index = SimilarityIndex(os.path.join(directory, "index"), train_min_rows=10 ** 12)
+        start = time.perf_counter()
+        batch = []
+        for review in synthetic_reviews(args.reviews, seed=2, vocabulary=vocabulary, n_topics=n_topics):
+            batch.append(review)
+            if len(batch) >= args.batch_size:
+                index.add_reviews(batch, dataset="bench")
+                batch = []
+        if batch:
+            index.add_reviews(batch, dataset="bench")
+        add_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        index.train()
+        train_seconds = time.perf_counter() - start
+
+        query_texts = [review["text"] for review in synthetic_reviews(args.queries, seed=3, vocabulary=vocabulary,
+                                                                      start_id=args.reviews, n_topics=n_topics)]
+        queries = index.vectorizer.transform(index.vectorizer.term_counts(query_texts))
+
+        exact = exact_neighbours(index, queries, args.k)
+        exact_latencies = []
+        for query in queries[:10]:
+            start = time.perf_counter()
+            index.search_vectors(query[None, :], args.k, exact=True)
+            exact_latencies.append(time.perf_counter() - start)
+
+        ivf = {}
+        for nprobe in args.nprobe:
+            latencies = []
+            found = np.zeros_like(exact)
+            for i, query in enumerate(queries):
+                start = time.perf_counter()
+                found[i] = index.search_vectors(query[None, :], args.k, nprobe=nprobe)[0]
+                latencies.append(time.perf_counter() - start)
+            text_latencies = []
+            for text in query_texts[:50]:
+                start = time.perf_counter()
+                index.search(text, args.k, nprobe=nprobe)
+                text_latencies.append(time.perf_counter() - start)
+            ivf[str(nprobe)] = {
+                f"recall@{args.k}": recall_at_k(index, queries, found, exact),
+                "vector_query": summarize(latencies),
+                "text_query": summarize(text_latencies),
+            }
+        stats = index.stats()
+        disk_bytes = sum(os.path.getsize(os.path.join(index.directory, name)) for name in os.listdir(index.directory))
+        index.close()
+
+    emit_results("similarity_index", {
+        "reviews": args.reviews,
+        "queries": args.queries,
+        "k": args.k,
+        "topics": n_topics,
+        "index": stats,
+        "disk_bytes": disk_bytes,
+        "add_seconds": add_seconds,
+        "add_reviews_per_sec": args.reviews / add_seconds,
+        "train_seconds": train_seconds,
+        "exact_query": summarize(exact_latencies),
+        "ivf": ivf,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
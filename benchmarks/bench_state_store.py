@@ -0,0 +1,93 @@
+"""
+Measures StateStore updates per second under concurrent writers, comparing
+field-level hash updates with the legacy read-modify-write of a JSON blob.
+
+Usage:
+    python -m benchmarks.bench_state_store --writers 8 --updates 2000
+    python -m benchmarks.bench_state_store --fake   # in-process fakeredis
+"""
+import argparse
+import threading
+import time
+
+import redis
+
+from benchmarks._common import emit_results
+from trendvisor.core.state_store import StateStore, TaskState
+
+
+class LegacyStateStore:
+    """The previous layout: one JSON string per task, updated by GET + validate + SET."""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def save_state(self, state: TaskState):
+        self.redis_client.set(f"legacy:{state.task_id}", state.model_dump_json())
+
+    def update_state(self, task_id: str, updates):
+        state_json = self.redis_client.get(f"legacy:{task_id}")
+        state = TaskState.model_validate_json(state_json)
+        for key, value in updates.items():
+            setattr(state, key, value)
+        self.save_state(state)
+
+
+def make_client(args):
+    if args.fake:
+        import fakeredis  # Optional, only needed for server-less runs
+        return fakeredis.FakeRedis(decode_responses=True)
+    return redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+
+
+def run_writers(store, n_writers: int, n_updates: int, n_tasks: int) -> float:
+    """Runs `n_writers` threads each issuing `n_updates` updates; returns updates/sec."""
+    for i in range(n_tasks):
+        store.save_state(TaskState(task_id=f"bench_{i}", goal="benchmark task"))
+
+    def writer(worker_id: int):
+        for i in range(n_updates):
+            store.update_state(f"bench_{i % n_tasks}", {"error_log": f"step {worker_id} {i}"})
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(n_writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return n_writers * n_updates / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark StateStore update throughput.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15, help="Scratch database; it is flushed.")
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a redis-server.")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--updates", type=int, default=2000, help="Updates per writer.")
+    parser.add_argument("--tasks", type=int, default=16, help="Distinct tasks the writers contend on.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    client = make_client(args)
+    client.flushdb()
+    try:
+        legacy = run_writers(LegacyStateStore(client), args.writers, args.updates, args.tasks)
+        hashed = run_writers(StateStore(redis_client=client), args.writers, args.updates, args.tasks)
+    finally:
+        client.flushdb()
+
+    emit_results("state_store_updates", {
+        "backend": "fakeredis" if args.fake else f"redis://{args.host}:{args.port}/{args.db}",
+        "writers": args.writers,
+        "updates_per_writer": args.updates,
+        "tasks": args.tasks,
+        "legacy_updates_per_sec": legacy,
+        "hash_updates_per_sec": hashed,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares task submission throughput of the legacy path (one save_state and
+one publish round trip per task) with OrchestratorAgent.submit_tasks
+(states and TASK_CREATED events written in pipelined batches).
+
+Usage:
+    python -m benchmarks.bench_task_submission --tasks 10000
+    python -m benchmarks.bench_task_submission --fake   # in-process fakeredis
+"""
+import argparse
+import contextlib
+import os
+import time
+
+import redis
+
+from benchmarks._common import emit_results
+from trendvisor.agents.orchestrator_agent import OrchestratorAgent
+from trendvisor.agents.task_scheduler import TaskSpec, new_task_id
+from trendvisor.core.message_bus import MessageBus
+from trendvisor.core.state_store import StateStore, TaskState
+
+
+def make_clients(args):
+    if args.fake:
+        import fakeredis  # Optional, only needed for server-less runs
+        server = fakeredis.FakeServer()
+        return (fakeredis.FakeRedis(server=server, db=0, decode_responses=True),
+                fakeredis.FakeRedis(server=server, db=args.db, decode_responses=True))
+    return (redis.Redis(host=args.host, port=args.port, db=0, decode_responses=True),
+            redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True))
+
+
+def submit_legacy(bus: MessageBus, store: StateStore, goals):
+    """The previous start_task loop: a state write and a publish per task."""
+    for goal in goals:
+        task_id = new_task_id(goal)
+        store.save_state(TaskState(task_id=task_id, goal=goal, status="CREATED"))
+        bus.publish("events:TASK_CREATED", {"task_id": task_id, "goal": goal})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk task submission.")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=15, help="Scratch database for task state; it is flushed.")
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a redis-server.")
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    bus_client, store_client = make_clients(args)
+    store_client.flushdb()
+    bus = MessageBus(redis_client=bus_client)
+    store = StateStore(redis_client=store_client)
+    goals = [f"product{i} sunscreen reviews" for i in range(args.tasks)]
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            submit_legacy(bus, store, goals)
+            legacy_s = time.perf_counter() - start
+            store_client.flushdb()
+
+            orchestrator = OrchestratorAgent(bus, store, max_in_flight=None, batch_size=args.batch_size)
+            start = time.perf_counter()
+            orchestrator.submit_tasks([TaskSpec(goal=goal, tenant=f"tenant{i % 8}") for i, goal in enumerate(goals)])
+            batched_s = time.perf_counter() - start
+    finally:
+        store_client.flushdb()
+
+    emit_results("task_submission", {
+        "backend": "fakeredis" if args.fake else f"redis://{args.host}:{args.port}/{args.db}",
+        "tasks": args.tasks,
+        "batch_size": args.batch_size,
+        "legacy_tasks_per_sec": args.tasks / legacy_s,
+        "batched_tasks_per_sec": args.tasks / batched_s,
+        "speedup": legacy_s / batched_s,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Measures the hot-path overhead of tracing: trace-context injection and the
+publish counter on the publish side, and the handler span and metrics on the
+receive side. Redis is left out, so the numbers are the pure per-message
+cost that tracing adds to encode + decode + handle. The run fails (exit status 1)
+if the default overhead (no span log) exceeds `--max-overhead-us`; the cost
+of the optional span log is reported separately.
+
+Usage:
+    python -m benchmarks.bench_tracing --messages 100000 --max-overhead-us 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks._common import emit_results
+from trendvisor.core import tracing
+from trendvisor.core.envelope import Envelope
+
+CHANNEL = "events:COLLECTION_PROGRESS"
+MESSAGE = {
+    "task_id": "task_bench_1751183660",
+    "data_path": "data/task_bench_1751183660_reviews.ndjson",
+    "start_offset": 40960,
+    "end_offset": 45056,
+    "count": 25,
+}
+
+
+def handler(message):
+    """A minimal handler: reads the decoded message like every agent handler does."""
+    return message['data'].get('task_id')
+
+
+def publish_and_handle(n: int, traced: bool, envelope: Envelope) -> float:
+    """Seconds per message to encode and decode a message and run its handler, with or without tracing."""
+    callback = tracing.Tracer("BenchAgent").wrap(CHANNEL, handler) if traced else handler
+    start = time.perf_counter()
+    for _ in range(n):
+        if traced:
+            payload = envelope.encode(tracing.inject(MESSAGE))
+            tracing.count_published(CHANNEL)
+        else:
+            payload = envelope.encode(MESSAGE)
+        callback({"type": "message", "channel": CHANNEL, "data": envelope.decode(payload)})
+    return (time.perf_counter() - start) / n
+
+
+def best_of(repeats: int, fn, *args) -> float:
+    return min(fn(*args) for _ in range(repeats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-message overhead of tracing.")
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per variant; the fastest is reported.")
+    parser.add_argument("--max-overhead-us", type=float, default=20.0, help="Allowed overhead per message.")
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    envelope = Envelope()
+    baseline = best_of(args.repeats, publish_and_handle, args.messages, False, envelope)
+    traced = best_of(args.repeats, publish_and_handle, args.messages, True, envelope)
+    with tempfile.TemporaryDirectory() as workdir:
+        tracing.set_span_log(tracing.SpanLog(os.path.join(workdir, "spans.jsonl")))
+        try:
+            traced_with_log = best_of(args.repeats, publish_and_handle, args.messages, True, envelope)
+        finally:
+            tracing._span_log.close()
+            tracing.set_span_log(None)
+
+    overhead_us = 1e6 * (traced - baseline)
+    overhead_with_log_us = 1e6 * (traced_with_log - baseline)
+    within_bound = overhead_us <= args.max_overhead_us
+    emit_results("tracing_overhead", {
+        "messages": args.messages,
+        "baseline_us": 1e6 * baseline,
+        "traced_us": 1e6 * traced,
+        "traced_with_span_log_us": 1e6 * traced_with_log,
+        "overhead_us": overhead_us,
+        "overhead_with_span_log_us": overhead_with_log_us,
+        "max_overhead_us": args.max_overhead_us,
+        "within_bound": within_bound,
+    }, args.output)
+    if not within_bound:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
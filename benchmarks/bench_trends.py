@@ -0,0 +1,114 @@
+"""
+Feeds a product's collections into the trend engine one at a time and
+compares keeping the rollups up to date incrementally (TrendStore.ingest
+of each new collection, overlapping reviews skipped) with recomputing them
+from all raw reviews collected so far. Then times the trend queries
+(rolling window, period-over-period delta, keyword velocity), which only
+read rollups.
+
+Usage:
+    python -m benchmarks.bench_trends --collections 20 --reviews-per-collection 2000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from benchmarks._common import emit_results, summarize
+from trendvisor.tools.text_analytics import TextAnalyzer
+from trendvisor.tools.trends import TrendStore
+
+POSITIVE = ["Light texture and no white cast, works well under makeup.", "Great value, I love this {product}.",
+            "Gentle on sensitive skin and smells fresh.", "Perfect daily {product}, absorbs fast."]
+NEGATIVE = ["Too greasy and the scent is strong.", "The packaging leaked and it was overpriced.",
+            "Sticky texture, it broke me out.", "Terrible {product}, burning on my skin."]
+
+
+def synthetic_collections(n: int, per_collection: int, overlap: float, days: int, seed: int = 7):
+    """Collections of reviews over `days` days; each re-collects `overlap` of the previous one."""
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    previous, next_id = [], 0
+    for _ in range(n):
+        repeated = previous[:int(len(previous) * overlap)]
+        collection = list(repeated)
+        while len(collection) < per_collection:
+            rating = rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 6])[0]
+            template = rng.choice(POSITIVE if rating >= 4 else NEGATIVE)
+            next_id += 1
+            collection.append({
+                "id": f"review_{next_id}",
+                "rating": rating,
+                "date": (today - datetime.timedelta(days=rng.randrange(days))).isoformat(),
+                "text": template.format(product="sunscreen") + f" Batch {next_id % 97}.",
+            })
+        previous = collection
+        yield collection
+
+
+def timed(fn, repeats: int):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incremental trend rollups against recomputing them.")
+    parser.add_argument("--collections", type=int, default=20)
+    parser.add_argument("--reviews-per-collection", type=int, default=2000)
+    parser.add_argument("--overlap", type=float, default=0.3, help="Share of each collection seen in the previous one.")
+    parser.add_argument("--days", type=int, default=365, help="Reviews are spread over this many days.")
+    parser.add_argument("--query-repeats", type=int, default=200)
+    parser.add_argument("--output", help="Optional path for the JSON results.")
+    args = parser.parse_args()
+
+    analyzer = TextAnalyzer()
+    incremental_s, recompute_s, new_reviews = [], [], []
+    raw = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = TrendStore(os.path.join(directory, "trends.sqlite3"), analyzer=analyzer)
+        for i, collection in enumerate(synthetic_collections(args.collections, args.reviews_per_collection,
+                                                             args.overlap, args.days)):
+            start = time.perf_counter()
+            new_reviews.append(store.ingest("sunscreen", collection))
+            incremental_s.append(time.perf_counter() - start)
+
+            # The previous way: every task recomputes from all raw reviews collected so far
+            raw.extend(collection)
+            scratch = TrendStore(os.path.join(directory, f"recompute_{i}.sqlite3"), analyzer=analyzer)
+            start = time.perf_counter()
+            scratch.ingest("sunscreen", raw)
+            recompute_s.append(time.perf_counter() - start)
+            scratch.close()
+
+        queries = {
+            "rolling_7d_x30": timed(lambda: store.rolling("sunscreen", window=7, periods=30), args.query_repeats),
+            "weekly_delta": timed(lambda: store.delta("sunscreen", "week"), args.query_repeats),
+            "monthly_delta": timed(lambda: store.delta("sunscreen", "month"), args.query_repeats),
+            "keyword_velocity_week": timed(lambda: store.keyword_velocity("sunscreen", "week"), args.query_repeats),
+            "summary": timed(lambda: store.summary("sunscreen"), args.query_repeats),
+        }
+        db_bytes = os.path.getsize(store.path)
+        store.close()
+
+    emit_results("trend_rollups", {
+        "collections": args.collections,
+        "reviews_per_collection": args.reviews_per_collection,
+        "overlap": args.overlap,
+        "days": args.days,
+        "new_reviews_per_collection": new_reviews,
+        "incremental_ingest": summarize(incremental_s),
+        "recompute_from_raw": summarize(recompute_s),
+        "last_collection_speedup": recompute_s[-1] / max(incremental_s[-1], 1e-9),
+        "queries": queries,
+        "rollup_db_bytes": db_bytes,
+    }, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,25 @@
 import threading
-import time
 import argparse
 import sys
 import signal
-from trendvisor.core.state_store import StateStore
+import json
+from concurrent.futures import wait
+from trendvisor.core.state_store import ArchiveWorker, StateStore
+from trendvisor.core.task_archive import DEFAULT_ARCHIVE_PATH, TaskArchive
 from trendvisor.core.message_bus import MessageBus
+from trendvisor.core import tracing
+from trendvisor.core.connection import DEFAULT_MAX_CONNECTIONS, DEFAULT_REDIS_URL, create_pool
+from trendvisor.core.envelope import CODECS, DEFAULT_CODEC, FileClaimStore
+from trendvisor.core.local_backend import LocalMessageBus, LocalStateStore
 from trendvisor.agents.orchestrator_agent import OrchestratorAgent
+from trendvisor.agents.task_scheduler import TaskSpec
 from trendvisor.agents.collection_agent import CollectionAgent
 from trendvisor.agents.analysis_agent import AnalysisAgent
-from trendvisor.core.ui import display_header, display_error, display_status
+from trendvisor.agents.index_agent import IndexAgent
+from trendvisor.tools.similarity_index import DEFAULT_INDEX_DIR, SimilarityIndex
+from trendvisor.tools.trends import DEFAULT_TRENDS_PATH, TrendStore
+from trendvisor.supervisor import AGENT_TYPES, PoolConfig, Supervisor, parse_pool_size
+from trendvisor.core.ui import VERBOSITY, display_header, display_error, display_status, start_renderer, stop_renderer
 
 def run_agent(agent):
     """Function to run an agent's main loop."""
@@ -17,22 +28,106 @@ def run_agent(agent):
     except KeyboardInterrupt:
         display_status(f"{agent.agent_name} received shutdown signal.", category="SYSTEM")
 
+def load_task_specs(path: str):
+    """Reads tasks from a file: one goal per line, or one JSON object of TaskSpec fields per line."""
+    specs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            specs.append(TaskSpec(**json.loads(line)) if line.startswith('{') else TaskSpec(goal=line))
+    return specs
+
 def main():
     """
     Initializes and runs the Trendvisor agent network.
     """
     parser = argparse.ArgumentParser(description="Trendvisor - AI-Powered Market Analysis")
-    parser.add_argument("goal", type=str, help="The high-level analysis goal (e.g., 'analyze sunscreen reviews on Olive Young').")
+    parser.add_argument("goal", type=str, nargs="?", help="The high-level analysis goal (e.g., 'analyze sunscreen reviews on Olive Young').")
+    parser.add_argument("--tasks-file", default=None,
+                        help="Submit many tasks: one goal per line, or JSON lines with goal/priority/tenant/key/depends_on/kind.")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Maximum tasks running at once.")
+    parser.add_argument("--tenant-max-in-flight", type=int, default=None, help="Maximum tasks running at once per tenant.")
+    parser.add_argument("--ready-timeout", type=float, default=10.0,
+                        help="Seconds to wait for every agent to subscribe before submitting tasks.")
+    parser.add_argument("--backend", choices=["redis", "local"], default="redis",
+                        help="'local' keeps events and state in this process (no Redis); all agents must run here.")
+    parser.add_argument("--redis-url", default=DEFAULT_REDIS_URL,
+                        help="Redis server and database shared by the state store and the message bus.")
+    parser.add_argument("--redis-max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help="Size of the shared Redis connection pool.")
+    parser.add_argument("--bus-mode", choices=["pubsub", "streams"], default="pubsub",
+                        help="Message bus delivery mode. 'streams' uses Redis Streams consumer groups (durable, load-balanced).")
+    parser.add_argument("--event-codec", choices=sorted(CODECS), default=DEFAULT_CODEC,
+                        help="Wire encoding of published events; receivers decode every codec.")
+    parser.add_argument("--max-inline-kb", type=int, default=64,
+                        help="Events larger than this are claim-checked: stored, and sent as a reference.")
+    parser.add_argument("--claim-dir", default=None,
+                        help="Store claim-checked payloads in this directory instead of Redis.")
+    parser.add_argument("--collection-concurrency", type=int, default=4, help="Maximum simultaneous collections.")
+    parser.add_argument("--analysis-workers", type=int, default=2, help="Number of pre-warmed analysis worker processes.")
+    parser.add_argument("--analysis-timeout", type=float, default=300.0, help="Per-job analysis timeout in seconds.")
+    parser.add_argument("--analysis-max-jobs", type=int, default=50, help="Recycle an analysis worker after this many jobs.")
+    parser.add_argument("--analysis-chunk-size", type=int, default=None,
+                        help="Analyze datasets in chunks of this many reviews (bounded worker memory).")
+    parser.add_argument("--report-cache-mb", type=int, default=1024,
+                        help="Size cap of the content-addressed report cache in MB (0 disables it).")
+    parser.add_argument("--trends-path", default=DEFAULT_TRENDS_PATH,
+                        help="SQLite file of per-product trend rollups updated by every analysis ('' disables).")
+    parser.add_argument("--similarity-index", default=DEFAULT_INDEX_DIR,
+                        help="Directory of the review similarity index, updated with every collection ('' disables).")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics (queue wait, handler time, failures) on this local port.")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Periodically write Prometheus metrics to this text file instead.")
+    parser.add_argument("--trace-file", default=None, help="Append handler and stage spans to this JSON lines file.")
+    parser.add_argument("--archive-path", default=DEFAULT_ARCHIVE_PATH,
+                        help="SQLite file that finished tasks are archived to.")
+    parser.add_argument("--retention-seconds", type=float, default=3600.0,
+                        help="Keep finished tasks in Redis this long before archiving them (negative disables archival).")
+    parser.add_argument("--verbosity", choices=sorted(VERBOSITY, key=VERBOSITY.get), default="verbose",
+                        help="'quiet': errors and reports; 'normal': + status messages; 'verbose': + every event.")
+    parser.add_argument("--ui-refresh", type=float, default=10.0, help="Console refreshes per second.")
+    parser.add_argument("--ui-queue-size", type=int, default=10000,
+                        help="Console messages buffered between refreshes; beyond that they are dropped and counted.")
+    parser.add_argument("--dashboard", action="store_true",
+                        help="Show a live table of agent states and queue depths below the log.")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="On shutdown, seconds each agent gets to finish the work it already accepted.")
+    parser.add_argument("--supervise", action="store_true",
+                        help="Run collection and analysis as supervised, autoscaled worker processes "
+                             "(Redis backend, streams mode). Without a goal it runs as a service until SIGTERM.")
+    parser.add_argument("--collection-processes", type=parse_pool_size, default=(1, 4), metavar="MIN[:MAX]",
+                        help="Collection worker processes under --supervise.")
+    parser.add_argument("--analysis-processes", type=parse_pool_size, default=(1, 4), metavar="MIN[:MAX]",
+                        help="Analysis worker processes under --supervise.")
+    parser.add_argument("--scale-up-backlog", type=float, default=8.0,
+                        help="Add a worker when a pool has more outstanding messages than this per worker.")
+    parser.add_argument("--scale-cooldown", type=float, default=10.0, help="Seconds between scaling decisions of a pool.")
     args = parser.parse_args()
+    if args.supervise:
+        if args.backend != "redis":
+            parser.error("--supervise needs the redis backend")
+        args.bus_mode = "streams"   # Workers of one agent type share a consumer group
+    elif not args.goal and not args.tasks_file:
+        parser.error("a goal or --tasks-file is required")
 
+    # Agents only queue their console output; one background thread writes it
+    start_renderer(args.ui_refresh, args.ui_queue_size, dashboard=args.dashboard,
+                   verbosity=VERBOSITY[args.verbosity])
     display_header()
 
     # --- Graceful Shutdown Handler ---
+    # The first signal stops submitting and waiting; the 'finally' block then
+    # drains the agents. A second signal skips straight to stopping them.
+    stop_requested = threading.Event()
+
     def shutdown_handler(signum, frame):
-        print("\n") # Newline for cleaner exit
-        display_error("Shutdown signal received. Terminating all agents.", "SYSTEM")
-        # The 'finally' block will handle the cleanup.
-        sys.exit(0)
+        if stop_requested.is_set():
+            raise KeyboardInterrupt
+        stop_requested.set()
+        display_error("Shutdown signal received. Draining agents (signal again to stop now).", "SYSTEM")
 
     signal.signal(signal.SIGINT, shutdown_handler)
     signal.signal(signal.SIGTERM, shutdown_handler)
@@ -40,15 +135,63 @@ def main():
     display_status("Initializing Trendvisor Agent Network...", category="SYSTEM")
     
     # 1. Initialize core components
-    message_bus = MessageBus()
-    state_store = StateStore()
+    if args.trace_file:
+        tracing.set_span_log(tracing.SpanLog(args.trace_file))
+    if args.metrics_port:
+        tracing.serve_metrics(args.metrics_port)
+        display_status(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics", category="SYSTEM")
+    metrics_writer = None
+    if args.metrics_file:
+        metrics_writer = tracing.MetricsFileWriter(args.metrics_file)
+        metrics_writer.start()
+    archive = TaskArchive(args.archive_path) if args.retention_seconds >= 0 else None
+    if args.backend == "local":
+        new_bus = lambda: LocalMessageBus(mode=args.bus_mode)
+        message_bus = new_bus()
+        state_store = LocalStateStore(archive=archive, retention_seconds=args.retention_seconds)
+    else:
+        redis_pool = create_pool(args.redis_url, max_connections=args.redis_max_connections)
+        new_bus = lambda: MessageBus(
+            mode=args.bus_mode, connection_pool=redis_pool, codec=args.event_codec,
+            max_inline_bytes=args.max_inline_kb * 1024,
+            claim_store=FileClaimStore(args.claim_dir) if args.claim_dir else None,
+        )
+        message_bus = new_bus()
+        state_store = StateStore(connection_pool=redis_pool, archive=archive, retention_seconds=args.retention_seconds)
+    archive_worker = None
+    if archive is not None:
+        archive_worker = ArchiveWorker(state_store, interval=max(1.0, min(60.0, args.retention_seconds / 2)))
+        archive_worker.start()
 
-    # 2. Initialize agents
-    orchestrator = OrchestratorAgent(message_bus, state_store)
-    collection_agent = CollectionAgent(message_bus, state_store)
-    analysis_agent = AnalysisAgent(message_bus, state_store)
-
-    agents = [orchestrator, collection_agent, analysis_agent]
+    # 2. Initialize agents (under --supervise, only the orchestrator runs in this process)
+    orchestrator = OrchestratorAgent(message_bus, state_store, max_in_flight=args.max_in_flight,
+                                     tenant_max_in_flight=args.tenant_max_in_flight)
+    agents = [orchestrator]
+    supervisor = None
+    if args.supervise:
+        supervisor = Supervisor(
+            vars(args),
+            [PoolConfig(agent_type, *getattr(args, f"{agent_type}_processes"),
+                        scale_up_backlog=args.scale_up_backlog, cooldown=args.scale_cooldown)
+             for agent_type in AGENT_TYPES],
+            message_bus,
+            drain_timeout=args.drain_timeout,
+        )
+    else:
+        collection_agent = CollectionAgent(message_bus, state_store, max_concurrency=args.collection_concurrency)
+        analysis_agent = AnalysisAgent(
+            message_bus, state_store,
+            pool_size=args.analysis_workers,
+            job_timeout=args.analysis_timeout,
+            max_jobs_per_worker=args.analysis_max_jobs,
+            analysis_options={"chunk_size": args.analysis_chunk_size} if args.analysis_chunk_size else None,
+            report_cache_max_bytes=args.report_cache_mb * 2**20,
+            trend_store=TrendStore(args.trends_path) if args.trends_path else None,
+        )
+        agents += [collection_agent, analysis_agent]
+    if args.similarity_index:
+        # A bus has one handler per channel; AnalysisAgent already handles COLLECTION_COMPLETE on the shared one
+        agents.append(IndexAgent(new_bus(), state_store, SimilarityIndex(args.similarity_index), backfill_dir="data"))
     threads = []
 
     # 3. Run each agent in a separate thread
@@ -57,29 +200,61 @@ def main():
         threads.append(thread)
         thread.start()
         display_status(f"{agent.agent_name} is running.", category="SYSTEM")
-    
-    # Give agents a moment to initialize and subscribe
-    time.sleep(1)
+    if supervisor is not None:
+        supervisor.start()
+        display_status("Supervisor is running the collection and analysis workers.", category="SYSTEM")
 
-    # 4. Start the main task
+    # 4. Start the main task (or the batch of tasks) once every agent is subscribed
     try:
-        task_id = orchestrator.start_task(args.goal)
-        display_status(f"Workflow for task '{task_id}' initiated.", category="SYSTEM")
-        
-        # Wait for the orchestrator to signal completion of all its tasks
-        # In this simple model, we check if the orchestrator's active_tasks list is empty.
-        while orchestrator.active_tasks:
-            time.sleep(2)
+        for agent in agents:
+            if not agent.wait_until_ready(timeout=args.ready_timeout):
+                display_error(f"{agent.agent_name} is not subscribed after {args.ready_timeout}s.", "SYSTEM")
+                sys.exit(1)
+        # Worker processes start a fresh interpreter first, hence the extra time
+        if supervisor is not None and not supervisor.wait_until_ready(timeout=args.ready_timeout + 30):
+            display_error("Not every worker pool is subscribed; tasks stay queued in the streams.", "SYSTEM")
+
+        task_ids = []
+        if args.goal:
+            task_ids.append(orchestrator.start_task(args.goal))
+            display_status(f"Workflow for task '{task_ids[0]}' initiated.", category="SYSTEM")
+        if args.tasks_file:
+            batch = orchestrator.submit_tasks(load_task_specs(args.tasks_file))
+            task_ids.extend(batch)
+            display_status(f"Workflows for {len(batch)} tasks initiated.", category="SYSTEM")
+
+        # Return as soon as the last task completes or fails, or on a shutdown
+        # signal; a supervised service without tasks runs until then.
+        pending = {orchestrator.task_future(task_id) for task_id in task_ids}
+        while (pending or not task_ids) and not stop_requested.is_set():
+            _, pending = wait(pending, timeout=0.5)
 
     except KeyboardInterrupt:
         display_status("Shutdown signal received. Exiting.", category="SYSTEM")
     finally:
-        display_header("System Shutdown", "Terminating agent fleet...")
+        display_header("System Shutdown", "Draining agent fleet...")
+        # Drain upstream first, so downstream agents still receive the events
+        # of the work finished during the drain; the orchestrator goes last.
+        try:
+            if supervisor is not None:
+                supervisor.stop()
+            for agent in agents[1:]:
+                if not agent.drain(args.drain_timeout):
+                    display_error(f"Work still in progress after {args.drain_timeout}s.", agent.agent_name)
+        except KeyboardInterrupt:
+            display_error("Second shutdown signal received. Stopping without draining.", "SYSTEM")
         for agent in reversed(agents): # Stop in reverse order
+            if agent.state == "stopped":
+                continue
             try:
                 agent.stop()
             except Exception as e:
                 display_error(f"Error stopping agent {getattr(agent, 'agent_name', 'N/A')}: {e}", "SYSTEM")
+        if metrics_writer is not None:
+            metrics_writer.stop()
+        if archive_worker is not None:
+            archive_worker.stop()
+        stop_renderer()
         
         print("\nTrendvisor has shut down gracefully.")
 
@@ -0,0 +1,38 @@
+import pytest
+
+from trendvisor.core.local_backend import LocalBroker, LocalMessageBus, LocalStateStore
+from trendvisor.core.message_bus import MessageBus
+from trendvisor.core.state_store import StateStore
+
+
+@pytest.fixture
+def fake_server():
+    """An in-process Redis server; the Lua scripts need fakeredis[lua] (lupa)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_store(fake_server):
+    import fakeredis
+    return StateStore(redis_client=fakeredis.FakeRedis(server=fake_server, db=1, decode_responses=True))
+
+
+@pytest.fixture
+def redis_bus(fake_server):
+    import fakeredis
+    return MessageBus(redis_client=fakeredis.FakeRedis(server=fake_server, db=0, decode_responses=True))
+
+
+@pytest.fixture
+def local_bus():
+    return LocalMessageBus(broker=LocalBroker())
+
+
+@pytest.fixture(params=["redis", "local"])
+def store(request):
+    """Each state store backend in turn, so every test checks both behave the same."""
+    if request.param == "redis":
+        return request.getfixturevalue("redis_store")
+    return LocalStateStore()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trendvisor.tools.aggregates import ReviewAggregates
+
+REVIEWS = [
+    {"rating": 5, "text": "great sunscreen, no white cast", "date": "2025-06-01T10:00:00"},
+    {"rating": 3, "review": "okay", "date": "2025-06-01"},
+    {"rating": None, "text": "no rating given here", "date": "2025-06-02"},
+    {"rating": 4, "text": "", "date": None},
+    {"rating": 1, "text": "broke me out badly", "date": "2025-06-03"},
+    {"rating": 5, "text": "repurchased three times already", "date": "2025-06-03"},
+]
+
+
+def _frame(reviews):
+    df = pd.DataFrame(reviews).astype(object)
+    df["text"] = [r.get("text") or r.get("review") or "" for r in reviews]
+    return df
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 4, len(REVIEWS)])
+def test_merged_chunks_equal_one_pass(chunk_size):
+    whole = ReviewAggregates().update(REVIEWS)
+    merged = ReviewAggregates()
+    for start in range(0, len(REVIEWS), chunk_size):
+        merged.merge(ReviewAggregates().update(REVIEWS[start:start + chunk_size]))
+    assert merged == whole
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, len(REVIEWS)])
+def test_frame_chunks_match_dicts(chunk_size):
+    expected = ReviewAggregates().update(REVIEWS)
+    merged = ReviewAggregates()
+    for start in range(0, len(REVIEWS), chunk_size):
+        merged.merge(ReviewAggregates().update_frame(_frame(REVIEWS[start:start + chunk_size]), text_column="text"))
+    assert merged.to_dict() == expected.to_dict()
+    assert merged.day_rating_sum == expected.day_rating_sum
+    assert merged.day_rating_count == expected.day_rating_count
+
+
+def test_weights_count_rows_as_repeated_reviews():
+    weights = [3, 1, 2, 1, 1, 4]
+    repeated = [review for review, weight in zip(REVIEWS, weights) for _ in range(weight)]
+    expected = ReviewAggregates().update(repeated)
+    weighted = ReviewAggregates().update_frame(_frame(REVIEWS), text_column="text", weights=np.array(weights))
+    assert weighted.to_dict() == expected.to_dict()
+    assert weighted.day_rating_sum == expected.day_rating_sum
+
+
+def test_weighted_sentiment_histogram():
+    sentiment = np.array([0.9, -0.9, 0.0, 0.0, -0.95, 0.9])
+    weighted = ReviewAggregates().update_frame(_frame(REVIEWS), sentiment=sentiment, weights=np.array([2, 1, 1, 1, 1, 1]))
+    assert sum(weighted.sentiment_histogram.values()) == 7
+    assert weighted.sentiment_histogram[max(weighted.sentiment_histogram)] == 3
@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from trendvisor.tools import analysis_pool
+from trendvisor.tools.analysis_pool import CANCELLED, FINISHED, AnalysisWorkerPool
+
+
+class FakeTool:
+    def __init__(self):
+        self.runs = []
+
+    def run_analysis(self, input_path, task_id, **options):
+        self.runs.append(task_id)
+        return {"report_path": f"{task_id}.html"}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A pool's bookkeeping, with this process standing in for its worker."""
+    running, lock, tool = {}, threading.Lock(), FakeTool()
+    monkeypatch.setattr(analysis_pool, "_running", running)
+    monkeypatch.setattr(analysis_pool, "_claims_lock", lock)
+    monkeypatch.setattr(analysis_pool, "_tool", tool)
+    pool = AnalysisWorkerPool.__new__(AnalysisWorkerPool)
+    pool._running, pool._claims_lock, pool._lock, pool._abandoned = running, lock, threading.Lock(), 0
+    pool.tool = tool
+    return pool
+
+
+def test_cancelled_queued_job_is_skipped_and_forgotten(pool):
+    assert pool._cancel(1) is False
+    assert pool._running == {1: CANCELLED}
+    assert analysis_pool._run_job(1, "in.ndjson", "task_a", {}) is None
+    assert pool.tool.runs == []
+    assert pool._running == {}
+
+
+def test_job_that_finished_as_it_timed_out_leaves_no_entry(pool):
+    assert analysis_pool._run_job(1, "in.ndjson", "task_a", {}) == {"report_path": "task_a.html"}
+    assert pool._running == {1: FINISHED}
+    assert pool._cancel(1) is True
+    assert pool._running == {}
+    assert pool._abandoned == 0
+
+
+def test_only_the_worker_still_running_the_job_is_killed(pool):
+    worker = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        pool._running[1] = worker.pid
+        assert pool._cancel(1) is False
+        assert worker.wait(timeout=5) != 0
+        assert pool._running == {}
+        assert pool._abandoned == 1
+    finally:
+        worker.kill()
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from trendvisor.agents.collection_agent import CollectionAgent
+from trendvisor.core.message_bus import STREAMS_MODE, MessageBus
+from trendvisor.core.state_store import TaskState
+
+GROUP = "CollectionAgent._handle_collection_task"
+
+
+class GatedCollector:
+    """A collector that finishes only once the test opens the gate."""
+
+    def __init__(self, tmp_path, fail=False):
+        self.gate = threading.Event()
+        self.tmp_path = tmp_path
+        self.fail = fail
+
+    async def __call__(self, task_id, goal, report_progress=None):
+        while not self.gate.is_set():
+            await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("site unreachable")
+        path = self.tmp_path / f"{task_id}.ndjson"
+        path.write_text("")
+        return str(path)
+
+
+@pytest.fixture
+def streams_bus(fake_server):
+    import fakeredis
+    client = fakeredis.FakeRedis(server=fake_server, db=0, decode_responses=True)
+    bus = MessageBus(redis_client=client, mode=STREAMS_MODE, block_ms=20, claim_idle_ms=100)
+    yield bus
+    bus.close()
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize("fail,status", [(False, "COLLECTION_COMPLETE"), (True, "COLLECTION_FAILED")])
+def test_task_created_is_acknowledged_when_the_collection_ends(streams_bus, redis_store, tmp_path, fail, status):
+    collector = GatedCollector(tmp_path, fail=fail)
+    agent = CollectionAgent(streams_bus, redis_store, collector=collector)
+    redis_store.save_state(TaskState(task_id="task_a", goal="analyze sunscreen", status="CREATED"))
+    agent.start()
+    try:
+        assert agent.wait_until_ready()
+        streams_bus.publish("events:TASK_CREATED", {"task_id": "task_a", "goal": "analyze sunscreen"})
+        assert _wait(lambda: redis_store.get_state("task_a").status == "COLLECTING")
+        time.sleep(0.3)  # Outlives claim_idle_ms: still pending, and not redelivered
+        assert streams_bus.backlog("events:TASK_CREATED", GROUP)["pending"] == 1
+
+        collector.gate.set()
+        assert _wait(lambda: streams_bus.backlog("events:TASK_CREATED", GROUP)["pending"] == 0)
+        assert redis_store.get_state("task_a").status == status
+    finally:
+        agent.stop()
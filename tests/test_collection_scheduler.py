@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from trendvisor.agents.collection_scheduler import CollectionScheduler, SiteLimit, resolve_site
+
+
+class Outcomes:
+    """Records what the scheduler reports as each collection ends."""
+
+    def __init__(self):
+        self.completed = []
+        self.failed = []
+        self.progress = []
+        self.lock = threading.Lock()
+
+    def on_complete(self, job, data_path):
+        with self.lock:
+            self.completed.append((job.task_id, data_path, time.monotonic()))
+
+    def on_failure(self, job, error):
+        with self.lock:
+            self.failed.append((job.task_id, str(error)))
+
+    def on_progress(self, job, data_path, start, end, count):
+        with self.lock:
+            self.progress.append((job.task_id, start, end, count))
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.completed) + len(self.failed) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return len(self.completed) + len(self.failed) >= count
+
+
+@pytest.fixture
+def schedulers():
+    started = []
+    yield started
+    for scheduler in started:
+        scheduler.stop(timeout=2)
+
+
+def _scheduler(schedulers, collector, outcomes, **kwargs):
+    scheduler = CollectionScheduler(collector, outcomes.on_complete, outcomes.on_failure,
+                                    on_progress=outcomes.on_progress, **kwargs)
+    scheduler.start()
+    schedulers.append(scheduler)
+    return scheduler
+
+
+def test_resolve_site():
+    assert resolve_site("analyze sunscreen reviews on Olive Young") == "olive young"
+    assert resolve_site("analyze sunscreen reviews") == "default"
+    assert resolve_site("analyze sunscreen reviews on ") == "default"
+
+
+def test_collections_run_concurrently_up_to_the_cap(schedulers):
+    outcomes = Outcomes()
+    running = {"now": 0, "peak": 0}
+
+    async def collector(task_id, goal, report_progress):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.05)
+        running["now"] -= 1
+        return f"{task_id}.ndjson"
+
+    scheduler = _scheduler(schedulers, collector, outcomes, max_concurrency=2)
+    for i in range(6):
+        scheduler.submit(f"task_{i}", "analyze sunscreen reviews")
+    assert outcomes.wait_for(6)
+    assert running["peak"] == 2
+    assert sorted(task_id for task_id, _, _ in outcomes.completed) == [f"task_{i}" for i in range(6)]
+
+
+def test_submit_does_not_block_the_caller(schedulers):
+    outcomes = Outcomes()
+    scheduler = _scheduler(schedulers, lambda task_id, goal, report_progress: time.sleep(0.3) or "x",
+                           outcomes, max_concurrency=1)
+    started = time.monotonic()
+    for i in range(3):
+        scheduler.submit(f"task_{i}", "goal")
+    assert time.monotonic() - started < 0.1
+
+
+def test_rate_limited_site_does_not_hold_global_slots(schedulers):
+    outcomes = Outcomes()
+
+    async def collector(task_id, goal, report_progress):
+        await asyncio.sleep(0.02)
+        return task_id
+
+    scheduler = _scheduler(schedulers, collector, outcomes, max_concurrency=1,
+                           site_limits={"slow": SiteLimit(max_concurrency=2, rate_per_sec=2.0)})
+    scheduler.submit("slow_1", "goal on slow")
+    scheduler.submit("slow_2", "goal on slow")  # Waits ~0.5s for its rate token
+    scheduler.submit("other", "goal")
+    assert outcomes.wait_for(3)
+    finished = {task_id: at for task_id, _, at in outcomes.completed}
+    assert finished["other"] < finished["slow_2"]
+
+
+def test_failures_and_progress_are_reported(schedulers):
+    outcomes = Outcomes()
+
+    def collector(task_id, goal, report_progress):
+        report_progress(f"{task_id}.ndjson", 0, 120, 3)
+        if task_id == "task_bad":
+            raise RuntimeError("site unreachable")
+        return f"{task_id}.ndjson"
+
+    scheduler = _scheduler(schedulers, collector, outcomes)
+    scheduler.submit("task_good", "goal")
+    scheduler.submit("task_bad", "goal")
+    assert outcomes.wait_for(2)
+    assert [task_id for task_id, _, _ in outcomes.completed] == ["task_good"]
+    assert outcomes.failed == [("task_bad", "site unreachable")]
+    assert sorted(outcomes.progress) == [("task_bad", 0, 120, 3), ("task_good", 0, 120, 3)]
+    assert scheduler.running == scheduler.pending == 0
@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pytest
+
+from trendvisor.tools.columnar import ColumnarDataset, ColumnarWriter, convert_json_to_columnar, is_columnar
+
+REVIEWS = [
+    {"id": "r1", "rating": 5, "date": "2025-06-01", "text": "좋아요, no white cast"},
+    {"id": "r2", "rating": None, "date": None, "review": "legacy text field"},
+    {"id": None, "rating": 3.5, "date": "2025-06-03", "text": ""},
+    {"id": "r4", "rating": 1, "date": "2025-06-04", "text": "broke me out"},
+    {"id": "r5", "rating": 4, "date": "2025-06-05", "text": "x" * 1000},
+]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    src = tmp_path / "reviews.json"
+    src.write_text(json.dumps(REVIEWS, ensure_ascii=False), encoding="utf-8")
+    dst = str(tmp_path / "reviews.tvcol")
+    assert convert_json_to_columnar(str(src), dst, chunk_size=2) == len(REVIEWS)
+    return ColumnarDataset(dst)
+
+
+def test_round_trip(dataset):
+    assert is_columnar(dataset.path)
+    assert len(dataset) == len(REVIEWS)
+    assert dataset.texts("text") == ["좋아요, no white cast", "legacy text field", "", "broke me out", "x" * 1000]
+    assert dataset.texts("id") == ["r1", "r2", "", "r4", "r5"]
+    assert dataset.texts("text", 3, 99) == ["broke me out", "x" * 1000]
+    ratings = dataset.numeric("rating")
+    assert isinstance(ratings, np.memmap)
+    assert np.isnan(ratings[1]) and ratings[2] == 3.5
+    assert np.isnat(dataset.numeric("date")[1])
+
+
+def test_iteration_and_dataframes_match_across_chunk_sizes(dataset):
+    for chunk_size in (1, 2, 100):
+        reviews = list(dataset.iter_reviews(chunk_size=chunk_size))
+        assert [review["text"] for review in reviews] == dataset.texts("text")
+    frame = dataset.to_dataframe(["rating", "text"], start=1, stop=4)
+    assert list(frame["text"]) == ["legacy text field", "", "broke me out"]
+    assert frame["rating"].isna().tolist() == [True, False, False]
+
+
+def test_empty_and_incomplete_datasets(tmp_path):
+    with ColumnarWriter(str(tmp_path / "empty.tvcol")) as writer:
+        writer.write([])
+    empty = ColumnarDataset(str(tmp_path / "empty.tvcol"))
+    assert len(empty) == 0 and empty.texts("text") == [] and list(empty.iter_reviews()) == []
+
+    partial = ColumnarWriter(str(tmp_path / "partial.tvcol"))
+    partial.write(REVIEWS)
+    assert not is_columnar(partial.path)  # meta.json is written last, by close()
+    partial.close()
+    assert len(ColumnarDataset(partial.path)) == len(REVIEWS)
+
+
+def test_unsupported_versions_are_rejected(dataset):
+    meta_path = f"{dataset.path}/meta.json"
+    with open(meta_path) as f:
+        meta = json.load(f)
+    meta["version"] += 1
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    with pytest.raises(ValueError, match="Unsupported"):
+        ColumnarDataset(dataset.path)
@@ -0,0 +1,49 @@
+import redis
+
+from trendvisor.core.connection import binary_client
+from trendvisor.core.message_bus import STREAMS_MODE, MessageBus
+
+
+def _pool(fake_server, max_connections=2):
+    import fakeredis
+    connection_class = getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection
+    return redis.BlockingConnectionPool(connection_class=connection_class, server=fake_server,
+                                        max_connections=max_connections, timeout=1, decode_responses=True)
+
+
+def test_binary_client_shares_the_pool_and_reads_bytes(fake_server):
+    client = redis.Redis(connection_pool=_pool(fake_server))
+    raw = binary_client(client)
+    assert raw.connection_pool is client.connection_pool
+    raw.set("frame", b"\xc1\x01\x00\xff")
+    assert raw.get("frame") == b"\xc1\x01\x00\xff"
+    client.set("text", "좋아요")
+    assert client.get("text") == "좋아요"
+    assert raw.get("text") == "좋아요".encode()
+
+
+def test_bus_stays_within_the_pool_bound(fake_server):
+    pool = _pool(fake_server)
+    bus = MessageBus(connection_pool=pool, mode=STREAMS_MODE, block_ms=20)
+    received = []
+    bus.subscribe("tasks", lambda message: received.append(message["data"]), group="workers")
+    bus.listen()
+    try:
+        for i in range(5):
+            bus.publish("tasks", {"n": i})
+        assert bus.raw_client.xlen("stream:tasks") == 5
+        assert len(pool._connections) <= 2
+    finally:
+        bus.close()
+
+
+def test_binary_pubsub(fake_server):
+    client = redis.Redis(connection_pool=_pool(fake_server))
+    pubsub = binary_client(client).pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe("events")
+    client.publish("events", b"\xc1\x01")
+    message = None
+    for _ in range(10):
+        message = message or pubsub.get_message(timeout=0.1)
+    assert message["data"] == b"\xc1\x01"
+    pubsub.close()
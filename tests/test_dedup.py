@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from trendvisor.tools.dedup import MinHashDeduplicator, duplicates_artifact, jaccard, shingles
+
+BASE = "this sunscreen has a light texture, leaves no white cast and sits well under makeup all day"
+TEXTS = [
+    BASE,
+    "Something else entirely: the pump broke on the first day and it leaked everywhere.",
+    "  THIS sunscreen has a light texture, leaves no white cast and sits well under makeup all day ",
+    BASE.replace("all day", "all day long"),
+    "",
+    "a short one",
+    None,
+    "a short one",
+]
+
+
+def test_clusters_exact_and_near_duplicates():
+    result = MinHashDeduplicator(threshold=0.8, num_perm=128).deduplicate(TEXTS)
+    assert result.labels.tolist() == [0, 1, 0, 0, 2, 3, 2, 3]
+    assert result.representatives.tolist() == [0, 1, 4, 5]
+    assert result.weights.tolist() == [3, 1, 2, 2]
+    assert result.duplicates == 4
+    assert [group.tolist() for group in result.clusters()] == [[0, 2, 3], [4, 6], [5, 7]]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, len(TEXTS)])
+def test_chunked_input_gives_the_same_clusters(chunk_size):
+    deduplicator = MinHashDeduplicator(threshold=0.8, num_perm=128, batch_size=2)
+    whole = deduplicator.deduplicate(TEXTS)
+    chunked = deduplicator.deduplicate_chunks(TEXTS[start:start + chunk_size]
+                                              for start in range(0, len(TEXTS), chunk_size))
+    np.testing.assert_array_equal(chunked.labels, whole.labels)
+    np.testing.assert_array_equal(chunked.weights, whole.weights)
+
+
+def test_signatures_estimate_jaccard_similarity():
+    deduplicator = MinHashDeduplicator(num_perm=256)
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(200)]
+    pairs = []
+    for _ in range(20):
+        a = " ".join(rng.choice(words, 40))
+        b = " ".join(rng.choice(words, 10)) + " " + a[:len(a) // 2]
+        pairs.append((a, b))
+    signatures = deduplicator.signatures([text for pair in pairs for text in pair])
+    estimates = (signatures[0::2] == signatures[1::2]).mean(axis=1)
+    exact = np.array([jaccard(shingles(a), shingles(b)) for a, b in pairs])
+    assert np.abs(estimates - exact).mean() < 0.05
+
+
+def test_artifact_and_arguments():
+    result = MinHashDeduplicator().deduplicate(TEXTS)
+    artifact = duplicates_artifact(result, ids=[f"r{i}" for i in range(len(TEXTS))], threshold=0.8)
+    json.dumps(artifact)
+    assert artifact["reviews"] == len(TEXTS) and artifact["duplicates"] == 4
+    assert artifact["clusters"][0] == {"representative": "r0", "size": 3, "members": ["r0", "r2", "r3"]}
+    assert MinHashDeduplicator().deduplicate([]).labels.tolist() == []
+    with pytest.raises(ValueError):
+        MinHashDeduplicator(threshold=0)
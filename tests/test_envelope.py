@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from trendvisor.core.envelope import (
+    CLAIM_FIELD, CODECS, ENVELOPE_VERSION, MAGIC, MESSAGE_FIELD, Envelope, EnvelopeError, FileClaimStore,
+    RedisClaimStore,
+)
+
+MESSAGE = {"task_id": "task_a", "trace": {"id": "t1"}, "reviews": [{"rating": 5, "text": "좋아요"}], "n": 3.5}
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_round_trip(codec):
+    envelope = Envelope(codec)
+    assert envelope.decode(envelope.encode(MESSAGE)) == MESSAGE
+    assert envelope.decode(envelope.encode({})) == {}
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_any_codec_decodes_any_frame(codec):
+    frame = Envelope(codec).encode(MESSAGE)
+    for receiver in CODECS:
+        assert Envelope(receiver).decode(frame) == MESSAGE
+
+
+def test_frames_carry_the_version():
+    assert json.loads(Envelope("json").encode(MESSAGE))["v"] == ENVELOPE_VERSION
+    if "msgpack" in CODECS:
+        frame = Envelope("msgpack").encode(MESSAGE)
+        assert frame[:2] == bytes((MAGIC, ENVELOPE_VERSION))
+
+
+def test_legacy_json_events_decode_as_version_0():
+    assert Envelope().decode(json.dumps(MESSAGE)) == MESSAGE
+
+
+def test_version_1_json_frames_still_decode():
+    assert Envelope().decode(json.dumps({"v": 1, **MESSAGE})) == MESSAGE
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_messages_may_use_the_envelope_keys(codec):
+    message = {"v": "draft", "m": [1, 2], "task_id": "task_a"}
+    envelope = Envelope(codec)
+    assert envelope.decode(envelope.encode(message)) == message
+
+
+@pytest.mark.parametrize("frame", [
+    json.dumps({"v": ENVELOPE_VERSION + 1, "task_id": "x"}).encode(),
+    json.dumps({"v": ENVELOPE_VERSION, "task_id": "x"}).encode(),  # No message
+    bytes((MAGIC, ENVELOPE_VERSION + 1, 0)) + b"{}",
+    bytes((MAGIC, ENVELOPE_VERSION, 99)) + b"{}",
+    b"not json",
+    b"[1, 2]",
+])
+def test_undecodable_frames(frame):
+    with pytest.raises(EnvelopeError):
+        Envelope().decode(frame)
+
+
+def test_file_claim_check_round_trip(tmp_path):
+    envelope = Envelope("json", FileClaimStore(str(tmp_path)), max_inline_bytes=64)
+    large = dict(MESSAGE, reviews=[{"text": "x" * 200}])
+    frame = envelope.encode(large)
+    reference = json.loads(frame)[MESSAGE_FIELD]
+    assert set(reference) == {CLAIM_FIELD, "task_id", "trace"}
+    assert len(list(tmp_path.iterdir())) == 1
+    assert envelope.decode(frame) == large
+
+    small = {"task_id": "task_b"}
+    assert envelope.decode(envelope.encode(small)) == small
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_expired_or_unresolvable_claims(tmp_path):
+    store = FileClaimStore(str(tmp_path))
+    frame = Envelope("json", store, max_inline_bytes=16).encode(MESSAGE)
+    with pytest.raises(EnvelopeError, match="no claim store"):
+        Envelope("json").decode(frame)
+    for path in tmp_path.iterdir():
+        path.unlink()
+    with pytest.raises(EnvelopeError, match="expired"):
+        Envelope("json", store).decode(frame)
+
+
+def test_a_message_that_only_looks_like_a_claim_is_not_fetched():
+    message = {CLAIM_FIELD: "file:x", "task_id": "task_a", "other": 1}
+    assert Envelope("json").decode(Envelope("json").encode(message)) == message
+
+
+def test_redis_claim_store(fake_server):
+    import fakeredis
+    store = RedisClaimStore(fakeredis.FakeRedis(server=fake_server), ttl=60)
+    envelope = Envelope(sorted(CODECS)[-1], store, max_inline_bytes=32)
+    frame = envelope.encode(MESSAGE)
+    assert len(frame) < 200
+    assert envelope.decode(frame) == MESSAGE
+
+
+def test_missing_msgpack_falls_back_to_json_with_a_warning(monkeypatch):
+    from trendvisor.core import envelope
+    warnings = []
+    monkeypatch.setattr(envelope, "msgpack", None)
+    monkeypatch.setattr(envelope, "display_warning", lambda message, agent_id: warnings.append(message))
+    assert envelope.get_codec("msgpack") is CODECS["json"]
+    assert len(warnings) == 1
@@ -0,0 +1,53 @@
+import sqlite3
+
+from trendvisor.tools.feature_cache import FeatureCache, content_hash
+
+
+def _items(ids, payload=b"x"):
+    return [((str(i), content_hash(f"review {i}")), payload) for i in ids]
+
+
+def _count(cache):
+    return cache._conn.execute("SELECT n FROM feature_count").fetchone()[0]
+
+
+def test_hits_misses_and_replaced_payloads(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many(_items(range(3)))
+    cache.put_many(_items(range(2), payload=b"y"))
+    keys = [key for key, _ in _items(range(4))]
+    assert cache.get_many(keys) == [b"y", b"y", b"x", None]
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert len(cache) == _count(cache) == 3
+
+
+def test_eviction_keeps_the_recently_used_entries(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    cache.put_many(_items(range(10)))
+    cache.get_many([key for key, _ in _items(range(5))])  # Refreshes 0-4
+    cache.put_many(_items(range(10, 12)))
+    assert len(cache) == _count(cache) <= 10
+    assert None not in cache.get_many([key for key, _ in _items(range(5))])
+    assert cache.evictions == 3
+
+
+def test_puts_below_the_cap_do_not_count_the_table(tmp_path):
+    cache = FeatureCache(str(tmp_path / "cache.sqlite3"), max_entries=1000)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+    for start in range(0, 100, 10):
+        cache.put_many(_items(range(start, start + 10)))
+    assert not any("COUNT(*)" in statement for statement in statements)
+    assert _count(cache) == 100
+
+
+def test_existing_caches_are_counted_once(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    FeatureCache(path).put_many(_items(range(5)))
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TRIGGER features_inserted; DROP TRIGGER features_deleted; DROP TABLE feature_count;")
+    conn.close()
+    cache = FeatureCache(path)
+    assert _count(cache) == 5
+    cache.put_many(_items(range(3, 8)))
+    assert _count(cache) == len(cache) == 8
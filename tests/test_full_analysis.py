@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+
+from trendvisor.tools.full_analysis import RowSampler, full_analysis
+
+
+def _frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    sentiment = rng.uniform(-1, 1, n)
+    words = rng.integers(3, 80, n)
+    return pd.DataFrame({
+        "sentiment": sentiment,
+        "word_count": words,
+        "review_length": words * 5 + rng.integers(0, 5, n),
+        "rating": np.clip(np.round(3 + 2 * sentiment + rng.normal(0, 0.3, n)), 1, 5),
+    })
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1000])
+def test_sample_does_not_depend_on_chunking(chunk_size):
+    frame = _frame(500)
+    whole = RowSampler(50, list(frame.columns))
+    whole.add(frame, 0)
+    chunked = RowSampler(50, list(frame.columns))
+    for start in range(0, len(frame), chunk_size):
+        chunked.add(frame.iloc[start:start + chunk_size], start)
+    sample = chunked.sample()
+    assert len(sample) == 50
+    pd.testing.assert_frame_equal(sample, whole.sample())
+
+
+def test_too_little_data_is_skipped():
+    result = full_analysis(_frame(5))
+    assert result["skipped"] and result["rows"] == 5
+    assert full_analysis(pd.DataFrame({"rating": [5] * 50}))["features"] == []
+
+
+def test_stages_degrade_when_over_budget():
+    result = full_analysis(_frame(300), budgets={"models": 1e-6, "segments": 1e-6, "embedding": 1e-6}, n_jobs=1)
+    json.dumps(result)
+    assert list(result["models"]) == ["Ridge"]
+    assert result["segments"]["Total Segments"] == 4  # The default k, without the search
+    assert sum(result["segments"]["Segment Sizes"]) == 300
+    assert result["embedding"]["method"] == "pca"
+    assert all(result["stages"][stage]["degraded"] for stage in ("models", "segments", "embedding"))
+
+
+def test_full_models_within_budget():
+    result = full_analysis(_frame(300), budgets={"models": 60, "segments": 60, "embedding": 60}, n_jobs=1)
+    json.dumps(result)
+    assert set(result["models"]) == {"RandomForest", "GradientBoosting"}
+    assert result["ensemble_r2"] > 0.5
+    assert result["embedding"]["method"] == "tsne"
+    assert len(result["embedding"]["x"]) == len(result["embedding"]["segment"]) == 300
+    assert result["stages"]["models"]["degraded"] == []
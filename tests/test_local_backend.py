@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from trendvisor.core.local_backend import LocalBroker, LocalMessageBus, LocalStateStore
+from trendvisor.core.message_bus import STREAMS_MODE
+from trendvisor.core.state_store import TaskState
+
+
+class Inbox:
+    """A handler that records the messages it receives."""
+
+    def __init__(self, fail_times=0):
+        self.received = []
+        self.fail_times = fail_times
+        self.calls = 0
+
+    def __call__(self, message):
+        self.calls += 1
+        if self.calls <= self.fail_times:
+            raise RuntimeError("handler failed")
+        self.received.append(message["data"])
+
+
+def _wait(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def broker():
+    return LocalBroker()
+
+
+@pytest.fixture
+def buses(broker):
+    started = []
+
+    def make(**kwargs):
+        bus = LocalMessageBus(broker=broker, poll_interval=0.01, **kwargs)
+        started.append(bus)
+        return bus
+    yield make
+    for bus in started:
+        bus.close()
+
+
+def test_pubsub_delivers_to_every_bus(buses):
+    inboxes = [Inbox(), Inbox()]
+    for inbox in inboxes:
+        bus = buses()
+        bus.subscribe("events", inbox)
+        bus.listen()
+    publisher = buses()
+    assert publisher.wait_for_subscribers(["events"], timeout=1)
+    assert not publisher.wait_for_subscribers(["nobody"], timeout=0.05)
+    publisher.publish("events", {"task_id": "task_a"})
+    assert all(_wait(lambda inbox=inbox: inbox.received) for inbox in inboxes)
+    assert inboxes[0].received[0]["task_id"] == "task_a"
+
+
+def test_group_members_share_the_messages(buses):
+    first, second = Inbox(), Inbox()
+    for inbox in (first, second):
+        bus = buses(mode=STREAMS_MODE)
+        bus.subscribe("tasks", inbox, group="workers")
+        bus.listen()
+    publisher = buses(mode=STREAMS_MODE)
+    for i in range(20):
+        publisher.publish("tasks", {"n": i})
+    assert _wait(lambda: len(first.received) + len(second.received) == 20)
+    assert sorted(m["n"] for m in first.received + second.received) == list(range(20))
+    assert publisher.backlog("tasks", "workers") == {"pending": 0, "lag": 0}
+
+
+def test_failed_messages_are_retried_then_dead_lettered(buses, broker):
+    retried, poisoned = Inbox(fail_times=1), Inbox(fail_times=100)
+    bus = buses(mode=STREAMS_MODE, max_deliveries=3)
+    bus.subscribe("tasks", retried, group="retried")
+    bus.subscribe("poison", poisoned, group="poisoned")
+    bus.listen()
+    bus.publish("tasks", {"n": 1})
+    bus.publish("poison", {"n": 2})
+    assert _wait(lambda: retried.received and broker.dead_letters)
+    assert retried.calls == 2
+    assert poisoned.calls == 3
+    assert [(channel, message["n"]) for channel, message in broker.dead_letters] == [("poison", 2)]
+
+
+def test_transitions_send_their_event(buses):
+    inbox = Inbox()
+    bus = buses(mode=STREAMS_MODE)
+    bus.subscribe("collection_complete", inbox, group="analysis")
+    bus.listen()
+    store = LocalStateStore()
+    store.save_state(TaskState(task_id="task_a", goal="goal", status="CREATED"))
+    store.transition("task_a", "COLLECTING")
+    event = bus.prepare("collection_complete", {"task_id": "task_a"})
+    assert store.transition("task_a", "COLLECTION_COMPLETE", {"artifacts": {"data_path": "a.ndjson"}},
+                            event=event) == "COLLECTING"
+    assert _wait(lambda: inbox.received)
+    assert inbox.received[0]["task_id"] == "task_a"
+    assert store.get_field("task_a", "artifacts") == {"data_path": "a.ndjson"}
+
+
+def test_published_messages_are_not_shared_between_deliveries(buses):
+    first, second = Inbox(), Inbox()
+    for inbox in (first, second):
+        bus = buses()
+        bus.subscribe("events", inbox)
+        bus.listen()
+    buses().publish("events", {"task_id": "task_a"})
+    assert _wait(lambda: first.received and second.received)
+    first.received[0]["task_id"] = "changed"
+    assert second.received[0]["task_id"] == "task_a"
@@ -0,0 +1,246 @@
+import threading
+import time
+
+import pytest
+import redis
+
+from trendvisor.core.message_bus import STREAMS_MODE, MessageBus
+
+
+def _bus(fake_server, **kwargs):
+    import fakeredis
+    client = fakeredis.FakeRedis(server=fake_server, decode_responses=True)
+    options = dict(mode=STREAMS_MODE, block_ms=20, claim_idle_ms=100)
+    options.update(kwargs)
+    return MessageBus(redis_client=client, **options)
+
+
+class Inbox:
+    """A handler that records the messages it receives."""
+
+    def __init__(self, fail_times=0):
+        self.received = []
+        self.fail_times = fail_times
+        self.calls = 0
+
+    def __call__(self, message):
+        self.calls += 1
+        if self.calls <= self.fail_times:
+            raise RuntimeError("handler failed")
+        self.received.append(message["data"])
+
+    def wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.received) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return len(self.received) >= count
+
+
+@pytest.fixture
+def buses():
+    started = []
+    yield started
+    for bus in started:
+        bus.close()
+
+
+def _listen(buses, bus):
+    buses.append(bus)
+    bus.listen()
+    return bus
+
+
+def _pending(bus, channel, group):
+    return bus.backlog(channel, group)["pending"]
+
+
+def test_group_members_share_the_messages(fake_server, buses):
+    first, second = Inbox(), Inbox()
+    publisher = _bus(fake_server)
+    for inbox in (first, second):
+        bus = _bus(fake_server)
+        bus.subscribe("tasks", inbox, group="workers")
+        _listen(buses, bus)
+    for i in range(20):
+        publisher.publish("tasks", {"n": i})
+
+    deadline = time.monotonic() + 5
+    while len(first.received) + len(second.received) < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    numbers = sorted(m["n"] for m in first.received + second.received)
+    assert numbers == list(range(20))
+    assert _pending(publisher, "tasks", "workers") == 0
+
+
+def test_separate_groups_each_get_every_message(fake_server, buses):
+    inboxes = [Inbox(), Inbox()]
+    for group, inbox in zip(("collect", "index"), inboxes):
+        bus = _bus(fake_server)
+        bus.subscribe("events", inbox, group=group)
+        _listen(buses, bus)
+    _bus(fake_server).publish("events", {"task_id": "t"})
+    assert all(inbox.wait_for(1) for inbox in inboxes)
+
+
+def test_messages_published_before_the_listener_starts_are_kept(fake_server, buses):
+    bus = _bus(fake_server)
+    inbox = Inbox()
+    bus.subscribe("tasks", inbox, group="workers")
+    bus.publish("tasks", {"n": 1})
+    _listen(buses, bus)
+    assert inbox.wait_for(1)
+
+
+def test_failed_messages_are_reclaimed_and_retried(fake_server, buses):
+    bus = _bus(fake_server)
+    inbox = Inbox(fail_times=1)
+    bus.subscribe("tasks", inbox, group="workers")
+    _listen(buses, bus)
+    bus.publish("tasks", {"n": 1})
+    assert inbox.wait_for(1)
+    assert inbox.calls == 2
+    deadline = time.monotonic() + 2
+    while _pending(bus, "tasks", "workers") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _pending(bus, "tasks", "workers") == 0
+
+
+def test_messages_of_a_dead_consumer_are_reclaimed(fake_server, buses):
+    dead = _bus(fake_server, consumer_name="dead")
+    dead.subscribe("tasks", Inbox(), group="workers")
+    dead.publish("tasks", {"n": 1})
+    # Read but never acknowledged, as by a worker that died mid-message
+    dead.raw_client.xreadgroup("workers", "dead", {"stream:tasks": ">"}, count=10)
+    assert _pending(dead, "tasks", "workers") == 1
+
+    survivor = _bus(fake_server, consumer_name="survivor")
+    inbox = Inbox()
+    survivor.subscribe("tasks", inbox, group="workers")
+    _listen(buses, survivor)
+    assert inbox.wait_for(1)
+    assert inbox.received[0]["n"] == 1
+
+
+def test_poison_messages_are_dead_lettered(fake_server, buses):
+    bus = _bus(fake_server, max_deliveries=2)
+    inbox = Inbox(fail_times=100)
+    bus.subscribe("tasks", inbox, group="workers")
+    _listen(buses, bus)
+    bus.publish("tasks", {"n": 1})
+    deadline = time.monotonic() + 5
+    while not bus.raw_client.xlen("stream:tasks:dead") and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert bus.raw_client.xlen("stream:tasks:dead") == 1
+    assert _pending(bus, "tasks", "workers") == 0
+    assert inbox.calls == 2
+
+
+def test_listener_survives_connection_errors_in_ack_and_reclaim(fake_server, buses, monkeypatch):
+    bus = _bus(fake_server)
+    inbox = Inbox()
+    bus.subscribe("tasks", inbox, group="workers")
+    client = bus.raw_client
+    failures = {"xack": 1, "xautoclaim": 1}
+
+    def flaky(name):
+        real = getattr(client, name)
+
+        def call(*args, **kwargs):
+            if failures[name]:
+                failures[name] -= 1
+                raise redis.ConnectionError(f"{name} lost the connection")
+            return real(*args, **kwargs)
+        return call
+
+    for name in failures:
+        monkeypatch.setattr(client, name, flaky(name))
+    _listen(buses, bus)
+    bus.publish("tasks", {"n": 1})
+    bus.publish("tasks", {"n": 2})
+
+    deadline = time.monotonic() + 5
+    while {m["n"] for m in inbox.received} != {1, 2} and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert {m["n"] for m in inbox.received} == {1, 2}
+    assert failures == {"xack": 0, "xautoclaim": 0}
+    assert all(listener.is_alive() for listener in bus._listeners.values())
+
+
+def test_stop_takes_effect_between_messages(fake_server):
+    bus = _bus(fake_server, batch_size=50)
+    seen = []
+    stopping = threading.Event()
+
+    def handler(message):
+        seen.append(message["data"]["n"])
+        if len(seen) == 3:
+            stopping.set()
+            bus.close()
+
+    bus.subscribe("tasks", handler, group="workers")
+    bus.publish_many("tasks", [{"n": i} for i in range(20)])
+    bus.listen()
+    assert stopping.wait(5)
+    time.sleep(0.2)
+    assert len(seen) == 3
+    assert _pending(bus, "tasks", "workers") == 17
+
+
+def test_deferred_messages_stay_pending_until_acknowledged(fake_server, buses):
+    bus = _bus(fake_server)
+    acks = []
+    bus.subscribe("tasks", lambda message: acks.append(bus.defer_ack(message)), group="workers")
+    _listen(buses, bus)
+    bus.publish("tasks", {"n": 1})
+    deadline = time.monotonic() + 5
+    while not acks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.3)  # Several claim_idle_ms: the heartbeat keeps it from being reclaimed
+    assert len(acks) == 1
+    assert _pending(bus, "tasks", "workers") == 1
+
+    acks[0]()
+    acks[0]()  # Acknowledging twice is harmless
+    assert _pending(bus, "tasks", "workers") == 0
+
+
+def test_deferred_messages_are_not_taken_by_other_consumers(fake_server, buses):
+    holder = _bus(fake_server, consumer_name="holder")
+    acks = []
+    holder.subscribe("tasks", lambda message: acks.append(holder.defer_ack(message)), group="workers")
+    _listen(buses, holder)
+    holder.publish("tasks", {"n": 1})
+    deadline = time.monotonic() + 5
+    while not acks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    other = _bus(fake_server, consumer_name="other")
+    inbox = Inbox()
+    other.subscribe("tasks", inbox, group="workers")
+    _listen(buses, other)
+    time.sleep(0.4)
+    assert inbox.received == []
+    acks[0]()
+    assert _pending(holder, "tasks", "workers") == 0
+
+
+def test_deferred_messages_of_a_dead_consumer_are_reclaimed(fake_server, buses):
+    dead = _bus(fake_server, consumer_name="dead")
+    acks = []
+    dead.subscribe("tasks", lambda message: acks.append(dead.defer_ack(message)), group="workers")
+    dead.listen()
+    dead.publish("tasks", {"n": 1})
+    deadline = time.monotonic() + 5
+    while not acks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Dies with the work unfinished: no more heartbeats, never acknowledged
+    for listener in dead._listeners.values():
+        listener._deferred.clear()
+    dead.close()
+
+    survivor = _bus(fake_server, consumer_name="survivor")
+    inbox = Inbox()
+    survivor.subscribe("tasks", inbox, group="workers")
+    _listen(buses, survivor)
+    assert inbox.wait_for(1)
+    assert inbox.received[0]["n"] == 1
@@ -0,0 +1,60 @@
+import os
+import time
+
+from trendvisor.tools.report_cache import ReportCache, cache_key, dataset_digest
+
+
+def _artifacts(output_dir, task_id, body="<html>report</html>"):
+    report = output_dir / f"{task_id}_report.html"
+    report.write_text(body)
+    return {"report_html": str(report), "review_count": 42}
+
+
+def test_keys_follow_content_parameters_and_version(tmp_path):
+    first, second = tmp_path / "a.ndjson", tmp_path / "b.ndjson"
+    first.write_text('{"rating": 5}\n')
+    second.write_text('{"rating": 5}\n')
+    params = {"chunk_size": 100, "dedup": 0.9}
+    assert cache_key(str(first), params, "1") == cache_key(str(second), dict(reversed(params.items())), "1")
+    assert cache_key(str(first), params, "1") != cache_key(str(first), params, "2")
+    assert cache_key(str(first), params, "1") != cache_key(str(first), {**params, "dedup": 0.8}, "1")
+    second.write_text('{"rating": 4}\n')
+    assert dataset_digest(str(first)) != dataset_digest(str(second))
+
+    directory = tmp_path / "reviews.tvcol"
+    directory.mkdir()
+    (directory / "meta.json").write_text("{}")
+    before = dataset_digest(str(directory))
+    (directory / "rating.bin").write_bytes(b"\0")
+    assert dataset_digest(str(directory)) != before
+
+
+def test_hits_are_materialized_under_the_new_task(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    results = tmp_path / "results"
+    results.mkdir()
+    assert cache.get("k", "task_b", str(results)) is None
+
+    cache.put("k", "task_a", _artifacts(results, "task_a"))
+    (results / "task_a_report.html").write_text("rewritten later")  # Must not alter the entry
+    artifacts = cache.get("k", "task_b", str(results))
+    assert artifacts == {"report_html": str(results / "task_b_report.html")}
+    assert (results / "task_b_report.html").read_text() == "<html>report</html>"
+
+
+def test_half_written_entries_are_misses(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    (tmp_path / "cache" / "k").mkdir()
+    assert cache.get("k", "task_b", str(tmp_path)) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ReportCache(str(tmp_path / "cache"))
+    for i, key in enumerate(("old", "used", "new")):
+        cache.put(key, f"task_{i}", _artifacts(tmp_path, f"task_{i}", body="x" * 1000))
+        past = time.time() - 100 + i
+        os.utime(tmp_path / "cache" / key, (past, past))
+    assert cache.get("used", "task_x", str(tmp_path)) is not None  # Refreshes it
+    cache.max_bytes = 2500
+    assert cache.evict() == 1
+    assert sorted(os.listdir(tmp_path / "cache")) == ["new", "used"]
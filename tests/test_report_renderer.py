@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("plotly")
+
+from trendvisor.tools.report_renderer import (
+    ReportRenderer, bar_chart, binned_counts, downsample_series, review_count_label, value_counts,
+)
+
+
+def test_binned_and_value_counts_skip_missing_values():
+    centers, counts, width = binned_counts([0.1, 0.2, np.nan, 0.9], bins=2, value_range=(0.0, 1.0))
+    assert centers.tolist() == [0.25, 0.75] and counts.tolist() == [2, 1] and width == 0.5
+    assert value_counts([5, 3, None, 5, 1]) == ([1.0, 3.0, 5.0], [1, 1, 2])
+
+
+def test_series_use_the_finest_period_that_fits():
+    dates = ["2025-01-01", "2025-01-01", "2025-01-03", None, "not a date"]
+    daily, period = downsample_series(dates, values=[4, 2, np.nan, 5, 5])
+    assert period == "day"
+    assert daily["count"].tolist() == [2, 1]  # Empty days are dropped
+    assert daily["mean"].iloc[0] == 3 and np.isnan(daily["mean"].iloc[1])
+
+    years = pd.date_range("2020-01-01", "2024-12-31", freq="D")
+    series, period = downsample_series(years, max_points=100)
+    assert period == "month" and len(series) == 60
+    assert series["count"].sum() == len(years)
+
+
+def test_reports_share_one_plotly_asset(tmp_path):
+    paths = []
+    for i in range(2):
+        renderer = ReportRenderer(f"Report <{i}>").add_metric("Reviews", review_count_label(145, 13))
+        renderer.add_chart("Ratings", bar_chart([1, 5], [3, 9]))
+        paths.append(renderer.render(str(tmp_path / f"task_{i}_report.html")))
+    assets = os.listdir(tmp_path / "assets")
+    assert len(assets) == 1
+    page = open(paths[0], encoding="utf-8").read()
+    assert f'src="assets/{assets[0]}"' in page
+    assert "Report &lt;0&gt;" in page and "145 reviews (13 unique)" in page
+    # The bundle is referenced, not inlined
+    assert os.path.getsize(paths[0]) < os.path.getsize(tmp_path / "assets" / assets[0]) / 10
+
+
+def test_review_count_label():
+    assert review_count_label(10) == "10 reviews"
+    assert review_count_label(10, 10) == "10 reviews"
+    assert review_count_label(145, 13) == "145 reviews (13 unique)"
@@ -0,0 +1,48 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("sklearn")
+
+from trendvisor.tools.aggregates import ReviewAggregates
+from trendvisor.tools.analyze_and_visualize import (
+    analyze_chunk, find_duplicates, render_report, select_representatives,
+)
+from trendvisor.tools.comparison import compare_tasks, task_summary
+from trendvisor.tools.text_analytics import TextAnalytics, TextAnalyzer
+
+TEXTS = (
+    ["great sunscreen with no white cast at all, would buy again"] * 10
+    + ["sticky texture and it stings my eyes every single time"] * 3
+    + ["smells lovely and layers well under makeup in the morning"]
+)
+
+
+def _analyze(texts):
+    df = pd.DataFrame({"id": range(len(texts)), "rating": [5] * len(texts), "text": texts})
+    dedup, _ = find_duplicates(lambda: iter([df]), 0.9)
+    analytics, aggregates = TextAnalytics(TextAnalyzer()), ReviewAggregates()
+    analyze_chunk(select_representatives(df, dedup, 0), analytics, aggregates)
+    return dedup, analytics.summary(), aggregates
+
+
+def test_report_counts_every_review_and_labels_the_unique_ones(tmp_path):
+    dedup, summary, aggregates = _analyze(TEXTS)
+    assert (summary["reviews"], aggregates.count) == (3, 14)
+    path = render_report(str(tmp_path / "report.html"), aggregates, summary, duplicates=dedup.duplicates)
+    page = open(path, encoding="utf-8").read()
+    assert "Trendvisor Review Analysis - 14 reviews (3 unique)" in page
+
+
+def test_comparison_uses_the_weighted_count(tmp_path):
+    _, summary, _ = _analyze(TEXTS)
+    text_path = tmp_path / "a_text_analytics.json"
+    text_path.write_text(json.dumps(summary))
+    artifacts = {"text_analytics_path": str(text_path)}
+    assert task_summary("A", artifacts)["reviews"] == 14
+    assert task_summary("A", artifacts)["unique_reviews"] == 3
+
+    report = compare_tasks("task_c", {"task_a": {"label": "A", "artifacts": artifacts}}, str(tmp_path))
+    page = open(report["report_path"], encoding="utf-8").read()
+    assert "14 reviews (3 unique)" in page
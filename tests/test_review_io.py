@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from trendvisor.tools.review_io import (
+    append_reviews, iter_json_array, iter_review_chunks, iter_reviews, read_review_range,
+)
+from trendvisor.tools.streaming_analysis import StreamingAnalysis
+
+REVIEWS = [
+    {"id": f"r{i}", "rating": 1 + i % 5, "text": f"리뷰 {i} " + "x" * i, "date": f"2025-06-{1 + i % 28:02d}"}
+    for i in range(30)
+]
+
+
+def test_appended_chunks_are_read_back_by_byte_range(tmp_path):
+    path = str(tmp_path / "reviews.ndjson")
+    ranges = [append_reviews(path, REVIEWS[start:start + 7]) for start in range(0, len(REVIEWS), 7)]
+    assert ranges[0][0] == 0
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+    for (start, end), first in zip(ranges, range(0, len(REVIEWS), 7)):
+        assert read_review_range(path, start, end) == REVIEWS[first:first + 7]
+    assert list(iter_reviews(path)) == REVIEWS
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 16, 1 << 20])
+def test_json_arrays_are_read_incrementally(tmp_path, block_size):
+    path = tmp_path / "reviews.json"
+    values = REVIEWS + [-3e10, 12345, "a, ]", [1, [2]], None]
+    path.write_text(json.dumps(values, indent=1, ensure_ascii=False), encoding="utf-8")
+    assert list(iter_json_array(str(path), block_size=block_size)) == values
+
+
+def test_malformed_json_arrays(tmp_path):
+    path = tmp_path / "reviews.json"
+    path.write_text('{"rating": 5}')
+    with pytest.raises(ValueError, match="not a JSON array"):
+        list(iter_json_array(str(path)))
+    path.write_text('[{"rating": 5}, ')
+    with pytest.raises(ValueError, match="unterminated"):
+        list(iter_json_array(str(path)))
+
+
+def test_chunks_of_either_format(tmp_path):
+    ndjson = str(tmp_path / "reviews.ndjson")
+    append_reviews(ndjson, REVIEWS)
+    array = tmp_path / "reviews.json"
+    array.write_text(json.dumps(REVIEWS))
+    for path in (ndjson, str(array)):
+        chunks = list(iter_review_chunks(path, 8))
+        assert [len(chunk) for chunk in chunks] == [8, 8, 8, 6]
+        assert [review for chunk in chunks for review in chunk] == REVIEWS
+
+
+def test_streaming_analysis_tolerates_missed_and_repeated_events(tmp_path):
+    path = str(tmp_path / "reviews.ndjson")
+    ends = [append_reviews(path, REVIEWS[start:start + 10])[1] for start in range(0, len(REVIEWS), 10)]
+    analysis = StreamingAnalysis("task_a", path)
+    assert analysis.consume(ends[1]) == 20  # The first chunk's event was missed
+    assert analysis.consume(ends[0]) == 0   # A late duplicate of it
+    assert analysis.consume(ends[2]) == 10
+    assert analysis.aggregates.count == len(REVIEWS)
+
+    assert analysis.report_due(min_interval=60)
+    report = analysis.write_provisional_report(str(tmp_path / "results"))
+    assert "Reviews so far: 30" in open(report, encoding="utf-8").read()
+    assert not analysis.report_due(min_interval=60)
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from trendvisor.tools.review_io import append_reviews
+from trendvisor.tools.similarity_index import SimilarityIndex
+
+TOPICS = [
+    "greasy texture that broke me out",
+    "no white cast and light on the skin",
+    "the pump bottle leaked in my bag",
+    "strong perfume scent gave me a headache",
+]
+
+
+def _reviews(n, prefix="r"):
+    return [{"id": f"{prefix}{i}", "rating": 1 + i % 5, "date": "2025-06-01",
+             "text": f"{TOPICS[i % len(TOPICS)]} review {i}"} for i in range(n)]
+
+
+def _index(path, **kwargs):
+    options = dict(dims=64, n_features=2 ** 14)
+    options.update(kwargs)
+    return SimilarityIndex(str(path), **options)
+
+
+def test_search_and_similar_reviews(tmp_path):
+    index = _index(tmp_path / "index")
+    assert index.add_reviews(_reviews(40), dataset="a.ndjson") == 40
+    results = index.search("leaked bottle", k=5)
+    assert len(results) == 5
+    assert all("leaked" in result["text"] for result in results)
+    assert results == sorted(results, key=lambda result: -result["score"])
+
+    similar = index.similar_to("r1", k=3)
+    assert "r1" not in [result["review_id"] for result in similar]
+    assert all("white cast" in result["text"] for result in similar)
+    with pytest.raises(KeyError):
+        index.similar_to("missing")
+
+
+def test_reviews_are_indexed_once_per_id_and_text(tmp_path):
+    index = _index(tmp_path / "index")
+    reviews = _reviews(10)
+    assert index.add_reviews(reviews) == 10
+    assert index.add_reviews(reviews + [dict(reviews[0])]) == 0
+    edited = dict(reviews[0], text="completely different text now")
+    assert index.add_reviews([edited, {"id": "blank", "text": "   "}]) == 1
+    assert index.stats()["reviews"] == 11
+
+
+def test_readers_see_committed_rows_and_cannot_write(tmp_path):
+    writer = _index(tmp_path / "index")
+    writer.add_reviews(_reviews(8))
+    reader = _index(tmp_path / "index", read_only=True)
+    assert reader.stats()["reviews"] == 8
+    writer.add_reviews(_reviews(8, prefix="s"))
+    assert reader.stats()["reviews"] == 16
+    with pytest.raises(PermissionError):
+        reader.add_reviews(_reviews(1, prefix="t"))
+    with pytest.raises(FileNotFoundError):
+        _index(tmp_path / "missing", read_only=True)
+
+
+def test_ivf_search_with_every_list_probed_is_exact(tmp_path):
+    index = _index(tmp_path / "index", train_min_rows=200)
+    index.add_reviews(_reviews(120))
+    assert not index.trained
+    index.add_reviews(_reviews(120, prefix="s"))
+    assert index.trained
+    lists = index.stats()["lists"]
+    queries = np.asarray(index.vectors()[:10], dtype=np.float32)
+    exact = index.search_vectors(queries, k=5, exact=True)
+    probed = index.search_vectors(queries, k=5, nprobe=lists)
+    assert (np.sort(exact, axis=1) == np.sort(probed, axis=1)).all()
+
+
+def test_interrupted_adds_are_truncated_on_reopen(tmp_path):
+    directory = tmp_path / "index"
+    index = _index(directory)
+    index.add_reviews(_reviews(5))
+    index.close()
+    vectors_path = directory / "vectors.f16"
+    size = os.path.getsize(vectors_path)
+    with open(vectors_path, "ab") as f:
+        f.write(b"\0" * 64 * 2 * 3)  # Rows written before a crash, without their metadata
+    reopened = _index(directory)
+    assert os.path.getsize(vectors_path) == size
+    assert reopened.add_reviews(_reviews(2, prefix="s")) == 2
+    assert reopened.similar_to("s1", k=1)
+
+
+def test_directories_skip_unchanged_datasets(tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    append_reviews(str(data / "a.ndjson"), _reviews(6))
+    (data / "notes.txt").write_text("not a dataset")
+    index = _index(tmp_path / "index")
+    assert index.add_directory(str(data)) == 6
+    assert index.add_directory(str(data)) == 0
+    append_reviews(str(data / "a.ndjson"), _reviews(3, prefix="s"))
+    assert index.add_directory(str(data)) == 3
+    assert index.stats()["datasets"] == 1
@@ -0,0 +1,241 @@
+import time
+
+import pytest
+
+from trendvisor.core.local_backend import LocalStateStore
+from trendvisor.core.state_store import (
+    CREATED_INDEX, FINISHED_INDEX, LEGACY_STATUS_INDEX_PREFIX, InvalidTransitionError, StateStore,
+    TERMINAL_STATUSES, TRANSITIONS, TaskState,
+)
+from trendvisor.core.task_archive import TaskArchive
+
+
+def _new_task(store, task_id="task_a", status="CREATED"):
+    store.save_state(TaskState(task_id=task_id, goal="analyze sunscreen", status=status, params={"site": "oliveyoung"}))
+
+
+def test_lifecycle_transitions(store):
+    _new_task(store)
+    assert store.transition("task_a", "COLLECTING") == "CREATED"
+    assert store.transition("task_a", "COLLECTING") == "COLLECTING"  # Redelivered events may re-enter
+    store.transition("task_a", "COLLECTION_COMPLETE", {"artifacts": {"data_path": "data/a.ndjson"}})
+    store.transition("task_a", "ANALYZING", {"history": "analysis started"})
+    store.transition("task_a", "ANALYSIS_COMPLETE", {"artifacts": {"report_path": "results/a.html"}})
+
+    state = store.get_state("task_a")
+    assert state.status == "ANALYSIS_COMPLETE"
+    assert state.artifacts == {"data_path": "data/a.ndjson", "report_path": "results/a.html"}
+    assert state.history == ["analysis started"]
+    assert state.params == {"site": "oliveyoung"}
+
+
+@pytest.mark.parametrize("current,status", [
+    ("ANALYSIS_COMPLETE", "ANALYZING"),
+    ("ANALYSIS_COMPLETE", "ANALYSIS_COMPLETE"),  # Terminal statuses cannot be re-entered
+    ("CREATED", "ANALYZING"),
+    ("COLLECTION_FAILED", "COLLECTING"),
+])
+def test_illegal_transition_is_rejected(store, current, status):
+    _new_task(store, status=current)
+    with pytest.raises(InvalidTransitionError) as info:
+        store.transition("task_a", status, {"error_log": "should not be written"})
+    assert info.value.current == current
+    state = store.get_state("task_a")
+    assert state.status == current
+    assert state.error_log is None
+
+
+def test_every_declared_transition_is_allowed(store):
+    for index, (source, targets) in enumerate(TRANSITIONS.items()):
+        for target in targets:
+            task_id = f"task_{index}_{target.lower()}"
+            _new_task(store, task_id, status=source)
+            assert store.transition(task_id, target) == source
+
+
+def test_transition_of_missing_task(store):
+    with pytest.raises(InvalidTransitionError) as info:
+        store.transition("task_missing", "COLLECTING")
+    assert info.value.current is None
+    assert store.get_state("task_missing") is None
+
+
+def test_unknown_status(store):
+    _new_task(store)
+    with pytest.raises(ValueError):
+        store.transition("task_a", "SHIPPED")
+
+
+def test_update_state_merges_and_appends(store):
+    _new_task(store)
+    store.update_state("task_a", {"artifacts": {"a": "1"}, "history": ["one"]})
+    store.update_state("task_a", {"artifacts": {"b": "2"}, "history": "two", "params": {"n": 3}, "unknown": "x"})
+    state = store.get_state("task_a")
+    assert state.artifacts == {"a": "1", "b": "2"}
+    assert state.history == ["one", "two"]
+    assert state.params == {"n": 3}
+
+    store.update_state("task_a", {"error_log": "boom"})
+    assert store.get_field("task_a", "error_log") == "boom"
+    store.update_state("task_a", {"error_log": None})
+    assert store.get_field("task_a", "error_log") is None
+
+
+def test_update_state_does_not_create_tasks(store):
+    store.update_state("task_ghost", {"artifacts": {"a": "1"}, "history": "late", "error_log": "late"})
+    store.update_state("task_ghost", {"status": "ANALYSIS_FAILED"})
+    assert store.get_state("task_ghost") is None
+    assert store.list_tasks() == []
+    assert store.count_by_status() == {}
+
+
+def test_update_state_status_goes_through_transitions(store):
+    _new_task(store, status="ANALYSIS_COMPLETE")
+    with pytest.raises(InvalidTransitionError):
+        store.update_state("task_a", {"status": "ANALYZING"})
+    _new_task(store, "task_b")
+    store.update_state("task_b", {"status": "COLLECTING", "artifacts": {"a": "1"}})
+    assert store.get_state("task_b").status == "COLLECTING"
+    assert store.get_field("task_b", "artifacts") == {"a": "1"}
+
+
+def test_indexes_follow_status(store):
+    _new_task(store, "task_a")
+    _new_task(store, "task_b")
+    store.transition("task_a", "COLLECTING")
+    store.transition("task_a", "COLLECTION_FAILED")
+    assert store.count_by_status() == {"CREATED": 1, "COLLECTION_FAILED": 1}
+    assert store.list_tasks(status="COLLECTION_FAILED") == ["task_a"]
+    assert sorted(store.list_tasks()) == ["task_a", "task_b"]
+    assert "COLLECTION_FAILED" in TERMINAL_STATUSES
+
+
+def test_status_pages_are_newest_first(store):
+    for i in range(6):
+        _new_task(store, f"task_{i}")
+    for task_id in ("task_1", "task_4"):
+        store.transition(task_id, "COLLECTING")
+    assert store.list_tasks(status="CREATED") == ["task_5", "task_3", "task_2", "task_0"]
+    assert store.list_tasks(status="CREATED", limit=2, offset=1) == ["task_3", "task_2"]
+    assert store.list_tasks(status="CREATED", offset=4) == []
+    assert store.list_tasks(status="COLLECTING") == ["task_4", "task_1"]
+    assert store.list_tasks(limit=3) == ["task_5", "task_4", "task_3"]
+
+
+def test_status_sets_of_older_versions_are_migrated(fake_server):
+    import fakeredis
+    client = fakeredis.FakeRedis(server=fake_server, db=1, decode_responses=True)
+    client.zadd(CREATED_INDEX, {"task_a": 1.0, "task_b": 2.0})
+    client.sadd(LEGACY_STATUS_INDEX_PREFIX + "CREATED", "task_a", "task_b")
+    store = StateStore(redis_client=client)
+    assert store.list_tasks(status="CREATED") == ["task_b", "task_a"]
+    assert store.count_by_status() == {"CREATED": 2}
+    assert not client.exists(LEGACY_STATUS_INDEX_PREFIX + "CREATED")
+
+
+def _next_message(subscriber, timeout):
+    """The next published message, skipping the subscribe confirmations get_message() returns as None."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        message = subscriber.get_message(timeout=0.05)
+        if message is not None:
+            return message
+    return None
+
+
+def test_redis_transition_publishes_event_atomically(redis_store, redis_bus):
+    _new_task(redis_store)
+    subscriber = redis_bus.raw_client.pubsub(ignore_subscribe_messages=True)
+    subscriber.subscribe("analysis_tasks")
+
+    redis_store.transition("task_a", "COLLECTING", event=redis_bus.prepare("analysis_tasks", {"task_id": "task_a"}))
+    message = _next_message(subscriber, 1.0)
+    assert redis_bus.envelope.decode(message["data"])["task_id"] == "task_a"
+
+    with pytest.raises(InvalidTransitionError):
+        redis_store.transition("task_a", "ANALYSIS_COMPLETE",
+                               event=redis_bus.prepare("analysis_tasks", {"task_id": "task_a"}))
+    assert _next_message(subscriber, 0.2) is None
+
+
+def test_local_transition_routes_event_only_when_applied(local_bus):
+    store = LocalStateStore()
+    _new_task(store)
+    local_bus.broker.bind("analysis_tasks", "inbox")
+    inbox = local_bus.broker.queue("inbox")
+
+    store.transition("task_a", "COLLECTING", event=local_bus.prepare("analysis_tasks", {"task_id": "task_a"}))
+    channel, message, _ = inbox.get_nowait()
+    assert (channel, message["task_id"]) == ("analysis_tasks", "task_a")
+
+    with pytest.raises(InvalidTransitionError):
+        store.transition("task_a", "ANALYSIS_COMPLETE", event=local_bus.prepare("analysis_tasks", {"task_id": "task_a"}))
+    assert inbox.empty()
+
+
+def _replay(store, steps):
+    """Applies the steps to a store and returns what each one returned or raised."""
+    outcomes = []
+    for kind, arg in steps:
+        try:
+            if kind == "save":
+                outcomes.append(store.save_state(arg))
+            elif kind == "update":
+                outcomes.append(store.update_state(*arg))
+            else:
+                outcomes.append(store.transition(*arg))
+        except InvalidTransitionError as e:
+            outcomes.append((e.current, e.status))
+    return outcomes
+
+
+def test_backends_agree(redis_store):
+    local_store = LocalStateStore()
+    steps = [
+        ("save", TaskState(task_id="task_a", goal="g", params={"k": [1, 2]})),
+        ("update", ("task_a", {"artifacts": {"data_path": "d"}, "history": ["h1"]})),
+        ("transition", ("task_a", "COLLECTING", {"error_log": "retrying"})),
+        ("update", ("task_ghost", {"history": "h"})),
+        ("transition", ("task_a", "ANALYZING", None)),  # Not allowed from COLLECTING
+        ("transition", ("task_a", "COLLECTION_COMPLETE", {"error_log": None})),
+        ("update", ("task_a", {"status": "ANALYZING", "history": "h2"})),
+    ]
+    assert _replay(redis_store, steps) == _replay(local_store, steps)
+    assert redis_store.get_state("task_a") == local_store.get_state("task_a")
+    assert redis_store.get_state("task_ghost") is None and local_store.get_state("task_ghost") is None
+    assert redis_store.count_by_status() == local_store.count_by_status()
+
+
+def _corrupt(store, task_id):
+    """Removes a required field, as a partial write or an old schema would."""
+    if isinstance(store, LocalStateStore):
+        store._fields[task_id].pop("goal")
+    else:
+        store.redis_client.hdel(f"task:{task_id}", "goal")
+
+
+def test_archive_keeps_tasks_it_cannot_read(store, tmp_path):
+    store.archive = TaskArchive(str(tmp_path / "archive.sqlite3"))
+    _new_task(store, "task_good", status="ANALYSIS_COMPLETE")
+    _new_task(store, "task_bad", status="ANALYSIS_COMPLETE")
+    store.update_state("task_bad", {"artifacts": {"report_path": "r.html"}})
+    _corrupt(store, "task_bad")
+
+    assert store.archive_finished(older_than=0) == 1
+    assert store.archive.get("task_good") is not None
+    assert store.archive.get("task_bad") is None
+    assert store.get_field("task_bad", "artifacts") == {"report_path": "r.html"}
+    assert store.list_tasks(status="ANALYSIS_COMPLETE") == ["task_bad", "task_good"]
+    assert store.archive_finished(older_than=0) == 0
+
+
+def test_archive_migrates_legacy_keys(redis_store, tmp_path):
+    redis_store.archive = TaskArchive(str(tmp_path / "archive.sqlite3"))
+    legacy = TaskState(task_id="task_old", goal="g", status="ANALYSIS_COMPLETE")
+    redis_store.redis_client.set("task:task_old", legacy.model_dump_json())
+    redis_store.redis_client.zadd(FINISHED_INDEX, {"task_old": 1.0})
+
+    redis_store.archive_finished(older_than=0)
+    redis_store.archive_finished(older_than=-60)  # The migration restamps the finish time
+    assert redis_store.get_state("task_old") == legacy
+    assert redis_store.archive.get("task_old") is not None
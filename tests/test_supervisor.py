@@ -0,0 +1,147 @@
+import itertools
+import time
+
+import pytest
+
+pytest.importorskip("sklearn")
+
+from trendvisor import supervisor as supervisor_module
+from trendvisor.supervisor import (
+    BUSY_SECONDS, HANDLED, QUEUE_DEPTH, READY, PoolConfig, Supervisor, Worker, parse_pool_size,
+)
+
+
+class FakeProcess:
+    """Stands in for a worker process; records the signals it gets."""
+
+    ids = itertools.count(1)
+
+    def __init__(self, log):
+        self.pid = next(self.ids)
+        self.log = log
+        self.alive = True
+        self.exitcode = None
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        pass
+
+    def terminate(self):
+        self.log.append(("terminate", self.pid))
+        self.alive, self.exitcode = False, 0
+
+    def kill(self):
+        self.log.append(("kill", self.pid))
+        self.alive, self.exitcode = False, -9
+
+    def crash(self):
+        self.alive, self.exitcode = False, 1
+
+
+class FakeBus:
+    def __init__(self):
+        self.lag = 0
+
+    def backlog(self, channel, group):
+        return {"pending": 0, "lag": self.lag}
+
+
+@pytest.fixture
+def make_supervisor(monkeypatch):
+    monkeypatch.setattr(supervisor_module, "register_agent", lambda name, stats: None)
+
+    def make(*pools, **kwargs):
+        log = []
+        supervisor = Supervisor({}, list(pools), FakeBus(), **kwargs)
+
+        def spawn(agent_type):
+            process = FakeProcess(log)
+            log.append(("spawn", agent_type, process.pid))
+            stats = [0.0] * 5
+            stats[READY] = 1
+            supervisor.workers[agent_type].append(Worker(process, stats))
+
+        monkeypatch.setattr(supervisor, "_spawn", spawn)
+        with supervisor._lock:
+            for agent_type in supervisor.pools:
+                for _ in range(supervisor.target[agent_type]):
+                    supervisor._spawn(agent_type)
+        return supervisor, log
+    return make
+
+
+def _check(supervisor, agent_type):
+    supervisor._reap(agent_type)
+    supervisor._autoscale(agent_type)
+    supervisor._replenish(agent_type)
+
+
+def test_parse_pool_size():
+    assert parse_pool_size("3") == (3, 3)
+    assert parse_pool_size("1:4") == (1, 4)
+    for text in ("0", "3:2", "x"):
+        with pytest.raises(ValueError):
+            parse_pool_size(text)
+
+
+def test_crashed_workers_restart_with_backoff(make_supervisor):
+    supervisor, log = make_supervisor(PoolConfig("collection"), backoff_base=0.2)
+    delays = []
+    for _ in range(3):
+        supervisor.workers["collection"][0].process.crash()
+        supervisor._reap("collection")
+        delays.append(supervisor._restart_at["collection"] - time.monotonic())
+        supervisor._replenish("collection")
+        assert supervisor.workers["collection"] == []  # Not before the backoff ends
+        supervisor._restart_at["collection"] = 0
+        supervisor._replenish("collection")
+        assert len(supervisor.workers["collection"]) == 1
+    assert supervisor.restarts["collection"] == 3
+    assert [round(delay, 1) for delay in delays] == [0.2, 0.4, 0.8]
+
+
+def test_backlog_scales_up_to_the_maximum(make_supervisor):
+    supervisor, log = make_supervisor(PoolConfig("analysis", min_workers=1, max_workers=2, cooldown=0))
+    supervisor.bus.lag = 100
+    for _ in range(3):
+        _check(supervisor, "analysis")
+    assert supervisor.target["analysis"] == 2
+    assert len(supervisor.workers["analysis"]) == 2
+
+
+def test_slow_handlers_scale_up_before_the_backlog_is_large(make_supervisor):
+    supervisor, _ = make_supervisor(PoolConfig("analysis", max_workers=2, cooldown=0, target_drain_seconds=10))
+    worker = supervisor.workers["analysis"][0]
+    supervisor._autoscale("analysis")
+    worker.stats[HANDLED], worker.stats[BUSY_SECONDS], worker.stats[QUEUE_DEPTH] = 2, 10.0, 3
+    supervisor._autoscale("analysis")
+    assert supervisor.latency["analysis"] == 5.0
+    assert supervisor.target["analysis"] == 2  # 3 messages at 5s each exceed the 10s target
+
+
+def test_idle_pools_retire_their_youngest_worker(make_supervisor):
+    supervisor, log = make_supervisor(PoolConfig("analysis", min_workers=1, max_workers=3, cooldown=0, idle_checks=2))
+    supervisor.bus.lag = 100
+    _check(supervisor, "analysis")
+    supervisor.bus.lag = 0
+    youngest = supervisor.workers["analysis"][-1]
+    for _ in range(2):
+        _check(supervisor, "analysis")
+    assert supervisor.target["analysis"] == 1
+    assert ("terminate", youngest.process.pid) in log
+    _check(supervisor, "analysis")
+    assert youngest not in supervisor.workers["analysis"]
+    assert len(supervisor.workers["analysis"]) == 1
+    assert supervisor.restarts["analysis"] == 0  # Retired, not crashed
+
+
+def test_stop_drains_collection_before_analysis(make_supervisor):
+    supervisor, log = make_supervisor(PoolConfig("analysis", min_workers=2, max_workers=2),
+                                      PoolConfig("collection"), drain_timeout=0)
+    collection = [w.process.pid for w in supervisor.workers["collection"]]
+    analysis = [w.process.pid for w in supervisor.workers["analysis"]]
+    log.clear()
+    supervisor.stop()
+    assert log == [("terminate", pid) for pid in collection + analysis]
@@ -0,0 +1,197 @@
+import pytest
+
+from trendvisor.agents.task_scheduler import (
+    DONE, FAILED, READY, RUNNING, TaskFailedError, TaskScheduler, TaskSpec,
+)
+
+
+class Recorder:
+    """Collects what the scheduler dispatches and fails."""
+
+    def __init__(self):
+        self.dispatched = []
+        self.failed = []
+
+    def dispatch(self, tasks):
+        self.dispatched.extend(task.task_id for task in tasks)
+
+    def fail(self, tasks):
+        self.failed.extend(task.task_id for task in tasks)
+
+
+def _scheduler(recorder, **kwargs):
+    return TaskScheduler(recorder.dispatch, recorder.fail, **kwargs)
+
+
+def _complete(scheduler, task_id, succeeded=True):
+    scheduler.finished(task_id, succeeded, None if succeeded else "boom")
+    scheduler.resolve(task_id, result=task_id if succeeded else None, error=None if succeeded else "boom")
+
+
+def test_dependencies_run_in_order():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    a, b, c = scheduler.submit([
+        TaskSpec("collect a", key="a"),
+        TaskSpec("collect b", key="b"),
+        TaskSpec("compare", key="c", depends_on=["a", "b"]),
+    ])
+    assert recorder.dispatched == [a, b]
+    _complete(scheduler, a)
+    assert recorder.dispatched == [a, b]
+    _complete(scheduler, b)
+    assert recorder.dispatched == [a, b, c]
+    _complete(scheduler, c)
+    assert scheduler.future(c).result() == c
+    assert scheduler.stats() == {DONE: 3}
+
+
+def test_failure_cascades_through_the_dag():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    a, b, c, d = scheduler.submit([
+        TaskSpec("root", key="a"),
+        TaskSpec("child", key="b", depends_on=["a"]),
+        TaskSpec("grandchild", key="c", depends_on=["b"]),
+        TaskSpec("independent", key="d"),
+    ])
+    _complete(scheduler, a, succeeded=False)
+
+    assert recorder.dispatched == [a, d]
+    assert sorted(recorder.failed) == sorted([b, c])
+    for task_id in (a, b, c):
+        with pytest.raises(TaskFailedError):
+            scheduler.future(task_id).result(timeout=0)
+    assert "Dependency" in scheduler.future(c).exception().reason
+    assert not scheduler.future(d).done()
+    assert scheduler.stats() == {FAILED: 3, RUNNING: 1}
+
+
+def test_child_of_several_parents_failed_by_one_of_them():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    a, b, c = scheduler.submit([
+        TaskSpec("a", key="a"),
+        TaskSpec("b", key="b"),
+        TaskSpec("compare", key="c", depends_on=["a", "b"]),
+    ])
+    _complete(scheduler, a, succeeded=False)
+    assert recorder.failed == [c]
+    assert c not in scheduler.tasks  # Failed, resolved and evicted while b still runs
+
+    _complete(scheduler, b)
+    assert scheduler.future(b).result() == b
+    assert recorder.dispatched == [a, b]
+    assert scheduler.stats() == {FAILED: 2, DONE: 1}
+    assert scheduler.tasks == {}
+
+
+def test_depending_on_a_failed_evicted_task_fails_immediately():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    (a,) = scheduler.submit([TaskSpec("root")])
+    _complete(scheduler, a, succeeded=False)
+    assert a not in scheduler.tasks
+
+    (b,) = scheduler.submit([TaskSpec("late", depends_on=[a])])
+    assert recorder.failed == [b]
+    assert isinstance(scheduler.future(b).exception(), TaskFailedError)
+
+
+def test_depending_on_a_done_evicted_task_runs():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    (a,) = scheduler.submit([TaskSpec("root")])
+    _complete(scheduler, a)
+    (b,) = scheduler.submit([TaskSpec("late", depends_on=[a])])
+    assert recorder.dispatched == [a, b]
+
+
+def test_invalid_submissions():
+    scheduler = _scheduler(Recorder())
+    with pytest.raises(ValueError, match="cycle"):
+        scheduler.submit([TaskSpec("x", key="x", depends_on=["y"]), TaskSpec("y", key="y", depends_on=["x"])])
+    with pytest.raises(ValueError, match="Unknown dependency"):
+        scheduler.submit([TaskSpec("x", depends_on=["missing"])])
+    with pytest.raises(ValueError, match="Duplicate"):
+        scheduler.submit([TaskSpec("x", key="k"), TaskSpec("y", key="k")])
+    assert scheduler.tasks == {}
+
+
+def test_priority_within_a_tenant():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder, max_in_flight=1)
+    (first,) = scheduler.submit([TaskSpec("first")])
+    low, high = scheduler.submit([TaskSpec("low", priority=-1), TaskSpec("high", priority=5)])
+    assert recorder.dispatched == [first]
+    assert scheduler.stats() == {RUNNING: 1, READY: 2}
+    _complete(scheduler, first)
+    _complete(scheduler, high)
+    assert recorder.dispatched == [first, high, low]
+
+
+def test_busy_tenant_cannot_starve_a_small_one():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder, max_in_flight=2)
+    bulk = scheduler.submit([TaskSpec(f"bulk {i}", tenant="bulk") for i in range(50)])
+    (small,) = scheduler.submit([TaskSpec("small", tenant="small")])
+    assert recorder.dispatched == bulk[:2]
+    # The slot goes to the tenant with fewer running tasks, not to the older queue
+    _complete(scheduler, bulk[0])
+    assert recorder.dispatched[-1] == small
+
+
+def test_tenant_cap():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder, max_in_flight=10, tenant_max_in_flight=2)
+    bulk = scheduler.submit([TaskSpec(f"bulk {i}", tenant="bulk") for i in range(5)])
+    assert recorder.dispatched == bulk[:2]
+    _complete(scheduler, bulk[1])
+    assert recorder.dispatched == bulk[:3]
+
+
+def test_dispatch_failure_fails_the_batch_and_frees_capacity():
+    recorder = Recorder()
+    calls = []
+
+    def dispatch(tasks):
+        calls.append([task.task_id for task in tasks])
+        if len(calls) == 1:
+            raise RuntimeError("bus down")
+
+    scheduler = TaskScheduler(dispatch, recorder.fail, max_in_flight=2)
+    a, b, c = scheduler.submit([TaskSpec("a", key="a"), TaskSpec("b", key="b", depends_on=["a"]), TaskSpec("c")])
+
+    assert calls == [[a, c]]
+    assert recorder.failed == [b]
+    for task_id in (a, c):
+        assert "bus down" in scheduler.future(task_id).exception().reason
+    assert scheduler.future(b).exception().reason == f"Dependency {a} failed"
+    assert scheduler.stats() == {FAILED: 3}
+    (d,) = scheduler.submit([TaskSpec("d")])
+    assert calls[-1] == [d]
+
+
+def test_finished_tasks_are_evicted_into_bounded_history():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder, history=2)
+    ids = scheduler.submit([TaskSpec(f"t{i}") for i in range(3)])
+    for task_id in ids:
+        _complete(scheduler, task_id)
+    assert scheduler.tasks == {}
+    with pytest.raises(KeyError):
+        scheduler.future(ids[0])
+    assert scheduler.future(ids[2]).result() == ids[2]
+    assert scheduler.stats() == {DONE: 3}
+
+
+def test_resolve_is_idempotent_and_ignores_unknown_tasks():
+    recorder = Recorder()
+    scheduler = _scheduler(recorder)
+    (a,) = scheduler.submit([TaskSpec("a")])
+    scheduler.resolve(a, result="first")
+    scheduler.resolve(a, result="second")
+    scheduler.resolve("task_unknown", result="x")
+    scheduler.finished(a, True)
+    assert scheduler.future(a).result() == "first"
+    assert scheduler.stats() == {DONE: 1}
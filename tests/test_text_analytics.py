@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from trendvisor.tools.feature_cache import FeatureCache
+from trendvisor.tools.text_analytics import (
+    TextAnalytics, TextAnalyzer, analyze_texts, decode_features, encode_features,
+)
+
+TEXTS = [
+    "great sunscreen, light texture and no white cast",
+    "terrible, greasy and it broke me out",
+    "the bottle leaked but the price is good",
+    "arrived on tuesday",
+    "",
+    "촉촉 좋아요 추천",
+]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return TextAnalyzer()
+
+
+def _same(left, right):
+    for name in ("unigrams", "bigrams", "aspect_mentions"):
+        assert (getattr(left, name) != getattr(right, name)).nnz == 0, name
+    np.testing.assert_array_equal(left.n_tokens, right.n_tokens)
+    np.testing.assert_allclose(left.sentiment, right.sentiment, rtol=1e-6)
+
+
+def test_sentiment_and_aspects(analyzer):
+    features = analyzer.transform(TEXTS)
+    sentiment = features.sentiment
+    assert sentiment[0] > 0 > sentiment[1]
+    assert sentiment[3] == sentiment[4] == 0
+    assert sentiment[5] == 1
+    aspects = features.aspect_mentions.toarray()
+    mentioned = {analyzer.aspects[i] for i in np.flatnonzero(aspects[2])}
+    assert mentioned == {"packaging", "price"}
+    assert not aspects[3].any()
+
+
+def test_results_do_not_depend_on_the_batch_size(analyzer):
+    whole, sentiment, n_tokens = analyze_texts(TEXTS, batch_size=len(TEXTS), analyzer=analyzer)
+    batched, batched_sentiment, batched_tokens = analyze_texts(TEXTS, batch_size=2, analyzer=analyzer)
+    assert batched.summary() == whole.summary()
+    np.testing.assert_array_equal(batched_sentiment, sentiment)
+    np.testing.assert_array_equal(batched_tokens, n_tokens)
+    assert dict(whole.summary()["top_keywords"])["great"] == 1
+
+
+def test_merged_analytics_equal_one_pass(analyzer):
+    whole = TextAnalytics(analyzer)
+    whole.add(analyzer.transform(TEXTS), texts=TEXTS)
+    merged = TextAnalytics(analyzer)
+    for part in (TEXTS[:3], TEXTS[3:]):
+        other = TextAnalytics(analyzer)
+        other.add(analyzer.transform(part), texts=part)
+        merged.merge(other)
+    assert merged.summary() == whole.summary()
+
+
+def test_weights_count_reviews_as_repeated(analyzer):
+    weights = np.array([3, 1, 1, 1, 1, 2])
+    repeated = [text for text, weight in zip(TEXTS, weights) for _ in range(weight)]
+    weighted, _, _ = analyze_texts(TEXTS, analyzer=analyzer, weights=weights)
+    expected, _, _ = analyze_texts(repeated, analyzer=analyzer)
+    summary, expected_summary = weighted.summary(), expected.summary()
+    assert summary["weighted_reviews"] == len(repeated)
+    assert summary["reviews"] == len(TEXTS)
+    assert summary["sentiment"] == pytest.approx(expected_summary["sentiment"])
+    assert dict(summary["top_keywords"]) == pytest.approx(dict(expected_summary["top_keywords"]))
+    for aspect, stats in summary["aspects"].items():
+        assert stats == pytest.approx(expected_summary["aspects"][aspect])
+
+
+def test_cached_features_round_trip(analyzer, tmp_path):
+    features = analyzer.transform(TEXTS)
+    _same(decode_features(encode_features(features), analyzer.n_features, len(analyzer.aspects)), features)
+
+    cache = FeatureCache(str(tmp_path / "features.sqlite"), version=analyzer.cache_version)
+    ids = [f"r{i}" for i in range(len(TEXTS))]
+    analyzer.transform_cached(TEXTS[::2], ids[::2], cache)  # Warm every other review
+    edited = TEXTS[:-1] + ["별로 최악"]
+    # Hits and misses interleave; rows must come back in input order
+    _same(analyzer.transform_cached(edited, ids, cache), analyzer.transform(edited))
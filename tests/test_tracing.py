@@ -0,0 +1,97 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+from prometheus_client import REGISTRY
+
+from trendvisor.core import tracing
+from trendvisor.core.tracing import TRACE_FIELD, SpanLog, Tracer, extract, inject, mark_failed
+
+
+@pytest.fixture
+def spans(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    span_log = SpanLog(str(path))
+    tracing.set_span_log(span_log)
+    yield lambda: [json.loads(line) for line in path.read_text().splitlines()]
+    tracing.set_span_log(None)
+    span_log.close()
+
+
+def _failures(agent, channel):
+    return REGISTRY.get_sample_value("trendvisor_handler_failures_total", {"agent": agent, "channel": channel}) or 0
+
+
+def test_inject_and_extract():
+    message = {"task_id": "task_a"}
+    traced = inject(message)
+    assert TRACE_FIELD not in message
+    span_id, parent_id, enqueued_at = extract(traced)
+    assert span_id and parent_id is None and abs(enqueued_at - time.time()) < 5
+    assert inject(traced) is traced  # Already traced hops keep their context
+    for bad in (None, "text", {TRACE_FIELD: "a/b"}, {TRACE_FIELD: "a/b/soon"}, {TRACE_FIELD: 3}):
+        assert extract(bad) is None
+
+
+def test_handler_spans_chain_through_published_messages(spans):
+    tracer = Tracer("TestAgent")
+    published = []
+    first = tracer.wrap("task_created", lambda message: published.append(inject({"task_id": "task_a"})))
+    second = tracer.wrap("collection_complete", lambda message: None)
+
+    incoming = inject({"task_id": "task_a"})
+    first({"data": incoming})
+    second({"data": published[0]})
+
+    upstream, downstream = spans()
+    assert upstream["parent_id"] == extract(incoming)[0]
+    assert upstream["trace_id"] == downstream["trace_id"] == "task_a"
+    assert extract(published[0])[1] == upstream["span_id"]  # Published with the handler as parent
+    assert downstream["parent_id"] == extract(published[0])[0]
+    assert upstream["started_at"] >= upstream["enqueued_at"]
+    assert upstream["finished_at"] >= upstream["started_at"]
+    assert tracing.current_span() is None
+
+
+def test_failures_are_counted_whether_raised_or_marked(spans):
+    tracer = Tracer("FailingAgent")
+    before = _failures("FailingAgent", "jobs")
+
+    def raising(message):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        tracer.wrap("jobs", raising)({"data": {"task_id": "task_a"}})
+    tracer.wrap("jobs", lambda message: mark_failed("site unreachable"))({"data": {"task_id": "task_b"}})
+
+    assert _failures("FailingAgent", "jobs") == before + 2
+    assert [span["error"] for span in spans()] == ["RuntimeError('boom')", "site unreachable"]
+
+
+def test_stages_are_child_spans(spans):
+    tracer = Tracer("StageAgent")
+
+    def handler(message):
+        with tracer.stage("load"):
+            pass
+        tracer.record_stage("analyze", 0.25)
+
+    tracer.wrap("jobs", handler)({"data": inject({"task_id": "task_a"})})
+    load, analyze, parent = spans()
+    assert load["parent_id"] == analyze["parent_id"] == parent["span_id"]
+    assert load["trace_id"] == analyze["trace_id"] == "task_a"
+    assert analyze["finished_at"] - analyze["started_at"] == pytest.approx(0.25)
+    assert REGISTRY.get_sample_value("trendvisor_stage_seconds_count", {"agent": "StageAgent", "stage": "load"}) >= 1
+
+
+def test_disabled_tracing_leaves_messages_and_handlers_alone():
+    handler = lambda message: None  # noqa: E731
+    tracing.set_enabled(False)
+    try:
+        assert TRACE_FIELD not in inject({"task_id": "task_a"})
+        assert Tracer("Agent").wrap("jobs", handler) is handler
+    finally:
+        tracing.set_enabled(True)
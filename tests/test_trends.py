@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("sklearn")
+
+from trendvisor.tools.trends import TrendStore
+
+REVIEWS = [
+    {"id": "r1", "rating": 5, "text": "love the texture, no white cast", "date": "2025-06-02"},
+    {"id": "r2", "rating": 4, "text": "good texture but the scent is strong", "date": "2025-06-03"},
+    {"id": "r3", "rating": 2, "text": "broke me out after a week", "date": "2025-06-10"},
+    {"rating": 3, "text": "okay for the price", "date": "2025-06-10"},
+]
+
+
+@pytest.fixture
+def trends(tmp_path):
+    store = TrendStore(str(tmp_path / "trends.sqlite3"))
+    yield store
+    store.close()
+
+
+def _week(trends, day):
+    (row,) = [row for row in trends.series("sunscreen", "week", start=day, end=day)]
+    return row
+
+
+def _keyword(trends, keyword, day="2025-06-02"):
+    row = trends._conn.execute(
+        "SELECT reviews FROM keywords WHERE product = 'sunscreen' AND granularity = 'week' AND bucket = ? "
+        "AND keyword = ?", (day, keyword),
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def test_reingesting_counts_nothing_twice(trends):
+    assert trends.ingest("sunscreen", REVIEWS) == 4
+    assert trends.ingest("sunscreen", REVIEWS) == 0
+    assert _week(trends, "2025-06-02")["reviews"] == 2
+    assert _week(trends, "2025-06-09")["reviews"] == 2
+    assert _keyword(trends, "texture") == 2
+
+
+def test_an_edited_review_replaces_its_earlier_version(trends):
+    trends.ingest("sunscreen", REVIEWS)
+    edited = dict(REVIEWS[1], rating=1, text="the scent gave me a headache")
+    assert trends.ingest("sunscreen", [edited]) == 1
+
+    week = _week(trends, "2025-06-02")
+    assert week["reviews"] == 2
+    assert week["mean_rating"] == 3.0
+    assert week["rating_distribution"]["4"] == 0
+    assert _keyword(trends, "texture") == 1
+    assert _keyword(trends, "headache") == 1
+
+
+def test_an_edit_can_move_a_review_to_another_bucket(trends):
+    trends.ingest("sunscreen", REVIEWS[:1])
+    trends.ingest("sunscreen", [dict(REVIEWS[0], text="still love it", date="2025-07-01")])
+    assert [row["bucket"] for row in trends.series("sunscreen", "month", start="2025-06-01")] == \
+        ["2025-06-01", "2025-07-01"]
+    assert trends.series("sunscreen", "month", start="2025-06-01")[0]["reviews"] == 0
+    assert trends.latest_bucket("sunscreen", "week").isoformat() == "2025-06-30"
+
+
+def test_stores_from_before_contributions_keep_their_reviews(tmp_path):
+    path = str(tmp_path / "trends.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ingested (product TEXT NOT NULL, review_id TEXT NOT NULL, content_hash BLOB NOT NULL, "
+                 "PRIMARY KEY (product, review_id, content_hash)) WITHOUT ROWID")
+    from trendvisor.tools.feature_cache import content_hash
+    conn.execute("INSERT INTO ingested VALUES ('sunscreen', 'r1', ?)", (content_hash(REVIEWS[0]["text"]),))
+    conn.commit()
+    conn.close()
+
+    trends = TrendStore(path)
+    try:
+        assert trends.ingest("sunscreen", REVIEWS) == 3
+    finally:
+        trends.close()
@@ -0,0 +1,70 @@
+import pytest
+
+from trendvisor.core import ui
+from trendvisor.core.ui import NORMAL, QUIET, VERBOSE, ConsoleRenderer
+
+
+@pytest.fixture(autouse=True)
+def restore_ui():
+    yield
+    ui.stop_renderer()
+    ui.set_verbosity(VERBOSE)
+    ui._agents.clear()
+
+
+def test_full_queue_drops_new_messages_but_keeps_errors(capsys):
+    renderer = ConsoleRenderer(max_queue=3)
+    for i in range(5):
+        renderer.put(NORMAL, f"status {i}")
+    renderer.put(QUIET, "error")
+    assert renderer.depth() == 3 and renderer.dropped == 3
+    renderer.flush()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[:3] == ["status 1", "status 2", "error"]
+    assert "3 messages dropped" in lines[3]
+    renderer.flush()
+    assert capsys.readouterr().out == ""  # Drops are reported once
+
+
+def test_repeated_lines_are_coalesced(capsys):
+    renderer = ConsoleRenderer()
+    for line in ["[10:00:00][A] same", "[10:00:01][A] same", "[10:00:02][A] same", "[10:00:02][A] other", "plain"]:
+        renderer.put(NORMAL, line)
+    renderer.flush()
+    assert capsys.readouterr().out.splitlines() == ["[10:00:00][A] same (x3)", "[10:00:02][A] other", "plain"]
+    assert renderer.rendered == 5
+
+
+def test_output_goes_through_the_renderer_until_it_stops(capsys):
+    renderer = ui.start_renderer(refresh_per_second=0.01, verbosity=NORMAL)
+    ui.display_status("collecting", category="Collector")
+    ui.display_event("task_created", {"task_id": "task_a"}, category="Bus")  # Above the verbosity
+    ui.display_error("site unreachable", agent_id="Collector")
+    assert capsys.readouterr().out == ""  # Queued, not printed by the caller
+    assert renderer.depth() == 2
+    ui.stop_renderer()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].endswith("[COLLECTOR] collecting")
+    assert lines[1].endswith("[COLLECTOR] ❌ ERROR: site unreachable")
+
+    ui.display_warning("msgpack missing", agent_id="Envelope")
+    assert "[ENVELOPE] ⚠️ WARNING: msgpack missing" in capsys.readouterr().out
+
+
+def test_quiet_verbosity_keeps_only_errors_and_warnings(capsys):
+    ui.set_verbosity(QUIET)
+    ui.display_status("collecting", category="Collector")
+    ui.display_warning("degraded", agent_id="Pool")
+    ui.display_error("failed", agent_id="Pool")
+    out = capsys.readouterr().out
+    assert "collecting" not in out and "degraded" in out and "failed" in out
+
+
+def test_dashboard_lists_agents_even_when_stats_fail():
+    ui.register_agent("CollectionAgent", lambda: {"state": "running", "handled": 3, "queue_depth": 1})
+    ui.register_agent("BrokenAgent", lambda: 1 / 0)
+    table = ui.agent_dashboard(ConsoleRenderer(max_queue=7))
+    assert table.row_count == 2
+    assert list(table.columns[2].cells) == ["3", ""]
+    assert "stats unavailable" in list(table.columns[1].cells)[1]
+    assert "0/7" in table.caption
@@ -1,72 +1,182 @@
-import time
 import json
-import subprocess
 import os
+import sqlite3
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
 from .base import BaseAgent
-from trendvisor.core.state_store import StateStore
-from trendvisor.core.message_bus import MessageBus
+from trendvisor.core.state_store import BaseStateStore, InvalidTransitionError
+from trendvisor.core.message_bus import BaseMessageBus
+from trendvisor.core.tracing import mark_failed
 from trendvisor.core.ui import display_status, display_event, display_error
+from trendvisor.tools.analysis_pool import AnalysisWorkerPool
+from trendvisor.tools.report_cache import ReportCache, cache_key
+from trendvisor.tools.streaming_analysis import RESULTS_DIR, StreamingAnalysis
+from trendvisor.tools.trends import TrendStore, product_key
 
 class AnalysisAgent(BaseAgent):
     """
     The AnalysisAgent is responsible for running data analysis and visualization.
-    It subscribes to COLLECTION_COMPLETE events.
+    It subscribes to COLLECTION_COMPLETE events and runs the analysis tool on a
+    pool of pre-warmed worker processes. While a collection is still running it
+    also consumes COLLECTION_PROGRESS chunks and publishes provisional reports.
+    Analyses whose dataset, options and tool version match an earlier task
+    are served from a content-addressed report cache without running.
+    With a TrendStore, each collection's new reviews are also added to the
+    product's time-series rollups, and a trend summary is stored with the task.
     """
-    def __init__(self, message_bus: MessageBus, state_store: StateStore):
+    def __init__(self, message_bus: BaseMessageBus, state_store: BaseStateStore,
+                 pool_size: int = 2, job_timeout: Optional[float] = 300.0, max_jobs_per_worker: Optional[int] = 50,
+                 provisional_interval: float = 10.0, analysis_options: Optional[Dict[str, Any]] = None,
+                 report_cache_max_bytes: Optional[int] = 1 << 30, trend_store: Optional[TrendStore] = None):
         super().__init__("AnalysisAgent", message_bus, state_store)
+        self.provisional_interval = provisional_interval
+        self.analysis_options = analysis_options or {}
+        self.report_cache = ReportCache(max_bytes=report_cache_max_bytes) if report_cache_max_bytes else None
+        self.trend_store = trend_store
+        self._streams: Dict[str, StreamingAnalysis] = {}
+        self._streams_lock = threading.Lock()
+        # Tasks whose collection already completed; late progress events are ignored.
+        self._closed_streams: "OrderedDict[str, None]" = OrderedDict()
+        self.worker_pool = AnalysisWorkerPool(
+            pool_size=pool_size,
+            job_timeout=job_timeout,
+            max_jobs_per_worker=max_jobs_per_worker,
+        )
+
+    def _handle_collection_progress(self, message):
+        """Callback that folds a newly collected chunk into the task's running aggregates."""
+        task_id = None
+        try:
+            data = message['data']
+            task_id = data.get('task_id')
+            data_path = data.get('data_path')
+            if not task_id or not data_path:
+                return
+
+            with self._streams_lock:
+                if task_id in self._closed_streams:
+                    return
+                stream = self._streams.get(task_id)
+                if stream is None:
+                    stream = self._streams[task_id] = StreamingAnalysis(task_id, data_path)
+                stream.consume(data.get('end_offset', 0))
+                if not stream.report_due(self.provisional_interval):
+                    return
+                report_path = stream.write_provisional_report()
+                reviews_seen = stream.aggregates.count
+
+            self.state_store.update_state(task_id, {"artifacts": {"provisional_report_path": report_path}})
+            display_status(f"Provisional report for task '{task_id}' ({reviews_seen} reviews so far): {report_path}", category=self.agent_name)
+
+        except Exception as e:
+            mark_failed(e)
+            display_error(f"Could not process collection progress for task {task_id}: {e}", agent_id=self.agent_name)
 
     def _handle_analysis_task(self, message):
         """Callback to handle the analysis and visualization task."""
         task_id = None # Initialize task_id to ensure it's available for error logging
         try:
-            data = json.loads(message['data'])
+            data = message['data']
             task_id = data.get('task_id')
             data_path = data.get('data_path')
             if not task_id or not data_path:
                 return
             
             display_event(message['channel'], data, category=self.agent_name, is_incoming=True)
-            
-            # 1. Update state to ANALYZING
-            self.state_store.update_state(task_id, {"status": "ANALYZING"})
+            # 1. Update state to ANALYZING (a duplicate event for a finished task stops here)
+            try:
+                self.transition(task_id, "ANALYZING")
+            except InvalidTransitionError as e:
+                display_status(f"Ignoring COLLECTION_COMPLETE: {e}", category=self.agent_name)
+                return
+
+            with self._streams_lock:
+                self._streams.pop(task_id, None)
+                self._closed_streams[task_id] = None
+                if len(self._closed_streams) > 1024:
+                    self._closed_streams.popitem(last=False)
             display_status(f"Starting analysis for task '{task_id}'.", category=self.agent_name)
             
-            # 2. Run the external analysis tool
-            tool_path = os.path.abspath(os.path.join(__file__, '..', '..', 'tools', 'analyze_and_visualize.py'))
-            process = subprocess.run(
-                ['python3', tool_path, '--input', data_path, '--task_id', task_id],
-                capture_output=True, text=True, check=True
-            )
-            
-            report_path = process.stdout.strip()
-            display_status(f"Analysis tool finished. Report at: {report_path}", category=self.agent_name)
+            # 2. Reuse a cached report for identical inputs, or run the analysis tool on a warm worker
+            artifacts = None
+            key = None
+            if self.report_cache is not None:
+                with self.tracer.stage("report_cache_lookup"):
+                    key = cache_key(data_path, self.analysis_options, self.worker_pool.tool_version())
+                    artifacts = self.report_cache.get(key, task_id, RESULTS_DIR)
+            if artifacts is not None:
+                artifacts['report_cache'] = "hit"
+                report_path = artifacts['report_path']
+                display_status(f"Report cache hit. Report at: {report_path}", category=self.agent_name)
+            else:
+                with self.tracer.stage("analysis_job"):
+                    artifacts = self.worker_pool.submit(data_path, task_id, self.analysis_options)
+                # Stages timed inside the worker (load, dedup, text, models, render)
+                for name, seconds in list(artifacts.items()):
+                    if name.startswith("timing_"):
+                        self.tracer.record_stage(f"analysis.{name[len('timing_'):]}", float(seconds))
+                report_path = artifacts['report_path']
+                display_status(f"Analysis tool finished. Report at: {report_path}", category=self.agent_name)
+                if key is not None:
+                    self.report_cache.put(key, task_id, artifacts)
+                    artifacts['report_cache'] = "miss"
 
-            # 3. Update state with the report path
-            current_state = self.state_store.get_state(task_id)
-            if current_state:
-                current_state.artifacts['report_path'] = report_path
-                current_state.status = "ANALYSIS_COMPLETE"
-                self.state_store.save_state(current_state)
+            if self.trend_store is not None:
+                with self.tracer.stage("trend_rollup"):
+                    trends_path = self._update_trends(task_id, data_path)
+                if trends_path:
+                    artifacts['trends_path'] = trends_path
 
-            # 4. Publish TASK_COMPLETE event
-            channel = "events:TASK_COMPLETE"
-            event_message = {"task_id": task_id, "report_path": report_path}
-            self.message_bus.publish(channel, event_message)
-            display_event(channel, event_message, category=self.agent_name)
+            # 3. Record the report path and other artifacts and 4. publish TASK_COMPLETE, atomically
+            self.transition(
+                task_id, "ANALYSIS_COMPLETE", {"artifacts": artifacts},
+                "events:TASK_COMPLETE", {"task_id": task_id, "report_path": report_path},
+            )
 
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Analysis tool failed for task {task_id}: {e.stderr}"
+        except Exception as e:
+            mark_failed(e)
+            error_msg = f"Analysis tool failed for task {task_id}: {e}"
             display_error(error_msg, agent_id=self.agent_name)
             if task_id:
-                self.state_store.update_state(task_id, {"status": "ANALYSIS_FAILED", "error_log": error_msg})
-                # Publish failure event
-                channel = "events:TASK_FAILED"
-                event_message = {"task_id": task_id, "error": error_msg}
-                self.message_bus.publish(channel, event_message)
-                display_event(channel, event_message, category=self.agent_name)
+                try:
+                    self.transition(
+                        task_id, "ANALYSIS_FAILED", {"error_log": error_msg},
+                        "events:TASK_FAILED", {"task_id": task_id, "error": error_msg},
+                    )
+                except InvalidTransitionError as transition_error:
+                    display_error(str(transition_error), agent_id=self.agent_name)
+
+    def _update_trends(self, task_id: str, data_path: str) -> Optional[str]:
+        """
+        Rolls the task's new reviews into its product's trends and writes the
+        trend summary. A failure here is reported but does not fail the task.
+        """
+        try:
+            state = self.state_store.get_state(task_id)
+            product = product_key(state.goal, state.params) if state else task_id
+            new_reviews = self.trend_store.ingest_file(product, data_path)
+            summary = self.trend_store.summary(product)
+            os.makedirs(RESULTS_DIR, exist_ok=True)
+            trends_path = os.path.join(RESULTS_DIR, f"{task_id}_trends.json")
+            with open(trends_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            display_error(f"Could not update trends for task {task_id}: {e}", agent_id=self.agent_name)
+            return None
+        display_status(f"Trends for '{product}' updated with {new_reviews} new reviews: {trends_path}",
+                       category=self.agent_name)
+        return trends_path
 
     def run(self):
         """Subscribes to COLLECTION_COMPLETE events and starts the analysis process."""
         display_status("Running and waiting for analysis tasks.", category=self.agent_name)
-        self.message_bus.subscribe("events:COLLECTION_COMPLETE", self._handle_analysis_task)
-        self.message_bus.listen() 
\ No newline at end of file
+        self.subscribe("events:COLLECTION_PROGRESS", self._handle_collection_progress)
+        self.subscribe("events:COLLECTION_COMPLETE", self._handle_analysis_task)
+        self.listen()
+
+    def stop(self):
+        """Stops the subscription thread and shuts down the analysis workers."""
+        super().stop()
+        self.worker_pool.close()
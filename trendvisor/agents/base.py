@@ -1,35 +1,148 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional
+import functools
 import threading
+import time
 
-from trendvisor.core.message_bus import MessageBus
-from trendvisor.core.state_store import StateStore
-from trendvisor.core.ui import display_status
+from trendvisor.core.message_bus import BaseMessageBus
+from trendvisor.core.state_store import BaseStateStore
+from trendvisor.core.tracing import Tracer
+from trendvisor.core.ui import display_status, display_event, register_agent
 
 class BaseAgent(ABC):
     """An abstract base class for all agents in the system."""
 
-    def __init__(self, agent_name: str, message_bus: MessageBus, state_store: StateStore):
+    def __init__(self, agent_name: str, message_bus: BaseMessageBus, state_store: BaseStateStore):
         """
         Initializes the agent.
         """
         self.agent_name = agent_name
         self.message_bus = message_bus
         self.state_store = state_store
+        self.tracer = Tracer(agent_name)
         self._stop_event = threading.Event()
+        self.ready = threading.Event()
+        self._channels: List[str] = []
+        self._listener = None
+        # Shown on the dashboard (see ui.agent_dashboard)
+        self.state = "initialized"
+        self.handled = 0
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        register_agent(agent_name, self.dashboard_stats)
         self.subscriber_thread = threading.Thread(target=self.run, daemon=True)
-        print(f"[{self.agent_name}] Initialized.")
+        display_status("Initialized.", category=self.agent_name)
 
     def start(self):
         """Starts the agent's event subscription thread."""
         display_status(f"Starting...", category=self.agent_name)
         self.subscriber_thread.start()
 
+    def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None]):
+        """
+        Subscribes a handler to a channel on the agent's message bus. Every
+        message it handles records a span and the queue-wait, handler-time
+        and failure metrics (see tracing).
+        """
+        self.message_bus.subscribe(channel, self.tracer.wrap(channel, self._tracked(channel, callback)))
+        self._channels.append(channel)
+
+    def _tracked(self, channel: str, callback: Callable[[Dict[str, Any]], None]):
+        """Wraps a handler to keep the dashboard's state, handled and in-flight counts."""
+        @functools.wraps(callback)
+        def tracked(message):
+            with self._stats_lock:
+                self.in_flight += 1
+                self.state = f"handling {channel}"
+            start = time.perf_counter()
+            try:
+                callback(message)
+            finally:
+                with self._stats_lock:
+                    self.busy_seconds += time.perf_counter() - start
+                    self.in_flight -= 1
+                    self.handled += 1
+                    if not self.in_flight:
+                        self.state = "listening"
+        return tracked
+
+    def queue_depth(self) -> int:
+        """Work accepted by the agent but not finished yet (subclasses add their own queues)."""
+        return self.in_flight
+
+    def dashboard_stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "handled": self.handled, "in_flight": self.in_flight,
+                "queue_depth": self.queue_depth()}
+
+    def transition(self, task_id: str, status: str, updates: Optional[Dict[str, Any]] = None,
+                   channel: Optional[str] = None, event_message: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Moves a task to `status` and publishes `event_message` on `channel` in
+        one atomic round trip (see StateStore.transition).
+
+        Raises:
+            InvalidTransitionError: if the task cannot move to `status`.
+        """
+        event = self.message_bus.prepare(channel, event_message) if channel else None
+        previous = self.state_store.transition(task_id, status, updates, event)
+        if channel:
+            display_event(channel, event_message, category=self.agent_name)
+        return previous
+
+    def listen(self):
+        """
+        Starts delivering the agent's subscriptions and marks the agent ready.
+        Call it at the end of run(), once every subscribe() is done.
+        """
+        self._listener = self.message_bus.listen()
+        self.state = "listening"
+        self.ready.set()
+        return self._listener
+
+    def wait_until_ready(self, timeout: Optional[float] = 10.0) -> bool:
+        """
+        Blocks until the agent listens and the broker confirms each of its
+        subscriptions, so events published afterwards are not missed.
+
+        Returns:
+            False if that did not happen within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self.ready.wait(timeout):
+            return False
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return self.message_bus.wait_for_subscribers(self._channels, timeout=remaining)
+
+    def drain(self, timeout: Optional[float] = 30.0) -> bool:
+        """
+        Stops taking new messages, waits up to `timeout` seconds for the work
+        already accepted (queue_depth) to finish, then stops the agent. In
+        streams mode, messages the agent has not acknowledged stay pending and
+        are reclaimed by another consumer.
+
+        Returns:
+            False if work was still in progress when the timeout expired.
+        """
+        self.state = "draining"
+        if self._listener is not None and self._listener.is_alive():
+            self._listener.stop()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue_depth() > 0 and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.05)
+        drained = self.queue_depth() == 0
+        self.stop()
+        return drained
+
     def stop(self):
         """Signals the agent's subscription thread to stop."""
         display_status(f"Stopping...", category=self.agent_name)
+        self.state = "stopped"
         self._stop_event.set()
-        self.subscriber_thread.join(timeout=2)
+        if self._listener is not None and self._listener.is_alive():
+            self._listener.stop()
+        if self.subscriber_thread.is_alive():
+            self.subscriber_thread.join(timeout=2)
 
     @abstractmethod
     def run(self):
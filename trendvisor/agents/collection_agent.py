@@ -1,8 +1,11 @@
+import threading
 import time
-import json
+from typing import Any, Callable, Dict, Optional
 from .base import BaseAgent
-from trendvisor.core.state_store import StateStore
-from trendvisor.core.message_bus import MessageBus
+from .collection_scheduler import CollectionScheduler, CollectionJob, SiteLimit, StubCollector
+from trendvisor.core.state_store import BaseStateStore, InvalidTransitionError
+from trendvisor.core.message_bus import BaseMessageBus
+from trendvisor.core.tracing import mark_failed
 from trendvisor.core.ui import display_status, display_event, display_error
 
 # from airtop import Airtop, Options # This will be used later
@@ -11,61 +14,130 @@ class CollectionAgent(BaseAgent):
     """
     The CollectionAgent is responsible for gathering data from the web.
     It subscribes to TASK_CREATED events and uses Airtop to perform collection.
+    Collections run concurrently on a CollectionScheduler, so the subscriber
+    thread only hands tasks over and never blocks on a collection. In streams
+    mode, TASK_CREATED is acknowledged only once COLLECTION_COMPLETE (or the
+    failure) is published, so a worker dying mid-collection leaves it
+    pending for another worker to reclaim.
     """
-    def __init__(self, message_bus: MessageBus, state_store: StateStore):
+    def __init__(self, message_bus: BaseMessageBus, state_store: BaseStateStore,
+                 collector: Optional[Callable[..., Any]] = None,
+                 max_concurrency: int = 4,
+                 site_limits: Optional[Dict[str, SiteLimit]] = None):
         super().__init__("CollectionAgent", message_bus, state_store)
+        # (TODO) Replace the stub with the Airtop SDK collector
+        self.scheduler = CollectionScheduler(
+            collector or StubCollector(latency=5.0),
+            on_complete=self._on_collection_complete,
+            on_failure=self._on_collection_failed,
+            on_progress=self._on_collection_progress,
+            max_concurrency=max_concurrency,
+            site_limits=site_limits,
+        )
+        self._acks: Dict[str, Callable[[], None]] = {}  # task id -> acknowledges its TASK_CREATED
+        self._acks_lock = threading.Lock()
 
     def _handle_collection_task(self, message):
         """Callback to handle the data collection task."""
+        task_id = None
         try:
-            data = json.loads(message['data'])
+            data = message['data']
             task_id = data.get('task_id')
             goal = data.get('goal')
             if not task_id or not goal:
                 return
-            
+
             display_event(message['channel'], data, category=self.agent_name, is_incoming=True)
-            
+
             # 1. Update state to COLLECTING
-            self.state_store.update_state(task_id, {"status": "COLLECTING"})
-            display_status(f"Starting data collection for task '{task_id}'.", category=self.agent_name)
-            
-            # 2. (TODO) Construct Airtop prompt and invoke the Airtop SDK
-            # For now, we'll simulate the process
-            display_status("Simulating Airtop data collection... (takes 5s)", category=self.agent_name)
-            time.sleep(5) 
-            simulated_data_path = f"data/{task_id}_reviews.json"
-            # Simulate saving data to a file
-            with open(simulated_data_path, 'w') as f:
-                json.dump([{"review": "This is a great product!"}], f)
-            
-            # 3. Update state with the path to the collected data
-            self.state_store.update_state(task_id, {
-                "status": "COLLECTION_COMPLETE",
-                "artifacts": {"raw_data_path": simulated_data_path}
-            })
-            display_status(f"Data collection finished. Data saved to '{simulated_data_path}'.", category=self.agent_name)
-
-            # 4. Publish COLLECTION_COMPLETE event
-            channel = "events:COLLECTION_COMPLETE"
-            event_message = {"task_id": task_id, "data_path": simulated_data_path}
-            self.message_bus.publish(channel, event_message)
-            display_event(channel, event_message, category=self.agent_name)
+            self.transition(task_id, "COLLECTING")
 
+            # 2. Hand the collection over to the scheduler; the message is acknowledged when it ends
+            ack = self.message_bus.defer_ack(message)
+            with self._acks_lock:
+                previous = self._acks.pop(task_id, None)
+                self._acks[task_id] = ack
+            if previous is not None:
+                previous()  # A redelivery of a task this worker is already collecting
+            job = self.scheduler.submit(task_id, goal, site=data.get('site'))
+            display_status(f"Queued data collection for task '{task_id}' (site: {job.site}).", category=self.agent_name)
+
+        except InvalidTransitionError as e:
+            display_status(f"Ignoring TASK_CREATED: {e}", category=self.agent_name)
         except Exception as e:
-            display_error(f"Failed during collection for task {task_id}: {e}", agent_id=self.agent_name)
-            self.state_store.update_state(task_id, {"status": "COLLECTION_FAILED", "error_log": str(e)})
-            # Publish failure event
-            channel = "events:COLLECTION_FAILED"
-            event_message = {"task_id": task_id, "error": str(e)}
-            self.message_bus.publish(channel, event_message)
-            display_event(channel, event_message, category=self.agent_name)
+            mark_failed(e)
+            self._publish_failure(task_id, e)
+            self._acknowledge(task_id)
+
+    def _acknowledge(self, task_id: Optional[str]):
+        """Acknowledges the TASK_CREATED message of a collection that has ended."""
+        with self._acks_lock:
+            ack = self._acks.pop(task_id, None)
+        if ack is not None:
+            ack()
 
+    def _on_collection_progress(self, job: CollectionJob, data_path: str, start: int, end: int, count: int):
+        """Scheduler callback: announces a newly appended chunk of reviews."""
+        channel = "events:COLLECTION_PROGRESS"
+        event_message = {
+            "task_id": job.task_id,
+            "data_path": data_path,
+            "start_offset": start,
+            "end_offset": end,
+            "count": count,
+        }
+        self.message_bus.publish(channel, event_message)
+        display_event(channel, event_message, category=self.agent_name)
+
+    def _on_collection_complete(self, job: CollectionJob, data_path: str):
+        """Scheduler callback: records the collected data and publishes COLLECTION_COMPLETE."""
+        self.tracer.record_stage("collection", time.time() - job.submitted_at)
+        try:
+            # 3. Record the path to the collected data and 4. publish COLLECTION_COMPLETE, atomically
+            display_status(f"Data collection finished. Data saved to '{data_path}'.", category=self.agent_name)
+            self.transition(
+                job.task_id, "COLLECTION_COMPLETE", {"artifacts": {"raw_data_path": data_path}},
+                "events:COLLECTION_COMPLETE", {"task_id": job.task_id, "data_path": data_path},
+            )
+        except Exception as e:
+            self._publish_failure(job.task_id, e)
+        finally:
+            self._acknowledge(job.task_id)
+
+    def _on_collection_failed(self, job: CollectionJob, error: Exception):
+        """Scheduler callback for a collection that raised."""
+        try:
+            self._publish_failure(job.task_id, error)
+        finally:
+            self._acknowledge(job.task_id)
+
+    def _publish_failure(self, task_id: Optional[str], error: Exception):
+        display_error(f"Failed during collection for task {task_id}: {error}", agent_id=self.agent_name)
+        if not task_id:
+            return
+        # A failed collection fails the task: record it and publish TASK_FAILED atomically
+        try:
+            self.transition(
+                task_id, "COLLECTION_FAILED", {"error_log": str(error)},
+                "events:TASK_FAILED", {"task_id": task_id, "error": str(error)},
+            )
+        except InvalidTransitionError as e:
+            display_error(str(e), agent_id=self.agent_name)
 
     def run(self):
         """Subscribes to TASK_CREATED events and starts the collection process."""
         display_status("Running and waiting for collection tasks.", category=self.agent_name)
-        self.message_bus.subscribe("events:TASK_CREATED", self._handle_collection_task)
-        self.message_bus.listen()
+        self.scheduler.start()
+        self.subscribe("events:TASK_CREATED", self._handle_collection_task)
+        self.listen()
+
+    def queue_depth(self) -> int:
+        """Collections queued or running, plus handlers in progress."""
+        return self.in_flight + self.scheduler.pending + self.scheduler.running
+
+    def stop(self):
+        """Stops the subscription thread and waits briefly for running collections."""
+        super().stop()
+        self.scheduler.stop(timeout=5)
 
-# No __main__ block needed as this is not intended to be run standalone. 
\ No newline at end of file
+# No __main__ block needed as this is not intended to be run standalone.
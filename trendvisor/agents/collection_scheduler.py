@@ -0,0 +1,245 @@
+import asyncio
+import datetime
+import inspect
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from trendvisor.tools.review_io import append_reviews
+from trendvisor.core.ui import display_error
+
+# report_progress(data_path, start_offset, end_offset, review_count)
+ProgressCallback = Callable[[str, int, int, int], None]
+
+# Site of goals that do not name one ("... on <site>"); not a real site, so not site-limited by default
+DEFAULT_SITE = "default"
+
+
+@dataclass
+class CollectionJob:
+    """A single collection request accepted by the scheduler."""
+    task_id: str
+    goal: str
+    site: str = "default"
+    submitted_at: float = field(default_factory=time.time)
+
+
+@dataclass
+class SiteLimit:
+    """Per-target-site caps: simultaneous collections and collection starts per second (0: unlimited)."""
+    max_concurrency: int = 2
+    rate_per_sec: float = 1.0
+
+
+class _RateLimiter:
+    """Spaces out acquisitions so that at most `rate_per_sec` happen per second."""
+
+    def __init__(self, rate_per_sec: float):
+        self.interval = 1.0 / rate_per_sec if rate_per_sec > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_POSITIVE_TEMPLATES = [
+    "This is a great product! I love the new {product}. Gave it a {rating} star rating.",
+    "Light texture and no white cast. The {product} works well under makeup.",
+    "Good value for the price, I will buy this {product} again.",
+]
+_NEGATIVE_TEMPLATES = [
+    "This is a terrible product! I hate the new {product}. Gave it a {rating} star rating.",
+    "Too greasy and the scent is strong. The {product} broke me out.",
+    "The packaging leaked and the {product} was overpriced.",
+]
+
+
+def _synthetic_review(rng: random.Random, product: str, index: int) -> Dict[str, Any]:
+    rating = rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 6])[0]
+    templates = _POSITIVE_TEMPLATES if rating >= 4 else _NEGATIVE_TEMPLATES
+    text = rng.choice(templates).format(product=product, rating=rating)
+    day = datetime.date.today() - datetime.timedelta(days=rng.randrange(90))
+    return {
+        "id": f"review_{index + 1}",
+        "rating": rating,
+        "date": day.isoformat(),
+        "text": f"{text} Review number {index + 1}.",
+    }
+
+
+class StubCollector:
+    """
+    Stand-in for the Airtop collection call. Produces `n_reviews` synthetic
+    reviews over `latency` seconds without blocking the event loop, appending
+    them to an NDJSON file in chunks and reporting each chunk's byte range.
+    """
+
+    def __init__(self, latency: float = 5.0, output_dir: str = "data", n_reviews: int = 100, chunk_size: int = 25):
+        self.latency = latency
+        self.output_dir = output_dir
+        self.n_reviews = n_reviews
+        self.chunk_size = chunk_size
+
+    async def __call__(self, task_id: str, goal: str, report_progress: Optional[ProgressCallback] = None) -> str:
+        data_path = os.path.join(self.output_dir, f"{task_id}_reviews.ndjson")
+        open(data_path, 'w').close()
+        words = goal.split()
+        product = words[1] if len(words) > 1 else "product"
+        rng = random.Random(task_id)
+
+        n_chunks = max(1, math.ceil(self.n_reviews / self.chunk_size))
+        for chunk in range(n_chunks):
+            await asyncio.sleep(self.latency / n_chunks)
+            first = chunk * self.chunk_size
+            reviews = [_synthetic_review(rng, product, i) for i in range(first, min(first + self.chunk_size, self.n_reviews))]
+            start, end = append_reviews(data_path, reviews)
+            if report_progress:
+                report_progress(data_path, start, end, len(reviews))
+        return data_path
+
+
+def resolve_site(goal: str) -> str:
+    """Extracts the target site from goals like '... reviews on Olive Young'."""
+    if " on " in goal:
+        return goal.rsplit(" on ", 1)[1].strip().lower() or DEFAULT_SITE
+    return DEFAULT_SITE
+
+
+class CollectionScheduler:
+    """
+    Runs collections concurrently on an asyncio event loop in a background thread.
+
+    `submit` never blocks the caller (typically a message bus callback). At most
+    `max_concurrency` collections run at once, and each target site is further
+    limited by its entry in `site_limits`, else by `default_site_limit` (2 at
+    once, 1 start per second). Goals that name no site are only limited by
+    `max_concurrency`, unless `site_limits` has a DEFAULT_SITE entry. A job
+    waits for its site's rate token before taking a global slot, so a
+    rate-limited site never holds global slots while it sleeps.
+    `on_complete(job, data_path)` or
+    `on_failure(job, error)` is called as each collection finishes.
+
+    The collector is `collector(task_id, goal, report_progress) -> data_path`;
+    coroutine functions are awaited on the loop, plain callables run in a
+    thread pool. Collectors call `report_progress` after appending each chunk
+    of reviews, which forwards to `on_progress(job, data_path, start, end, count)`.
+    """
+
+    def __init__(self, collector: Callable[..., Any],
+                 on_complete: Callable[[CollectionJob, str], None],
+                 on_failure: Callable[[CollectionJob, Exception], None],
+                 on_progress: Optional[Callable[[CollectionJob, str, int, int, int], None]] = None,
+                 max_concurrency: int = 4,
+                 site_limits: Optional[Dict[str, SiteLimit]] = None,
+                 default_site_limit: Optional[SiteLimit] = None):
+        self.collector = collector
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+        self.on_progress = on_progress
+        self.max_concurrency = max_concurrency
+        self.site_limits = site_limits or {}
+        self.default_site_limit = default_site_limit or SiteLimit()
+
+        self._is_async = inspect.iscoroutinefunction(collector) or \
+            inspect.iscoroutinefunction(getattr(collector, "__call__", None))
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency + 1, thread_name_prefix="collection")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="CollectionScheduler", daemon=True)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._site_slots: Dict[str, asyncio.Semaphore] = {}
+        self._site_rates: Dict[str, _RateLimiter] = {}
+        self._tasks = set()
+        self.pending = 0
+        self.running = 0
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._loop.run_forever()
+
+    def start(self):
+        """Starts the scheduler's event loop thread."""
+        self._thread.start()
+
+    def submit(self, task_id: str, goal: str, site: Optional[str] = None) -> CollectionJob:
+        """Queues a collection without blocking; safe to call from any thread."""
+        job = CollectionJob(task_id=task_id, goal=goal, site=site or resolve_site(goal))
+        self._loop.call_soon_threadsafe(self._enqueue, job)
+        return job
+
+    def _enqueue(self, job: CollectionJob):
+        self.pending += 1
+        task = self._loop.create_task(self._run_job(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _limits_for(self, site: str):
+        if site not in self._site_slots:
+            if site in self.site_limits:
+                limit = self.site_limits[site]
+            elif site == DEFAULT_SITE:
+                limit = SiteLimit(max_concurrency=self.max_concurrency, rate_per_sec=0.0)
+            else:
+                limit = self.default_site_limit
+            self._site_slots[site] = asyncio.Semaphore(limit.max_concurrency)
+            self._site_rates[site] = _RateLimiter(limit.rate_per_sec)
+        return self._site_slots[site], self._site_rates[site]
+
+    def _progress_reporter(self, job: CollectionJob) -> ProgressCallback:
+        def report_progress(data_path: str, start: int, end: int, count: int):
+            if self.on_progress:
+                try:
+                    self.on_progress(job, data_path, start, end, count)
+                except Exception as e:
+                    display_error(f"Progress callback failed for task {job.task_id}: {e}", agent_id="CollectionScheduler")
+        return report_progress
+
+    async def _run_job(self, job: CollectionJob):
+        site_slots, site_rate = self._limits_for(job.site)
+        # Take the site slot and rate token first so a busy or rate-limited
+        # site cannot hold global slots.
+        async with site_slots:
+            await site_rate.acquire()
+            async with self._slots:
+                self.pending -= 1
+                self.running += 1
+                report_progress = self._progress_reporter(job)
+                try:
+                    if self._is_async:
+                        data_path = await self.collector(job.task_id, job.goal, report_progress)
+                    else:
+                        data_path = await self._loop.run_in_executor(
+                            self._executor, self.collector, job.task_id, job.goal, report_progress)
+                except Exception as e:
+                    await self._loop.run_in_executor(self._executor, self.on_failure, job, e)
+                    return
+                finally:
+                    self.running -= 1
+        await self._loop.run_in_executor(self._executor, self.on_complete, job, data_path)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Waits up to `timeout` seconds for queued collections, then stops the loop."""
+        if not self._thread.is_alive():
+            return
+
+        async def _drain():
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=timeout)
+
+        try:
+            asyncio.run_coroutine_threadsafe(_drain(), self._loop).result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2)
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,58 @@
+from typing import Optional
+from .base import BaseAgent
+from trendvisor.core.message_bus import BaseMessageBus
+from trendvisor.core.state_store import BaseStateStore
+from trendvisor.core.tracing import mark_failed
+from trendvisor.core.ui import display_status, display_event, display_error
+from trendvisor.tools.similarity_index import SimilarityIndex
+
+class IndexAgent(BaseAgent):
+    """
+    The IndexAgent keeps the review similarity index up to date. It
+    subscribes to COLLECTION_COMPLETE events and adds each new dataset's
+    reviews to the SimilarityIndex; it does not change the task's status.
+    On start it also indexes datasets already in `backfill_dir`.
+    """
+    def __init__(self, message_bus: BaseMessageBus, state_store: BaseStateStore, index: SimilarityIndex,
+                 backfill_dir: Optional[str] = None):
+        super().__init__("IndexAgent", message_bus, state_store)
+        self.index = index
+        self.backfill_dir = backfill_dir
+
+    def _handle_collection_complete(self, message):
+        """Callback that indexes a finished collection's reviews."""
+        task_id = None
+        try:
+            data = message['data']
+            task_id = data.get('task_id')
+            data_path = data.get('data_path')
+            if not task_id or not data_path:
+                return
+
+            display_event(message['channel'], data, category=self.agent_name, is_incoming=True)
+            with self.tracer.stage("similarity_index"):
+                added = self.index.add_file(data_path)
+            display_status(f"Indexed {added} new reviews of task '{task_id}' ({self.index.rows} in total).",
+                           category=self.agent_name)
+
+        except Exception as e:
+            mark_failed(e)
+            display_error(f"Could not index the reviews of task {task_id}: {e}", agent_id=self.agent_name)
+
+    def run(self):
+        """Subscribes to COLLECTION_COMPLETE events, then backfills existing datasets."""
+        display_status("Running and waiting for collected datasets.", category=self.agent_name)
+        self.subscribe("events:COLLECTION_COMPLETE", self._handle_collection_complete)
+        self.listen()
+        if self.backfill_dir:
+            try:
+                added = self.index.add_directory(self.backfill_dir)
+                if added:
+                    display_status(f"Indexed {added} reviews from existing datasets.", category=self.agent_name)
+            except OSError as e:
+                display_error(f"Could not index existing datasets: {e}", agent_id=self.agent_name)
+
+    def stop(self):
+        """Stops the subscription thread and closes the index."""
+        super().stop()
+        self.index.close()
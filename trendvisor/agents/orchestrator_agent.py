@@ -1,92 +1,227 @@
-import time
-import json
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Union
 from .base import BaseAgent
-from trendvisor.core.state_store import StateStore, TaskState
-from trendvisor.core.message_bus import MessageBus
+from .task_scheduler import (
+    COMPARISON_KIND, READY, RUNNING, WAITING, ScheduledTask, TaskFailedError, TaskScheduler, TaskSpec,
+)
+from trendvisor.core.state_store import BaseStateStore, StateStore, TaskState
+from trendvisor.core.message_bus import BaseMessageBus, MessageBus
 from trendvisor.core.ui import display_status, display_event, display_final_report, display_error
+from trendvisor.tools.comparison import compare_tasks
+from trendvisor.tools.streaming_analysis import RESULTS_DIR
 
 class OrchestratorAgent(BaseAgent):
     """
     The OrchestratorAgent is responsible for initiating tasks and monitoring their
     overall progress. It acts as the entry point for user requests.
+    Tasks go through a TaskScheduler (priorities, per-tenant fairness and
+    dependencies), which hands them back in batches: initial states are
+    saved and TASK_CREATED events published with one pipelined round trip
+    per batch. Comparison tasks run here once the tasks they compare are done.
+    Every task has a future that resolves on its TASK_COMPLETE or
+    TASK_FAILED event, so callers wait on events instead of polling.
     """
-    def __init__(self, message_bus: MessageBus, state_store: StateStore):
+    def __init__(self, message_bus: BaseMessageBus, state_store: BaseStateStore,
+                 max_in_flight: Optional[int] = 256, tenant_max_in_flight: Optional[int] = None,
+                 tenant_weights: Optional[Dict[str, float]] = None, batch_size: int = 500):
         super().__init__("OrchestratorAgent", message_bus, state_store)
         self.active_tasks = {}
+        self.scheduler = TaskScheduler(
+            self._dispatch_tasks, fail=self._fail_tasks,
+            max_in_flight=max_in_flight, tenant_max_in_flight=tenant_max_in_flight,
+            tenant_weights=tenant_weights, batch_size=batch_size,
+        )
     
     def start_task(self, goal: str) -> str:
         """
         Initiates a new analysis task from a user-defined goal.
         """
-        task_id = f"task_{goal.split(' ')[0].lower()}_{int(time.time())}"
         display_status(f"New task received. Goal: '{goal}'.", category=self.agent_name)
+        return self.submit_tasks([TaskSpec(goal=goal)])[0]
 
-        # 1. Create and save the initial state using the Pydantic model
-        initial_state = TaskState(task_id=task_id, goal=goal, status="CREATED")
-        self.state_store.save_state(initial_state)
-        display_status(f"Initial state for task '{task_id}' saved.", category=self.agent_name)
+    def submit(self, goal: Union[TaskSpec, str]) -> Future:
+        """
+        Submits one task and returns its future. The future resolves to the
+        task's final TaskState once TASK_COMPLETE arrives, and raises
+        TaskFailedError on TASK_FAILED. Use `asyncio.wrap_future` to await
+        it from a coroutine.
+        """
+        return self.task_future(self.submit_tasks([goal])[0])
 
-        # 2. Publish the TASK_CREATED event
-        channel = "events:TASK_CREATED"
-        event_message = {
-            "task_id": task_id,
-            "goal": goal,
-        }
-        self.message_bus.publish(channel, event_message)
-        display_event(channel, event_message, category=self.agent_name)
-        
-        self.active_tasks[task_id] = "RUNNING"
-        return task_id
+    def task_future(self, task_id: str) -> Future:
+        """The future of a task submitted through this orchestrator."""
+        return self.scheduler.future(task_id)
+
+    def submit_tasks(self, specs: Iterable[Union[TaskSpec, str]]) -> List[str]:
+        """
+        Submits many tasks at once (goals or TaskSpecs, which may depend on
+        each other). Tasks that can start are dispatched right away, in
+        pipelined batches; the rest follow as capacity frees up and their
+        dependencies complete.
+
+        Returns:
+            The collision-free task ids, in the order of `specs`.
+        """
+        specs = [spec if isinstance(spec, TaskSpec) else TaskSpec(goal=spec) for spec in specs]
+        task_ids = self.scheduler.submit(specs)
+        display_status(f"Submitted {len(task_ids)} task(s); {self.scheduler.stats()}.", category=self.agent_name)
+        return task_ids
+
+    @staticmethod
+    def _initial_state(task: ScheduledTask, status: str, error: Optional[str] = None) -> TaskState:
+        spec = task.spec
+        params = dict(spec.params, tenant=spec.tenant, priority=spec.priority, kind=spec.kind)
+        if task.dependencies:
+            params["depends_on"] = task.dependencies
+        return TaskState(task_id=task.task_id, goal=spec.goal, status=status, params=params, error_log=error)
+
+    def _dispatch_tasks(self, tasks: List[ScheduledTask]):
+        """
+        Scheduler callback: creates and announces a batch of tasks, and runs
+        comparisons. If the batch cannot be saved, the error propagates and
+        the scheduler fails the batch.
+        """
+        analyses = [task for task in tasks if task.spec.kind != COMPARISON_KIND]
+        for task in tasks:
+            self.active_tasks[task.task_id] = "RUNNING"
+        if analyses:
+            # 1. Save the initial states and 2. publish the TASK_CREATED events in one transaction
+            channel = "events:TASK_CREATED"
+            events = [
+                dict({"task_id": task.task_id, "goal": task.spec.goal},
+                     **({"site": task.spec.params["site"]} if "site" in task.spec.params else {}))
+                for task in analyses
+            ]
+            try:
+                self.state_store.save_states(
+                    [self._initial_state(task, "CREATED") for task in analyses],
+                    [self.message_bus.prepare(channel, event) for event in events],
+                )
+            except Exception as e:
+                display_error(f"Could not create {len(tasks)} task(s): {e}", agent_id=self.agent_name)
+                for task in tasks:
+                    self.active_tasks.pop(task.task_id, None)
+                raise
+            if len(events) == 1:
+                display_event(channel, events[0], category=self.agent_name)
+            else:
+                display_status(f"Published {len(events)} {channel} events.", category=self.agent_name)
+        for task in tasks:
+            if task.spec.kind == COMPARISON_KIND:
+                try:
+                    self._run_comparison(task)
+                except Exception as e:
+                    # Its TASK_FAILED event could not be published either; fail it here
+                    error_msg = f"Comparison failed for task {task.task_id}: {e}"
+                    display_error(error_msg, agent_id=self.agent_name)
+                    self.active_tasks.pop(task.task_id, None)
+                    self.scheduler.finished(task.task_id, False, error=error_msg)
+                    self.scheduler.resolve(task.task_id, error=error_msg)
+
+    def _run_comparison(self, task: ScheduledTask):
+        """Compares the finished tasks a comparison task depends on, then completes it like any task."""
+        self.state_store.save_state(self._initial_state(task, "COMPARING"))
+        try:
+            compared = {}
+            for dependency in task.dependencies:
+                state = self.state_store.get_state(dependency)
+                compared[dependency] = {
+                    "label": state.goal if state else dependency,
+                    "artifacts": state.artifacts if state else {},
+                }
+            artifacts = compare_tasks(task.task_id, compared, RESULTS_DIR)
+            self.transition(
+                task.task_id, "COMPARISON_COMPLETE", {"artifacts": artifacts},
+                "events:TASK_COMPLETE", {"task_id": task.task_id, "report_path": artifacts["report_path"]},
+            )
+        except Exception as e:
+            error_msg = f"Comparison failed for task {task.task_id}: {e}"
+            self.transition(
+                task.task_id, "COMPARISON_FAILED", {"error_log": error_msg},
+                "events:TASK_FAILED", {"task_id": task.task_id, "error": error_msg},
+            )
+
+    def _fail_tasks(self, tasks: List[ScheduledTask]):
+        """
+        Scheduler callback: records tasks that cannot run because a dependency
+        failed. The scheduler resolves their futures.
+        """
+        for task in tasks:
+            display_error(f"Task '{task.task_id}' skipped: {task.error}", agent_id=self.agent_name)
+        try:
+            self.state_store.save_states(
+                [self._initial_state(task, "DEPENDENCY_FAILED", task.error) for task in tasks],
+                [self.message_bus.prepare("events:TASK_FAILED", {"task_id": task.task_id, "error": task.error})
+                 for task in tasks],
+            )
+        except Exception as e:
+            display_error(f"Could not record {len(tasks)} skipped task(s): {e}", agent_id=self.agent_name)
+
+    def _resolve(self, task_id: str, final_state: Optional[TaskState], error: Optional[str] = None):
+        """Completes a task's future: with its final state, or with TaskFailedError if `error` is set."""
+        self.scheduler.resolve(task_id, final_state, error)
 
     def _handle_final_events(self, message):
         """Callback for handling terminal events like TASK_COMPLETE or TASK_FAILED."""
+        task_id = None
         try:
             channel = message['channel']
             event_type = channel.split(':')[-1]
-            data = json.loads(message['data'])
+            data = message['data']
             task_id = data.get('task_id')
+            if not task_id:
+                return
 
-            if not task_id or task_id not in self.active_tasks:
+            # Release dependents and free capacity first, so active_tasks never
+            # looks empty while scheduled work remains.
+            self.scheduler.finished(task_id, event_type == "TASK_COMPLETE", error=data.get('error'))
+            if task_id not in self.active_tasks:
                 return
 
             display_event(channel, data, category=self.agent_name, is_incoming=True)
             
             final_state = self.state_store.get_state(task_id)
+            error = None
             if not final_state:
                 display_error(f"Could not retrieve final state for task {task_id}", agent_id=self.agent_name)
-                return
-
-            if event_type == "TASK_COMPLETE":
+                if event_type == "TASK_FAILED":
+                    error = data.get('error') or "unknown error"
+            elif event_type == "TASK_COMPLETE":
                 report_path = final_state.artifacts.get('report_path', 'N/A')
                 display_final_report(task_id, report_path)
             elif event_type == "TASK_FAILED":
-                display_error(f"Task '{task_id}' failed. Reason: {final_state.error_log}", agent_id=self.agent_name)
-            
+                error = final_state.error_log or data.get('error') or "unknown error"
+                display_error(f"Task '{task_id}' failed. Reason: {error}", agent_id=self.agent_name)
+
             self.active_tasks.pop(task_id, None)
+            self._resolve(task_id, final_state, error)
 
-        except (json.JSONDecodeError, KeyError) as e:
+        except Exception as e:
             display_error(f"Could not process final event: {message}. Error: {e}", agent_id=self.agent_name)
+            if task_id and self.active_tasks.pop(task_id, None) is not None:
+                failed = message['channel'].endswith("TASK_FAILED")
+                self._resolve(task_id, None, (message['data'].get('error') or "unknown error") if failed else None)
+
+    def queue_depth(self) -> int:
+        """Submitted tasks that have not finished (waiting, ready or running)."""
+        stats = self.scheduler.stats()
+        return stats.get(WAITING, 0) + stats.get(READY, 0) + stats.get(RUNNING, 0)
 
     def run(self):
         """
-        The orchestrator subscribes to final status events to monitor outcomes.
+        The orchestrator subscribes to final status events to monitor outcomes,
+        until stop() is called. Task completion is reported through futures.
         """
         display_status("Running and monitoring task outcomes.", category=self.agent_name)
         
         # Subscribe to terminal events
-        self.message_bus.subscribe("events:TASK_COMPLETE", self._handle_final_events)
-        self.message_bus.subscribe("events:TASK_FAILED", self._handle_final_events)
+        self.subscribe("events:TASK_COMPLETE", self._handle_final_events)
+        self.subscribe("events:TASK_FAILED", self._handle_final_events)
         
         # Start listening in a non-blocking way
-        listener_thread = self.message_bus.listen()
-        
-        # Keep the agent alive while tasks are running or until stopped
-        while self.active_tasks:
-            time.sleep(1)
-        
-        display_status("All tasks completed. Stopping listener.", category=self.agent_name)
-        if listener_thread and listener_thread.is_alive():
-            listener_thread.stop()
+        self.listen()
+        self._stop_event.wait()
+        display_status("Stopped monitoring task outcomes.", category=self.agent_name)
 
 if __name__ == '__main__':
     # This is for testing the agent in isolation
@@ -95,32 +230,28 @@ if __name__ == '__main__':
         state_store = StateStore()
         message_bus = MessageBus()
         orchestrator = OrchestratorAgent(message_bus, state_store)
-        
-        # Run orchestrator in a separate thread to not block the main thread
-        import threading
-        orchestrator_thread = threading.Thread(target=orchestrator.run, daemon=True)
-        orchestrator_thread.start()
+        orchestrator.start()
+        orchestrator.wait_until_ready()
 
         # Simulate creating a task
         task_id = orchestrator.start_task("analyze sunscreen reviews")
+        future = orchestrator.task_future(task_id)
         print(f"Main thread: Task {task_id} started.")
 
         # In a real run, other agents would publish these events.
         # For this test, we simulate them.
-        time.sleep(2)
         print("\nMain thread: Simulating a TASK_COMPLETE event...")
         message_bus.publish("events:TASK_COMPLETE", {
             "task_id": task_id,
             "report_path": "/results/simulated_report.html"
         })
 
-        # Give the orchestrator time to process the event
-        time.sleep(2)
-        print("Main thread: Test finished.")
+        final_state = future.result(timeout=5)
+        print(f"Main thread: Task finished with status {final_state.status if final_state else 'N/A'}.")
         
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
         print("Orchestrator agent test finished.")
-        if 'orchestrator' in locals() and orchestrator.subscriber_thread.is_alive():
-            orchestrator.stop()
\ No newline at end of file
+        if 'orchestrator' in locals():
+            orchestrator.stop()
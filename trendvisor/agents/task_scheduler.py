@@ -0,0 +1,346 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+ANALYSIS_KIND = "analysis"
+COMPARISON_KIND = "comparison"
+
+WAITING = "WAITING"     # dependencies not finished yet
+READY = "READY"         # queued for dispatch
+RUNNING = "RUNNING"     # dispatched, not finished
+DONE = "DONE"
+FAILED = "FAILED"
+
+
+def new_task_id(goal: str) -> str:
+    """A collision-free task id that still reads like the goal: task_<first word>_<epoch>_<random>."""
+    word = "".join(c for c in (goal.split() or ["task"])[0].lower() if c.isalnum()) or "task"
+    return f"task_{word}_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+class TaskFailedError(Exception):
+    """Raised by a task's future when the task failed or was skipped because a dependency failed."""
+
+    def __init__(self, task_id: str, reason: Optional[str]):
+        super().__init__(f"Task {task_id} failed: {reason}")
+        self.task_id = task_id
+        self.reason = reason
+
+
+@dataclass
+class TaskSpec:
+    """A task to schedule. `depends_on` names other specs' `key`s from the same submission, or existing task ids."""
+    goal: str
+    priority: int = 0               # higher runs first within a tenant
+    tenant: str = "default"
+    key: Optional[str] = None
+    depends_on: List[str] = field(default_factory=list)
+    kind: str = ANALYSIS_KIND       # or COMPARISON_KIND: runs in the orchestrator once its dependencies are done
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ScheduledTask:
+    task_id: str
+    spec: TaskSpec
+    seq: int
+    dependencies: List[str] = field(default_factory=list)
+    status: str = WAITING
+    error: Optional[str] = None
+    future: Future = field(default_factory=Future)  # resolved by the orchestrator with the final TaskState
+    _pending: set = field(default_factory=set)
+    _dependents: List[str] = field(default_factory=list)
+
+
+class TaskScheduler:
+    """
+    Decides when submitted tasks are dispatched.
+
+    - Dependencies: a task becomes ready once every task it depends on is
+      done. If a dependency fails, its dependents fail without running.
+    - Fairness: ready tasks are queued per tenant. Each dispatch slot goes
+      to the tenant with the fewest running tasks relative to its weight,
+      and ties go to the higher-priority head task, then submission order.
+      A tenant submitting thousands of tasks therefore cannot starve one
+      submitting a few.
+    - Priority: within a tenant, higher priority first, then submission order.
+    - Capacity: at most `max_in_flight` tasks run at once (and at most
+      `tenant_max_in_flight` per tenant).
+    - Memory: a task leaves `tasks` once it is done or failed and its
+      future is resolved (its dependents were released or failed when it
+      finished). The futures of the last `history` such tasks are kept, so
+      late `future()` calls and new tasks depending on them still work.
+
+    `dispatch(tasks)` is called with each batch of tasks to start, and
+    `fail(tasks)` with tasks that failed because of a dependency. Both are
+    called outside the scheduler lock. If `dispatch` raises, the batch
+    fails (and so do its dependents). Dispatched tasks are reported back
+    through `finished()`, and every task's outcome through `resolve()`.
+    """
+
+    def __init__(self, dispatch: Callable[[List[ScheduledTask]], None],
+                 fail: Optional[Callable[[List[ScheduledTask]], None]] = None,
+                 max_in_flight: Optional[int] = 256, tenant_max_in_flight: Optional[int] = None,
+                 tenant_weights: Optional[Dict[str, float]] = None, batch_size: int = 500,
+                 history: int = 10000):
+        self._dispatch = dispatch
+        self._fail = fail
+        self.max_in_flight = max_in_flight
+        self.tenant_max_in_flight = tenant_max_in_flight
+        self.tenant_weights = tenant_weights or {}
+        self.batch_size = batch_size
+        self.history = history
+        self.tasks: Dict[str, ScheduledTask] = {}
+        self._finished: "OrderedDict[str, Future]" = OrderedDict()  # evicted task id -> its resolved future
+        self._counts: Dict[str, int] = {}                           # status -> tasks, evicted ones included
+        self._ready: Dict[str, List[Tuple[int, int, str]]] = {}  # tenant -> heap of (-priority, seq, task_id)
+        self._running: Dict[str, int] = {}                         # tenant -> running tasks
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, specs: Iterable[TaskSpec]) -> List[str]:
+        """
+        Adds tasks (a DAG, if they depend on each other) and dispatches the
+        ones that can start.
+
+        Returns:
+            The task ids, in the order of `specs`.
+
+        Raises:
+            ValueError: on unknown dependencies (or ones evicted from the
+                history), duplicate keys or a cycle.
+        """
+        specs = list(specs)
+        ids = [new_task_id(spec.goal) for spec in specs]
+        keys: Dict[str, str] = {}
+        for spec, task_id in zip(specs, ids):
+            if spec.key is not None:
+                if spec.key in keys:
+                    raise ValueError(f"Duplicate task key: {spec.key}")
+                keys[spec.key] = task_id
+        new_ids = set(ids)
+
+        with self._lock:
+            new_tasks = []
+            for spec, task_id in zip(specs, ids):
+                dependencies = []
+                for name in spec.depends_on:
+                    dependency = keys.get(name, name)
+                    if dependency not in self.tasks and dependency not in new_ids and dependency not in self._finished:
+                        raise ValueError(f"Unknown dependency '{name}' of task '{spec.key or spec.goal}'")
+                    dependencies.append(dependency)
+                new_tasks.append(ScheduledTask(task_id, spec, next(self._seq), dependencies))
+            self._check_acyclic(new_tasks)
+
+            for task in new_tasks:
+                self.tasks[task.task_id] = task
+                self._count(None, WAITING)
+            for task in new_tasks:
+                for dependency in task.dependencies:
+                    parent = self.tasks.get(dependency)
+                    if parent is not None and parent.status != DONE:
+                        task._pending.add(dependency)
+                        parent._dependents.append(task.task_id)
+            failed = []
+            for task in new_tasks:
+                if task.status != WAITING:
+                    continue  # Already failed by a cascade below
+                failed_dependency = next((d for d in task.dependencies if self._status(d) == FAILED), None)
+                if failed_dependency is not None:
+                    failed.extend(self._cascade_failure(task, failed_dependency))
+                elif not task._pending:
+                    self._enqueue(task)
+        self._report_failures(failed)
+        self.pump()
+        return ids
+
+    def _check_acyclic(self, new_tasks: List[ScheduledTask]):
+        """Raises ValueError if the new tasks' dependencies form a cycle (Kahn's algorithm)."""
+        new_ids = {task.task_id for task in new_tasks}
+        indegree = {task.task_id: sum(1 for d in task.dependencies if d in new_ids) for task in new_tasks}
+        children: Dict[str, List[str]] = {}
+        for task in new_tasks:
+            for dependency in task.dependencies:
+                if dependency in new_ids:
+                    children.setdefault(dependency, []).append(task.task_id)
+        queue = [task_id for task_id, degree in indegree.items() if degree == 0]
+        visited = 0
+        while queue:
+            task_id = queue.pop()
+            visited += 1
+            for child in children.get(task_id, []):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+        if visited != len(new_tasks):
+            raise ValueError("Task dependencies contain a cycle")
+
+    def _status(self, task_id: str) -> str:
+        """The status of a scheduled or evicted task."""
+        task = self.tasks.get(task_id)
+        if task is not None:
+            return task.status
+        return FAILED if self._finished[task_id].exception() is not None else DONE
+
+    def _count(self, old: Optional[str], new: str):
+        if old is not None:
+            self._counts[old] -= 1
+        self._counts[new] = self._counts.get(new, 0) + 1
+
+    def _set_status(self, task: ScheduledTask, status: str):
+        self._count(task.status, status)
+        task.status = status
+
+    def _enqueue(self, task: ScheduledTask):
+        self._set_status(task, READY)
+        heapq.heappush(self._ready.setdefault(task.spec.tenant, []), (-task.spec.priority, task.seq, task.task_id))
+
+    def _next_tenant(self) -> Optional[str]:
+        best, best_rank = None, None
+        for tenant, queue in self._ready.items():
+            if not queue:
+                continue
+            running = self._running.get(tenant, 0)
+            if self.tenant_max_in_flight is not None and running >= self.tenant_max_in_flight:
+                continue
+            rank = (running / self.tenant_weights.get(tenant, 1.0), queue[0][0], queue[0][1])
+            if best_rank is None or rank < best_rank:
+                best, best_rank = tenant, rank
+        return best
+
+    def pump(self):
+        """Dispatches ready tasks while there is capacity, in batches of `batch_size`."""
+        while True:
+            batch = []
+            with self._lock:
+                while len(batch) < self.batch_size and (self.max_in_flight is None or self._in_flight < self.max_in_flight):
+                    tenant = self._next_tenant()
+                    if tenant is None:
+                        break
+                    _, _, task_id = heapq.heappop(self._ready[tenant])
+                    task = self.tasks[task_id]
+                    self._set_status(task, RUNNING)
+                    self._running[tenant] = self._running.get(tenant, 0) + 1
+                    self._in_flight += 1
+                    batch.append(task)
+            if not batch:
+                return
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                error = f"Dispatch failed: {e}"
+                failed = []
+                with self._lock:
+                    for task in batch:
+                        failed.extend(self._finish(task, False, error))
+                for task in batch:
+                    self.resolve(task.task_id, error=error)
+                self._report_failures(failed)
+
+    def finished(self, task_id: str, succeeded: bool, error: Optional[str] = None):
+        """Records the outcome of a dispatched task, releasing or failing its dependents."""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None or task.status != RUNNING:
+                return
+            failed = self._finish(task, succeeded, error)
+            self._evict_if_resolved(task)
+        self._report_failures(failed)
+        self.pump()
+
+    def _finish(self, task: ScheduledTask, succeeded: bool, error: Optional[str]) -> List[ScheduledTask]:
+        """Frees a running task's slot and releases its dependents; returns the ones failed by a cascade."""
+        self._in_flight -= 1
+        self._running[task.spec.tenant] -= 1
+        failed = []
+        if succeeded:
+            self._set_status(task, DONE)
+            for child_id in task._dependents:
+                child = self.tasks.get(child_id)
+                if child is None:
+                    continue  # Failed through another dependency and already evicted
+                child._pending.discard(task.task_id)
+                if child.status == WAITING and not child._pending:
+                    self._enqueue(child)
+        else:
+            self._set_status(task, FAILED)
+            task.error = error
+            for child_id in task._dependents:
+                child = self.tasks.get(child_id)
+                if child is not None and child.status == WAITING:
+                    failed.extend(self._cascade_failure(child, task.task_id))
+        return failed
+
+    def _cascade_failure(self, task: ScheduledTask, failed_dependency: str) -> List[ScheduledTask]:
+        """Fails a waiting task and every waiting task downstream of it; returns them."""
+        self._set_status(task, FAILED)
+        task.error = f"Dependency {failed_dependency} failed"
+        failed, stack = [task], [task]
+        while stack:
+            parent = stack.pop()
+            for child_id in parent._dependents:
+                child = self.tasks.get(child_id)
+                if child is not None and child.status == WAITING:
+                    self._set_status(child, FAILED)
+                    child.error = f"Dependency {parent.task_id} failed"
+                    failed.append(child)
+                    stack.append(child)
+        return failed
+
+    def _report_failures(self, failed: List[ScheduledTask]):
+        if not failed:
+            return
+        try:
+            if self._fail is not None:
+                self._fail(failed)
+        finally:
+            for task in failed:
+                self.resolve(task.task_id, error=task.error)
+
+    def resolve(self, task_id: str, result: Any = None, error: Optional[str] = None):
+        """
+        Completes a task's future: with `result` (its final state), or with
+        TaskFailedError if `error` is set. Finished tasks are then evicted.
+        """
+        with self._lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            return
+        # Outside the lock: done-callbacks run synchronously and may call back in
+        try:
+            if error is None:
+                task.future.set_result(result)
+            else:
+                task.future.set_exception(TaskFailedError(task_id, error))
+        except InvalidStateError:
+            return  # Already resolved
+        with self._lock:
+            if self.tasks.get(task_id) is task:
+                self._evict_if_resolved(task)
+
+    def _evict_if_resolved(self, task: ScheduledTask):
+        """Moves a finished, resolved task to the bounded history of futures."""
+        if task.status not in (DONE, FAILED) or not task.future.done():
+            return
+        del self.tasks[task.task_id]
+        self._finished[task.task_id] = task.future
+        while len(self._finished) > self.history:
+            self._finished.popitem(last=False)
+
+    def future(self, task_id: str) -> Future:
+        """The future of a scheduled task, or of a finished one still in the history."""
+        with self._lock:
+            task = self.tasks.get(task_id)
+            return task.future if task is not None else self._finished[task_id]
+
+    def stats(self) -> Dict[str, int]:
+        """Number of tasks per status (finished tasks included after eviction)."""
+        with self._lock:
+            return {status: count for status, count in self._counts.items() if count}
@@ -0,0 +1,76 @@
+"""
+Trendvisor Redis Connections
+One bounded connection pool per process, shared by the state store, the
+message bus and the claim store. The agent network then keeps a fixed
+number of connections to a single Redis database, and state changes and
+their events can be written together in one atomic round trip (see
+StateStore.transition).
+"""
+import redis
+from redis.client import NEVER_DECODE
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/1"
+DEFAULT_MAX_CONNECTIONS = 64
+
+
+def create_pool(url: str = DEFAULT_REDIS_URL, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                timeout: float = 20.0) -> redis.BlockingConnectionPool:
+    """
+    Creates the shared pool. When every connection is in use, callers wait
+    up to `timeout` seconds for one instead of opening more.
+    """
+    return redis.BlockingConnectionPool.from_url(
+        url, max_connections=max_connections, timeout=timeout, decode_responses=True,
+    )
+
+
+class _BinaryRedis(redis.Redis):
+    """
+    A client that reads every reply as raw bytes, whatever its pool's
+    decode_responses setting, so it can share that pool. Pub/sub reads go
+    through their own connection (see pubsub()); pipelines are not supported.
+    """
+
+    def __init__(self, connection_pool: redis.ConnectionPool):
+        super().__init__(connection_pool=connection_pool)
+        self._pubsub_pool = None
+
+    def execute_command(self, *args, **options):
+        options[NEVER_DECODE] = True
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        raise NotImplementedError("The binary client does not pipeline; use the decoding client")
+
+    def pubsub(self, **kwargs):
+        # A subscribed connection reads messages outside execute_command, so it cannot share the pool
+        if self._pubsub_pool is None:
+            connection_kwargs = dict(self.connection_pool.connection_kwargs, decode_responses=False)
+            self._pubsub_pool = redis.ConnectionPool(connection_class=self.connection_pool.connection_class,
+                                                     **connection_kwargs)
+        return redis.client.PubSub(self._pubsub_pool, **kwargs)
+
+
+def binary_client(client: redis.Redis) -> redis.Redis:
+    """
+    A client for the same server and database as `client` that returns raw
+    bytes (event frames are binary). It uses `client`'s connection pool, so
+    the pool's max_connections bounds both; only pub/sub subscribers hold
+    one connection each outside it.
+    """
+    pool = client.connection_pool
+    if not pool.connection_kwargs.get("decode_responses"):
+        return client
+    return _BinaryRedis(pool)
+
+
+def same_server(a: redis.Redis, b: redis.Redis, same_db: bool = True) -> bool:
+    """Whether two clients talk to the same Redis server (and, with `same_db`, the same database)."""
+    if a.connection_pool is b.connection_pool:
+        return True
+    ka, kb = a.connection_pool.connection_kwargs, b.connection_pool.connection_kwargs
+    if same_db and ka.get("db", 0) != kb.get("db", 0):
+        return False
+    if ka.get("server") is not None or kb.get("server") is not None:  # In-process fakeredis servers
+        return ka.get("server") is kb.get("server")
+    return all(ka.get(key) == kb.get(key) for key in ("host", "port", "path"))
@@ -0,0 +1,234 @@
+"""
+Trendvisor Event Envelope
+Versioned wire format of bus events, with pluggable codecs and claim-check
+offloading of large payloads.
+
+Frames:
+    binary  0xc1 <version> <codec id> <body>
+            0xc1 is never the first byte of a msgpack value or of UTF-8
+            text, so binary frames and JSON frames cannot be confused.
+    JSON    {"v": <version>, "m": <message>}. It is the fallback codec,
+            used when msgpack is not installed. The message is nested, so
+            its own keys never clash with the envelope's. Version 1 JSON
+            frames kept "v" among the message's keys, and events without
+            "v" (published before envelopes existed) decode as version 0.
+
+A frame larger than `max_inline_bytes` is put in a ClaimStore, which is
+Redis with a TTL or a local directory. The event then carries only the
+claim reference plus the `task_id` and `trace` fields. Receivers fetch and
+decode the stored frame transparently, so handlers always see the full
+message.
+"""
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # JSON remains available as the fallback codec
+    msgpack = None
+
+from trendvisor.core.ui import display_warning
+
+ENVELOPE_VERSION = 2
+VERSION_FIELD = "v"
+MESSAGE_FIELD = "m"
+CLAIM_FIELD = "claim"
+MAGIC = 0xc1
+DEFAULT_MAX_INLINE_BYTES = 64 * 1024
+# Fields kept inline next to a claim reference, so routing and tracing work without fetching the payload
+CLAIM_KEPT_FIELDS = ("task_id", "trace")
+
+
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)  # Reused: json.dumps builds an encoder per call for non-default options
+
+
+class EnvelopeError(ValueError):
+    """Raised for frames that cannot be decoded: unknown version or codec, or an expired claim."""
+
+
+class JsonCodec:
+    name = "json"
+    codec_id = 0
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        return _JSON_ENCODER.encode(message).encode("utf-8")
+
+    def decode(self, body: bytes) -> Dict[str, Any]:
+        return json.loads(body)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    codec_id = 1
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, body: bytes) -> Dict[str, Any]:
+        return msgpack.unpackb(body, raw=False)
+
+
+CODECS = {"json": JsonCodec()}
+if msgpack is not None:
+    CODECS["msgpack"] = MsgpackCodec()
+DEFAULT_CODEC = "msgpack" if msgpack is not None else "json"
+_CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+_CLAIM_FIELDS = {CLAIM_FIELD, *CLAIM_KEPT_FIELDS}
+_JSON_FRAME_PREFIX = f'{{"{VERSION_FIELD}": {ENVELOPE_VERSION}, "{MESSAGE_FIELD}": '
+
+
+def get_codec(name: str):
+    """
+    Returns the codec registered under `name`. If msgpack is requested but
+    not installed, the JSON codec is returned instead.
+    """
+    if name == "msgpack" and msgpack is None:
+        display_warning("msgpack is not installed; falling back to the JSON event codec.", agent_id="Envelope")
+        return CODECS["json"]
+    if name not in CODECS:
+        raise ValueError(f"Unknown event codec: {name}")
+    return CODECS[name]
+
+
+class RedisClaimStore:
+    """
+    Keeps offloaded payloads in Redis under `claim:<id>`, expiring after
+    `ttl` seconds. The client must not decode responses (frames are binary).
+    """
+
+    def __init__(self, redis_client, ttl: int = 3600, prefix: str = "claim:"):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def put(self, data: bytes) -> str:
+        key = f"{self.prefix}{uuid.uuid4().hex}"
+        self.redis_client.set(key, data, ex=self.ttl)
+        return f"redis:{key}"
+
+    def get(self, ref: str) -> Optional[bytes]:
+        return self.redis_client.get(ref[len("redis:"):])
+
+
+class FileClaimStore:
+    """
+    Keeps offloaded payloads as files in a local (or shared) directory. Files
+    older than `ttl` seconds are pruned every `prune_every` puts.
+    """
+
+    def __init__(self, directory: str, ttl: int = 3600, prune_every: int = 100):
+        self.directory = directory
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, data: bytes) -> str:
+        name = f"{uuid.uuid4().hex}.claim"
+        tmp_path = os.path.join(self.directory, name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._puts += 1
+        if self._puts % self.prune_every == 0:
+            self.prune()
+        return f"file:{name}"
+
+    def get(self, ref: str) -> Optional[bytes]:
+        path = os.path.join(self.directory, os.path.basename(ref[len("file:"):]))
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def prune(self):
+        """Removes claims older than the TTL."""
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith(".claim") and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class Envelope:
+    """
+    Encodes and decodes bus events: one codec for publishing, every known
+    codec (and legacy JSON) for receiving, and claim checks above
+    `max_inline_bytes` when a claim store is configured.
+    """
+
+    def __init__(self, codec: str = DEFAULT_CODEC, claim_store=None,
+                 max_inline_bytes: Optional[int] = DEFAULT_MAX_INLINE_BYTES):
+        self.codec = get_codec(codec)
+        self.claim_store = claim_store
+        self.max_inline_bytes = max_inline_bytes
+
+    def _frame(self, message: Dict[str, Any]) -> bytes:
+        if self.codec.codec_id == JsonCodec.codec_id:
+            # Wrapping the encoded text is cheaper than encoding a wrapper dict
+            return (_JSON_FRAME_PREFIX + _JSON_ENCODER.encode(message) + "}").encode("utf-8")
+        return bytes((MAGIC, ENVELOPE_VERSION, self.codec.codec_id)) + self.codec.encode(message)
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        """Encodes a message, replacing it with a claim reference if it is too large to send inline."""
+        frame = self._frame(message)
+        if self.claim_store is None or self.max_inline_bytes is None or len(frame) <= self.max_inline_bytes:
+            return frame
+        reference = {CLAIM_FIELD: self.claim_store.put(frame)}
+        for name in CLAIM_KEPT_FIELDS:
+            if name in message:
+                reference[name] = message[name]
+        return self._frame(reference)
+
+    def decode(self, data: Union[bytes, str]) -> Dict[str, Any]:
+        """
+        Decodes a frame of any known codec into the message, fetching
+        claim-checked payloads.
+
+        Raises:
+            EnvelopeError: for an unsupported version or codec, a malformed
+            frame, or a claim that expired or cannot be resolved.
+        """
+        message = self._decode_frame(data)
+        ref = message.get(CLAIM_FIELD)
+        if isinstance(ref, str) and set(message) <= _CLAIM_FIELDS:
+            if self.claim_store is None:
+                raise EnvelopeError(f"Received claim {ref} but no claim store is configured")
+            frame = self.claim_store.get(ref)
+            if frame is None:
+                raise EnvelopeError(f"Claim {ref} has expired or does not exist")
+            message = self._decode_frame(frame)
+        return message
+
+    @staticmethod
+    def _decode_frame(data: Union[bytes, str]) -> Dict[str, Any]:
+        binary = isinstance(data, (bytes, bytearray)) and data[:1] == bytes((MAGIC,))
+        try:
+            if binary:
+                version, codec_id = data[1], data[2]
+                codec = _CODECS_BY_ID.get(codec_id)
+                message = None if version > ENVELOPE_VERSION or codec is None else codec.decode(bytes(data[3:]))
+            else:
+                frame = json.loads(data)
+                version = frame.get(VERSION_FIELD, 0) if isinstance(frame, dict) else 0
+                if version == 1:  # The version was mixed into the message's own keys
+                    message = {key: value for key, value in frame.items() if key != VERSION_FIELD}
+                elif version:
+                    message = frame.get(MESSAGE_FIELD)
+                else:
+                    message = frame
+        except Exception as e:
+            raise EnvelopeError(f"Malformed event frame: {e}") from e
+        if not isinstance(version, int) or version > ENVELOPE_VERSION:
+            raise EnvelopeError(f"Unsupported envelope version {version}")
+        if binary and codec is None:
+            raise EnvelopeError(f"Unknown or unavailable event codec id {codec_id}")
+        if not isinstance(message, dict):
+            raise EnvelopeError("Event frame is not an object")
+        return message
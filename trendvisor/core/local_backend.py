@@ -0,0 +1,493 @@
+"""
+Trendvisor Local Backend
+In-process MessageBus and StateStore for single-node runs, where every
+agent is a thread of one process (`run_trendvisor.py --backend local`).
+Events travel through thread-safe queues as dicts and state lives in
+dicts, so there is no network hop and nothing is encoded. Delivery and
+update semantics follow the Redis backend: the same bus modes, the same
+TRANSITIONS checks, and events sent atomically with state changes.
+"""
+import bisect
+import copy
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from trendvisor.core import tracing
+from trendvisor.core.message_bus import (
+    BaseMessageBus, ListenerHandle, PreparedEvent, PUBSUB_MODE, STREAMS_MODE,
+)
+from trendvisor.core.state_store import (
+    BaseStateStore, InvalidTransitionError, STRING_FIELDS, TERMINAL_STATUSES, TaskState,
+    _ALLOWED_FROM,
+)
+from trendvisor.core.task_archive import TaskArchive
+from trendvisor.core.ui import display_error, display_status
+
+# (channel, message, deliveries so far)
+Delivery = Tuple[str, Dict[str, Any], int]
+
+
+class LocalBroker:
+    """
+    Routes published messages to the queues subscribed to their channel:
+    the in-process stand-in for the Redis server. Buses created without a
+    broker share the process-wide default one.
+    """
+
+    def __init__(self, max_dead_letters: int = 10000):
+        self._lock = threading.Lock()
+        self._queues: Dict[str, "queue.Queue[Delivery]"] = {}
+        self._routes: Dict[str, Dict[str, "queue.Queue[Delivery]"]] = {}
+        self.dead_letters: Deque[Tuple[str, Dict[str, Any]]] = deque(maxlen=max_dead_letters)
+
+    def queue(self, name: str) -> "queue.Queue[Delivery]":
+        """The queue called `name`, created on first use."""
+        with self._lock:
+            q = self._queues.get(name)
+            if q is None:
+                q = self._queues[name] = queue.Queue()
+            return q
+
+    def bind(self, channel: str, name: str):
+        """Routes `channel` to the queue called `name`."""
+        q = self.queue(name)
+        with self._lock:
+            self._routes.setdefault(channel, {})[name] = q
+
+    def route(self, channel: str, message: Dict[str, Any]):
+        """Puts a message on every queue subscribed to `channel`; it is dropped if there is none."""
+        for q in list(self._routes.get(channel, {}).values()):
+            q.put((channel, message, 0))
+
+    def subscribers(self, channel: str) -> int:
+        return len(self._routes.get(channel, ()))
+
+    def backlog(self, name: str) -> int:
+        """Messages waiting in the queue called `name`."""
+        q = self._queues.get(name)
+        return q.qsize() if q is not None else 0
+
+
+_DEFAULT_BROKER = LocalBroker()
+
+
+class LocalMessageBus(BaseMessageBus):
+    """
+    Delivers agent events between threads of one process.
+
+    The modes match MessageBus:
+        pubsub   every subscribed bus gets every message, and one thread per
+                 bus runs its callbacks in order. A failing callback loses
+                 the message.
+        streams  every handler forms a group (named after the callback by
+                 default); buses sharing a group share its queue, so each
+                 message is handled once. A failing handler gets the message
+                 again, up to `max_deliveries` times, after which it goes to
+                 `broker.dead_letters`.
+
+    Messages are passed by reference (each delivery gets a shallow copy), so
+    a publisher must not modify nested values after publishing them.
+    """
+
+    def __init__(self, mode: str = PUBSUB_MODE, broker: Optional[LocalBroker] = None,
+                 max_deliveries: int = 5, poll_interval: float = 0.1):
+        if mode not in (PUBSUB_MODE, STREAMS_MODE):
+            raise ValueError(f"Unknown MessageBus mode: {mode}")
+        self.mode = mode
+        self.broker = broker or _DEFAULT_BROKER
+        self.max_deliveries = max_deliveries
+        self.poll_interval = poll_interval
+        self._pubsub_queue = f"pubsub:{id(self)}"
+        self._handlers: Dict[str, Dict[str, Callable]] = {}   # queue name -> channel -> callback
+        self._listeners: Dict[str, "LocalListener"] = {}
+        self._lock = threading.Lock()
+
+    def prepare(self, channel: str, message: Dict[str, Any]) -> PreparedEvent:
+        """Wraps a message for `channel` (with this hop's trace context) without sending it."""
+        tracing.count_published(channel)
+        return PreparedEvent(self, channel, dict(tracing.inject(message)))
+
+    def send(self, event: PreparedEvent, pipe=None):
+        """Routes a prepared event to its subscribers. `pipe` is accepted for interface compatibility."""
+        self.broker.route(event.channel, event.payload)
+
+    def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None], group: Optional[str] = None):
+        """
+        Subscribes to a channel and registers a callback. In streams mode,
+        `group` names the consumer group; it defaults to the callback's
+        qualified name, as in MessageBus.
+        """
+        if self.mode == STREAMS_MODE:
+            name = f"group:{group or getattr(callback, '__qualname__', repr(callback))}"
+        else:
+            name = self._pubsub_queue
+        with self._lock:
+            self._handlers.setdefault(name, {})[channel] = callback
+            self.broker.bind(channel, name)
+        display_status(f"Subscribed to {channel}", category="LocalBus")
+
+    def listen(self):
+        """Starts one dispatcher thread per subscribed queue that does not have one yet."""
+        display_status("Listening for messages...", category="LocalBus")
+        started = []
+        with self._lock:
+            for name, handlers in self._handlers.items():
+                listener = self._listeners.get(name)
+                if listener is None or not listener.is_alive():
+                    listener = LocalListener(self, name, self.broker.queue(name), handlers)
+                    self._listeners[name] = listener
+                    listener.start()
+                    started.append(listener)
+        if self.mode != STREAMS_MODE:
+            # One dispatcher per bus, as MessageBus shares its pub/sub thread
+            return self._listeners.get(self._pubsub_queue) or ListenerHandle(started)
+        return ListenerHandle(started)
+
+    def wait_for_subscribers(self, channels: List[str], timeout: Optional[float] = 10.0) -> bool:
+        """
+        Waits until every channel has a subscriber. In streams mode messages
+        wait in their group's queue, so the channels are ready at once.
+        """
+        if self.mode == STREAMS_MODE or not channels:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if all(self.broker.subscribers(channel) > 0 for channel in channels):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def close(self):
+        """Stops the dispatcher threads started by listen()."""
+        with self._lock:
+            for listener in self._listeners.values():
+                listener.stop()
+            self._listeners.clear()
+
+    def backlog(self, channel: str, group: str) -> Dict[str, int]:
+        """Returns the pending (in-flight, always 0 here) and lag (queued) counts of a group."""
+        return {"pending": 0, "lag": self.broker.backlog(f"group:{group}")}
+
+
+class LocalListener(threading.Thread):
+    """Takes messages from one queue and runs this bus's callback for their channel."""
+
+    def __init__(self, bus: LocalMessageBus, queue_name: str, inbox: "queue.Queue[Delivery]",
+                 handlers: Dict[str, Callable]):
+        super().__init__(daemon=True)
+        self.bus = bus
+        self.queue_name = queue_name
+        self.inbox = inbox
+        self.handlers = handlers   # Shared with the bus, so later subscriptions apply
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                channel, message, deliveries = self.inbox.get(timeout=self.bus.poll_interval)
+            except queue.Empty:
+                continue
+            handler = self.handlers.get(channel)
+            if handler is None:
+                # Another bus in this group subscribed to the channel: leave the message to its listener
+                self.inbox.put((channel, message, deliveries))
+                self._stop_event.wait(0.01)
+                continue
+            try:
+                handler({"type": "message", "channel": channel, "data": dict(message)})
+            except Exception as e:
+                self._failed(channel, message, deliveries + 1, e)
+
+    def _failed(self, channel: str, message: Dict[str, Any], deliveries: int, error: Exception):
+        display_error(f"Handler for {channel} failed: {error}", agent_id="LocalBus")
+        if self.bus.mode != STREAMS_MODE:
+            return
+        if deliveries < self.bus.max_deliveries:
+            self.inbox.put((channel, message, deliveries))
+        else:
+            display_error(f"Message on {channel} exceeded {self.bus.max_deliveries} deliveries; dead-lettering.", agent_id="LocalBus")
+            self.bus.broker.dead_letters.append((channel, message))
+
+    def stop(self):
+        """Stops after the current message (or poll) finishes."""
+        self._stop_event.set()
+
+
+def _unindex(index: List[Tuple[float, str]], entry: Tuple[float, str]):
+    """Removes `entry` from a sorted index, if it is there."""
+    position = bisect.bisect_left(index, entry)
+    if position < len(index) and index[position] == entry:
+        del index[position]
+
+
+class LocalStateStore(BaseStateStore):
+    """
+    Keeps task state in memory with the same layout as StateStore: scalar
+    fields, artifacts and history per task, plus the per-status and
+    creation/finish time indexes.
+
+    One lock makes each operation atomic. transition() checks and applies
+    a status change under it, and routes the event of a LocalMessageBus
+    before releasing it, so, as with the Redis script, the state change and
+    its event happen together. Values are copied on the way in and out, as
+    Redis would serialize them.
+    """
+
+    def __init__(self, archive: Optional[TaskArchive] = None, retention_seconds: float = 3600.0):
+        super().__init__(archive, retention_seconds)
+        self._lock = threading.RLock()
+        self._fields: Dict[str, Dict[str, Any]] = {}
+        self._artifacts: Dict[str, Dict[str, str]] = {}
+        self._history: Dict[str, List[str]] = {}
+        # Sorted (creation time, task id) lists, as the Redis sorted-set indexes: pages are sliced, not sorted
+        self._by_status: Dict[str, List[Tuple[float, str]]] = {}
+        self._by_created: List[Tuple[float, str]] = []
+        self._created: Dict[str, float] = {}
+        self._finished: Dict[str, float] = {}
+        self._unarchivable: Dict[str, float] = {}  # finished tasks archive_finished() could not read
+
+    @staticmethod
+    def _encode_field(field: str, value: Any) -> Any:
+        return str(value) if field in STRING_FIELDS else copy.deepcopy(value)
+
+    @staticmethod
+    def _decode_field(field: str, value: Any) -> Any:
+        return value if field in STRING_FIELDS else copy.deepcopy(value)
+
+    def _reindex(self, task_id: str, old: Optional[str], new: str):
+        """Moves a task from status `old` to `new` in the indexes (the lock is held)."""
+        now = time.time()
+        if task_id not in self._created:
+            self._created[task_id] = now
+            bisect.insort(self._by_created, (now, task_id))
+        entry = (self._created[task_id], task_id)
+        if old is not None and old != new:
+            _unindex(self._by_status.get(old, []), entry)
+        index = self._by_status.setdefault(new, [])
+        position = bisect.bisect_left(index, entry)
+        if position == len(index) or index[position] != entry:
+            index.insert(position, entry)
+        if new in TERMINAL_STATUSES:
+            if old != new:
+                self._finished[task_id] = now
+        else:
+            self._finished.pop(task_id, None)
+
+    def _apply(self, task_id: str, updates: Dict[str, Any]):
+        """Applies partial non-status updates as StateStore.update_state does (the lock is held)."""
+        for key, value in updates.items():
+            if key == "artifacts":
+                if value:
+                    self._artifacts.setdefault(task_id, {}).update(value)
+            elif key == "history":
+                entries = [value] if isinstance(value, str) else list(value)
+                if entries:
+                    self._history.setdefault(task_id, []).extend(entries)
+            elif key in TaskState.model_fields and key != "status":
+                fields = self._fields[task_id]
+                if value is None:
+                    fields.pop(key, None)
+                else:
+                    fields[key] = self._encode_field(key, value)
+
+    def _write_state(self, state: TaskState):
+        """Replaces a task's stored state (the lock is held)."""
+        task_id = state.task_id
+        self._reindex(task_id, self._fields.get(task_id, {}).get("status"), state.status)
+        self._fields[task_id] = {
+            field: self._encode_field(field, value)
+            for field, value in state.model_dump(exclude={"history", "artifacts"}).items()
+            if value is not None
+        }
+        self._artifacts.pop(task_id, None)
+        self._history.pop(task_id, None)
+        if state.artifacts:
+            self._artifacts[task_id] = dict(state.artifacts)
+        if state.history:
+            self._history[task_id] = list(state.history)
+
+    @staticmethod
+    def _is_local(event) -> bool:
+        return isinstance(event.bus, LocalMessageBus)
+
+    def save_state(self, state: TaskState):
+        with self._lock:
+            self._write_state(state)
+
+    def save_states(self, states: List[TaskState], events: Optional[List[Any]] = None):
+        """Saves many task states and routes `events` (from LocalMessageBus.prepare) with them."""
+        remote = [event for event in events or [] if not self._is_local(event)]
+        with self._lock:
+            for state in states:
+                self._write_state(state)
+            for event in events or []:
+                if self._is_local(event):
+                    event.bus.send(event)
+        for event in remote:
+            event.bus.send(event)
+
+    def transition(self, task_id: str, status: str, updates: Optional[Dict[str, Any]] = None,
+                   event: Optional[Any] = None) -> str:
+        """
+        Moves a task to `status`, applies `updates` and sends `event`, as
+        StateStore.transition does.
+
+        Returns:
+            The task's previous status.
+
+        Raises:
+            InvalidTransitionError: if TRANSITIONS does not allow the move or the task does not exist.
+        """
+        allowed = _ALLOWED_FROM.get(status)
+        if allowed is None:
+            raise ValueError(f"Unknown task status: {status}")
+        with self._lock:
+            fields = self._fields.get(task_id)
+            current = fields.get("status") if fields else None
+            if current is None or f",{current}," not in allowed:
+                raise InvalidTransitionError(task_id, current, status)
+            fields["status"] = status
+            self._reindex(task_id, current, status)
+            self._apply(task_id, updates or {})
+            if event is not None and self._is_local(event):
+                event.bus.send(event)
+        if event is not None and not self._is_local(event):
+            event.bus.send(event)
+        return current
+
+    def get_state(self, task_id: str) -> Optional[TaskState]:
+        with self._lock:
+            fields = self._fields.get(task_id)
+            if fields:
+                data = {field: self._decode_field(field, value) for field, value in fields.items()}
+                data["artifacts"] = dict(self._artifacts.get(task_id, {}))
+                data["history"] = list(self._history.get(task_id, []))
+        if not fields:
+            return self._get_archived(task_id)
+        try:
+            return TaskState.model_validate(data)
+        except Exception as e:
+            display_error(f"Data validation error for task {task_id}: {e}", agent_id="StateStore")
+            return None
+
+    def update_state(self, task_id: str, updates: Dict[str, Any]):
+        """
+        Updates specific fields in the state for a given task.
+
+        `artifacts` entries are merged into the existing artifacts and
+        `history` entries are appended; unknown fields are ignored. Updates
+        to a task that does not exist are ignored. A `status` update is
+        applied with transition().
+
+        Raises:
+            InvalidTransitionError: if TRANSITIONS does not allow the status change.
+        """
+        if updates.get("status") is not None:
+            updates = dict(updates)
+            status = updates.pop("status")
+            try:
+                self.transition(task_id, status, updates)
+            except InvalidTransitionError as e:
+                if e.current is not None:
+                    raise
+            return
+        with self._lock:
+            if task_id in self._fields:
+                self._apply(task_id, updates)
+
+    def log_history(self, task_id: str, event_summary: str):
+        with self._lock:
+            self._history.setdefault(task_id, []).append(event_summary)
+
+    def get_field(self, task_id: str, field: str) -> Optional[Any]:
+        if field == "artifacts":
+            with self._lock:
+                artifacts = dict(self._artifacts.get(task_id, {}))
+            return artifacts or None
+        if field == "history":
+            return self.get_history(task_id) or None
+        with self._lock:
+            fields = self._fields.get(task_id)
+            if fields is not None:
+                value = fields.get(field)
+                return None if value is None else self._decode_field(field, value)
+        state = self._get_archived(task_id)
+        return getattr(state, field, None) if state is not None else None
+
+    def get_history(self, task_id: str) -> list:
+        with self._lock:
+            history = list(self._history.get(task_id, []))
+        if not history and self.archive is not None:
+            state = self._get_archived(task_id)
+            return state.history if state is not None else history
+        return history
+
+    def list_tasks(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[str]:
+        """Task ids, newest first: tasks in memory, then archived tasks."""
+        with self._lock:
+            index = self._by_created if status is None else self._by_status.get(status, [])
+            end = max(0, len(index) - offset)
+            live = [task_id for _, task_id in reversed(index[max(0, end - limit):end])]
+            live_total = len(index)
+        return self._with_archived(live, live_total, status, limit, offset)
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {status: len(task_ids) for status, task_ids in self._by_status.items() if task_ids}
+        return self._with_archived_counts(counts)
+
+    def archive_finished(self, older_than: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        Moves tasks that finished more than `older_than` seconds ago (default:
+        the retention period) from memory to the archive. Without an archive,
+        they are only deleted. Tasks that fail validation are kept, as
+        StateStore.archive_finished does.
+
+        Returns:
+            The number of tasks removed.
+        """
+        cutoff = time.time() - (self.retention_seconds if older_than is None else older_than)
+        moved = 0
+        while True:
+            with self._lock:
+                task_ids = list(itertools.islice(
+                    (task_id for task_id, finished_at in self._finished.items() if finished_at <= cutoff), batch_size,
+                ))
+                if not task_ids:
+                    return moved
+                rows = []
+                for task_id in task_ids:
+                    fields = self._fields.get(task_id)
+                    if fields is None:
+                        self._finished.pop(task_id, None)  # Only a stale index entry
+                        continue
+                    try:
+                        state = TaskState.model_validate(dict(
+                            fields, artifacts=self._artifacts.get(task_id, {}),
+                            history=self._history.get(task_id, []),
+                        ))
+                    except Exception as e:
+                        display_error(f"Not archiving task {task_id}: {e}", agent_id="StateStore")
+                        # Kept with its data, but out of the finished index so later batches move on
+                        self._unarchivable[task_id] = self._finished.pop(task_id)
+                        continue
+                    rows.append((state.model_dump_json(), task_id, state.status, state.goal,
+                                 self._created.get(task_id), self._finished.get(task_id)))
+                if self.archive is not None and rows:
+                    self.archive.put_many(rows)
+                for row in rows:
+                    task_id = row[1]
+                    status = self._fields.pop(task_id).get("status")
+                    self._artifacts.pop(task_id, None)
+                    self._history.pop(task_id, None)
+                    created = self._created.pop(task_id, None)
+                    if created is not None:
+                        _unindex(self._by_status.get(status, []), (created, task_id))
+                        _unindex(self._by_created, (created, task_id))
+                    self._finished.pop(task_id, None)
+            moved += len(rows)
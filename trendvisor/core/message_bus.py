@@ -1,23 +1,436 @@
 import redis
-import json
+import os
+import socket
+import threading
 import time
-from typing import Callable, Dict, Any
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
 
-class MessageBus:
-    def __init__(self, host='localhost', port=6379):
-        self.redis_client = redis.Redis(host=host, port=port, db=0, decode_responses=True)
-        self.pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+from trendvisor.core import tracing
+from trendvisor.core.connection import binary_client
+from trendvisor.core.envelope import DEFAULT_CODEC, DEFAULT_MAX_INLINE_BYTES, Envelope, EnvelopeError, RedisClaimStore
+from trendvisor.core.ui import display_error, display_status
+
+PUBSUB_MODE = "pubsub"
+STREAMS_MODE = "streams"
+
+
+def _no_ack():
+    pass
+
+
+@dataclass
+class PreparedEvent:
+    """An encoded event, ready to be sent by its bus or written atomically with a state change."""
+    bus: "BaseMessageBus"
+    channel: str
+    payload: Any                   # the encoded frame (bytes) for Redis, the message dict in-process
+    stream: Optional[str] = None   # set in streams mode: XADD to this key instead of PUBLISH
+
+
+class BaseMessageBus(ABC):
+    """
+    The interface agents publish and receive events through. MessageBus
+    implements it over Redis; LocalMessageBus (see local_backend) over
+    in-process queues, for single-node runs.
+    """
+
+    mode: str = PUBSUB_MODE
+
+    @abstractmethod
+    def prepare(self, channel: str, message: Dict[str, Any]) -> PreparedEvent:
+        """Encodes a message for `channel` without sending it (see StateStore.transition)."""
+
+    @abstractmethod
+    def send(self, event: PreparedEvent, pipe=None):
+        """Sends a prepared event."""
 
     def publish(self, channel: str, message: Dict[str, Any]):
-        """Publishes a message to a specific channel."""
-        self.redis_client.publish(channel, json.dumps(message))
+        """Publishes a message to a specific channel, with a trace context for this hop (see tracing)."""
+        self.send(self.prepare(channel, message))
+
+    def publish_many(self, channel: str, messages: List[Dict[str, Any]]):
+        """Publishes several messages to a channel."""
+        for message in messages:
+            self.publish(channel, message)
 
-    def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None]):
-        """Subscribes to a channel and registers a callback."""
-        self.pubsub.subscribe(**{channel: callback})
-        print(f"Subscribed to {channel}")
+    @abstractmethod
+    def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None], group: Optional[str] = None):
+        """Registers a callback for a channel; it gets {"type", "channel", "data"}."""
+
+    def defer_ack(self, message: Dict[str, Any]) -> Callable[[], None]:
+        """
+        Called by a handler that hands its message over to background work:
+        the message is not acknowledged when the handler returns, but when
+        the returned callable is called. Only consumer groups acknowledge
+        messages; elsewhere the callable does nothing.
+        """
+        defer = message.get("defer_ack")
+        return defer() if defer is not None else _no_ack
+
+    @abstractmethod
+    def listen(self):
+        """Starts delivering messages to the subscribed callbacks; returns a thread-like handle."""
+
+    @abstractmethod
+    def wait_for_subscribers(self, channels: List[str], timeout: Optional[float] = 10.0) -> bool:
+        """Waits until every channel has a subscriber; False on timeout."""
+
+    @abstractmethod
+    def close(self):
+        """Stops the listeners started by listen()."""
+
+
+class MessageBus(BaseMessageBus):
+    """
+    Publishes and delivers agent events over Redis.
+
+    Two delivery modes are supported:
+        pubsub   Redis Pub/Sub. Every subscriber gets every message, but
+                 messages published while nobody listens are lost.
+        streams  Redis Streams with consumer groups. Each channel is a capped
+                 stream (`stream:<channel>`); every subscribed handler forms a
+                 consumer group, so N processes running the same handler share
+                 the load and each message is processed once. Messages are
+                 acknowledged after the handler returns (or later, when it
+                 calls defer_ack), and messages left pending by a dead
+                 consumer are reclaimed with XAUTOCLAIM.
+
+    Events are sent as versioned envelopes (msgpack by default, JSON as the
+    fallback). Payloads larger than `max_inline_bytes` are claim-checked
+    into `claim_store`, which defaults to Redis with a TTL. Handlers receive
+    the decoded message dict as `message['data']`.
+    """
+
+    def __init__(self, host='localhost', port=6379, mode: str = PUBSUB_MODE,
+                 consumer_name: Optional[str] = None, max_stream_length: int = 10000,
+                 claim_idle_ms: int = 60000, max_deliveries: int = 5,
+                 block_ms: int = 1000, batch_size: int = 10,
+                 redis_client: Optional[redis.Redis] = None,
+                 connection_pool: Optional[redis.ConnectionPool] = None,
+                 codec: str = DEFAULT_CODEC, claim_store=None,
+                 max_inline_bytes: Optional[int] = DEFAULT_MAX_INLINE_BYTES):
+        if mode not in (PUBSUB_MODE, STREAMS_MODE):
+            raise ValueError(f"Unknown MessageBus mode: {mode}")
+        self.mode = mode
+        if redis_client is None and connection_pool is not None:
+            redis_client = redis.Redis(connection_pool=connection_pool)
+        self.redis_client = redis_client or redis.Redis(host=host, port=port, db=0, decode_responses=True)
+        # Event frames are binary, so they are read through a client that does not decode responses
+        self.raw_client = binary_client(self.redis_client)
+        self.pubsub = self.raw_client.pubsub(ignore_subscribe_messages=True)
+        self.envelope = Envelope(codec, claim_store or RedisClaimStore(self.raw_client), max_inline_bytes)
+
+        # Streams mode settings
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.max_stream_length = max_stream_length
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.block_ms = block_ms
+        self.batch_size = batch_size
+        self._groups: Dict[str, Dict[str, Callable]] = {}
+        self._listeners: Dict[str, "StreamListener"] = {}
+        self._pubsub_thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def stream_key(channel: str) -> str:
+        """Returns the Redis stream that backs a channel in streams mode."""
+        return f"stream:{channel}"
+
+    def prepare(self, channel: str, message: Dict[str, Any]) -> PreparedEvent:
+        """
+        Encodes a message for `channel` (with this hop's trace context) without
+        sending it. Pass it to StateStore.transition to publish it atomically
+        with a state change, or to send().
+        """
+        tracing.count_published(channel)
+        return PreparedEvent(
+            self, channel, self.envelope.encode(tracing.inject(message)),
+            self.stream_key(channel) if self.mode == STREAMS_MODE else None,
+        )
+
+    def send(self, event: PreparedEvent, pipe=None):
+        """Sends a prepared event, or queues it on `pipe`."""
+        target = pipe if pipe is not None else self.redis_client
+        if event.stream is not None:
+            target.xadd(event.stream, {"data": event.payload}, maxlen=self.max_stream_length, approximate=True)
+        else:
+            target.publish(event.channel, event.payload)
+
+    def publish_many(self, channel: str, messages: List[Dict[str, Any]]):
+        """Publishes several messages to a channel in one pipelined round trip."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for message in messages:
+            self.send(self.prepare(channel, message), pipe)
+        pipe.execute()
+
+    def subscribe(self, channel: str, callback: Callable[[Dict[str, Any]], None], group: Optional[str] = None):
+        """
+        Subscribes to a channel and registers a callback. The callback gets
+        {"type", "channel", "data"} with the decoded message as "data".
+
+        In streams mode, `group` names the consumer group; it defaults to the
+        callback's qualified name (e.g. 'CollectionAgent._handle_collection_task'),
+        so every process running the same handler joins the same group.
+        """
+        if self.mode == STREAMS_MODE:
+            group = group or getattr(callback, "__qualname__", repr(callback))
+            stream = self.stream_key(channel)
+            try:
+                # Start from the beginning of the (capped) stream so that events
+                # published before the group first existed are not lost.
+                self.redis_client.xgroup_create(stream, group, id="0", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+            with self._lock:
+                self._groups.setdefault(group, {})[stream] = callback
+        else:
+            # PubSub is not thread-safe: agents sharing a bus subscribe from their own threads
+            with self._lock:
+                self.pubsub.subscribe(**{channel: self._decoding(channel, callback)})
+        display_status(f"Subscribed to {channel}", category="MessageBus")
+
+    def _decoding(self, channel: str, callback: Callable[[Dict[str, Any]], None]):
+        """Wraps a pub/sub callback so it receives the decoded message."""
+        def deliver(message):
+            try:
+                data = self.envelope.decode(message['data'])
+            except EnvelopeError as e:
+                display_error(f"Dropped undecodable message on {channel}: {e}", agent_id="MessageBus")
+                return
+            callback({"type": message['type'], "channel": channel, "data": data})
+        return deliver
 
     def listen(self):
         """Starts listening for messages in a separate thread."""
-        print("Listening for messages...")
-        return self.pubsub.run_in_thread(sleep_time=0.1)
\ No newline at end of file
+        display_status("Listening for messages...", category="MessageBus")
+        if self.mode != STREAMS_MODE:
+            # One reader per connection: agents sharing a bus share the thread
+            with self._lock:
+                if self._pubsub_thread is None or not self._pubsub_thread.is_alive():
+                    self._pubsub_thread = self.pubsub.run_in_thread(sleep_time=0.1, daemon=True)
+                return self._pubsub_thread
+
+        started = []
+        with self._lock:
+            for group, handlers in self._groups.items():
+                listener = self._listeners.get(group)
+                if listener is None or not listener.is_alive():
+                    listener = StreamListener(self, group, dict(handlers))
+                    self._listeners[group] = listener
+                    listener.start()
+                    started.append(listener)
+        return ListenerHandle(started)
+
+    def wait_for_subscribers(self, channels: List[str], timeout: Optional[float] = 10.0) -> bool:
+        """
+        Waits until the broker reports a subscriber on every channel.
+
+        In pubsub mode this is checked with PUBSUB NUMSUB. In streams mode,
+        subscribe() creates the consumer groups synchronously and messages
+        wait in the stream, so the channels are ready as soon as they exist.
+
+        Returns:
+            False if some channel had no subscriber within `timeout` seconds.
+        """
+        if self.mode == STREAMS_MODE or not channels:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if all(count > 0 for _, count in self.redis_client.pubsub_numsub(*channels)):
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def close(self):
+        """Stops the pub/sub thread and the stream listeners started by listen()."""
+        with self._lock:
+            if self._pubsub_thread is not None:
+                self._pubsub_thread.stop()
+                self._pubsub_thread = None
+            for listener in self._listeners.values():
+                listener.stop()
+            self._listeners.clear()
+
+    def backlog(self, channel: str, group: str) -> Dict[str, int]:
+        """Returns the pending (delivered, unacked) and lag (undelivered) counts of a group."""
+        for info in self.redis_client.xinfo_groups(self.stream_key(channel)):
+            if info["name"] == group:
+                return {"pending": info.get("pending", 0) or 0, "lag": info.get("lag", 0) or 0}
+        return {"pending": 0, "lag": 0}
+
+
+class StreamListener(threading.Thread):
+    """Reads one consumer group's streams, dispatches messages and acks them."""
+
+    def __init__(self, bus: MessageBus, group: str, handlers: Dict[str, Callable]):
+        super().__init__(daemon=True)
+        self.bus = bus
+        self.group = group
+        self.handlers = handlers
+        self._stop_event = threading.Event()
+        self._last_reclaim = 0.0
+        self._last_heartbeat = 0.0
+        self._deferred: Set[Tuple[str, str]] = set()  # (stream, message id) acked later, see defer_ack()
+        self._deferred_lock = threading.Lock()
+
+    def run(self):
+        client = self.bus.raw_client
+        while not self._stop_event.is_set():
+            try:
+                self._heartbeat()
+                if time.monotonic() - self._last_reclaim >= self.bus.claim_idle_ms / 1000.0:
+                    self._reclaim()
+                response = client.xreadgroup(
+                    self.group, self.bus.consumer_name,
+                    {stream: ">" for stream in self.handlers},
+                    count=self.bus.batch_size, block=self.bus.block_ms,
+                )
+                for stream, entries in response or []:
+                    for message_id, fields in entries:
+                        if self._stop_event.is_set():
+                            break  # The rest stays pending and is reclaimed by another consumer
+                        self._dispatch(stream, message_id, fields)
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                # Unacked messages stay pending, so nothing is lost; keep the listener alive
+                display_error(f"Stream connection failed for group {self.group}: {e}", agent_id="MessageBus")
+                self._stop_event.wait(1)
+        # Work accepted before stop() still holds its messages: keep them claimed until it is acknowledged
+        while self._deferred:
+            time.sleep(min(0.1, self._heartbeat_interval()))
+            try:
+                self._heartbeat()
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                display_error(f"Stream connection failed for group {self.group}: {e}", agent_id="MessageBus")
+
+    def _heartbeat_interval(self) -> float:
+        return self.bus.claim_idle_ms / 3000.0
+
+    def _heartbeat(self):
+        """Resets the idle time of deferred messages, so other consumers do not reclaim them."""
+        if not self._deferred or time.monotonic() - self._last_heartbeat < self._heartbeat_interval():
+            return
+        self._last_heartbeat = time.monotonic()
+        with self._deferred_lock:
+            by_stream: Dict[str, List[str]] = {}
+            for stream, message_id in self._deferred:
+                by_stream.setdefault(stream, []).append(message_id)
+        for stream, message_ids in by_stream.items():
+            # JUSTID: does not count as a delivery
+            self.bus.raw_client.xclaim(stream, self.group, self.bus.consumer_name, min_idle_time=0,
+                                       message_ids=message_ids, justid=True)
+
+    def _defer(self, stream: str, message_id: str) -> Callable[[], None]:
+        """Takes over acknowledging a message; returns the callable that does it (once)."""
+        key = (stream, message_id)
+        with self._deferred_lock:
+            self._deferred.add(key)
+
+        def ack():
+            with self._deferred_lock:
+                if key not in self._deferred:
+                    return
+                self._deferred.discard(key)
+            try:
+                self.bus.raw_client.xack(stream, self.group, message_id)
+            except (redis.ConnectionError, redis.TimeoutError) as e:
+                # Still pending: it is reclaimed and handled again, as after a crash
+                display_error(f"Could not acknowledge {message_id} on {stream}: {e}", agent_id="MessageBus")
+        return ack
+
+    def _dispatch(self, stream, message_id, fields: Dict[bytes, bytes]):
+        """
+        Runs the handler and acks the message unless decoding or the handler
+        raised. Redis connection errors propagate to run().
+        """
+        stream = stream.decode() if isinstance(stream, bytes) else stream
+        message_id = message_id.decode() if isinstance(message_id, bytes) else message_id
+        deferred = []
+
+        def defer_ack():
+            deferred.append(True)
+            return self._defer(stream, message_id)
+
+        try:
+            message = {
+                "type": "message",
+                "channel": stream[len("stream:"):],
+                "data": self.bus.envelope.decode(fields.get(b"data", b"")),
+                "id": message_id,
+                "defer_ack": defer_ack,
+            }
+            self.handlers[stream](message)
+        except Exception as e:
+            # Left pending: it will be redelivered through XAUTOCLAIM, and dead-lettered eventually.
+            display_error(f"Handler for {stream} failed on message {message_id}: {e}", agent_id="MessageBus")
+            with self._deferred_lock:
+                self._deferred.discard((stream, message_id))
+            return
+        if not deferred:
+            self.bus.raw_client.xack(stream, self.group, message_id)
+
+    def _reclaim(self):
+        """Takes over messages left pending by dead or stuck consumers."""
+        self._last_reclaim = time.monotonic()
+        client = self.bus.raw_client
+        for stream in self.handlers:
+            start_id = "0-0"
+            while not self._stop_event.is_set():
+                result = client.xautoclaim(
+                    stream, self.group, self.bus.consumer_name,
+                    min_idle_time=self.bus.claim_idle_ms, start_id=start_id,
+                    count=self.bus.batch_size,
+                )
+                start_id, entries = result[0], result[1]
+                for message_id, fields in entries:
+                    if self._stop_event.is_set():
+                        return
+                    key = (stream, message_id.decode() if isinstance(message_id, bytes) else message_id)
+                    if key in self._deferred:
+                        continue  # Still being worked on here
+                    if fields is None or self._exceeded_deliveries(stream, message_id):
+                        continue
+                    self._dispatch(stream, message_id, fields)
+                if start_id in ("0-0", b"0-0"):
+                    break
+
+    def _exceeded_deliveries(self, stream: str, message_id: str) -> bool:
+        """Dead-letters a message that has been delivered too many times."""
+        client = self.bus.raw_client
+        pending = client.xpending_range(stream, self.group, min=message_id, max=message_id, count=1)
+        if not pending or pending[0]["times_delivered"] <= self.bus.max_deliveries:
+            return False
+        display_error(f"Message {message_id} on {stream} exceeded {self.bus.max_deliveries} deliveries; dead-lettering.", agent_id="MessageBus")
+        entry = client.xrange(stream, min=message_id, max=message_id)
+        if entry:
+            client.xadd(f"{stream}:dead", entry[0][1],
+                        maxlen=self.bus.max_stream_length, approximate=True)
+        client.xack(stream, self.group, message_id)
+        return True
+
+    def stop(self):
+        """Stops reading after the current message, or once the current blocking read returns."""
+        self._stop_event.set()
+
+
+class ListenerHandle:
+    """Thread-like handle over the stream listeners started by one listen() call."""
+
+    def __init__(self, listeners: List[StreamListener]):
+        self.listeners = listeners
+
+    def is_alive(self) -> bool:
+        return any(listener.is_alive() for listener in self.listeners)
+
+    def stop(self):
+        for listener in self.listeners:
+            listener.stop()
+
+    def join(self, timeout: Optional[float] = None):
+        for listener in self.listeners:
+            listener.join(timeout)
@@ -1,8 +1,17 @@
 import redis
 import json
-from typing import Dict, Any, Optional, List
+import argparse
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List, Set
 from pydantic import BaseModel, Field
 
+from trendvisor.core.connection import same_server
+from trendvisor.core.task_archive import DEFAULT_ARCHIVE_PATH, TaskArchive
+from trendvisor.core.ui import display_error
+
 # Pydantic model for robust type validation and serialization
 class TaskState(BaseModel):
     task_id: str
@@ -13,58 +22,479 @@ class TaskState(BaseModel):
     artifacts: Dict[str, str] = Field(default_factory=dict)
     error_log: Optional[str] = None
 
-class StateStore:
-    """A Redis-based state store using Pydantic for data integrity."""
+# Fields stored verbatim in the task hash; everything else is JSON-encoded.
+STRING_FIELDS = {"task_id", "status", "goal", "error_log"}
+
+# The task lifecycle: status -> statuses it may move to. Statuses without an
+# entry are terminal. A non-terminal status may also be re-entered, so a
+# redelivered event can be processed again.
+TRANSITIONS: Dict[str, Set[str]] = {
+    "CREATED": {"COLLECTING", "COLLECTION_FAILED"},
+    "COLLECTING": {"COLLECTION_COMPLETE", "COLLECTION_FAILED"},
+    "COLLECTION_COMPLETE": {"ANALYZING", "ANALYSIS_FAILED"},
+    "ANALYZING": {"ANALYSIS_COMPLETE", "ANALYSIS_FAILED"},
+    "COMPARING": {"COMPARISON_COMPLETE", "COMPARISON_FAILED"},
+}
+TERMINAL_STATUSES = {"ANALYSIS_COMPLETE", "ANALYSIS_FAILED", "COLLECTION_FAILED",
+                     "COMPARISON_COMPLETE", "COMPARISON_FAILED", "DEPENDENCY_FAILED"}
+_ALLOWED_FROM: Dict[str, str] = {
+    status: "," + ",".join(sorted(
+        {source for source, targets in TRANSITIONS.items() if status in targets}
+        | ({status} if status in TRANSITIONS else set())
+    )) + ","
+    for status in set(TRANSITIONS) | TERMINAL_STATUSES
+}
+
+# Secondary indexes, updated with every status change
+STATUS_INDEX_PREFIX = "tasks:by_status:"  # sorted set per status: task id -> creation time
+LEGACY_STATUS_INDEX_PREFIX = "tasks:status:"  # plain sets, replaced by the sorted sets (see _migrate_status_indexes)
+CREATED_INDEX = "tasks:created"         # sorted set: task id -> creation time
+FINISHED_INDEX = "tasks:finished"       # sorted set: task id -> time it reached a terminal status
+UNARCHIVABLE_INDEX = "tasks:unarchivable"  # sorted set: finished tasks archive_finished() could not read
+
+# Moves task ARGV[1] from status `old` to `new` in the indexes (KEYS[2] created, KEYS[3] finished)
+_REINDEX_LUA = """
+local function reindex(old, new, now, terminal)
+    redis.call('ZADD', KEYS[2], 'NX', now, ARGV[1])
+    if old and old ~= new then redis.call('ZREM', '%(prefix)s' .. old, ARGV[1]) end
+    redis.call('ZADD', '%(prefix)s' .. new, redis.call('ZSCORE', KEYS[2], ARGV[1]), ARGV[1])
+    if terminal == '1' then
+        if old ~= new then redis.call('ZADD', KEYS[3], now, ARGV[1]) end
+    else
+        redis.call('ZREM', KEYS[3], ARGV[1])
+    end
+end
+""" % {"prefix": STATUS_INDEX_PREFIX}
+
+# KEYS: task hash, created index, finished index
+# ARGV: task id, new status, now, terminal ("1" or "0")
+# Runs before the status itself is written, so it sees the previous one.
+_INDEX_SCRIPT = _REINDEX_LUA + """
+local old = redis.pcall('HGET', KEYS[1], 'status')
+if type(old) ~= 'string' then old = nil end
+reindex(old, ARGV[2], ARGV[3], ARGV[4])
+"""
+
+# KEYS: task hash, created index, finished index, artifacts hash, history
+#       list, event stream (streams mode)
+# ARGV: task id, status, now, terminal, allowed previous statuses
+#       (",A,B,"), counts of field sets, field deletes, artifact sets and
+#       history entries, event kind ("", "publish" or "xadd"), channel,
+#       payload, stream max length, then the field pairs, deleted fields,
+#       artifact pairs and history entries.
+# Returns {1, previous status}, {0, current status} if the transition is
+# not allowed, or {-1, ""} if the task does not exist.
+_TRANSITION_SCRIPT = _REINDEX_LUA + """
+local current = redis.call('HGET', KEYS[1], 'status')
+if not current then return {-1, ''} end
+if not string.find(ARGV[5], ',' .. current .. ',', 1, true) then return {0, current} end
+redis.call('HSET', KEYS[1], 'status', ARGV[2])
+reindex(current, ARGV[2], ARGV[3], ARGV[4])
+local i = 14
+for _ = 1, tonumber(ARGV[6]) do redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1]); i = i + 2 end
+for _ = 1, tonumber(ARGV[7]) do redis.call('HDEL', KEYS[1], ARGV[i]); i = i + 1 end
+for _ = 1, tonumber(ARGV[8]) do redis.call('HSET', KEYS[4], ARGV[i], ARGV[i + 1]); i = i + 2 end
+for _ = 1, tonumber(ARGV[9]) do redis.call('RPUSH', KEYS[5], ARGV[i]); i = i + 1 end
+if ARGV[10] == 'publish' then
+    redis.call('PUBLISH', ARGV[11], ARGV[12])
+elseif ARGV[10] == 'xadd' then
+    redis.call('XADD', KEYS[6], 'MAXLEN', '~', ARGV[13], '*', 'data', ARGV[12])
+end
+return {1, current}
+"""
+
+# KEYS: task hash, artifacts hash, history list
+# ARGV: counts of field sets, field deletes, artifact sets and history
+#       entries, then the field pairs, deleted fields, artifact pairs and
+#       history entries.
+# Returns 0 without writing anything if the task does not exist, else 1.
+_UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local i = 5
+for _ = 1, tonumber(ARGV[1]) do redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1]); i = i + 2 end
+for _ = 1, tonumber(ARGV[2]) do redis.call('HDEL', KEYS[1], ARGV[i]); i = i + 1 end
+for _ = 1, tonumber(ARGV[3]) do redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1]); i = i + 2 end
+for _ = 1, tonumber(ARGV[4]) do redis.call('RPUSH', KEYS[3], ARGV[i]); i = i + 1 end
+return 1
+"""
+
+
+class InvalidTransitionError(Exception):
+    """Raised when a task cannot move to the requested status from its current one."""
+
+    def __init__(self, task_id: str, current: Optional[str], status: str):
+        if current is None:
+            message = f"Task {task_id} does not exist; cannot move it to {status}"
+        else:
+            message = f"Task {task_id} cannot move from {current} to {status}"
+        super().__init__(message)
+        self.task_id = task_id
+        self.current = current
+        self.status = status
+
+class BaseStateStore(ABC):
+    """
+    The interface agents read and update task state through. StateStore
+    implements it over Redis; LocalStateStore (see local_backend) in
+    memory, for single-node runs. Both keep finished tasks for
+    `retention_seconds` and then move them to the optional `archive`,
+    which stays readable through the same methods.
+    """
+
+    def __init__(self, archive: Optional[TaskArchive] = None, retention_seconds: float = 3600.0):
+        self.archive = archive
+        self.retention_seconds = retention_seconds
+
+    @abstractmethod
+    def save_state(self, state: TaskState):
+        """Saves the entire state object for a task."""
+
+    @abstractmethod
+    def save_states(self, states: List[TaskState], events: Optional[List[Any]] = None):
+        """Saves many task states; `events` are sent atomically with them."""
+
+    @abstractmethod
+    def transition(self, task_id: str, status: str, updates: Optional[Dict[str, Any]] = None,
+                   event: Optional[Any] = None) -> str:
+        """Moves a task to `status` (validated against TRANSITIONS), applies `updates` and sends `event` atomically."""
+
+    @abstractmethod
+    def get_state(self, task_id: str) -> Optional[TaskState]:
+        """Retrieves and validates the state for a given task."""
+
+    @abstractmethod
+    def update_state(self, task_id: str, updates: Dict[str, Any]):
+        """
+        Updates specific fields of an existing task (unknown tasks are
+        ignored); artifacts are merged and history entries appended. A
+        `status` update is applied through transition(), so it is validated.
+        """
+
+    @abstractmethod
+    def log_history(self, task_id: str, event_summary: str):
+        """Appends an event summary to the task's history."""
+
+    @abstractmethod
+    def get_field(self, task_id: str, field: str) -> Optional[Any]:
+        """Retrieves a single field from a task's state."""
+
+    @abstractmethod
+    def get_history(self, task_id: str) -> list:
+        """Retrieves the full history for a task."""
+
+    @abstractmethod
+    def list_tasks(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[str]:
+        """Task ids, newest first, optionally only those in `status`."""
+
+    @abstractmethod
+    def count_by_status(self) -> Dict[str, int]:
+        """The number of tasks in each status."""
 
-    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 1):
-        """Initializes the connection to Redis."""
+    @abstractmethod
+    def archive_finished(self, older_than: Optional[float] = None, batch_size: int = 500) -> int:
+        """Moves tasks finished more than `older_than` seconds ago to the archive."""
+
+    def _get_archived(self, task_id: str) -> Optional[TaskState]:
+        """The archived state of a task, or None if there is no archive or the task is not in it."""
+        if self.archive is None:
+            return None
+        data = self.archive.get(task_id)
+        return TaskState.model_validate_json(data) if data is not None else None
+
+    def _with_archived(self, live: List[str], live_total: int, status: Optional[str],
+                       limit: int, offset: int) -> List[str]:
+        """Completes a page of live task ids with archived ones."""
+        remaining = limit - len(live)
+        if remaining > 0 and self.archive is not None:
+            live += self.archive.list_tasks(status, limit=remaining, offset=max(0, offset - live_total))
+        return live
+
+    def _with_archived_counts(self, counts: Dict[str, int]) -> Dict[str, int]:
+        if self.archive is not None:
+            for status, count in self.archive.count_by_status().items():
+                counts[status] = counts.get(status, 0) + count
+        return counts
+
+
+class StateStore(BaseStateStore):
+    """
+    A Redis-based state store using Pydantic for data integrity.
+
+    Each task is stored as:
+        task:<id>            hash of scalar fields (params is JSON-encoded)
+        task:<id>:artifacts  hash mapping artifact names to paths
+        task:<id>:history    list of event summaries
+
+    Partial updates are written with HSET/RPUSH by one server-side script
+    that first checks the task exists, so agents never read-modify-write
+    the whole state, concurrent updates to different fields cannot
+    overwrite each other, and updates never create tasks. Pydantic
+    validation only happens when the full state is requested.
+
+    Status changes go through transition() (update_state() hands them to
+    it), which checks them against TRANSITIONS and can publish the matching
+    event in the same server-side script.
+
+    Every status change also maintains the secondary indexes (sorted sets
+    by creation time, per status and overall, and by finish time). list_tasks() and
+    count_by_status() use them instead of scanning keys. With an `archive`,
+    archive_finished() moves tasks finished more than `retention_seconds`
+    ago to disk. Archived tasks are still returned by get_state(),
+    list_tasks() and count_by_status().
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 1,
+                 redis_client: Optional[redis.Redis] = None,
+                 connection_pool: Optional[redis.ConnectionPool] = None,
+                 archive: Optional[TaskArchive] = None, retention_seconds: float = 3600.0):
+        """Initializes the connection to Redis, or reuses `redis_client` (or a shared `connection_pool`) if given."""
+        super().__init__(archive, retention_seconds)
         try:
-            self.redis_client = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+            if redis_client is None and connection_pool is not None:
+                redis_client = redis.Redis(connection_pool=connection_pool)
+            self.redis_client = redis_client or redis.Redis(host=host, port=port, db=db, decode_responses=True)
             self.redis_client.ping()
         except redis.ConnectionError as e:
-            print(f"Error connecting to Redis for StateStore: {e}")
+            display_error(f"Could not connect to Redis: {e}", agent_id="StateStore")
             raise
+        self._transition_script = self.redis_client.register_script(_TRANSITION_SCRIPT)
+        self._update_script = self.redis_client.register_script(_UPDATE_SCRIPT)
+        self._index_script = self.redis_client.register_script(_INDEX_SCRIPT)
+        self._migrate_status_indexes()
+
+    def _migrate_status_indexes(self):
+        """Replaces the status sets of older versions with sorted sets scored by creation time."""
+        for status in sorted(set(TRANSITIONS) | TERMINAL_STATUSES):
+            legacy_key = LEGACY_STATUS_INDEX_PREFIX + status
+            with self.redis_client.pipeline(transaction=True) as pipe:
+                try:
+                    pipe.watch(legacy_key, CREATED_INDEX)
+                    members = list(pipe.smembers(legacy_key))
+                    if not members:
+                        continue
+                    now = time.time()
+                    scores = pipe.zmscore(CREATED_INDEX, members)
+                    created = {task_id: now if score is None else score for task_id, score in zip(members, scores)}
+                    pipe.multi()
+                    pipe.zadd(CREATED_INDEX, created, nx=True)
+                    pipe.zadd(STATUS_INDEX_PREFIX + status, created)
+                    pipe.delete(legacy_key)
+                    pipe.execute()
+                except redis.WatchError:
+                    continue  # Another process is migrating it
 
     def _get_task_key(self, task_id: str) -> str:
         """Generates the Redis key for a given task."""
         return f"task:{task_id}"
 
+    def _get_artifacts_key(self, task_id: str) -> str:
+        return f"{self._get_task_key(task_id)}:artifacts"
+
+    def _get_history_key(self, task_id: str) -> str:
+        return f"{self._get_task_key(task_id)}:history"
+
+    @staticmethod
+    def _encode_field(field: str, value: Any) -> str:
+        if field in STRING_FIELDS:
+            return str(value)
+        return json.dumps(value)
+
+    @staticmethod
+    def _decode_field(field: str, value: str) -> Any:
+        if field in STRING_FIELDS:
+            return value
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
+
+    def _reindex(self, pipe, task_id: str, status: str):
+        """Queues the index update for a task moving to `status` (before the status is written)."""
+        self._index_script(
+            keys=[self._get_task_key(task_id), CREATED_INDEX, FINISHED_INDEX],
+            args=[task_id, status, time.time(), int(status in TERMINAL_STATUSES)],
+            client=pipe,
+        )
+
+    def _write_state(self, pipe, state: TaskState):
+        """Queues the commands that replace a task's stored state on `pipe`."""
+        task_key = self._get_task_key(state.task_id)
+        artifacts_key = self._get_artifacts_key(state.task_id)
+        history_key = self._get_history_key(state.task_id)
+
+        fields = {
+            field: self._encode_field(field, value)
+            for field, value in state.model_dump(exclude={"history", "artifacts"}).items()
+            if value is not None
+        }
+        self._reindex(pipe, state.task_id, state.status)
+        pipe.delete(task_key, artifacts_key, history_key)
+        pipe.hset(task_key, mapping=fields)
+        if state.artifacts:
+            pipe.hset(artifacts_key, mapping=state.artifacts)
+        if state.history:
+            pipe.rpush(history_key, *state.history)
+
     def save_state(self, state: TaskState):
         """Saves the entire state object for a task."""
-        task_key = self._get_task_key(state.task_id)
-        # Pydantic's model_dump_json handles serialization
-        self.redis_client.set(task_key, state.model_dump_json())
+        pipe = self.redis_client.pipeline(transaction=True)
+        self._write_state(pipe, state)
+        pipe.execute()
+
+    def save_states(self, states: List[TaskState], events: Optional[List[Any]] = None):
+        """
+        Saves many task states in one pipelined round trip. Without events,
+        the writes are not isolated from concurrent readers, so this is
+        meant for new tasks that nothing reads yet. Events (from
+        MessageBus.prepare) are sent in the same MULTI/EXEC transaction, so
+        a task is never announced without its state.
+        """
+        local, remote = [], []
+        for event in events or []:
+            (local if self._shares_server(event) else remote).append(event)
+        pipe = self.redis_client.pipeline(transaction=bool(local))
+        for state in states:
+            self._write_state(pipe, state)
+        for event in local:
+            event.bus.send(event, pipe)
+        pipe.execute()
+        for event in remote:
+            event.bus.send(event)
+
+    def _shares_server(self, event) -> bool:
+        """Whether `event` can be written by this store's connection (same server, and same database for streams)."""
+        bus_client = getattr(event.bus, "redis_client", None)
+        return bus_client is not None and same_server(self.redis_client, bus_client, same_db=event.stream is not None)
+
+    def transition(self, task_id: str, status: str, updates: Optional[Dict[str, Any]] = None,
+                   event: Optional[Any] = None) -> str:
+        """
+        Moves a task to `status`, applies `updates` (as update_state does)
+        and publishes `event` (from MessageBus.prepare). All of it happens
+        in one Lua script and one round trip, so either the state changes
+        and the event is published, or nothing happens. An event for a bus
+        on a different server or database is sent after the script instead.
+
+        Returns:
+            The task's previous status.
+
+        Raises:
+            InvalidTransitionError: if TRANSITIONS does not allow the move
+            (e.g. ANALYZING after ANALYSIS_COMPLETE) or the task does not exist.
+        """
+        allowed = _ALLOWED_FROM.get(status)
+        if allowed is None:
+            raise ValueError(f"Unknown task status: {status}")
+        field_sets, field_deletes, artifacts, history = self._split_updates(updates or {})
+
+        atomic_event = event if event is not None and self._shares_server(event) else None
+        kind, stream_key, channel, payload = "", "", "", ""
+        if atomic_event is not None:
+            kind = "xadd" if event.stream is not None else "publish"
+            stream_key, channel, payload = event.stream or "", event.channel, event.payload
+        max_stream_length = event.bus.max_stream_length if event is not None else 0
+
+        keys = [self._get_task_key(task_id), CREATED_INDEX, FINISHED_INDEX,
+                self._get_artifacts_key(task_id), self._get_history_key(task_id), stream_key]
+        args = [task_id, status, time.time(), int(status in TERMINAL_STATUSES), allowed,
+                len(field_sets) // 2, len(field_deletes), len(artifacts) // 2, len(history),
+                kind, channel, payload, max_stream_length, *field_sets, *field_deletes, *artifacts, *history]
+        try:
+            applied, current = self._transition_script(keys=keys, args=args)
+        except redis.ResponseError as e:
+            if "WRONGTYPE" in str(e) and self._migrate_key(self._get_task_key(task_id)):
+                return self.transition(task_id, status, updates, event)
+            raise
+        if applied != 1:
+            raise InvalidTransitionError(task_id, current or None, status)
+        if event is not None and atomic_event is None:
+            event.bus.send(event)
+        return current
 
     def get_state(self, task_id: str) -> Optional[TaskState]:
         """Retrieves and validates the state for a given task."""
-        task_key = self._get_task_key(task_id)
-        state_json = self.redis_client.get(task_key)
-        
-        if not state_json:
-            return None
-        
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hgetall(self._get_task_key(task_id))
+        pipe.hgetall(self._get_artifacts_key(task_id))
+        pipe.lrange(self._get_history_key(task_id), 0, -1)
+        try:
+            fields, artifacts, history = pipe.execute()
+        except redis.ResponseError:
+            # A legacy JSON string key: convert it in place and read again.
+            if not self._migrate_key(self._get_task_key(task_id)):
+                return None
+            return self.get_state(task_id)
+
+        if not fields:
+            return self._get_archived(task_id)
+
         try:
-            # Pydantic's model_validate_json handles deserialization and validation
-            return TaskState.model_validate_json(state_json)
+            data = {field: self._decode_field(field, value) for field, value in fields.items()}
+            data["artifacts"] = artifacts
+            data["history"] = history
+            return TaskState.model_validate(data)
         except Exception as e:
-            print(f"Data validation error for task {task_id}: {e}")
+            display_error(f"Data validation error for task {task_id}: {e}", agent_id="StateStore")
             return None
 
+    def _split_updates(self, updates: Dict[str, Any]):
+        """Flattens partial updates into field sets, field deletes, artifact pairs and history entries."""
+        field_sets, field_deletes, artifacts, history = [], [], [], []
+        for key, value in updates.items():
+            if key == "artifacts":
+                for name, path in (value or {}).items():
+                    artifacts += [name, path]
+            elif key == "history":
+                history += [value] if isinstance(value, str) else list(value)
+            elif key in TaskState.model_fields and key != "status":
+                if value is None:
+                    field_deletes.append(key)
+                else:
+                    field_sets += [key, self._encode_field(key, value)]
+        return field_sets, field_deletes, artifacts, history
+
     def update_state(self, task_id: str, updates: Dict[str, Any]):
-        """Updates specific fields in the state for a given task."""
-        current_state = self.get_state(task_id)
-        if current_state:
-            for key, value in updates.items():
-                if hasattr(current_state, key):
-                    setattr(current_state, key, value)
-            self.save_state(current_state)
+        """
+        Updates specific fields in the state for a given task.
+
+        `artifacts` entries are merged into the existing artifacts and
+        `history` entries are appended; unknown fields are ignored. Updates
+        to a task that does not exist are ignored. A `status` update is
+        applied with transition().
+
+        Raises:
+            InvalidTransitionError: if TRANSITIONS does not allow the status change.
+        """
+        if updates.get("status") is not None:
+            updates = dict(updates)
+            status = updates.pop("status")
+            try:
+                self.transition(task_id, status, updates)
+            except InvalidTransitionError as e:
+                if e.current is not None:
+                    raise
+            return
+        field_sets, field_deletes, artifacts, history = self._split_updates(updates)
+        task_key = self._get_task_key(task_id)
+        try:
+            self._update_script(
+                keys=[task_key, self._get_artifacts_key(task_id), self._get_history_key(task_id)],
+                args=[len(field_sets) // 2, len(field_deletes), len(artifacts) // 2, len(history),
+                      *field_sets, *field_deletes, *artifacts, *history],
+            )
+        except redis.ResponseError as e:
+            if "WRONGTYPE" in str(e) and self._migrate_key(task_key):
+                self.update_state(task_id, updates)
+                return
+            raise
 
     def log_history(self, task_id: str, event_summary: str):
         """Appends an event summary to the task's history."""
-        current_state = self.get_state(task_id)
-        if current_state:
-            current_state.history.append(event_summary)
-            self.save_state(current_state)
+        try:
+            self.redis_client.rpush(self._get_history_key(task_id), event_summary)
+        except redis.ResponseError:
+            if self._migrate_key(self._get_task_key(task_id)):
+                self.log_history(task_id, event_summary)
 
     def get_field(self, task_id: str, field: str) -> Optional[Any]:
         """
@@ -77,17 +507,223 @@ class StateStore:
         Returns:
             The value of the field, or None if not found.
         """
+        if field == "artifacts":
+            return self.redis_client.hgetall(self._get_artifacts_key(task_id)) or None
+        if field == "history":
+            return self.get_history(task_id) or None
+
         task_key = self._get_task_key(task_id)
         value = self.redis_client.hget(task_key, field)
         if value is None:
+            if self.archive is not None and not self.redis_client.exists(task_key):
+                state = self._get_archived(task_id)
+                return getattr(state, field, None) if state is not None else None
             return None
-        
-        try:
-            return json.loads(value)
-        except (json.JSONDecodeError, TypeError):
-            return value
+        return self._decode_field(field, value)
 
     def get_history(self, task_id: str) -> list:
-        """Retrieves the full history for a task from the Redis list."""
-        history_key = f"{self._get_task_key(task_id)}:history"
-        return self.redis_client.lrange(history_key, 0, -1) 
\ No newline at end of file
+        """Retrieves the full history for a task from the Redis list (or the archive)."""
+        history_key = self._get_history_key(task_id)
+        history = self.redis_client.lrange(history_key, 0, -1)
+        if not history and self.archive is not None:
+            state = self._get_archived(task_id)
+            return state.history if state is not None else history
+        return history
+
+    def list_tasks(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[str]:
+        """
+        Lists task ids from the indexes, without scanning keys.
+
+        Args:
+            status: Only tasks currently in this status (all tasks if None).
+            limit: The maximum number of ids to return.
+            offset: The number of ids to skip, for paging.
+
+        Returns:
+            Task ids, newest first: tasks in Redis, then archived tasks.
+        """
+        if status is None:
+            live_total = self.redis_client.zcard(CREATED_INDEX)
+            live = self.redis_client.zrevrange(CREATED_INDEX, offset, offset + limit - 1) if offset < live_total else []
+        else:
+            index = STATUS_INDEX_PREFIX + status
+            live_total = self.redis_client.zcard(index)
+            live = self.redis_client.zrevrange(index, offset, offset + limit - 1) if offset < live_total else []
+        return self._with_archived(live, live_total, status, limit, offset)
+
+    def count_by_status(self) -> Dict[str, int]:
+        """The number of tasks in each status, in Redis and in the archive."""
+        statuses = sorted(set(TRANSITIONS) | TERMINAL_STATUSES)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for status in statuses:
+            pipe.zcard(STATUS_INDEX_PREFIX + status)
+        return self._with_archived_counts({status: count for status, count in zip(statuses, pipe.execute()) if count})
+
+    def archive_finished(self, older_than: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        Moves tasks that finished more than `older_than` seconds ago (default:
+        the retention period) from Redis to the archive. Without an archive,
+        they are only deleted. Legacy keys are migrated first. Tasks that
+        still cannot be read are left in place and moved from the finished
+        index to UNARCHIVABLE_INDEX, so nothing is deleted unread.
+
+        Returns:
+            The number of tasks removed from Redis.
+        """
+        cutoff = time.time() - (self.retention_seconds if older_than is None else older_than)
+        moved = 0
+        while True:
+            task_ids = self.redis_client.zrangebyscore(FINISHED_INDEX, "-inf", cutoff, start=0, num=batch_size)
+            if not task_ids:
+                return moved
+            pipe = self.redis_client.pipeline(transaction=False)
+            for task_id in task_ids:
+                pipe.hgetall(self._get_task_key(task_id))
+                pipe.hgetall(self._get_artifacts_key(task_id))
+                pipe.lrange(self._get_history_key(task_id), 0, -1)
+                pipe.zscore(CREATED_INDEX, task_id)
+                pipe.zscore(FINISHED_INDEX, task_id)
+            replies = pipe.execute(raise_on_error=False)
+
+            rows, statuses, gone, skipped, migrated = [], {}, [], {}, []
+            for i, task_id in enumerate(task_ids):
+                fields, artifacts, history, created_at, finished_at = replies[5 * i:5 * i + 5]
+                if isinstance(fields, dict) and not fields:
+                    gone.append(task_id)  # Already deleted; only its index entries are left
+                    continue
+                if not isinstance(fields, dict) and self._migrate_key(self._get_task_key(task_id)):
+                    migrated.append(task_id)  # A legacy JSON string key, now a hash: archived on a later pass
+                    continue
+                try:
+                    if not isinstance(fields, dict):
+                        raise fields  # A key that could not be migrated
+                    data = {field: self._decode_field(field, value) for field, value in fields.items()}
+                    state = TaskState.model_validate(dict(data, artifacts=artifacts, history=history))
+                except Exception as e:
+                    display_error(f"Not archiving task {task_id}: {e}", agent_id="StateStore")
+                    skipped[task_id] = finished_at or cutoff
+                    continue
+                statuses[task_id] = state.status
+                rows.append((state.model_dump_json(), task_id, state.status, state.goal, created_at, finished_at))
+            if self.archive is not None and rows:
+                self.archive.put_many(rows)
+
+            pipe = self.redis_client.pipeline(transaction=True)
+            for task_id, status in statuses.items():
+                pipe.delete(self._get_task_key(task_id), self._get_artifacts_key(task_id),
+                            self._get_history_key(task_id))
+                pipe.zrem(STATUS_INDEX_PREFIX + status, task_id)
+            removed = list(statuses) + gone
+            if removed:
+                pipe.zrem(CREATED_INDEX, *removed)
+            if skipped:
+                # Kept with their data, but out of the finished index so later batches move on
+                pipe.zadd(UNARCHIVABLE_INDEX, skipped)
+            done = [task_id for task_id in task_ids if task_id not in migrated]
+            if done:
+                pipe.zrem(FINISHED_INDEX, *done)
+            pipe.execute()
+            moved += len(statuses)
+
+    def _migrate_key(self, task_key: str) -> bool:
+        """
+        Converts a legacy `task:<id>` JSON string into the hash layout.
+
+        Returns True if the key now holds a hash (migrated here or by a
+        concurrent caller), False if it could not be migrated.
+        """
+        with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(task_key)
+                key_type = pipe.type(task_key)
+                if key_type == "hash":
+                    return True
+                if key_type != "string":
+                    return False
+                state = TaskState.model_validate_json(pipe.get(task_key))
+                pipe.multi()
+                self._write_state(pipe, state)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return self.redis_client.type(task_key) == "hash"
+            except Exception as e:
+                display_error(f"Could not migrate legacy state key {task_key}: {e}", agent_id="StateStore")
+                return False
+
+    def migrate_legacy_keys(self, batch_size: int = 500) -> int:
+        """
+        Converts every legacy `task:*` JSON string key into the hash layout.
+
+        Returns:
+            The number of keys migrated.
+        """
+        migrated = 0
+        for task_key in self.redis_client.scan_iter(match="task:*", count=batch_size, _type="string"):
+            if self._migrate_key(task_key):
+                migrated += 1
+        return migrated
+
+    def rebuild_indexes(self, batch_size: int = 500) -> int:
+        """
+        Indexes tasks stored before the indexes existed (finished ones as
+        finished now). Run after migrate_legacy_keys().
+
+        Returns:
+            The number of tasks indexed.
+        """
+        indexed = 0
+        for task_key in self.redis_client.scan_iter(match="task:*", count=batch_size, _type="hash"):
+            task_id = task_key[len("task:"):]
+            if task_id.endswith((":artifacts", ":history")):
+                continue
+            status = self.redis_client.hget(task_key, "status")
+            if status is not None:
+                pipe = self.redis_client.pipeline(transaction=False)
+                self._reindex(pipe, task_id, status)
+                pipe.execute()
+                indexed += 1
+        return indexed
+
+
+class ArchiveWorker(threading.Thread):
+    """Calls `state_store.archive_finished()` every `interval` seconds."""
+
+    def __init__(self, state_store: BaseStateStore, interval: float = 60.0):
+        super().__init__(daemon=True)
+        self.state_store = state_store
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.state_store.archive_finished()
+            except (redis.RedisError, sqlite3.Error) as e:
+                display_error(f"Task archival failed: {e}", agent_id="StateStore")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="StateStore maintenance utilities.")
+    parser.add_argument("--host", default="localhost", help="Redis host.")
+    parser.add_argument("--port", type=int, default=6379, help="Redis port.")
+    parser.add_argument("--db", type=int, default=1, help="Redis database of the state store.")
+    parser.add_argument("--migrate", action="store_true", help="Convert legacy JSON string task keys to hashes.")
+    parser.add_argument("--reindex", action="store_true", help="Index tasks stored before the status indexes existed.")
+    parser.add_argument("--archive", metavar="RETENTION_SECONDS", type=float, default=None,
+                        help="Archive tasks finished more than this many seconds ago.")
+    parser.add_argument("--archive-path", default=None, help="SQLite task archive (default: data/task_archive.sqlite3).")
+    args = parser.parse_args()
+
+    archive = TaskArchive(args.archive_path or DEFAULT_ARCHIVE_PATH) if args.archive is not None else None
+    store = StateStore(host=args.host, port=args.port, db=args.db, archive=archive)
+    if args.migrate:
+        count = store.migrate_legacy_keys()
+        print(f"Migrated {count} legacy task keys.")
+    if args.reindex:
+        print(f"Indexed {store.rebuild_indexes()} tasks.")
+    if args.archive is not None:
+        print(f"Archived {store.archive_finished(older_than=args.archive)} finished tasks.")
@@ -0,0 +1,77 @@
+"""
+Trendvisor Task Archive
+On-disk (SQLite) store of finished tasks. StateStore.archive_finished()
+moves tasks here once they have been finished longer than the retention
+period, so Redis only holds live and recently finished tasks. Archived
+tasks stay readable through the StateStore API (get_state, list_tasks,
+count_by_status).
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'task_archive.sqlite3')
+
+# (task state JSON, task id, status, goal, created_at, finished_at)
+ArchiveRow = Tuple[str, str, str, str, Optional[float], Optional[float]]
+
+
+class TaskArchive:
+    """SQLite table of archived task states, indexed by status and creation time."""
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                goal TEXT NOT NULL,
+                created_at REAL,
+                finished_at REAL,
+                state TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created_at)")
+        self._conn.commit()
+
+    def put_many(self, rows: Iterable[ArchiveRow]):
+        """Stores (or replaces) archived tasks in one transaction."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tasks (state, task_id, status, goal, created_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                list(rows),
+            )
+            self._conn.commit()
+
+    def get(self, task_id: str) -> Optional[str]:
+        """The archived state of a task as JSON, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def list_tasks(self, status: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[str]:
+        """Archived task ids, newest first, optionally with a given status."""
+        query = "SELECT task_id FROM tasks"
+        params: list = []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            return [row[0] for row in self._conn.execute(query, params + [limit, offset])]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,261 @@
+"""
+Trendvisor Tracing
+Trace context carried in event messages, handler spans and per-agent
+latency metrics.
+
+Every published message gets a `trace` field, "<span_id>/<parent_id>/<enqueued_at>":
+    span_id      id of this message hop
+    parent_id    span of the handler that published it (empty if none)
+    enqueued_at  publish time (epoch seconds)
+The message's `task_id` is the trace id, so all spans of one task share it.
+The bus decodes each event once (see envelope), and the handler wrapper
+reads the trace from the decoded message.
+
+Handlers subscribed through `Tracer.wrap` (BaseAgent.subscribe) record a
+span per message with its dequeue time, and feed Prometheus metrics:
+    trendvisor_queue_wait_seconds{agent,channel}     publish -> handler start
+    trendvisor_handler_seconds{agent,channel}        handler run time
+    trendvisor_handler_failures_total{agent,channel} raised or marked failed
+    trendvisor_messages_published_total{channel}
+    trendvisor_stage_seconds{agent,stage}            named stages within handlers
+
+Metrics are served over HTTP (`serve_metrics`) or written periodically to a
+Prometheus text file (`MetricsFileWriter`). Spans can be appended to a JSON
+lines file (`set_span_log`) to reconstruct where a slow task spent its time.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from prometheus_client import REGISTRY, Counter, Histogram, start_http_server, write_to_textfile
+
+TRACE_FIELD = "trace"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+QUEUE_WAIT = Histogram("trendvisor_queue_wait_seconds", "Time from publish to handler start.",
+                       ["agent", "channel"], buckets=LATENCY_BUCKETS)
+HANDLER_SECONDS = Histogram("trendvisor_handler_seconds", "Handler run time per message.",
+                            ["agent", "channel"], buckets=LATENCY_BUCKETS)
+HANDLER_FAILURES = Counter("trendvisor_handler_failures", "Messages whose handler raised or failed the task.",
+                           ["agent", "channel"])
+MESSAGES_PUBLISHED = Counter("trendvisor_messages_published", "Messages published per channel.", ["channel"])
+STAGE_SECONDS = Histogram("trendvisor_stage_seconds", "Duration of named stages within agent handlers.",
+                          ["agent", "stage"], buckets=LATENCY_BUCKETS)
+
+_enabled = True
+_span_log: Optional["SpanLog"] = None
+_current_span: contextvars.ContextVar = contextvars.ContextVar("trendvisor_span", default=None)
+
+
+def set_enabled(enabled: bool):
+    """Turns trace injection and handler spans on or off (for handlers subscribed afterwards)."""
+    global _enabled
+    _enabled = enabled
+
+
+def set_span_log(span_log: Optional["SpanLog"]):
+    """Sets the span log every Tracer writes finished spans to (None disables it)."""
+    global _span_log
+    _span_log = span_log
+
+
+# Span ids: a random per-process prefix and a counter (cheaper than random ids per span)
+_ID_PREFIX = os.urandom(4).hex()
+_id_counter = itertools.count(1)
+
+
+def _new_id() -> str:
+    return f"{_ID_PREFIX}{next(_id_counter):x}"
+
+
+class Span:
+    """One handler invocation (or a named stage within one)."""
+    __slots__ = ("trace_id", "span_id", "parent_id", "agent", "name", "enqueued_at", "started_at", "finished_at", "error")
+
+    def __init__(self, trace_id: Optional[str], parent_id: Optional[str], agent: str, name: str,
+                 enqueued_at: Optional[float] = None):
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.agent = agent
+        self.name = name
+        self.enqueued_at = enqueued_at
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def current_span() -> Optional[Span]:
+    """The span of the handler running in this thread, if any."""
+    return _current_span.get()
+
+
+def mark_failed(error: Any):
+    """
+    Marks the current handler span as failed. For handlers that catch their
+    errors (and publish a failure event) instead of raising.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.error = str(error)
+
+
+def inject(message: Dict[str, Any]) -> Dict[str, Any]:
+    """The message with the trace context of the hop being published added (the message is not modified)."""
+    if not _enabled or not message or TRACE_FIELD in message:
+        return message
+    parent = _current_span.get()
+    return dict(message, **{TRACE_FIELD: f"{_new_id()}/{parent.span_id if parent else ''}/{time.time():.6f}"})
+
+
+def extract(data: Any) -> Optional[Tuple[str, Optional[str], float]]:
+    """The (span_id, parent_id, enqueued_at) trace context of a received message, if present."""
+    trace = data.get(TRACE_FIELD) if isinstance(data, dict) else None
+    if not isinstance(trace, str):
+        return None
+    parts = trace.split("/")
+    if len(parts) != 3:
+        return None
+    try:
+        return parts[0], parts[1] or None, float(parts[2])
+    except ValueError:
+        return None
+
+
+class SpanLog:
+    """Appends finished spans as JSON lines to a file shared by all agents of a process."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', buffering=1, encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def write(self, span: Span):
+        line = json.dumps(span.to_dict())
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Tracer:
+    """Records spans and latency metrics for one agent's handlers."""
+
+    def __init__(self, agent: str):
+        self.agent = agent
+
+    def wrap(self, channel: str, callback: Callable[[Dict[str, Any]], None]) -> Callable[[Dict[str, Any]], None]:
+        """
+        Wraps a message handler so every call records a span, the queue wait
+        and handler time, and failures. The wrapper keeps the handler's
+        qualified name, which streams mode uses as the consumer group.
+        """
+        if not _enabled:
+            return callback
+        queue_wait = QUEUE_WAIT.labels(self.agent, channel)
+        handler_seconds = HANDLER_SECONDS.labels(self.agent, channel)
+        failures = HANDLER_FAILURES.labels(self.agent, channel)
+
+        @functools.wraps(callback)
+        def traced(message):
+            data = message.get('data')
+            trace = extract(data)
+            if trace is None:
+                span = Span(None, None, self.agent, channel)
+            else:
+                span = Span(data.get('task_id'), trace[0], self.agent, channel, trace[2])
+            token = _current_span.set(span)
+            start = time.perf_counter()
+            try:
+                callback(message)
+            except BaseException as e:
+                span.error = repr(e)
+                raise
+            finally:
+                handler_seconds.observe(time.perf_counter() - start)
+                _current_span.reset(token)
+                span.finished_at = time.time()
+                if span.enqueued_at is not None:
+                    queue_wait.observe(max(0.0, span.started_at - span.enqueued_at))
+                if span.error is not None:
+                    failures.inc()
+                if _span_log is not None:
+                    _span_log.write(span)
+        return traced
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a named stage, as a child span of the running handler."""
+        start = time.perf_counter()
+        parent = _current_span.get()
+        span = Span(parent.trace_id if parent else None, parent.span_id if parent else None, self.agent, name)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            self.record_stage(name, time.perf_counter() - start, span)
+
+    def record_stage(self, name: str, seconds: float, span: Optional[Span] = None):
+        """Records the duration of a stage timed elsewhere (e.g. inside an analysis worker)."""
+        STAGE_SECONDS.labels(self.agent, name).observe(seconds)
+        if _span_log is not None:
+            if span is None:
+                parent = _current_span.get()
+                span = Span(parent.trace_id if parent else None, parent.span_id if parent else None, self.agent, name)
+                span.started_at -= seconds
+            span.finished_at = span.started_at + seconds
+            _span_log.write(span)
+
+
+_published: Dict[str, Any] = {}
+
+
+def count_published(channel: str):
+    counter = _published.get(channel)
+    if counter is None:
+        counter = _published[channel] = MESSAGES_PUBLISHED.labels(channel)
+    counter.inc()
+
+
+def serve_metrics(port: int, addr: str = "127.0.0.1"):
+    """Serves all metrics in the Prometheus text format at http://<addr>:<port>/metrics."""
+    start_http_server(port, addr=addr)
+
+
+class MetricsFileWriter(threading.Thread):
+    """Rewrites a Prometheus text file with the current metrics every `interval` seconds (atomically)."""
+
+    def __init__(self, path: str, interval: float = 10.0):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def write(self):
+        write_to_textfile(self.path, REGISTRY)
+
+    def stop(self):
+        """Stops the writer after one final write."""
+        self._stop_event.set()
+        self.write()
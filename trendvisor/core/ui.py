@@ -3,14 +3,183 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.table import Table
 from rich.live import Live
+from rich.rule import Rule
 from rich.spinner import Spinner
+import threading
 import time
-from typing import Dict, Any
+from collections import deque
+from typing import Callable, Deque, Dict, Any, List, Optional, Tuple
 
 # --- Global Console Object ---
 # All rich output should be channeled through this console object.
 console = Console()
 
+# --- Verbosity ---
+# A message is shown when its level is at most the configured verbosity.
+QUIET, NORMAL, VERBOSE = 0, 1, 2     # errors and reports / + status / + every event
+VERBOSITY = {"quiet": QUIET, "normal": NORMAL, "verbose": VERBOSE}
+_verbosity = VERBOSE
+
+
+def set_verbosity(level: int):
+    global _verbosity
+    _verbosity = level
+
+
+# --- Background Rendering ---
+
+class ConsoleRenderer:
+    """
+    Owns the terminal: agents and bus threads only append to a bounded
+    in-memory queue, and one background thread writes it out
+    `refresh_per_second` times a second, in a single write per refresh,
+    so output from different threads never interleaves and handlers never
+    block on stdout.
+
+    When the queue is full, new messages are dropped (errors evict the
+    oldest message instead), and the count is reported on the next
+    refresh. Consecutive identical lines are coalesced into one with a
+    repeat count. With `dashboard`, a rich Live table of the registered
+    agents is kept below the log.
+    """
+
+    def __init__(self, refresh_per_second: float = 10.0, max_queue: int = 10000, dashboard: bool = False):
+        self.interval = 1.0 / refresh_per_second
+        self.max_queue = max_queue
+        self.dashboard = dashboard
+        self.dropped = 0
+        self.rendered = 0
+        self._queue: Deque[Tuple[int, Any]] = deque()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._reported_drops = 0
+        self._live: Optional[Live] = None
+        self._thread = threading.Thread(target=self._run, name="ConsoleRenderer", daemon=True)
+
+    def put(self, level: int, item: Any):
+        """Queues a line (or rich renderable) without blocking."""
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                if level > QUIET:
+                    return
+                self._queue.popleft()
+            self._queue.append((level, item))
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        if self.dashboard:
+            self._live = Live(agent_dashboard(self), console=console, auto_refresh=False,
+                              redirect_stdout=True, redirect_stderr=False)
+            self._live.start()
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """Writes everything queued so far (called by the renderer thread, and once on stop)."""
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+            dropped = self.dropped
+        lines: List[str] = []
+        for _, item in batch:
+            if isinstance(item, str):
+                lines.append(item)
+                continue
+            self._write(_coalesce(lines))
+            lines = []
+            console.print(item)
+        if dropped > self._reported_drops:
+            lines.append(f"[{time.strftime('%H:%M:%S')}][UI] {dropped - self._reported_drops} "
+                         f"messages dropped (output queue full)")
+            self._reported_drops = dropped
+        self._write(_coalesce(lines))
+        self.rendered += len(batch)
+        if self._live is not None:
+            self._live.update(agent_dashboard(self), refresh=True)
+
+    @staticmethod
+    def _write(lines: List[str]):
+        if lines:
+            print("\n".join(lines), flush=True)
+
+    def stop(self):
+        """Stops the renderer after writing what is still queued."""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self.flush()
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+
+
+def _coalesce(lines: List[str]) -> List[str]:
+    """Merges runs of lines that are identical apart from their timestamp."""
+    merged: List[str] = []
+    previous, repeats = None, 0
+    for line in lines:
+        body = line[10:] if line.startswith("[") and line[9:10] == "]" else line
+        if body == previous:
+            repeats += 1
+            continue
+        if repeats:
+            merged[-1] += f" (x{repeats + 1})"
+        merged.append(line)
+        previous, repeats = body, 0
+    if repeats:
+        merged[-1] += f" (x{repeats + 1})"
+    return merged
+
+
+_renderer: Optional[ConsoleRenderer] = None
+_agents: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def start_renderer(refresh_per_second: float = 10.0, max_queue: int = 10000, dashboard: bool = False,
+                   verbosity: int = VERBOSE) -> ConsoleRenderer:
+    """Routes all display_* output through a background ConsoleRenderer (until stop_renderer)."""
+    global _renderer
+    set_verbosity(verbosity)
+    renderer = ConsoleRenderer(refresh_per_second, max_queue, dashboard)
+    renderer.start()
+    _renderer = renderer
+    return renderer
+
+
+def stop_renderer():
+    """Writes what is still queued and returns to printing directly."""
+    global _renderer
+    renderer, _renderer = _renderer, None
+    if renderer is not None:
+        renderer.stop()
+
+
+def _emit(level: int, item: Any):
+    if level > _verbosity:
+        return
+    renderer = _renderer
+    if renderer is not None:
+        renderer.put(level, item)
+    elif isinstance(item, str):
+        print(item)
+    else:
+        console.print(item)
+
+
+def register_agent(name: str, stats: Callable[[], Dict[str, Any]]):
+    """
+    Adds an agent to the dashboard. `stats` is polled on every refresh and
+    returns its "state", "handled" and "queue_depth".
+    """
+    _agents[name] = stats
+
+
 # --- Core UI Functions ---
 
 def display_header(title="Trendvisor MVP", subtitle="Autonomous Agent-Based E-commerce Analysis Platform"):
@@ -20,42 +189,54 @@ def display_header(title="Trendvisor MVP", subtitle="Autonomous Agent-Based E-co
     
     panel_content = Text("\n").join([header_text, subtitle_text])
     
-    console.print(Panel(
+    _emit(QUIET, Panel(
         panel_content,
         expand=False,
         border_style="bold green",
         padding=(1, 10)
     ))
-    console.rule("[bold green]System Initializing...[/bold green]")
+    _emit(QUIET, Rule("[bold green]System Initializing...[/bold green]"))
 
 
 def display_status(message: str, category: str):
     """Displays a status message with a category label."""
+    if _verbosity < NORMAL:
+        return
     timestamp = time.strftime('%H:%M:%S')
-    print(f"[{timestamp}][{category.upper()}] {message}")
+    _emit(NORMAL, f"[{timestamp}][{category.upper()}] {message}")
 
 
 def display_event(channel: str, event_data: Dict[str, Any], category: str, is_incoming: bool = False):
     """Displays an event with its data."""
+    if _verbosity < VERBOSE:
+        return
     direction = "<- RECV" if is_incoming else "-> SENT"
     timestamp = time.strftime('%H:%M:%S')
     task_id = event_data.get('task_id', 'N/A')
-    print(f"[{timestamp}][{category.upper()}] {direction} on channel [{channel}] | Task: {task_id}")
+    _emit(VERBOSE, f"[{timestamp}][{category.upper()}] {direction} on channel [{channel}] | Task: {task_id}")
 
 
 def display_final_report(task_id: str, report_path: str):
     """Displays the path to the final report."""
     timestamp = time.strftime('%H:%M:%S')
-    print("\n" + "="*80)
-    print(f"[{timestamp}][SYSTEM] ✅ TASK COMPLETE: {task_id}")
-    print(f"[{timestamp}][SYSTEM] Final report available at: {report_path}")
-    print("="*80 + "\n")
+    _emit(QUIET, "\n".join([
+        "\n" + "="*80,
+        f"[{timestamp}][SYSTEM] ✅ TASK COMPLETE: {task_id}",
+        f"[{timestamp}][SYSTEM] Final report available at: {report_path}",
+        "="*80 + "\n",
+    ]))
 
 
 def display_error(message: str, agent_id: str = "System"):
     """Displays an error message."""
     timestamp = time.strftime('%H:%M:%S')
-    print(f"[{timestamp}][{agent_id.upper()}] ❌ ERROR: {message}")
+    _emit(QUIET, f"[{timestamp}][{agent_id.upper()}] ❌ ERROR: {message}")
+
+
+def display_warning(message: str, agent_id: str = "System"):
+    """Displays a warning: something degraded, but the run continues."""
+    timestamp = time.strftime('%H:%M:%S')
+    _emit(QUIET, f"[{timestamp}][{agent_id.upper()}] ⚠️ WARNING: {message}")
 
 
 def display_agent_status(agent_statuses: dict):
@@ -72,6 +253,28 @@ def display_agent_status(agent_statuses: dict):
 
     return table
 
+
+def agent_dashboard(renderer: Optional[ConsoleRenderer] = None) -> Table:
+    """A table of every registered agent's state, handled events and queue depth."""
+    table = Table(show_header=True, header_style="bold magenta", title="Trendvisor Agents")
+    table.add_column("Agent ID", style="dim", width=25)
+    table.add_column("State")
+    table.add_column("Handled", justify="right")
+    table.add_column("In flight", justify="right")
+    table.add_column("Queue depth", justify="right")
+    for agent_id, stats in list(_agents.items()):
+        try:
+            values = stats()
+        except Exception as e:
+            values = {"state": f"[red]stats unavailable: {e}[/red]"}
+        table.add_row(f"[magenta]{agent_id}[/magenta]", str(values.get("state", "")),
+                      str(values.get("handled", "")), str(values.get("in_flight", "")),
+                      str(values.get("queue_depth", "")))
+    if renderer is not None:
+        table.caption = (f"UI queue {renderer.depth()}/{renderer.max_queue} | "
+                         f"rendered {renderer.rendered} | dropped {renderer.dropped}")
+    return table
+
 if __name__ == '__main__':
     # --- Example Usage for testing the UI components ---
     
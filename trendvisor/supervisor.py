@@ -0,0 +1,303 @@
+"""
+Trendvisor Supervisor
+Runs the collection and analysis agents as pools of worker processes
+(run_trendvisor.py --supervise) instead of threads of one interpreter.
+Workers of one agent type join the same Redis Streams consumer group, so
+they share its events, and a message a dead worker never acknowledged is
+reclaimed by another one. A collection worker acknowledges TASK_CREATED
+only after publishing the collection's outcome (see MessageBus.defer_ack),
+so collections that were queued or running when it died are redone.
+
+The supervisor restarts workers that exit unexpectedly, with exponential
+backoff; resizes each pool between its minimum and maximum from the work
+outstanding (stream lag plus the workers' own queues) and the observed
+handler latency; and on SIGTERM drains the pools in pipeline order,
+collection before analysis, so every worker finishes what it accepted.
+"""
+import multiprocessing
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+
+from trendvisor.agents.analysis_agent import AnalysisAgent
+from trendvisor.agents.collection_agent import CollectionAgent
+from trendvisor.core.connection import create_pool
+from trendvisor.core.envelope import FileClaimStore
+from trendvisor.core.message_bus import STREAMS_MODE, MessageBus
+from trendvisor.core.state_store import StateStore
+from trendvisor.tools.trends import TrendStore
+from trendvisor.core.ui import VERBOSITY, display_error, display_status, register_agent, start_renderer, stop_renderer
+
+# The consumer group each agent type reads its work from (groups are named after handlers)
+AGENT_TYPES = {
+    "collection": ("events:TASK_CREATED", "CollectionAgent._handle_collection_task"),
+    "analysis": ("events:COLLECTION_COMPLETE", "AnalysisAgent._handle_analysis_task"),
+}
+DRAIN_ORDER = ("collection", "analysis")
+
+# Layout of the stats array a worker shares with the supervisor
+HANDLED, BUSY_SECONDS, IN_FLIGHT, QUEUE_DEPTH, READY = range(5)
+STATS_INTERVAL = 0.5
+
+
+@dataclass
+class PoolConfig:
+    """Size limits and scaling thresholds of one agent type's worker pool."""
+    agent_type: str
+    min_workers: int = 1
+    max_workers: int = 1
+    scale_up_backlog: float = 8.0       # Outstanding messages per worker that add a worker
+    target_drain_seconds: float = 30.0  # Also add one when the backlog would take longer to clear
+    idle_checks: int = 10               # Consecutive idle checks before a worker is retired
+    cooldown: float = 10.0              # Seconds between two scaling decisions of a pool
+
+
+def parse_pool_size(text: str) -> Tuple[int, int]:
+    """Parses "N" (a fixed size) or "MIN:MAX"."""
+    low, _, high = text.partition(":")
+    min_workers, max_workers = int(low), int(high or low)
+    if not 1 <= min_workers <= max_workers:
+        raise ValueError(f"invalid pool size {text!r}: need 1 <= MIN <= MAX")
+    return min_workers, max_workers
+
+
+def create_agent(agent_type: str, bus: MessageBus, store: StateStore, config: Dict[str, Any]):
+    """Builds an agent from run_trendvisor's options (a dict of its parsed arguments)."""
+    if agent_type == "collection":
+        return CollectionAgent(bus, store, max_concurrency=config["collection_concurrency"])
+    return AnalysisAgent(
+        bus, store,
+        pool_size=config["analysis_workers"],
+        job_timeout=config["analysis_timeout"],
+        max_jobs_per_worker=config["analysis_max_jobs"],
+        analysis_options={"chunk_size": config["analysis_chunk_size"]} if config["analysis_chunk_size"] else None,
+        report_cache_max_bytes=config["report_cache_mb"] * 2**20,
+        trend_store=TrendStore(config["trends_path"]) if config["trends_path"] else None,
+    )
+
+
+def _publish_stats(agent, stats):
+    with agent._stats_lock:
+        handled, busy, in_flight = agent.handled, agent.busy_seconds, agent.in_flight
+    stats[HANDLED], stats[BUSY_SECONDS], stats[IN_FLIGHT] = handled, busy, in_flight
+    stats[QUEUE_DEPTH] = agent.queue_depth()
+
+
+def worker_main(agent_type: str, config: Dict[str, Any], stats):
+    """
+    Entry point of a worker process: runs one agent until SIGTERM, then
+    drains it. SIGINT is ignored; the supervisor decides when workers stop.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    drain_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: drain_requested.set())
+    start_renderer(config["ui_refresh"], config["ui_queue_size"], verbosity=VERBOSITY[config["verbosity"]])
+    try:
+        redis_pool = create_pool(config["redis_url"], max_connections=config["redis_max_connections"])
+        bus = MessageBus(
+            mode=STREAMS_MODE, connection_pool=redis_pool, codec=config["event_codec"],
+            max_inline_bytes=config["max_inline_kb"] * 1024,
+            claim_store=FileClaimStore(config["claim_dir"]) if config["claim_dir"] else None,
+        )
+        agent = create_agent(agent_type, bus, StateStore(connection_pool=redis_pool), config)
+        threading.Thread(target=agent.run, daemon=True).start()
+        if not agent.wait_until_ready(timeout=config["ready_timeout"]):
+            raise RuntimeError(f"{agent.agent_name} is not subscribed after {config['ready_timeout']}s")
+        stats[READY] = 1
+        while not drain_requested.wait(STATS_INTERVAL):
+            _publish_stats(agent, stats)
+        if not agent.drain(config["drain_timeout"]):
+            display_error(f"Work still in progress after {config['drain_timeout']}s; stopping anyway.",
+                          agent.agent_name)
+        _publish_stats(agent, stats)
+        bus.close()
+    finally:
+        stop_renderer()
+
+
+class Worker:
+    """A worker process and the stats it shares."""
+
+    def __init__(self, process, stats):
+        self.process = process
+        self.stats = stats
+        self.started_at = time.monotonic()
+        self.retiring_since: Optional[float] = None
+
+
+class Supervisor:
+    """Starts, restarts, scales and drains the worker pools."""
+
+    def __init__(self, config: Dict[str, Any], pools: List[PoolConfig], bus: MessageBus,
+                 check_interval: float = 1.0, backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 stable_after: float = 60.0, drain_timeout: float = 30.0):
+        self.config = config
+        self.pools = {pool.agent_type: pool for pool in pools}
+        self.bus = bus
+        self.check_interval = check_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.drain_timeout = drain_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self.workers: Dict[str, List[Worker]] = {name: [] for name in self.pools}
+        self.target = {name: pool.min_workers for name, pool in self.pools.items()}
+        self.restarts = {name: 0 for name in self.pools}
+        self.latency = {name: 0.0 for name in self.pools}
+        self._failures = {name: 0 for name in self.pools}
+        self._restart_at = {name: 0.0 for name in self.pools}
+        self._last_scaled = {name: time.monotonic() for name in self.pools}
+        self._idle_checks = {name: 0 for name in self.pools}
+        self._last_totals = {name: (0.0, 0.0) for name in self.pools}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+
+    def start(self):
+        with self._lock:
+            for agent_type in self.pools:
+                for _ in range(self.target[agent_type]):
+                    self._spawn(agent_type)
+                register_agent(f"{agent_type} workers", lambda agent_type=agent_type: self.pool_stats(agent_type))
+        self._thread.start()
+
+    def wait_until_ready(self, timeout: Optional[float] = 30.0) -> bool:
+        """Blocks until every pool has a worker subscribed to its events."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            with self._lock:
+                if all(any(w.stats[READY] for w in workers) for workers in self.workers.values()):
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def pool_stats(self, agent_type: str) -> Dict[str, Any]:
+        """Totals of a pool's workers, for the dashboard."""
+        with self._lock:
+            workers = [w for w in self.workers[agent_type] if w.retiring_since is None]
+            return {
+                "state": f"{len(workers)}/{self.target[agent_type]} workers, {self.restarts[agent_type]} restarts",
+                "handled": int(sum(w.stats[HANDLED] for w in workers)),
+                "in_flight": int(sum(w.stats[IN_FLIGHT] for w in workers)),
+                "queue_depth": int(sum(w.stats[QUEUE_DEPTH] for w in workers)),
+            }
+
+    def _spawn(self, agent_type: str):
+        stats = self._context.Array('d', 5)
+        process = self._context.Process(target=worker_main, args=(agent_type, self.config, stats),
+                                        name=f"trendvisor-{agent_type}")
+        process.start()
+        self.workers[agent_type].append(Worker(process, stats))
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            with self._lock:
+                for agent_type in self.pools:
+                    self._reap(agent_type)
+                    self._autoscale(agent_type)
+                    self._replenish(agent_type)
+
+    def _reap(self, agent_type: str):
+        """Forgets exited workers; an unexpected exit schedules a restart with backoff."""
+        now = time.monotonic()
+        for worker in list(self.workers[agent_type]):
+            if worker.retiring_since is not None and worker.process.is_alive() \
+                    and now - worker.retiring_since > self.drain_timeout + 5:
+                worker.process.kill()
+            if worker.process.is_alive():
+                continue
+            worker.process.join()
+            self.workers[agent_type].remove(worker)
+            if worker.retiring_since is not None:
+                continue
+            # A worker that ran for a while before failing starts the backoff over
+            if now - worker.started_at >= self.stable_after:
+                self._failures[agent_type] = 0
+            self._failures[agent_type] += 1
+            self.restarts[agent_type] += 1
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self._failures[agent_type] - 1))
+            self._restart_at[agent_type] = now + delay
+            display_error(f"A {agent_type} worker exited with code {worker.process.exitcode}; "
+                          f"restarting in {delay:.1f}s.", "SUPERVISOR")
+
+    def _replenish(self, agent_type: str):
+        active = [w for w in self.workers[agent_type] if w.retiring_since is None]
+        if len(active) < self.target[agent_type] and time.monotonic() >= self._restart_at[agent_type]:
+            for _ in range(self.target[agent_type] - len(active)):
+                self._spawn(agent_type)
+
+    def _autoscale(self, agent_type: str):
+        """
+        Adds a worker when the outstanding work per worker, or the time the
+        pool needs to clear it at the observed handler latency, is above the
+        pool's thresholds; retires one after a sustained idle period.
+        """
+        pool, now = self.pools[agent_type], time.monotonic()
+        active = [w for w in self.workers[agent_type] if w.retiring_since is None and w.stats[READY]]
+        handled = sum(w.stats[HANDLED] for w in active)
+        busy = sum(w.stats[BUSY_SECONDS] for w in active)
+        last_handled, last_busy = self._last_totals[agent_type]
+        self._last_totals[agent_type] = (handled, busy)
+        if handled > last_handled and busy >= last_busy:
+            self.latency[agent_type] = (busy - last_busy) / (handled - last_handled)
+        if not active or now - self._last_scaled[agent_type] < pool.cooldown:
+            return
+
+        channel, group = AGENT_TYPES[agent_type]
+        try:
+            lag = self.bus.backlog(channel, group)["lag"]
+        except redis.RedisError:
+            lag = 0
+        outstanding = lag + sum(w.stats[QUEUE_DEPTH] for w in active)
+        per_worker = outstanding / len(active)
+        drain_seconds = per_worker * self.latency[agent_type]
+        if self.target[agent_type] < pool.max_workers and \
+                (per_worker > pool.scale_up_backlog or drain_seconds > pool.target_drain_seconds):
+            self.target[agent_type] += 1
+            self._last_scaled[agent_type] = now
+            self._idle_checks[agent_type] = 0
+            display_status(f"Scaling {agent_type} up to {self.target[agent_type]} workers "
+                           f"({outstanding:.0f} outstanding, {self.latency[agent_type]:.2f}s per message).",
+                           category="SUPERVISOR")
+        elif outstanding == 0:
+            self._idle_checks[agent_type] += 1
+            if self._idle_checks[agent_type] >= pool.idle_checks and self.target[agent_type] > pool.min_workers:
+                self.target[agent_type] -= 1
+                self._last_scaled[agent_type] = now
+                self._idle_checks[agent_type] = 0
+                youngest = max(active, key=lambda w: w.started_at)
+                youngest.retiring_since = now
+                youngest.process.terminate()
+                display_status(f"Scaling {agent_type} down to {self.target[agent_type]} workers.",
+                               category="SUPERVISOR")
+        else:
+            self._idle_checks[agent_type] = 0
+
+    def stop(self):
+        """
+        Drains the pools in pipeline order: every worker of a pool gets
+        SIGTERM and up to drain_timeout seconds to finish; stragglers are
+        killed and their unacknowledged messages stay pending in the stream.
+        """
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        for agent_type in DRAIN_ORDER:
+            workers = self.workers.get(agent_type, [])
+            if not workers:
+                continue
+            display_status(f"Draining {len(workers)} {agent_type} workers...", category="SUPERVISOR")
+            for worker in workers:
+                worker.process.terminate()
+            deadline = time.monotonic() + self.drain_timeout + 5
+            for worker in workers:
+                worker.process.join(max(0.0, deadline - time.monotonic()))
+                if worker.process.is_alive():
+                    display_error(f"A {agent_type} worker did not drain in time; killing it.", "SUPERVISOR")
+                    worker.process.kill()
+                    worker.process.join()
+            workers.clear()
@@ -0,0 +1,148 @@
+"""
+Trendvisor Review Aggregates
+Mergeable running statistics over review chunks. Aggregates built from
+separate chunks can be merged, so results do not depend on how the data was
+split.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+# Sentiment histogram: fixed bins over [-1, 1], so per-chunk counts add up.
+SENTIMENT_BINS = 21
+SENTIMENT_EDGES = np.linspace(-1.0, 1.0, SENTIMENT_BINS + 1)
+
+
+def review_text(review: Dict[str, Any]) -> str:
+    """Returns a review's text; collectors use either 'text' or 'review'."""
+    return review.get('text') or review.get('review') or ""
+
+
+def _day(value: Any) -> Optional[str]:
+    """The ISO day ('YYYY-MM-DD') of a review date, or None."""
+    if value is None or value != value:  # None or NaN/NaT
+        return None
+    return str(value)[:10] or None
+
+
+@dataclass
+class ReviewAggregates:
+    count: int = 0
+    rating_count: int = 0
+    rating_sum: float = 0.0
+    rating_histogram: Counter = field(default_factory=Counter)
+    text_chars: int = 0
+    text_words: int = 0
+    max_words: int = 0
+    # ISO day -> reviews, rating total and rated reviews on that day
+    day_counts: Counter = field(default_factory=Counter)
+    day_rating_sum: Counter = field(default_factory=Counter)
+    day_rating_count: Counter = field(default_factory=Counter)
+    # Sentiment bin index -> reviews (see SENTIMENT_EDGES)
+    sentiment_histogram: Counter = field(default_factory=Counter)
+
+    def update(self, reviews: Iterable[Dict[str, Any]]) -> "ReviewAggregates":
+        """Adds a chunk of reviews to the running totals."""
+        for review in reviews:
+            self.count += 1
+            rating = review.get('rating')
+            if rating is not None:
+                self.rating_count += 1
+                self.rating_sum += rating
+                self.rating_histogram[int(rating)] += 1
+            text = review_text(review)
+            words = len(text.split())
+            self.text_chars += len(text)
+            self.text_words += words
+            self.max_words = max(self.max_words, words)
+            day = _day(review.get('date'))
+            if day is not None:
+                self.day_counts[day] += 1
+                if rating is not None:
+                    self.day_rating_sum[day] += rating
+                    self.day_rating_count[day] += 1
+        return self
+
+    def update_frame(self, df, text_column: Optional[str] = None, sentiment: Optional[np.ndarray] = None,
+                     weights: Optional[np.ndarray] = None) -> "ReviewAggregates":
+        """
+        Adds a DataFrame chunk of reviews with column operations. Gives the
+        same totals as `update` on the equivalent dicts, plus the sentiment
+        histogram when per-review `sentiment` scores are given. With
+        `weights` (e.g. near-duplicate cluster sizes), each row counts as
+        that many reviews in every total.
+        """
+        import pandas as pd
+
+        weight = (pd.Series(np.ones(len(df), dtype=np.int64), index=df.index) if weights is None
+                  else pd.Series(np.asarray(weights, dtype=np.int64), index=df.index))
+        self.count += int(weight.sum())
+        ratings = pd.to_numeric(df['rating'], errors='coerce') if 'rating' in df.columns else None
+        if ratings is not None:
+            rated = ratings.notna()
+            self.rating_count += int(weight[rated].sum())
+            self.rating_sum += float((ratings[rated] * weight[rated]).sum())
+            per_rating = weight[rated].groupby(ratings[rated].astype(int)).sum()
+            self.rating_histogram.update({int(k): int(v) for k, v in per_rating.items()})
+        if text_column is not None:
+            texts = df[text_column].fillna("").astype(str)
+            words = texts.str.split().str.len()
+            self.text_chars += int((texts.str.len() * weight).sum())
+            self.text_words += int((words * weight).sum())
+            if len(words):
+                self.max_words = max(self.max_words, int(words.max()))
+        if 'date' in df.columns:
+            dates = df['date']
+            if pd.api.types.is_datetime64_any_dtype(dates):
+                days = dates.dt.strftime("%Y-%m-%d")
+            else:
+                # Same as _day(): parsing would drop dates whose format differs from the first one
+                days = dates.where(dates.notna()).astype("string").str[:10].replace("", pd.NA)
+            rating_values = ratings if ratings is not None else pd.Series(np.nan, index=df.index)
+            per_day = pd.DataFrame({
+                "day": days,
+                "size": weight,
+                "sum": rating_values * weight,
+                "count": rating_values.notna() * weight,
+            }).dropna(subset=["day"]).groupby("day")[["size", "sum", "count"]].sum()
+            labels = per_day.index
+            self.day_counts.update(dict(zip(labels, per_day["size"].astype(int))))
+            rated_days = per_day["count"] > 0
+            self.day_rating_sum.update(dict(zip(labels[rated_days], per_day["sum"][rated_days].astype(float))))
+            self.day_rating_count.update(dict(zip(labels[rated_days], per_day["count"][rated_days].astype(int))))
+        if sentiment is not None:
+            counts, _ = np.histogram(sentiment, bins=SENTIMENT_EDGES, weights=weight.to_numpy())
+            self.sentiment_histogram.update({i: int(c) for i, c in enumerate(counts) if c})
+        return self
+
+    def merge(self, other: "ReviewAggregates") -> "ReviewAggregates":
+        """Folds another aggregate into this one."""
+        self.count += other.count
+        self.rating_count += other.rating_count
+        self.rating_sum += other.rating_sum
+        self.rating_histogram.update(other.rating_histogram)
+        self.text_chars += other.text_chars
+        self.text_words += other.text_words
+        self.max_words = max(self.max_words, other.max_words)
+        self.day_counts.update(other.day_counts)
+        self.day_rating_sum.update(other.day_rating_sum)
+        self.day_rating_count.update(other.day_rating_count)
+        self.sentiment_histogram.update(other.sentiment_histogram)
+        return self
+
+    @property
+    def mean_rating(self) -> Optional[float]:
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_rating": self.mean_rating,
+            "rating_histogram": {str(k): v for k, v in sorted(self.rating_histogram.items())},
+            "mean_length": self.text_chars / self.count if self.count else 0.0,
+            "mean_word_count": self.text_words / self.count if self.count else 0.0,
+            "max_word_count": self.max_words,
+            "day_counts": dict(sorted(self.day_counts.items())),
+        }
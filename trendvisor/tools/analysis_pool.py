@@ -0,0 +1,186 @@
+"""
+Trendvisor Analysis Worker Pool
+Keeps a set of pre-warmed worker processes with the analysis tool (and its
+heavy pandas/numpy/plotly/sklearn/networkx imports) already loaded, so that
+agents can run analyses without paying interpreter start-up on every task.
+"""
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Populated in each worker by _warm_worker()
+_tool = None
+# job id -> pid of the worker running it, CANCELLED or FINISHED; shared through a manager
+_running = None
+# Held while a worker marks its job FINISHED and while the parent decides to kill a job's worker
+_claims_lock = None
+
+CANCELLED = 0
+FINISHED = -1
+
+
+class AnalysisTimeoutError(Exception):
+    """Raised when an analysis job exceeds the pool's per-job timeout."""
+
+
+def _warm_worker(running, claims_lock):
+    """Pool initializer: imports the analysis tool once per worker process."""
+    global _tool, _running, _claims_lock
+    from trendvisor.tools import analyze_and_visualize
+    _tool = analyze_and_visualize
+    _running = running
+    _claims_lock = claims_lock
+
+
+def _ping(_=None) -> int:
+    """Near no-op job used to find out which workers have finished warming up."""
+    time.sleep(0.05)  # Hold the worker briefly so pings spread across the pool
+    return os.getpid()
+
+
+def _tool_version() -> str:
+    return _tool.TOOL_VERSION
+
+
+def _run_job(job_id: int, input_path: str, task_id: str, options: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """
+    Runs the analysis tool inside a warm worker and returns the task artifacts.
+    Claims the job first, so the parent knows which worker to kill if it
+    times out, and skips it if it timed out while still queued. A finished
+    job is left as FINISHED for the parent to remove.
+    """
+    pid = os.getpid()
+    if _running.setdefault(job_id, pid) != pid:
+        _running.pop(job_id, None)
+        return None
+    try:
+        return _tool.run_analysis(input_path, task_id, **options)
+    finally:
+        # Under the lock: once the parent has checked this job is still ours, we cannot move on to the next one
+        with _claims_lock:
+            _running[job_id] = FINISHED
+
+
+class AnalysisWorkerPool:
+    """
+    A persistent pool of analysis worker processes.
+
+    Workers are started with the 'spawn' method so they never inherit the
+    parent's Redis connections or agent threads, and each one is recycled
+    after `max_jobs_per_worker` jobs to bound memory growth. A job that times
+    out only costs its own worker: that process is killed and the pool starts
+    a replacement, while jobs on the other workers carry on.
+    """
+
+    def __init__(self, pool_size: int = 2, job_timeout: Optional[float] = 300.0, max_jobs_per_worker: Optional[int] = 50):
+        self.pool_size = pool_size
+        self.job_timeout = job_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._manager = self._context.Manager()
+        self._running = self._manager.dict()
+        self._claims_lock = self._manager.Lock()
+        self._job_ids = itertools.count(1)
+        self._abandoned = 0
+        self._pending = set()
+        self._pool = self._context.Pool(
+            processes=self.pool_size,
+            initializer=_warm_worker,
+            initargs=(self._running, self._claims_lock),
+            maxtasksperchild=self.max_jobs_per_worker,
+        )
+        self._tool_version: Optional[str] = None
+
+    def warm_up(self, timeout: Optional[float] = None):
+        """Blocks until every worker has imported the analysis tool."""
+        pool = self._pool
+        deadline = None if timeout is None else time.monotonic() + timeout
+        warm_pids = set()
+        while len(warm_pids) < self.pool_size:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            warm_pids.update(pool.map_async(_ping, range(self.pool_size), chunksize=1).get(timeout=remaining))
+
+    def tool_version(self) -> str:
+        """The analysis tool's TOOL_VERSION, as loaded by the workers (asked once, then remembered)."""
+        if self._tool_version is None:
+            self._tool_version = self._pool.apply_async(_tool_version).get(timeout=self.job_timeout)
+        return self._tool_version
+
+    def submit(self, input_path: str, task_id: str, options: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Runs an analysis job on a warm worker and waits for its result.
+
+        Args:
+            input_path: Path to the collected review data.
+            task_id: The unique identifier for the task.
+            options: Extra keyword arguments for `run_analysis`.
+
+        Returns:
+            The artifacts produced, including 'report_path'.
+
+        Raises:
+            AnalysisTimeoutError: If the job runs longer than `job_timeout`
+                (time spent queued included). The worker running it is
+                killed; a job still queued is dropped when its turn comes.
+        """
+        job_id = next(self._job_ids)
+        result = self._pool.apply_async(_run_job, (job_id, input_path, task_id, options or {}))
+        with self._lock:
+            self._pending.add(result)
+        try:
+            return result.get(timeout=self.job_timeout)
+        except multiprocessing.TimeoutError:
+            if not self._cancel(job_id):
+                raise AnalysisTimeoutError(
+                    f"Analysis of '{input_path}' for task {task_id} exceeded {self.job_timeout}s"
+                )
+            return result.get(timeout=self.job_timeout)  # It finished as it timed out
+        finally:
+            if result.ready():
+                self._running.pop(job_id, None)  # Left FINISHED by the worker
+            with self._lock:
+                self._pending.discard(result)
+
+    def _cancel(self, job_id: int) -> bool:
+        """
+        Kills the worker running `job_id`, or marks the job to be skipped if
+        it has not started.
+
+        Returns:
+            True if the job had already finished, so its result is on its way.
+        """
+        with self._claims_lock:
+            pid = self._running.setdefault(job_id, CANCELLED)
+            if pid == CANCELLED:
+                return False  # Not started: the worker drops the job and the entry when its turn comes
+            self._running.pop(job_id, None)
+            if pid == FINISHED:
+                return True
+            # The worker cannot mark this job finished and claim another one while we hold the lock
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                return False
+        # The pool never hears back about a killed worker's job, so close() must not wait for it
+        with self._lock:
+            self._abandoned += 1
+        return False
+
+    def close(self):
+        """Lets in-flight jobs finish, then shuts the workers down."""
+        self._pool.close()
+        with self._lock:
+            pending = list(self._pending)
+            abandoned = self._abandoned
+        for result in pending:
+            result.wait()
+        if abandoned:
+            # Pool.join() would wait forever on the killed workers' jobs
+            self._pool.terminate()
+        self._pool.join()
+        self._manager.shutdown()
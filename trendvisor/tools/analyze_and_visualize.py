@@ -25,47 +25,173 @@ import networkx as nx
 import warnings
 import sys
 import random
+from typing import Optional
+
+# Allow running as a plain script (python3 trendvisor/tools/analyze_and_visualize.py)
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from trendvisor.tools.aggregates import SENTIMENT_BINS, SENTIMENT_EDGES, ReviewAggregates
+from trendvisor.tools.columnar import ColumnarDataset, is_columnar
+from trendvisor.tools.dedup import DEDUP_VERSION, MinHashDeduplicator, duplicates_artifact
+from trendvisor.tools.feature_cache import DEFAULT_CACHE_PATH, FeatureCache
+from trendvisor.tools.full_analysis import FEATURE_COLUMNS, TARGET_COLUMN, WEIGHT_COLUMN, RowSampler, full_analysis
+from trendvisor.tools.report_renderer import (
+    ReportRenderer, bar_chart, downsample_daily, histogram_chart, review_count_label, series_chart,
+)
+from trendvisor.tools.review_io import is_ndjson, iter_review_chunks
+from trendvisor.tools.text_analytics import TEXT_ANALYTICS_VERSION, TextAnalytics, TextAnalyzer, analyze_texts
+
+# Bump when the analysis or report output changes: cached reports keyed on
+# it (see report_cache) are then no longer reused.
+TOOL_VERSION = f"5+text{TEXT_ANALYTICS_VERSION}+dedup{DEDUP_VERSION}"
 
 # This tool is designed to be called by an agent.
 # For now, we'll create a placeholder for the cli_utils import
 # and replace it later when the agent code is in place.
-def print_header(x): print(f"--- {x} ---")
-def print_subheader(x): print(f"-- {x} --")
-def print_success(x): print(f"[SUCCESS] {x}")
-def print_info(x): print(f"[INFO] {x}")
+# Progress goes to stderr: stdout is reserved for the report path.
+def print_header(x): print(f"--- {x} ---", file=sys.stderr)
+def print_subheader(x): print(f"-- {x} --", file=sys.stderr)
+def print_success(x): print(f"[SUCCESS] {x}", file=sys.stderr)
+def print_info(x): print(f"[INFO] {x}", file=sys.stderr)
 
 warnings.filterwarnings('ignore')
 
-def load_data(input_path):
+def load_data(input_path, columns=None):
+    """
+    Loads a review dataset into a DataFrame. Columnar datasets are memory-mapped
+    (numeric columns are not copied), NDJSON is parsed straight into the frame,
+    and legacy JSON arrays go through json.load.
+    """
     print_info(f"Loading data from {input_path}...")
-    # This is a placeholder for actual data loading.
-    # In a real scenario, we would load from the JSON file.
-    dummy_data = [{'review': 'great product', 'date': '2024-01-01', 'rating': 5}] * 100
-    df = pd.DataFrame(dummy_data)
+    if is_columnar(input_path):
+        df = ColumnarDataset(input_path).to_dataframe(columns=columns)
+    elif is_ndjson(input_path):
+        df = pd.read_json(input_path, lines=True)
+    else:
+        with open(input_path, 'r') as f:
+            data = json.load(f)
+        df = pd.DataFrame(data)
     print_success(f"Loaded {len(df)} reviews.")
     return df
 
-def preprocess_data(df):
+def text_column(df):
+    """Returns the name of the review text column ('text' or legacy 'review')."""
+    for column in ('text', 'review'):
+        if column in df.columns:
+            return column
+    return None
+
+def preprocess_data(df, n_tokens=None):
+    """
+    Adds date, length and word-count columns. `n_tokens` (from the text
+    analytics stage) is used as the word count when available, so the text
+    is not split again row by row.
+    """
     print_info("Preprocessing data...")
-    df['date'] = pd.to_datetime(df['date'])
-    df['review_length'] = df['review'].str.len()
-    df['word_count'] = df['review'].str.split().str.len()
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    column = text_column(df)
+    if column:
+        texts = df[column].fillna("")
+        df['review_length'] = np.fromiter(map(len, texts), dtype=np.int64, count=len(df))
+        if n_tokens is None:
+            n_tokens = np.fromiter((len(t.split()) for t in texts), dtype=np.int64, count=len(df))
+        df['word_count'] = n_tokens
     df_numeric = df.select_dtypes(include=np.number).fillna(0)
     print_success("Preprocessing complete.")
     return df, df_numeric
 
-def run_full_analysis(df):
-    """A placeholder for the full analysis pipeline."""
+def iter_data_chunks(input_path, chunk_size):
+    """Yields a review dataset as DataFrames of at most `chunk_size` reviews, never loading it whole."""
+    if is_columnar(input_path):
+        dataset = ColumnarDataset(input_path)
+        for start in range(0, len(dataset), chunk_size):
+            yield dataset.to_dataframe(start=start, stop=start + chunk_size)
+    else:
+        for reviews in iter_review_chunks(input_path, chunk_size):
+            yield pd.DataFrame(reviews)
+
+def find_duplicates(chunk_source, threshold):
+    """
+    Finds near-duplicate clusters (MinHash/LSH at the given Jaccard
+    `threshold`) over the chunks produced by `chunk_source()`.
+
+    Returns:
+        The DedupResult and the duplicate-cluster artifact, or (None, None)
+        if the data has no text.
+    """
+    first = next(iter(chunk_source()), None)
+    if first is None or text_column(first) is None:
+        return None, None
+    print_info(f"Detecting near-duplicate reviews (threshold {threshold})...")
+    ids = []
+
+    def text_chunks():
+        offset = 0
+        for chunk in chunk_source():
+            if 'id' in chunk.columns:
+                ids.extend(chunk['id'].astype(str).tolist())
+            else:
+                ids.extend(str(i) for i in range(offset, offset + len(chunk)))
+            offset += len(chunk)
+            yield chunk[text_column(chunk)].fillna("").tolist()
+
+    result = MinHashDeduplicator(threshold=threshold).deduplicate_chunks(text_chunks())
+    artifact = duplicates_artifact(result, ids, threshold)
+    print_success(f"Kept {len(result.representatives)} of {len(result.labels)} reviews ({result.duplicates} near-duplicates).")
+    return result, artifact
+
+def select_representatives(chunk, dedup, offset):
+    """Keeps the rows of a chunk (starting at global row `offset`) that represent a cluster, with its size as 'weight'."""
+    lo, hi = np.searchsorted(dedup.representatives, [offset, offset + len(chunk)])
+    selected = chunk.iloc[dedup.representatives[lo:hi] - offset].reset_index(drop=True)
+    selected['weight'] = dedup.weights[lo:hi]
+    return selected
+
+def analyze_chunk(chunk, analytics, aggregates, cache=None):
+    """
+    Folds one chunk of reviews into the mergeable text analytics and review
+    aggregates, and adds per-review 'sentiment', 'word_count' and
+    'review_length' columns.
+    With a FeatureCache, only reviews not seen before (by id and text) are
+    transformed. A 'weight' column (near-duplicate cluster sizes) weights
+    every aggregate, so the totals describe the whole dataset.
+
+    Returns:
+        True if the chunk has review text.
+    """
+    column = text_column(chunk)
+    sentiment = None
+    weights = chunk['weight'].to_numpy() if 'weight' in chunk.columns else None
+    if column is not None:
+        ids = chunk['id'].astype(str) if 'id' in chunk.columns else None
+        _, sentiment, n_tokens = analyze_texts(chunk[column].fillna(""), ids=ids, cache=cache,
+                                               weights=weights, analytics=analytics)
+        chunk['sentiment'] = sentiment
+        chunk['word_count'] = n_tokens
+        chunk['review_length'] = chunk[column].fillna("").str.len()
+    aggregates.update_frame(chunk, text_column=column, sentiment=sentiment, weights=weights)
+    return column is not None
+
+def run_full_analysis(sample, stage_budgets=None, n_jobs=-1):
+    """
+    Runs rating prediction, segmentation and the 2-D embedding on a
+    fixed-seed sample of the analyzed reviews (see full_analysis). Stages
+    that would exceed their wall-clock budget degrade to cheaper
+    approximations.
+    """
     print_subheader("Running Full Analysis Pipeline")
-    time.sleep(1) # Simulate work
-    models_summary = {'RandomForest': {'R2': 0.85}, 'GradientBoosting': {'R2': 0.88}}
-    ensemble_r2 = 0.89
-    segment_details = {
-        'Total Segments': 4,
-        'Segment Sizes': [25, 25, 25, 25]
-    }
-    print_success("Full analysis pipeline complete.")
-    return models_summary, ensemble_r2, segment_details
+    result = full_analysis(sample, budgets=stage_budgets, n_jobs=n_jobs)
+    for stage, timing in result['stages'].items():
+        print_info(f"{stage}: {timing['elapsed_s']:.2f}s of {timing['budget_s']:.0f}s budget")
+        for reason in timing['degraded']:
+            print_info(f"{stage} degraded: {reason}")
+    if 'skipped' in result:
+        print_info(f"Full analysis skipped: {result['skipped']}.")
+    else:
+        print_success(f"Full analysis pipeline complete on {result['rows']} reviews.")
+    return result
 
 def generate_html_report(output_dir, df, models_summary, ensemble_r2, segment_details):
     """Generates a placeholder HTML report."""
@@ -94,40 +220,232 @@ def generate_html_report(output_dir, df, models_summary, ensemble_r2, segment_de
     print_success(f"Report saved to {report_path}")
     return report_path
 
-def analyze_and_visualize(input_path: str, task_id: str) -> str:
+def render_report(report_path, aggregates, text_summary, duplicates=None, full=None):
     """
-    Reads review data, performs a simple analysis, generates a visualization,
-    and saves it as an HTML report.
+    Renders the report page: ratings, sentiment, review volume over time,
+    keywords, aspects and, with the `full` analysis result, rating models
+    and customer segments. Every chart is built from the mergeable
+    aggregates or a bounded sample, so the page size does not grow with the
+    number of reviews.
+    """
+    # Counts are weighted by cluster size: each representative stands for its near-duplicates
+    unique = text_summary['reviews'] if text_summary and duplicates else None
+    report = ReportRenderer(f"Trendvisor Review Analysis - {review_count_label(aggregates.count, unique)}")
+    report.add_metric("Reviews", aggregates.count)
+    if duplicates is not None:
+        report.add_metric("Near-duplicates collapsed", duplicates)
+    if aggregates.mean_rating is not None:
+        report.add_metric("Mean rating", f"{aggregates.mean_rating:.2f}")
+    ratings = sorted(aggregates.rating_histogram.items())
+    report.add_chart("Distribution of Star Ratings", bar_chart(
+        [rating for rating, _ in ratings], [count for _, count in ratings],
+    ))
+
+    if aggregates.day_counts:
+        days = sorted(aggregates.day_counts)
+        daily = pd.DataFrame({
+            "count": [aggregates.day_counts[d] for d in days],
+            "value_sum": [aggregates.day_rating_sum.get(d, 0.0) for d in days],
+            "value_count": [aggregates.day_rating_count.get(d, 0) for d in days],
+        }, index=pd.to_datetime(days))
+        series, period = downsample_daily(daily)
+        report.add_chart(f"Reviews per {period} (line: mean rating)", series_chart(series, "Mean rating"))
+
+    if text_summary is not None:
+        sentiment = text_summary['sentiment']
+        report.add_metric("Mean sentiment", f"{sentiment['mean']:+.2f}")
+        counts = np.array([aggregates.sentiment_histogram.get(i, 0) for i in range(SENTIMENT_BINS)])
+        centers = (SENTIMENT_EDGES[:-1] + SENTIMENT_EDGES[1:]) / 2
+        report.add_chart("Review Sentiment", histogram_chart(centers, counts, float(np.diff(SENTIMENT_EDGES)[0])))
+
+        keywords = text_summary['top_keywords'][:15][::-1]
+        keyword_chart = go.Figure(go.Bar(
+            x=[count for _, count in keywords], y=[term for term, _ in keywords], orientation='h',
+        ))
+        report.add_chart("Top Keywords", keyword_chart)
+
+        aspects = text_summary['aspects']
+        report.add_chart("Aspect Mentions (color: mean sentiment)", bar_chart(
+            list(aspects), [a['mentions'] for a in aspects.values()],
+            color=[a['mean_sentiment'] or 0.0 for a in aspects.values()],
+            colorscale='RdYlGn', cmin=-1, cmax=1,
+        ))
+
+    if full is not None and full.get('ensemble_r2') is not None:
+        report.add_metric("Rating model R² (ensemble)", f"{full['ensemble_r2']:.3f}")
+    if full is not None and 'segments' in full:
+        segments = full['segments']
+        labels = [f"Segment {k + 1}" for k in range(segments['Total Segments'])]
+        report.add_chart("Customer Segments (color: mean rating)", bar_chart(
+            labels, segments['Segment Sizes'],
+            color=[rating or 0.0 for rating in segments['Mean Rating']], colorscale='RdYlGn', cmin=1, cmax=5,
+        ))
+        embedding = full['embedding']
+        scatter = go.Figure(go.Scattergl(
+            x=embedding['x'], y=embedding['y'], mode='markers',
+            marker=dict(size=4, color=embedding['segment'], colorscale='Viridis'),
+            text=[labels[k] for k in embedding['segment']], hoverinfo='text',
+        ))
+        report.add_chart(f"Segments in 2-D ({embedding['method'].upper()}, {len(embedding['x'])}-review sample)", scatter)
+    return report.render(report_path)
+
+def record_timing(artifacts, stage, started):
+    """Adds a stage's wall-clock seconds as the 'timing_<stage>' artifact and returns the current clock."""
+    now = time.perf_counter()
+    artifacts[f'timing_{stage}'] = f"{now - started:.3f}"
+    return now
+
+def run_analysis(input_path: str, task_id: str, feature_cache_path: str = DEFAULT_CACHE_PATH,
+                 dedup_threshold: Optional[float] = 0.9, chunk_size: Optional[int] = None,
+                 model_sample_size: Optional[int] = 50000, stage_budgets: Optional[dict] = None,
+                 n_jobs: int = -1) -> dict:
+    """
+    Runs the full analysis for a task and writes its outputs to results/.
+    Near-duplicate reviews above `dedup_threshold` are collapsed first, and
+    the analysis runs on one weighted representative per cluster (None
+    disables deduplication). Per-review text features are cached at
+    `feature_cache_path` (None disables the cache).
+
+    With `chunk_size`, the dataset is streamed in chunks of that many
+    reviews and only mergeable aggregates are kept, so peak memory is
+    bounded by the chunk size (plus a few bytes per review for
+    deduplication). The outputs are the same as those of the in-memory path,
+    which is simply a single chunk.
+
+    Rating models and segmentation run on a fixed-seed sample of at most
+    `model_sample_size` analyzed reviews (None disables them), with the
+    per-stage wall-clock `stage_budgets` (seconds, see full_analysis) and
+    `n_jobs` workers for model fitting.
+
+    Returns:
+        The task artifacts produced, mapping artifact names to paths (and
+        the feature-cache counters and per-stage 'timing_*' seconds).
     """
     # Create results directory if it doesn't exist
     output_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'results')
     os.makedirs(output_dir, exist_ok=True)
+    artifacts = {}
+    clock = time.perf_counter()
 
     # Load data
-    with open(input_path, 'r') as f:
-        data = json.load(f)
-    
-    df = pd.DataFrame(data)
+    if chunk_size:
+        print_info(f"Streaming {input_path} in chunks of {chunk_size} reviews...")
+        chunk_source = lambda: iter_data_chunks(input_path, chunk_size)
+    else:
+        df = load_data(input_path)
+        chunk_source = lambda: iter([df])
+    clock = record_timing(artifacts, 'load', clock)
+
+    # Near-duplicates: analyze one representative per cluster
+    dedup = None
+    if dedup_threshold:
+        dedup, duplicates = find_duplicates(chunk_source, dedup_threshold)
+        if duplicates is not None:
+            duplicates_path = os.path.join(output_dir, f"{task_id}_duplicates.json")
+            with open(duplicates_path, 'w', encoding='utf-8') as f:
+                json.dump(duplicates, f, ensure_ascii=False)
+            artifacts['duplicates_path'] = duplicates_path
+    clock = record_timing(artifacts, 'dedup', clock)
+
+    # Ratings, volume, keywords, sentiment and aspects, chunk by chunk
+    analyzer = TextAnalyzer()
+    analytics = TextAnalytics(analyzer)
+    aggregates = ReviewAggregates()
+    cache = None
+    if feature_cache_path:
+        cache = FeatureCache(feature_cache_path, version=analyzer.cache_version)
+    sampler = None
+    if model_sample_size:
+        sampler = RowSampler(model_sample_size, FEATURE_COLUMNS + [TARGET_COLUMN, WEIGHT_COLUMN])
+    has_text = False
+    try:
+        print_info("Running text analytics...")
+        offset = analyzed = 0
+        for chunk in chunk_source():
+            size = len(chunk)
+            if 'rating' not in chunk.columns:
+                chunk['rating'] = 5 # Add dummy rating if not present
+            if dedup is not None:
+                chunk = select_representatives(chunk, dedup, offset)
+            offset += size
+            has_text = analyze_chunk(chunk, analytics, aggregates, cache=cache) or has_text
+            if sampler is not None:
+                sampler.add(chunk, analyzed)
+            analyzed += len(chunk)
+            if chunk_size:
+                print_info(f"Analyzed {offset} reviews...")
+    finally:
+        if cache is not None:
+            cache.close()
+    if cache is not None:
+        print_info(f"Feature cache: {cache.hits} hits, {cache.misses} misses.")
+        for name, value in cache.stats().items():
+            artifacts[f'feature_cache_{name}'] = str(value)
+
+    text_summary = None
+    if has_text:
+        text_summary = analytics.summary()
+        unique = analytics.reviews if dedup is not None else None
+        print_success(f"Text analytics complete for {review_count_label(aggregates.count, unique)}.")
+        text_analytics_path = os.path.join(output_dir, f"{task_id}_text_analytics.json")
+        with open(text_analytics_path, 'w', encoding='utf-8') as f:
+            json.dump(text_summary, f, ensure_ascii=False, indent=2)
+        artifacts['text_analytics_path'] = text_analytics_path
+    clock = record_timing(artifacts, 'text', clock)
+
+    full = None
+    if sampler is not None and has_text:
+        full = run_full_analysis(sampler.sample(), stage_budgets=stage_budgets, n_jobs=n_jobs)
+        full_analysis_path = os.path.join(output_dir, f"{task_id}_full_analysis.json")
+        with open(full_analysis_path, 'w', encoding='utf-8') as f:
+            json.dump(full, f)
+        artifacts['full_analysis_path'] = full_analysis_path
+    clock = record_timing(artifacts, 'models', clock)
 
-    # Simple analysis: rating distribution
-    if 'rating' not in df.columns:
-        df['rating'] = 5 # Add dummy rating if not present
-        
-    fig = px.histogram(df, x="rating", title="Distribution of Star Ratings")
-    
     # Save report
-    report_path = os.path.join(output_dir, f"{task_id}_report.html")
-    fig.write_html(report_path)
-    
-    return report_path
+    report_path = render_report(
+        os.path.join(output_dir, f"{task_id}_report.html"), aggregates, text_summary,
+        duplicates=dedup.duplicates if dedup is not None else None, full=full,
+    )
+    artifacts['report_path'] = report_path
+    record_timing(artifacts, 'render', clock)
+
+    return artifacts
+
+def analyze_and_visualize(input_path: str, task_id: str) -> str:
+    """
+    Reads review data, performs the analysis, generates a visualization,
+    and saves it as an HTML report.
+    """
+    return run_analysis(input_path, task_id)['report_path']
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Analyze review data and generate a report.")
-    parser.add_argument("--input", required=True, help="Path to the input JSON file.")
+    parser.add_argument("--input", required=True, help="Path to the input JSON/NDJSON file or columnar (.tvcol) dataset.")
     parser.add_argument("--task_id", required=True, help="Unique ID for the task.")
+    parser.add_argument("--feature-cache", default=DEFAULT_CACHE_PATH, help="Per-review feature cache (SQLite) path.")
+    parser.add_argument("--no-feature-cache", action="store_true", help="Recompute every review's features.")
+    parser.add_argument("--dedup-threshold", type=float, default=0.9,
+                        help="Jaccard similarity above which reviews are near-duplicates (0 disables deduplication).")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Stream the dataset in chunks of this many reviews (bounded memory) instead of loading it whole.")
+    parser.add_argument("--model-sample-size", type=int, default=50000,
+                        help="Reviews sampled for rating models and segmentation (0 disables them).")
+    parser.add_argument("--stage-budget", action="append", default=[], metavar="STAGE=SECONDS",
+                        help="Wall-clock budget of a full-analysis stage (models, segments, embedding); repeatable.")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel workers for model fitting (-1: all cores).")
     args = parser.parse_args()
+    stage_budgets = {name: float(seconds) for name, seconds in (b.split("=", 1) for b in args.stage_budget)}
 
-    report_file_path = analyze_and_visualize(args.input, args.task_id)
+    report_file_path = run_analysis(
+        args.input, args.task_id,
+        feature_cache_path=None if args.no_feature_cache else args.feature_cache,
+        dedup_threshold=args.dedup_threshold or None,
+        chunk_size=args.chunk_size,
+        model_sample_size=args.model_sample_size or None,
+        stage_budgets=stage_budgets or None,
+        n_jobs=args.n_jobs,
+    )['report_path']
     
     # The agent expects the output path to be printed to stdout
     print(report_file_path) 
\ No newline at end of file
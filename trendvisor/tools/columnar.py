@@ -0,0 +1,219 @@
+"""
+Trendvisor Columnar Review Format
+A compact on-disk layout for review datasets that can be memory-mapped
+instead of parsed. A dataset is a directory (conventionally `*.tvcol`):
+
+    meta.json          format version, row count and column descriptions
+    <col>.bin          numeric columns as raw little-endian arrays
+    <col>.offsets.bin  text columns: int64 start offsets (num_rows + 1 entries)
+    <col>.data.bin     text columns: the concatenated UTF-8 bytes
+
+Usage:
+    python -m trendvisor.tools.columnar convert data/reviews.json data/reviews.tvcol
+    python -m trendvisor.tools.columnar info data/reviews.tvcol
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+# Allow running as a plain script
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from trendvisor.tools.aggregates import review_text
+from trendvisor.tools.review_io import iter_reviews
+
+FORMAT_NAME = "trendvisor-columnar"
+FORMAT_VERSION = 1
+COLUMNAR_EXTENSION = ".tvcol"
+
+# Column name -> (kind, numpy dtype). Text columns have no dtype.
+REVIEW_SCHEMA = {
+    "id": ("text", None),
+    "rating": ("numeric", "<f4"),
+    "date": ("numeric", "<M8[D]"),
+    "text": ("text", None),
+}
+
+
+def is_columnar(path: str) -> bool:
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, "meta.json"))
+
+
+def _column_value(review: Dict[str, Any], name: str) -> Any:
+    if name == "text":
+        return review_text(review)
+    return review.get(name)
+
+
+class ColumnarWriter:
+    """Streams reviews into a columnar dataset without holding them in memory."""
+
+    def __init__(self, path: str, chunk_size: int = 65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.num_rows = 0
+        os.makedirs(path, exist_ok=True)
+        self._files = {}
+        self._text_offsets = {}
+        for name, (kind, _dtype) in REVIEW_SCHEMA.items():
+            if kind == "numeric":
+                self._files[name] = open(os.path.join(path, f"{name}.bin"), 'wb')
+            else:
+                self._files[f"{name}.offsets"] = open(os.path.join(path, f"{name}.offsets.bin"), 'wb')
+                self._files[f"{name}.data"] = open(os.path.join(path, f"{name}.data.bin"), 'wb')
+                self._files[f"{name}.offsets"].write(np.zeros(1, dtype="<i8").tobytes())
+                self._text_offsets[name] = 0
+
+    def write(self, reviews: Iterable[Dict[str, Any]]):
+        """Appends reviews, flushing one column chunk at a time."""
+        chunk: List[Dict[str, Any]] = []
+        for review in reviews:
+            chunk.append(review)
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._write_chunk(chunk)
+
+    def _write_chunk(self, chunk: List[Dict[str, Any]]):
+        for name, (kind, dtype) in REVIEW_SCHEMA.items():
+            values = [_column_value(review, name) for review in chunk]
+            if kind == "numeric":
+                if dtype.startswith("<M8"):
+                    array = np.array([v if v else "NaT" for v in values], dtype=dtype)
+                else:
+                    array = np.array([np.nan if v is None else v for v in values], dtype=dtype)
+                self._files[name].write(array.tobytes())
+            else:
+                encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+                lengths = np.fromiter((len(b) for b in encoded), dtype="<i8", count=len(encoded))
+                offsets = self._text_offsets[name] + np.cumsum(lengths)
+                self._files[f"{name}.offsets"].write(offsets.astype("<i8").tobytes())
+                self._files[f"{name}.data"].write(b"".join(encoded))
+                if len(offsets):
+                    self._text_offsets[name] = int(offsets[-1])
+        self.num_rows += len(chunk)
+
+    def close(self):
+        """Closes the column files and writes meta.json last, marking the dataset complete."""
+        for f in self._files.values():
+            f.close()
+        meta = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "num_rows": self.num_rows,
+            "columns": {name: {"kind": kind, "dtype": dtype} for name, (kind, dtype) in REVIEW_SCHEMA.items()},
+        }
+        with open(os.path.join(self.path, "meta.json"), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnarDataset:
+    """Read-only, memory-mapped access to a columnar review dataset."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_NAME or self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar dataset at {path}: {self.meta.get('format')} v{self.meta.get('version')}")
+        self.num_rows = self.meta["num_rows"]
+        self.columns = self.meta["columns"]
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def _map(self, filename: str, dtype: str, shape: int) -> np.ndarray:
+        if shape == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, filename), dtype=dtype, mode='r', shape=(shape,))
+
+    def numeric(self, name: str) -> np.ndarray:
+        """Returns a numeric column as a read-only memory map (no parsing, no copy)."""
+        return self._map(f"{name}.bin", self.columns[name]["dtype"], self.num_rows)
+
+    def text_offsets(self, name: str) -> np.ndarray:
+        return self._map(f"{name}.offsets.bin", "<i8", self.num_rows + 1)
+
+    def text_buffer(self, name: str) -> np.ndarray:
+        offsets = self.text_offsets(name)
+        return self._map(f"{name}.data.bin", "u1", int(offsets[-1]))
+
+    def texts(self, name: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Decodes rows [start, stop) of a text column."""
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        offsets = self.text_offsets(name)[start:stop + 1]
+        if len(offsets) < 2:
+            return []
+        raw = self.text_buffer(name)[offsets[0]:offsets[-1]].tobytes()
+        relative = (offsets - offsets[0]).tolist()
+        return [raw[relative[i]:relative[i + 1]].decode("utf-8") for i in range(len(relative) - 1)]
+
+    def iter_reviews(self, chunk_size: int = 65536) -> Iterator[Dict[str, Any]]:
+        """Yields reviews as dicts, decoding one chunk of rows at a time."""
+        for start in range(0, self.num_rows, chunk_size):
+            stop = min(start + chunk_size, self.num_rows)
+            columns = {}
+            for name, spec in self.columns.items():
+                if spec["kind"] == "text":
+                    columns[name] = self.texts(name, start, stop)
+                else:
+                    columns[name] = self.numeric(name)[start:stop].tolist()
+            for i in range(stop - start):
+                yield {name: values[i] for name, values in columns.items()}
+
+    def to_dataframe(self, columns: Optional[List[str]] = None, start: int = 0, stop: Optional[int] = None):
+        """
+        Builds a pandas DataFrame for rows [start, stop). Numeric columns wrap
+        the memory maps without copying; text columns are decoded.
+        """
+        import pandas as pd
+
+        stop = self.num_rows if stop is None else min(stop, self.num_rows)
+        data = {}
+        for name in columns or list(self.columns):
+            if self.columns[name]["kind"] == "text":
+                data[name] = self.texts(name, start, stop)
+            else:
+                data[name] = self.numeric(name)[start:stop]
+        return pd.DataFrame(data, copy=False)
+
+
+def convert_json_to_columnar(src: str, dst: str, chunk_size: int = 65536) -> int:
+    """
+    Converts a JSON array or NDJSON review file into a columnar dataset.
+
+    Returns:
+        The number of reviews written.
+    """
+    with ColumnarWriter(dst, chunk_size=chunk_size) as writer:
+        writer.write(iter_reviews(src))
+    return writer.num_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Columnar review dataset utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help="Convert a JSON/NDJSON review file.")
+    convert_parser.add_argument("src", help="Input JSON or NDJSON file.")
+    convert_parser.add_argument("dst", help=f"Output dataset directory (e.g. reviews{COLUMNAR_EXTENSION}).")
+    info_parser = subparsers.add_parser("info", help="Describe a columnar dataset.")
+    info_parser.add_argument("path", help="Columnar dataset directory.")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        rows = convert_json_to_columnar(args.src, args.dst)
+        print(f"Wrote {rows} reviews to {args.dst}")
+    else:
+        print(json.dumps(ColumnarDataset(args.path).meta, indent=2))
@@ -0,0 +1,85 @@
+"""
+Trendvisor Comparison Tool
+Compares finished analysis tasks side by side: review counts, mean
+sentiment, and per-aspect mentions and sentiment. Only the tasks' small
+summary artifacts are read, so a comparison is cheap enough to run inside
+the orchestrator once its dependencies complete.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import plotly.graph_objects as go
+
+from trendvisor.tools.report_renderer import ReportRenderer, bar_chart, review_count_label
+
+
+def _load_json(path: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not path or not os.path.isfile(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def task_summary(label: str, artifacts: Dict[str, str]) -> Dict[str, Any]:
+    """The comparable numbers of one analysis task, from its text-analytics and full-analysis artifacts."""
+    text = _load_json(artifacts.get('text_analytics_path')) or {}
+    full = _load_json(artifacts.get('full_analysis_path')) or {}
+    unique = text.get("reviews", 0)
+    return {
+        "label": label,
+        # Near-duplicates count once per review they stand for, as in the task's own report
+        "reviews": round(text.get("weighted_reviews", unique)),
+        "unique_reviews": unique,
+        "mean_sentiment": (text.get("sentiment") or {}).get("mean"),
+        "ensemble_r2": full.get("ensemble_r2"),
+        "aspects": text.get("aspects", {}),
+        "top_keywords": [term for term, _ in text.get("top_keywords", [])[:10]],
+    }
+
+
+def compare_tasks(task_id: str, tasks: Dict[str, Dict[str, Any]], output_dir: str) -> Dict[str, str]:
+    """
+    Writes the comparison of `tasks` (task id -> {"label", "artifacts"}) as
+    `<task_id>_comparison.json` and `<task_id>_report.html`.
+
+    Returns:
+        The comparison task's artifacts.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summaries: List[Dict[str, Any]] = [
+        dict(task_summary(task["label"], task["artifacts"]), task_id=dependency)
+        for dependency, task in tasks.items()
+    ]
+    comparison_path = os.path.join(output_dir, f"{task_id}_comparison.json")
+    with open(comparison_path, 'w', encoding='utf-8') as f:
+        json.dump({"task_id": task_id, "tasks": summaries}, f, ensure_ascii=False, indent=2)
+
+    labels = [summary["label"] for summary in summaries]
+    report = ReportRenderer(f"Trendvisor Comparison - {len(summaries)} analyses")
+    for summary in summaries:
+        report.add_metric(summary["label"], review_count_label(summary["reviews"], summary["unique_reviews"]))
+    report.add_chart("Reviews Analyzed", bar_chart(labels, [s["reviews"] for s in summaries]))
+    report.add_chart("Mean Sentiment", bar_chart(
+        labels, [s["mean_sentiment"] or 0.0 for s in summaries],
+        color=[s["mean_sentiment"] or 0.0 for s in summaries], colorscale='RdYlGn', cmin=-1, cmax=1,
+    ))
+
+    aspects = sorted({aspect for s in summaries for aspect in s["aspects"]})
+    if aspects:
+        share = go.Figure([
+            go.Bar(name=s["label"], x=aspects, y=[(s["aspects"].get(a) or {}).get("share", 0.0) for a in aspects])
+            for s in summaries
+        ])
+        report.add_chart("Aspect Mentions per Review", share)
+        sentiment = go.Figure([
+            go.Bar(name=s["label"], x=aspects,
+                   y=[(s["aspects"].get(a) or {}).get("mean_sentiment") or 0.0 for a in aspects])
+            for s in summaries
+        ])
+        report.add_chart("Aspect Sentiment", sentiment)
+        for fig in (share, sentiment):
+            fig.update_layout(barmode='group', showlegend=True)
+
+    report_path = report.render(os.path.join(output_dir, f"{task_id}_report.html"))
+    return {"comparison_path": comparison_path, "report_path": report_path}
@@ -0,0 +1,295 @@
+"""
+Trendvisor Near-Duplicate Detection
+Finds templated and syndicated near-duplicate reviews with MinHash
+signatures and locality-sensitive hashing (LSH), so that analysis can run
+on one representative per duplicate cluster, weighted by the cluster size.
+
+Exact duplicates (after normalization) are collapsed first. The remaining
+texts are split into byte k-gram shingles, and each MinHash permutation is
+one vectorized pass over all shingles of a batch. Signatures are then
+banded, and reviews that share any band become candidates. Candidates are
+verified against the estimated Jaccard similarity and grouped into
+connected components. Every step is a sort or a linear pass, so the cost
+grows roughly linearly with the number of reviews.
+
+Usage:
+    python -m trendvisor.tools.dedup data/reviews.json --threshold 0.8
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+# Allow running as a plain script
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+DEDUP_VERSION = "1"
+
+_ROLLING_MULTIPLIER = np.uint32(0x01000193)  # FNV prime, for the k-gram hash
+
+
+def _mix32(x: np.ndarray) -> np.ndarray:
+    """MurmurHash3's 32-bit finalizer: spreads every input bit over the whole word."""
+    x = x ^ (x >> np.uint32(16))
+    x = x * np.uint32(0x85EBCA6B)
+    x = x ^ (x >> np.uint32(13))
+    x = x * np.uint32(0xC2B2AE35)
+    return x ^ (x >> np.uint32(16))
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lower-cases and collapses whitespace, so formatting differences do not matter."""
+    return " ".join((text or "").lower().split())
+
+
+def shingles(text: str, shingle_size: int = 5) -> Set[bytes]:
+    """The byte k-gram shingle set of a normalized text (the exact counterpart of the MinHash input)."""
+    encoded = normalize(text).encode("utf-8").ljust(shingle_size)
+    return {encoded[i:i + shingle_size] for i in range(len(encoded) - shingle_size + 1)}
+
+
+def jaccard(a: Set[bytes], b: Set[bytes]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def lsh_parameters(threshold: float, num_perm: int, false_negative_weight: float = 0.9) -> Tuple[int, int]:
+    """
+    Chooses (bands, rows) with bands * rows <= num_perm that minimize the
+    weighted false-positive and false-negative probability mass around
+    `threshold`. Candidates are verified afterwards, so false positives
+    only cost time and false negatives are weighted more heavily.
+    """
+    similarity = np.linspace(0.0, 1.0, 1001)
+    best, best_error = (1, num_perm), float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        candidate = 1.0 - (1.0 - similarity ** rows) ** bands
+        error = np.where(similarity < threshold,
+                         (1.0 - false_negative_weight) * candidate,
+                         false_negative_weight * (1.0 - candidate)).mean()
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+@dataclass
+class DedupResult:
+    """Duplicate clusters over the input order."""
+    labels: np.ndarray           # (n,) cluster id per review
+    representatives: np.ndarray  # (k,) first review index of each cluster, ascending
+    weights: np.ndarray          # (k,) cluster size per representative
+
+    @property
+    def duplicates(self) -> int:
+        return len(self.labels) - len(self.representatives)
+
+    def clusters(self) -> List[np.ndarray]:
+        """The member indices of every cluster with more than one review."""
+        order = np.argsort(self.labels, kind="stable")
+        boundaries = np.flatnonzero(np.diff(self.labels[order])) + 1
+        return [group for group in np.split(order, boundaries) if len(group) > 1]
+
+
+class MinHashDeduplicator:
+    """
+    MinHash/LSH near-duplicate detector.
+
+    Args:
+        threshold: Jaccard similarity (over shingles) above which two
+            reviews are considered duplicates.
+        num_perm: Number of MinHash permutations (signature length).
+        shingle_size: Shingle length in bytes of normalized text.
+        batch_size: Reviews per signature batch; bounds peak memory.
+        seed: Seed for the hash permutations.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, shingle_size: int = 5,
+                 batch_size: int = 20000, seed: int = 1):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.batch_size = batch_size
+        self.bands, self.rows = lsh_parameters(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        # Permutation j of uint32: x -> xorshift(a_j * x + b_j), a bijection for odd a_j.
+        self._a = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint32) | np.uint32(1)
+        self._b = rng.integers(0, 2 ** 32, num_perm, dtype=np.uint32)
+
+    def _shingle_hashes(self, encoded: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hashes every k-gram of a batch of non-empty normalized texts.
+
+        Returns:
+            The mixed shingle hashes (uint32) in document order, and the start of each document's run.
+        """
+        k = self.shingle_size
+        encoded = [e.ljust(k) for e in encoded]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+        n_windows = len(buffer) - k + 1
+        hashes = np.zeros(n_windows, dtype=np.uint32)
+        for j in range(k):
+            hashes = hashes * _ROLLING_MULTIPLIER + buffer[j:j + n_windows]
+        # Keep only windows that lie entirely inside one document.
+        doc_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        windows_per_doc = lengths - k + 1
+        run_starts = np.concatenate(([0], np.cumsum(windows_per_doc)[:-1]))
+        positions = np.arange(windows_per_doc.sum()) + np.repeat(doc_starts - run_starts, windows_per_doc)
+        return _mix32(hashes[positions]), run_starts
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """MinHash signatures (n, num_perm) of non-empty texts, computed batch by batch."""
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = [normalize(t).encode("utf-8") for t in texts[start:start + self.batch_size]]
+            hashes, run_starts = self._shingle_hashes(batch)
+            # uint32 arithmetic into preallocated buffers: the permutations are memory-bound.
+            permuted, shifted = np.empty_like(hashes), np.empty_like(hashes)
+            for j in range(self.num_perm):
+                np.multiply(hashes, self._a[j], out=permuted)
+                np.add(permuted, self._b[j], out=permuted)
+                np.right_shift(permuted, np.uint32(15), out=shifted)
+                np.bitwise_xor(permuted, shifted, out=permuted)
+                signatures[start:start + len(batch), j] = np.minimum.reduceat(permuted, run_starts)
+        return signatures
+
+    def _candidate_edges(self, signatures: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Links every review to the first review sharing one of its LSH bands."""
+        n = len(signatures)
+        sources, targets = [], []
+        for band in range(self.bands):
+            block = np.ascontiguousarray(signatures[:, band * self.rows:(band + 1) * self.rows])
+            keys = block.view(np.dtype((np.void, block.dtype.itemsize * self.rows))).ravel()
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            partner = first[inverse.ravel()]
+            linked = partner != np.arange(n)
+            sources.append(np.flatnonzero(linked))
+            targets.append(partner[linked])
+        if not sources:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        edges = np.unique(np.stack([np.concatenate(sources), np.concatenate(targets)], axis=1), axis=0)
+        return edges[:, 0], edges[:, 1]
+
+    def _verify(self, signatures: np.ndarray, sources: np.ndarray, targets: np.ndarray,
+                chunk: int = 100000) -> np.ndarray:
+        """Keeps candidate edges whose estimated Jaccard similarity reaches the threshold."""
+        keep = np.zeros(len(sources), dtype=bool)
+        for start in range(0, len(sources), chunk):
+            u, v = sources[start:start + chunk], targets[start:start + chunk]
+            keep[start:start + chunk] = (signatures[u] == signatures[v]).mean(axis=1) >= self.threshold
+        return keep
+
+    def deduplicate(self, texts: Sequence[str]) -> DedupResult:
+        """Clusters `texts` into near-duplicate groups."""
+        return self.deduplicate_chunks([texts])
+
+    def deduplicate_chunks(self, chunks: Iterable[Sequence[str]]) -> DedupResult:
+        """
+        Clusters a stream of text chunks (in order) into near-duplicate
+        groups. Only an 8-byte digest per review and one signature per
+        distinct text are kept, never the texts themselves.
+        """
+        # 1. Exact duplicates after normalization collapse for free.
+        unique_ids: Dict[bytes, int] = {}
+        inverse_parts, candidate_parts, signature_parts = [], [], []
+        for chunk in chunks:
+            inverse = np.empty(len(chunk), dtype=np.int64)
+            new_texts, new_ids = [], []
+            for i, text in enumerate(chunk):
+                normalized = normalize(text)
+                digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+                unique_id = unique_ids.get(digest)
+                if unique_id is None:
+                    unique_id = unique_ids[digest] = len(unique_ids)
+                    if normalized:
+                        new_texts.append(normalized)
+                        new_ids.append(unique_id)
+                inverse[i] = unique_id
+            inverse_parts.append(inverse)
+            if new_texts:
+                candidate_parts.append(np.array(new_ids, dtype=np.int64))
+                signature_parts.append(self.signatures(new_texts))
+        unique_inverse = np.concatenate(inverse_parts) if inverse_parts else np.zeros(0, dtype=np.int64)
+        n_unique = len(unique_ids)
+        del unique_ids
+
+        # 2. MinHash + LSH over the distinct non-empty texts.
+        unique_labels = np.arange(n_unique)
+        candidates = np.concatenate(candidate_parts) if candidate_parts else np.zeros(0, dtype=np.int64)
+        if len(candidates) > 1:
+            signatures = np.concatenate(signature_parts)
+            del signature_parts
+            sources, targets = self._candidate_edges(signatures)
+            keep = self._verify(signatures, sources, targets)
+            graph = sp.coo_matrix(
+                (np.ones(int(keep.sum()), dtype=np.int8), (sources[keep], targets[keep])),
+                shape=(len(candidates), len(candidates)),
+            )
+            _, components = connected_components(graph, directed=False)
+            # Relabel each component by its smallest member's unique id.
+            component_root = np.full(components.max() + 1, n_unique, dtype=np.int64)
+            np.minimum.at(component_root, components, candidates)
+            unique_labels[candidates] = component_root[components]
+
+        # 3. Map back to reviews; each cluster is represented by its first review.
+        labels = unique_labels[unique_inverse]
+        _, first, inverse, weights = np.unique(labels, return_index=True, return_inverse=True, return_counts=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        labels, representatives, weights = rank[inverse.ravel()], first[order], weights[order]
+        return DedupResult(labels=labels, representatives=representatives, weights=weights)
+
+
+def duplicates_artifact(result: DedupResult, ids: Optional[Sequence[Any]] = None,
+                        threshold: Optional[float] = None) -> Dict[str, Any]:
+    """A JSON-serializable description of the duplicate clusters (members listed by id, or by row)."""
+    def name(index: int):
+        return str(ids[index]) if ids is not None else int(index)
+
+    clusters = sorted(result.clusters(), key=len, reverse=True)
+    return {
+        "version": DEDUP_VERSION,
+        "threshold": threshold,
+        "reviews": int(len(result.labels)),
+        "representatives": int(len(result.representatives)),
+        "duplicates": int(result.duplicates),
+        "clusters": [
+            {"representative": name(int(group[0])), "size": int(len(group)),
+             "members": [name(int(i)) for i in group]}
+            for group in clusters
+        ],
+    }
+
+
+if __name__ == '__main__':
+    from trendvisor.tools.aggregates import review_text
+    from trendvisor.tools.review_io import iter_reviews
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate reviews with MinHash/LSH.")
+    parser.add_argument("input", help="Input JSON or NDJSON review file.")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Jaccard similarity threshold.")
+    parser.add_argument("--num-perm", type=int, default=64, help="MinHash signature length.")
+    parser.add_argument("--output", help="Where to write the clusters as JSON (default: stdout).")
+    args = parser.parse_args()
+
+    reviews = list(iter_reviews(args.input))
+    deduplicator = MinHashDeduplicator(threshold=args.threshold, num_perm=args.num_perm)
+    result = deduplicator.deduplicate([review_text(r) for r in reviews])
+    artifact = duplicates_artifact(result, [r.get("id", i) for i, r in enumerate(reviews)], args.threshold)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f, ensure_ascii=False, indent=2)
+        print(f"{artifact['duplicates']} duplicates in {len(artifact['clusters'])} clusters -> {args.output}")
+    else:
+        print(json.dumps(artifact, ensure_ascii=False, indent=2))
@@ -0,0 +1,154 @@
+"""
+Trendvisor Feature Cache
+A persistent, size-bounded cache of per-review derived features, keyed by
+(review id, content hash, feature-extractor version). Re-analyzing a product
+only computes features for reviews that are new or whose text changed.
+Entries are evicted least-recently-used once the cache exceeds
+`max_entries`. The row count is kept by triggers in `feature_count`, so
+checking the bound does not scan the table.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', '.feature_cache.sqlite3')
+
+# (review_id, content_hash)
+CacheKey = Tuple[str, bytes]
+
+# Keeps each SQL statement well under SQLite's bound-parameter limit.
+_QUERY_CHUNK = 400
+
+
+def content_hash(text: str) -> bytes:
+    """A short, stable digest of a review's text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class FeatureCache:
+    """SQLite-backed LRU cache of opaque per-review feature payloads."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, version: str = "1", max_entries: int = 1_000_000):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS features (
+                review_id TEXT NOT NULL,
+                content_hash BLOB NOT NULL,
+                version TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                last_access INTEGER NOT NULL,
+                PRIMARY KEY (review_id, content_hash, version)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS features_lru ON features (last_access)")
+        self._conn.commit()
+        self._create_counter()
+
+    def _create_counter(self):
+        """Adds the row counter, counting the existing rows once, in the same transaction as its triggers."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS feature_count (n INTEGER NOT NULL)")
+            if self._conn.execute("SELECT 1 FROM feature_count").fetchone() is None:
+                self._conn.execute("INSERT INTO feature_count SELECT COUNT(*) FROM features")
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS features_inserted AFTER INSERT ON features
+                BEGIN UPDATE feature_count SET n = n + 1; END
+            """)
+            self._conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS features_deleted AFTER DELETE ON features
+                BEGIN UPDATE feature_count SET n = n - 1; END
+            """)
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[CacheKey]) -> List[Optional[bytes]]:
+        """Looks up payloads for `keys`, returning None for misses, and refreshes hits."""
+        found = {}
+        now = time.time_ns()
+        with self._lock:
+            for start in range(0, len(keys), _QUERY_CHUNK):
+                chunk = keys[start:start + _QUERY_CHUNK]
+                placeholders = ",".join("(?, ?)" for _ in chunk)
+                params = [value for key in chunk for value in key]
+                rows = self._conn.execute(
+                    f"SELECT review_id, content_hash, payload FROM features "
+                    f"WHERE version = ? AND (review_id, content_hash) IN (VALUES {placeholders})",
+                    [self.version] + params,
+                ).fetchall()
+                for review_id, digest, payload in rows:
+                    found[(review_id, bytes(digest))] = payload
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE features SET last_access = ? "
+                        f"WHERE version = ? AND (review_id, content_hash) IN (VALUES {placeholders})",
+                        [now, self.version] + params,
+                    )
+            self._conn.commit()
+        results = [found.get((key[0], key[1])) for key in keys]
+        hits = sum(1 for payload in results if payload is not None)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return results
+
+    def put_many(self, items: Iterable[Tuple[CacheKey, bytes]]):
+        """Stores payloads, then evicts least-recently-used entries beyond `max_entries`."""
+        now = time.time_ns()
+        rows = [(review_id, digest, self.version, payload, now) for (review_id, digest), payload in items]
+        if not rows:
+            return
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: REPLACE's implicit delete would not fire the count trigger
+            self._conn.executemany(
+                "INSERT INTO features (review_id, content_hash, version, payload, last_access) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (review_id, content_hash, version) "
+                "DO UPDATE SET payload = excluded.payload, last_access = excluded.last_access",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT n FROM feature_count").fetchone()
+        if count <= self.max_entries:
+            return
+        # Recount before deleting: writers that predate the counter may have skewed it
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM features").fetchone()
+        self._conn.execute("UPDATE feature_count SET n = ?", (count,))
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        # Trim 10% below the cap so eviction does not run on every put.
+        excess += self.max_entries // 10
+        cursor = self._conn.execute("""
+            DELETE FROM features WHERE (review_id, content_hash, version) IN (
+                SELECT review_id, content_hash, version FROM features ORDER BY last_access LIMIT ?
+            )
+        """, (excess,))
+        self.evictions += cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
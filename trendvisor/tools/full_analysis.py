@@ -0,0 +1,320 @@
+"""
+Trendvisor Full Analysis
+Rating prediction and customer segmentation that stay fast on large
+datasets:
+
+- Models are fitted on a fixed-seed row sample, which is the same sample
+  whether the data arrives in one frame or in chunks.
+- RandomForest and GradientBoosting are fitted in parallel, and the forest
+  also builds its trees with `n_jobs`.
+- Segments come from MiniBatchKMeans. The number of segments is picked by
+  silhouette score on a small fixed-seed subsample, since silhouette is
+  O(n^2).
+- The 2-D embedding runs PCA first, then t-SNE on a small fixed-seed
+  subsample.
+
+Each stage has a wall-clock budget. A small pilot run estimates the
+stage's full cost; when the estimate exceeds the remaining budget, the stage
+degrades to a cheaper approximation (fewer rows, a linear model, a fixed
+k or a PCA projection) instead of stalling the pipeline.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.decomposition import PCA
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.manifold import TSNE
+from sklearn.metrics import mean_squared_error, r2_score, silhouette_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+FEATURE_COLUMNS = ["sentiment", "word_count", "review_length"]
+TARGET_COLUMN = "rating"
+WEIGHT_COLUMN = "weight"
+
+DEFAULT_STAGE_BUDGETS = {"models": 30.0, "segments": 10.0, "embedding": 15.0}
+
+# Assumed growth of each stage's cost with its row count, used to
+# extrapolate from the pilot run.
+_MODEL_COST_EXPONENT = 1.1   # tree ensembles: ~n log n
+_KMEANS_COST_EXPONENT = 1.0
+_TSNE_COST_EXPONENT = 1.2    # Barnes-Hut t-SNE: ~n log n, with a large constant
+
+
+def _row_keys(start: int, n: int, seed: int) -> np.ndarray:
+    """A pseudo-random key per global row index (splitmix64), independent of how rows are chunked."""
+    x = np.arange(start, start + n, dtype=np.uint64) + np.uint64(seed * 0x9E3779B97F4A7C15 % (1 << 64))
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class RowSampler:
+    """
+    Keeps a fixed-seed uniform sample of at most `size` rows over a stream
+    of chunks: the rows with the smallest keys. Memory is bounded by
+    `size` plus one chunk.
+    """
+
+    def __init__(self, size: int, columns: List[str], seed: int = 42):
+        self.size = size
+        self.columns = columns
+        self.seed = seed
+        self._sample: Optional[pd.DataFrame] = None
+
+    def add(self, chunk: pd.DataFrame, offset: int):
+        """Offers the rows of a chunk that starts at global row `offset`."""
+        columns = [c for c in self.columns if c in chunk.columns]
+        candidate = chunk[columns].copy()
+        candidate["_key"] = _row_keys(offset, len(chunk), self.seed)
+        candidate["_row"] = np.arange(offset, offset + len(chunk))
+        if self._sample is not None:
+            candidate = pd.concat([self._sample, candidate], ignore_index=True)
+        if len(candidate) > self.size:
+            candidate = candidate.nsmallest(self.size, "_key")
+        self._sample = candidate
+
+    def sample(self) -> pd.DataFrame:
+        """The sampled rows, in their original order."""
+        if self._sample is None:
+            return pd.DataFrame(columns=self.columns)
+        return self._sample.sort_values("_row").drop(columns=["_key", "_row"]).reset_index(drop=True)
+
+
+def subsample(n: int, size: int, seed: int) -> np.ndarray:
+    """Fixed-seed row indices for a subsample of at most `size` of `n` rows, in order."""
+    if n <= size:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, size, replace=False))
+
+
+@dataclass
+class StageBudget:
+    """Wall-clock budget of one stage, with pilot-based cost estimates."""
+    name: str
+    seconds: float
+    started: float = field(default_factory=time.perf_counter)
+    degraded: List[str] = field(default_factory=list)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.seconds - self.elapsed)
+
+    def affordable_rows(self, pilot_seconds: float, pilot_rows: int, exponent: float) -> int:
+        """How many rows fit in the remaining budget, extrapolating from a pilot run."""
+        if pilot_seconds <= 0:
+            return np.iinfo(np.int64).max
+        return int(pilot_rows * (self.remaining / pilot_seconds) ** (1.0 / exponent))
+
+    def degrade(self, reason: str):
+        self.degraded.append(reason)
+
+    def report(self) -> Dict[str, Any]:
+        return {"budget_s": self.seconds, "elapsed_s": round(self.elapsed, 3), "degraded": self.degraded}
+
+
+def _timed(fn: Callable, *args, **kwargs) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _fit(model, X, y, sample_weight):
+    return model.fit(X, y, sample_weight=sample_weight)
+
+
+def _tree_models(n_jobs: int, seed: int) -> Dict[str, Any]:
+    return {
+        "RandomForest": RandomForestRegressor(n_estimators=100, max_depth=12, min_samples_leaf=5,
+                                              n_jobs=n_jobs, random_state=seed),
+        "GradientBoosting": GradientBoostingRegressor(n_estimators=100, max_depth=3, random_state=seed),
+    }
+
+
+def fit_rating_models(X: np.ndarray, y: np.ndarray, weights: Optional[np.ndarray], budget: StageBudget,
+                      n_jobs: int = -1, seed: int = 42, pilot_rows: int = 2000) -> Tuple[Dict[str, Any], Optional[float]]:
+    """
+    Fits rating regressors in parallel and scores them and their averaged
+    ensemble on a held-out split.
+
+    Returns:
+        Per-model metrics, and the ensemble R^2 (None if there is too little data).
+    """
+    if len(X) < 20 or np.unique(y).size < 2:
+        budget.degrade("skipped: too few rows or a constant rating")
+        return {}, None
+    w = weights if weights is not None else np.ones(len(y))
+    X_train, X_test, y_train, y_test, w_train, _ = train_test_split(X, y, w, test_size=0.2, random_state=seed)
+
+    # Pilot: fit the real models on a small sample to estimate the full cost.
+    pilot = subsample(len(X_train), pilot_rows, seed)
+    pilot_models = _tree_models(n_jobs, seed)
+    _, pilot_seconds = _timed(
+        Parallel(n_jobs=len(pilot_models), prefer="threads"),
+        (delayed(_fit)(m, X_train[pilot], y_train[pilot], w_train[pilot]) for m in pilot_models.values()),
+    )
+    rows = budget.affordable_rows(pilot_seconds, len(pilot), _MODEL_COST_EXPONENT)
+    if rows < len(pilot):
+        budget.degrade(f"tree models over budget even on {len(pilot)} rows; using Ridge regression")
+        models = {"Ridge": Ridge(alpha=1.0)}
+        fit_rows = np.arange(len(X_train))
+    else:
+        models = _tree_models(n_jobs, seed)
+        fit_rows = subsample(len(X_train), rows, seed)
+        if len(fit_rows) < len(X_train):
+            budget.degrade(f"fitted on {len(fit_rows)} of {len(X_train)} training rows")
+
+    fitted = Parallel(n_jobs=len(models), prefer="threads")(
+        delayed(_fit)(m, X_train[fit_rows], y_train[fit_rows], w_train[fit_rows]) for m in models.values()
+    )
+    summary, predictions = {}, []
+    for name, model in zip(models, fitted):
+        predicted = model.predict(X_test)
+        predictions.append(predicted)
+        summary[name] = {
+            "R2": float(r2_score(y_test, predicted)),
+            "RMSE": float(np.sqrt(mean_squared_error(y_test, predicted))),
+            "train_rows": int(len(fit_rows)),
+        }
+    ensemble_r2 = float(r2_score(y_test, np.mean(predictions, axis=0)))
+    return summary, ensemble_r2
+
+
+def segment_reviews(X_scaled: np.ndarray, budget: StageBudget, k_range: Tuple[int, int] = (2, 6),
+                    default_k: int = 4, silhouette_rows: int = 2000, seed: int = 42) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    Clusters rows with MiniBatchKMeans. k is chosen by silhouette score on
+    a fixed-seed subsample, falling back to `default_k` when the search
+    does not fit in the budget.
+
+    Returns:
+        The label of every row and the segment details.
+    """
+    n = len(X_scaled)
+    if n < 2 * k_range[0]:
+        budget.degrade("skipped: too few rows")
+        return np.zeros(n, dtype=int), {"Total Segments": 1, "Segment Sizes": [n]}
+
+    def kmeans(k):
+        return MiniBatchKMeans(n_clusters=k, batch_size=4096, n_init=3, random_state=seed)
+
+    sample = X_scaled[subsample(n, silhouette_rows, seed)]
+    best_k, scores = default_k, {}
+    for k in range(k_range[0], min(k_range[1], len(sample) - 1) + 1):
+        if budget.remaining < budget.seconds / 2:
+            budget.degrade(f"k search stopped at k={k - 1}")
+            break
+        labels = kmeans(k).fit_predict(sample)
+        if np.unique(labels).size > 1:
+            scores[k] = float(silhouette_score(sample, labels, random_state=seed))
+    if scores:
+        best_k = max(scores, key=scores.get)
+    best_k = min(best_k, n)
+
+    # Pilot on a sample, then fit on as many rows as the budget allows and predict the rest.
+    pilot = subsample(n, 10000, seed)
+    _, pilot_seconds = _timed(kmeans(best_k).fit, X_scaled[pilot])
+    rows = max(len(pilot), budget.affordable_rows(pilot_seconds, len(pilot), _KMEANS_COST_EXPONENT))
+    fit_rows = subsample(n, rows, seed)
+    if len(fit_rows) < n:
+        budget.degrade(f"fitted on {len(fit_rows)} of {n} rows")
+    model = kmeans(best_k).fit(X_scaled[fit_rows])
+    labels = model.predict(X_scaled)
+    sizes = np.bincount(labels, minlength=best_k)
+    return labels, {
+        "Total Segments": int(best_k),
+        "Segment Sizes": sizes.tolist(),
+        "Silhouette": scores,
+    }
+
+
+def embed_2d(X_scaled: np.ndarray, budget: StageBudget, max_points: int = 1000,
+             seed: int = 42) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Projects a fixed-seed subsample to 2-D: PCA first, then t-SNE if a
+    pilot says it fits in the budget, otherwise the PCA projection itself.
+
+    Returns:
+        The embedded row indices, their 2-D coordinates and the method used.
+    """
+    rows = subsample(len(X_scaled), max_points, seed)
+    points = X_scaled[rows]
+    n_components = min(10, points.shape[1], len(points))
+    reduced = PCA(n_components=n_components, random_state=seed).fit_transform(points)
+    if reduced.shape[1] < 2 or len(points) < 10:
+        budget.degrade("PCA only: too few rows or features for t-SNE")
+        return rows, np.pad(reduced, ((0, 0), (0, max(0, 2 - reduced.shape[1]))))[:, :2], "pca"
+
+    def tsne(data):
+        perplexity = min(30.0, (len(data) - 1) / 3)
+        return TSNE(n_components=2, perplexity=perplexity, init="pca", random_state=seed).fit_transform(data)
+
+    pilot = subsample(len(reduced), 200, seed)
+    _, pilot_seconds = _timed(tsne, reduced[pilot])
+    affordable = budget.affordable_rows(pilot_seconds, len(pilot), _TSNE_COST_EXPONENT)
+    if affordable < len(pilot):
+        budget.degrade("t-SNE over budget; using the PCA projection")
+        return rows, reduced[:, :2], "pca"
+    if affordable < len(reduced):
+        budget.degrade(f"t-SNE on {affordable} of {len(reduced)} sampled points")
+        keep = subsample(len(reduced), affordable, seed)
+        rows, reduced = rows[keep], reduced[keep]
+    return rows, tsne(reduced), "tsne"
+
+
+def full_analysis(sample: pd.DataFrame, budgets: Optional[Dict[str, float]] = None, n_jobs: int = -1,
+                  seed: int = 42) -> Dict[str, Any]:
+    """
+    Runs rating prediction, segmentation and the 2-D embedding over a
+    (sampled) frame with FEATURE_COLUMNS, TARGET_COLUMN and optionally
+    WEIGHT_COLUMN.
+
+    Returns:
+        A JSON-serializable summary, including per-stage timings and any
+        degradations applied.
+    """
+    budgets = {**DEFAULT_STAGE_BUDGETS, **(budgets or {})}
+    features = [c for c in FEATURE_COLUMNS if c in sample.columns]
+    data = sample.dropna(subset=features + [TARGET_COLUMN]) if features else sample.iloc[0:0]
+    result: Dict[str, Any] = {"rows": int(len(data)), "features": features, "stages": {}}
+    if not features or len(data) < 10:
+        result["skipped"] = "not enough rows or features"
+        return result
+
+    X = data[features].to_numpy(dtype=np.float64)
+    y = data[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    weights = data[WEIGHT_COLUMN].to_numpy(dtype=np.float64) if WEIGHT_COLUMN in data.columns else None
+
+    stage = StageBudget("models", budgets["models"])
+    result["models"], result["ensemble_r2"] = fit_rating_models(X, y, weights, stage, n_jobs=n_jobs, seed=seed)
+    result["stages"]["models"] = stage.report()
+
+    X_scaled = StandardScaler().fit_transform(X)
+    stage = StageBudget("segments", budgets["segments"])
+    labels, result["segments"] = segment_reviews(X_scaled, stage, seed=seed)
+    result["segments"]["Mean Rating"] = [
+        float(y[labels == k].mean()) if np.any(labels == k) else None
+        for k in range(result["segments"]["Total Segments"])
+    ]
+    result["stages"]["segments"] = stage.report()
+
+    stage = StageBudget("embedding", budgets["embedding"])
+    rows, coordinates, method = embed_2d(X_scaled, stage, seed=seed)
+    result["embedding"] = {
+        "method": method,
+        "x": coordinates[:, 0].round(4).tolist(),
+        "y": coordinates[:, 1].round(4).tolist(),
+        "segment": labels[rows].tolist(),
+    }
+    result["stages"]["embedding"] = stage.report()
+    return result
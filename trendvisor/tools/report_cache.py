@@ -0,0 +1,157 @@
+"""
+Trendvisor Report Cache
+A content-addressed cache of rendered analysis outputs. Entries are keyed
+by a digest of the dataset bytes, the analysis parameters and the tool
+version, so a task whose inputs match an earlier one can reuse its report
+without running the analysis. Each entry is a directory under
+`results/.cache/<key>/` holding the cached files and a manifest; once the
+cache exceeds `max_bytes`, least-recently-used entries are removed.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+REPORT_CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'results', '.cache')
+MANIFEST_NAME = "manifest.json"
+
+_READ_BLOCK = 1 << 20
+
+
+def _hash_file(digest, path: str):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            digest.update(block)
+
+
+def dataset_digest(path: str) -> str:
+    """Hashes a dataset's bytes: a single file, or every file of a dataset directory (e.g. `.tvcol`)."""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode("utf-8") + b"\0")
+                _hash_file(digest, file_path)
+    else:
+        _hash_file(digest, path)
+    return digest.hexdigest()
+
+
+def cache_key(input_path: str, params: Dict[str, Any], tool_version: str) -> str:
+    """The content address of an analysis: dataset bytes + parameters + tool version."""
+    digest = hashlib.sha256()
+    digest.update(dataset_digest(input_path).encode("ascii"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(tool_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _link_or_copy(src: str, dst: str):
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _tree_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _dirs, files in os.walk(path) for name in files
+    )
+
+
+class ReportCache:
+    """
+    Size-bounded, content-addressed store of analysis artifacts.
+
+    Cached files are stored read-only without their task prefix, and are
+    hard-linked (or copied, across filesystems) back out under the new
+    task's name.
+    """
+
+    def __init__(self, directory: str = REPORT_CACHE_DIR, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str, task_id: str, output_dir: str) -> Optional[Dict[str, str]]:
+        """
+        Materializes a cached entry for `task_id` in `output_dir`.
+
+        Returns:
+            The task artifacts, or None on a miss.
+        """
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+            artifacts = {}
+            for name, filename in manifest["files"].items():
+                target = os.path.join(output_dir, f"{task_id}_{filename}")
+                _link_or_copy(os.path.join(entry, filename), target)
+                artifacts[name] = target
+        except (OSError, ValueError, KeyError):
+            # Missing, half-evicted or unreadable entries are plain misses.
+            return None
+        os.utime(entry)  # Recency for LRU eviction
+        return artifacts
+
+    def put(self, key: str, task_id: str, artifacts: Dict[str, str]):
+        """Stores the file artifacts of a finished analysis under `key`, then enforces the size cap."""
+        prefix = f"{task_id}_"
+        files = {}
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.directory)
+        try:
+            for name, path in artifacts.items():
+                if not isinstance(path, str) or not os.path.isfile(path):
+                    continue  # Counters and other non-file artifacts are per-run
+                basename = os.path.basename(path)
+                filename = basename[len(prefix):] if basename.startswith(prefix) else basename
+                # Copied, not linked, so later writes to the task's own file cannot alter the entry.
+                cached = os.path.join(staging, filename)
+                shutil.copyfile(path, cached)
+                os.chmod(cached, 0o444)
+                files[name] = filename
+            with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+                json.dump({"task_id": task_id, "files": files}, f, indent=2)
+            try:
+                os.rename(staging, self._entry(key))
+            except OSError:
+                pass  # Another worker stored the same key first
+        finally:
+            if os.path.isdir(staging):
+                shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def evict(self) -> int:
+        """Removes least-recently-used entries until the cache fits in `max_bytes`; returns how many."""
+        with self._lock:
+            entries = []
+            for key in os.listdir(self.directory):
+                entry = self._entry(key)
+                if key.startswith(".") or not os.path.isdir(entry):
+                    continue
+                try:
+                    entries.append((os.path.getmtime(entry), _tree_size(entry), entry))
+                except OSError:
+                    continue
+            total = sum(size for _mtime, size, _entry in entries)
+            evicted = 0
+            for _mtime, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                evicted += 1
+            return evicted
@@ -0,0 +1,202 @@
+"""
+Trendvisor Report Renderer
+Renders analysis reports as one templated HTML page holding several small
+charts. Chart data is aggregated server-side (binned counts, downsampled
+time series), and every report references a single shared, versioned
+plotly.js asset instead of inlining the bundle, so a report's size and
+render time no longer depend on the number of reviews.
+"""
+import html
+import os
+import string
+import tempfile
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'results')
+ASSETS_DIRNAME = "assets"
+
+# Time-series frequencies to try, finest first, when downsampling.
+_SERIES_FREQUENCIES = (("D", "day"), ("W", "week"), ("MS", "month"), ("QS", "quarter"), ("YS", "year"))
+
+_PAGE_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>$title</title>
+    <script src="$plotlyjs_src"></script>
+    <style>
+        body { font-family: -apple-system, "Segoe UI", Roboto, sans-serif; margin: 24px; color: #222; }
+        .metrics { display: flex; flex-wrap: wrap; gap: 12px; padding: 0; list-style: none; }
+        .metrics li { background: #f4f6f8; border-radius: 6px; padding: 8px 14px; }
+        .charts { display: grid; grid-template-columns: repeat(auto-fit, minmax(480px, 1fr)); gap: 16px; }
+        .chart h2 { font-size: 1.05em; margin: 0 0 4px; }
+    </style>
+</head>
+<body>
+    <h1>$title</h1>
+    <ul class="metrics">
+$metrics
+    </ul>
+    <div class="charts">
+$charts
+    </div>
+</body>
+</html>
+""")
+
+
+def plotly_asset(output_dir: str = RESULTS_DIR) -> str:
+    """
+    Writes the shared plotly.js bundle (`assets/plotly-<version>.min.js`)
+    into `output_dir` if it is not there yet, and returns its path.
+    """
+    assets_dir = os.path.join(output_dir, ASSETS_DIRNAME)
+    path = os.path.join(assets_dir, f"plotly-{get_plotlyjs_version()}.min.js")
+    if not os.path.exists(path):
+        os.makedirs(assets_dir, exist_ok=True)
+        # Write then rename, so concurrent workers never reference a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=assets_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    return path
+
+
+def binned_counts(values, bins: int = 20, value_range: Optional[Tuple[float, float]] = None) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Histograms `values` server-side.
+
+    Returns:
+        Bin centers, counts and bin width.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return (edges[:-1] + edges[1:]) / 2, counts, float(edges[1] - edges[0])
+
+
+def value_counts(values) -> Tuple[List[float], List[int]]:
+    """Counts of each distinct value (e.g. star ratings), in value order."""
+    counts = pd.Series(values).dropna().value_counts().sort_index()
+    return counts.index.tolist(), counts.tolist()
+
+
+def downsample_series(dates, values=None, max_points: int = 200) -> Tuple[pd.DataFrame, str]:
+    """
+    Aggregates per-review dates (and optional values) into at most
+    `max_points` periods, using the finest of day/week/month/quarter/year
+    that fits.
+
+    Returns:
+        A frame indexed by period start with 'count' (and 'mean' when
+        `values` is given), and the period name.
+    """
+    days = pd.to_datetime(pd.Series(dates), errors="coerce").to_numpy().astype("datetime64[D]")
+    valid = ~np.isnat(days)
+    # Collapse to per-day totals first; the per-period resampling then only
+    # touches one row per distinct day rather than one per review.
+    day_numbers = days[valid].astype(np.int64)
+    first_day = int(day_numbers.min()) if len(day_numbers) else 0
+    day_of_review = day_numbers - first_day
+    n_days = int(day_of_review.max()) + 1 if len(day_of_review) else 0
+    day_index = np.datetime64(first_day, "D") + np.arange(n_days).astype("timedelta64[D]")
+    daily = pd.DataFrame({"count": np.bincount(day_of_review, minlength=n_days)},
+                         index=pd.DatetimeIndex(day_index))
+    if values is not None:
+        values = np.asarray(values, dtype=np.float64)[valid]
+        has_value = ~np.isnan(values)
+        daily["value_sum"] = np.bincount(day_of_review, weights=np.where(has_value, values, 0.0), minlength=n_days)
+        daily["value_count"] = np.bincount(day_of_review, weights=has_value, minlength=n_days)
+    return downsample_daily(daily, max_points)
+
+
+def downsample_daily(daily: pd.DataFrame, max_points: int = 200) -> Tuple[pd.DataFrame, str]:
+    """
+    Resamples per-day totals (a DatetimeIndex with 'count' and optionally
+    'value_sum'/'value_count' columns) to the finest period that fits in
+    `max_points`. See `downsample_series`.
+    """
+    daily = daily.sort_index()
+    for freq, period in _SERIES_FREQUENCIES:
+        series = daily.resample(freq).sum()
+        if len(series) <= max_points or freq == _SERIES_FREQUENCIES[-1][0]:
+            break
+    if "value_sum" in series:
+        series["mean"] = series.pop("value_sum") / series.pop("value_count").replace(0, np.nan)
+    return series[series["count"] > 0], period
+
+
+class ReportRenderer:
+    """Assembles pre-aggregated charts into one HTML page sharing a plotly.js asset."""
+
+    def __init__(self, title: str):
+        self.title = title
+        self.metrics: List[Tuple[str, str]] = []
+        self.charts: List[Tuple[str, go.Figure]] = []
+
+    def add_metric(self, label: str, value) -> "ReportRenderer":
+        self.metrics.append((label, str(value)))
+        return self
+
+    def add_chart(self, title: str, fig: go.Figure) -> "ReportRenderer":
+        fig.update_layout(margin=dict(l=40, r=20, t=20, b=40), height=360, showlegend=False)
+        self.charts.append((title, fig))
+        return self
+
+    def render(self, report_path: str, asset_path: Optional[str] = None) -> str:
+        """Writes the report and returns its path. The asset is referenced relative to the report."""
+        report_dir = os.path.dirname(os.path.abspath(report_path))
+        asset_path = asset_path or plotly_asset(report_dir)
+        plotlyjs_src = os.path.relpath(os.path.abspath(asset_path), report_dir).replace(os.sep, "/")
+        charts = "\n".join(
+            f'        <div class="chart"><h2>{html.escape(title)}</h2>\n'
+            + fig.to_html(full_html=False, include_plotlyjs=False, div_id=f"chart-{i}",
+                          config={"displaylogo": False, "responsive": True})
+            + "\n        </div>"
+            for i, (title, fig) in enumerate(self.charts)
+        )
+        metrics = "\n".join(
+            f"        <li><strong>{html.escape(label)}:</strong> {html.escape(value)}</li>"
+            for label, value in self.metrics
+        )
+        page = _PAGE_TEMPLATE.substitute(
+            title=html.escape(self.title),
+            plotlyjs_src=html.escape(plotlyjs_src),
+            metrics=metrics,
+            charts=charts,
+        )
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(page)
+        return report_path
+
+
+def review_count_label(total: int, unique: Optional[int] = None) -> str:
+    """'145 reviews', or '145 reviews (13 unique)' when near-duplicates were collapsed."""
+    if unique is None or unique == total:
+        return f"{total} reviews"
+    return f"{total} reviews ({unique} unique)"
+
+
+def bar_chart(labels: Sequence, counts: Sequence, **marker) -> go.Figure:
+    return go.Figure(go.Bar(x=list(labels), y=list(counts), marker=marker or None))
+
+
+def histogram_chart(centers: np.ndarray, counts: np.ndarray, width: float) -> go.Figure:
+    """A histogram drawn from pre-binned counts."""
+    return go.Figure(go.Bar(x=centers.tolist(), y=counts.tolist(), width=width))
+
+
+def series_chart(series: pd.DataFrame, value_name: Optional[str] = None) -> go.Figure:
+    """Review counts per period, with the per-period mean of a value on a second axis."""
+    fig = go.Figure(go.Bar(x=series.index, y=series["count"], name="Reviews"))
+    if value_name and "mean" in series:
+        fig.add_trace(go.Scatter(x=series.index, y=series["mean"], name=value_name,
+                                 mode="lines+markers", yaxis="y2"))
+        fig.update_layout(yaxis2=dict(overlaying="y", side="right", title=value_name))
+    return fig
@@ -0,0 +1,112 @@
+"""
+Trendvisor Review I/O
+Reading and writing review datasets. Collections append reviews as
+newline-delimited JSON (NDJSON) so that readers can consume byte ranges of
+a file while it is still being written; legacy datasets are a single JSON
+array.
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+
+# What may follow an element of a top-level JSON array
+_JSON_SEPARATORS = " \t\r\n,"
+_JSON_DELIMITERS = _JSON_SEPARATORS + "]"
+
+
+def is_ndjson(path: str) -> bool:
+    return path.endswith(NDJSON_EXTENSIONS)
+
+
+def append_reviews(path: str, reviews: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Appends reviews to an NDJSON file.
+
+    Returns:
+        The (start, end) byte offsets of the appended chunk.
+    """
+    lines = "".join(json.dumps(review, ensure_ascii=False) + "\n" for review in reviews)
+    with open(path, 'ab') as f:
+        start = f.tell()
+        f.write(lines.encode("utf-8"))
+        f.flush()
+        end = f.tell()
+    return start, end
+
+
+def read_review_range(path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Reads the reviews stored between two byte offsets of an NDJSON file."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+    return [json.loads(line) for line in chunk.splitlines() if line.strip()]
+
+
+def iter_json_array(path: str, block_size: int = 1 << 20) -> Iterator[Any]:
+    """
+    Yields the elements of a top-level JSON array incrementally, so memory
+    is bounded by the block size and the largest element rather than by
+    the file size.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(block_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} is not a JSON array")
+        position = 1
+        eof = False
+        while True:
+            # Skip separators; refill when the buffer runs dry.
+            while True:
+                while position < len(buffer) and buffer[position] in _JSON_SEPARATORS:
+                    position += 1
+                if position < len(buffer) or eof:
+                    break
+                buffer, position = f.read(block_size), 0
+                eof = not buffer
+            if position >= len(buffer):
+                raise ValueError(f"{path}: unterminated JSON array")
+            if buffer[position] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(block_size)
+                eof = not more
+                buffer, position = buffer[position:] + more, 0
+                continue
+            if not eof and (end == len(buffer) or buffer[end] not in _JSON_DELIMITERS):
+                # A number may continue in the next block (e.g. "-3" of "-3e10"); decode again with more input.
+                more = f.read(block_size)
+                if more:
+                    buffer, position = buffer[position:] + more, 0
+                    continue
+                eof = True
+            yield element
+            position = end
+
+
+def iter_reviews(path: str) -> Iterator[Dict[str, Any]]:
+    """Yields reviews one at a time from an NDJSON or JSON array file."""
+    if is_ndjson(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(path)
+
+
+def iter_review_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Yields lists of at most `chunk_size` reviews from an NDJSON or JSON array file."""
+    chunk: List[Dict[str, Any]] = []
+    for review in iter_reviews(path):
+        chunk.append(review)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
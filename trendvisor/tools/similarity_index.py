@@ -0,0 +1,515 @@
+"""
+Trendvisor Similarity Index
+A persistent nearest-neighbour index over the text of every collected
+review, for "reviews like this one" and "reviews mentioning this
+complaint" across all datasets without rescanning them.
+
+Reviews become hashed TF-IDF vectors (sublinear term frequencies of
+unigrams and bigrams, weighted by inverse document frequencies kept from
+every review indexed so far), compressed to `dims` dimensions by a signed
+hashing sketch and stored as float16 rows. Search is IVF: once enough rows
+exist, spherical k-means centroids partition them into inverted lists, and
+a query only scores the rows of its `nprobe` nearest lists. Datasets are
+added incrementally; rows are never rewritten except by rebuild().
+
+Writers (adding, training, rebuilding) hold an exclusive lock on
+`write.lock` and re-read the committed row count under it, so several
+processes can add to one index. Readers open it read-only and only see
+committed rows.
+
+Files in the index directory:
+    meta.sqlite3   review metadata and text, indexed datasets
+    vectors.f16    one row of `dims` float16 per review
+    lists.i32      each row's inverted list (-1 before training)
+    model.npz      document frequencies and IVF centroids
+    write.lock     held by the process writing to the index
+
+Usage:
+    python -m trendvisor.tools.similarity_index add data/
+    python -m trendvisor.tools.similarity_index search "greasy and broke me out" -k 5
+    python -m trendvisor.tools.similarity_index similar review_42
+"""
+import argparse
+import fcntl
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from trendvisor.tools.aggregates import review_text
+from trendvisor.tools.feature_cache import content_hash
+from trendvisor.tools.review_io import NDJSON_EXTENSIONS, iter_review_chunks
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data', '.similarity_index')
+
+N_FEATURES = 2 ** 18
+DIMS = 1024
+# IVF: train once this many rows exist, and retrain when the index has grown this many times since
+TRAIN_MIN_ROWS = 20000
+RETRAIN_GROWTH = 4
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+_BLOCK = 65536
+
+
+def default_nlist(rows: int) -> int:
+    """Number of inverted lists for `rows` vectors: about sqrt(rows)."""
+    return int(min(4096, max(16, np.sqrt(rows))))
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class ReviewVectorizer:
+    """Hashed TF-IDF of review text, sketched down to `dims` dense dimensions."""
+
+    def __init__(self, n_features: int = N_FEATURES, dims: int = DIMS, seed: int = 0):
+        self.n_features = n_features
+        self.dims = dims
+        self.seed = seed
+        self.hasher = HashingVectorizer(n_features=n_features, ngram_range=(1, 2), alternate_sign=False,
+                                        norm=None, stop_words="english", dtype=np.float32)
+        # Signed hashing sketch: every hashed term lands on one output dimension with a random sign,
+        # which preserves inner products in expectation.
+        rng = np.random.default_rng(seed)
+        self.sketch = sp.csr_matrix(
+            (rng.choice(np.array([-1.0, 1.0], dtype=np.float32), n_features),
+             (np.arange(n_features), rng.integers(0, dims, n_features))),
+            shape=(n_features, dims),
+        )
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+
+    def term_counts(self, texts: List[str]) -> sp.csr_matrix:
+        return self.hasher.transform(texts).tocsr()
+
+    def observe(self, counts: sp.csr_matrix):
+        """Adds documents to the document frequencies."""
+        self.df += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs += counts.shape[0]
+
+    def transform(self, counts: sp.csr_matrix) -> np.ndarray:
+        """Unit-length sketched TF-IDF vectors (float32) of hashed term counts."""
+        weighted = counts.copy()
+        idf = np.log((1.0 + self.n_docs) / (1.0 + self.df)) + 1.0
+        weighted.data = (1.0 + np.log(weighted.data)) * idf[weighted.indices].astype(np.float32)
+        return _normalize(np.asarray((weighted @ self.sketch).todense(), dtype=np.float32))
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Unit-length centroids of `data` (unit rows) under cosine similarity."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = nearest_centroid(data, centroids)
+        members = sp.csr_matrix((np.ones(len(data), dtype=np.float32), (assign, np.arange(len(data)))),
+                                shape=(k, len(data)))
+        sums = np.asarray(members @ data)
+        empty = np.asarray(members.sum(axis=1)).ravel() == 0
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums).astype(np.float32)
+    return centroids
+
+
+def nearest_centroid(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(np.asarray(data[start:start + _BLOCK], dtype=np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(data), _BLOCK)
+    ]).astype(np.int32) if len(data) else np.zeros(0, dtype=np.int32)
+
+
+class SimilarityIndex:
+    """Persistent IVF index of review vectors with their metadata."""
+
+    def __init__(self, directory: str = DEFAULT_INDEX_DIR, dims: int = DIMS, n_features: int = N_FEATURES,
+                 nprobe: int = 8, train_min_rows: int = TRAIN_MIN_ROWS, read_only: bool = False):
+        self.directory = directory
+        self.nprobe = nprobe
+        self.train_min_rows = train_min_rows
+        self.read_only = read_only
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(directory, "vectors.f16")
+        self._lists_path = os.path.join(directory, "lists.i32")
+        self._model_path = os.path.join(directory, "model.npz")
+        self._lock_path = os.path.join(directory, "write.lock")
+        meta_path = os.path.join(directory, "meta.sqlite3")
+        if read_only:
+            if not os.path.exists(meta_path):
+                raise FileNotFoundError(f"no similarity index at {directory}")
+            self._conn = sqlite3.connect(f"file:{meta_path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(meta_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    row INTEGER PRIMARY KEY,
+                    dataset TEXT NOT NULL,
+                    review_id TEXT NOT NULL,
+                    content_hash BLOB NOT NULL,
+                    rating REAL,
+                    date TEXT,
+                    text TEXT NOT NULL
+                );
+                CREATE UNIQUE INDEX IF NOT EXISTS reviews_key ON reviews (review_id, content_hash);
+                CREATE TABLE IF NOT EXISTS datasets (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    reviews INTEGER NOT NULL
+                );
+            """)
+            self._conn.commit()
+
+        self.vectorizer = ReviewVectorizer(n_features, dims)
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_rows = 0
+        self.rows = 0
+        self._model_mtime = None
+        self._vectors: Optional[np.ndarray] = None
+        self._inverted = None
+        if read_only:
+            self._refresh()
+        else:
+            with self._writing():
+                pass
+
+    @property
+    def dims(self) -> int:
+        return self.vectorizer.dims
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    # --- Storage ---
+
+    def _load_model(self):
+        """Loads model.npz if another writer (or this one) replaced it since it was last loaded."""
+        try:
+            mtime = os.stat(self._model_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._model_mtime:
+            return
+        model = np.load(self._model_path)
+        dims, n_features, seed = int(model["dims"]), int(model["n_features"]), int(model["seed"])
+        if (dims, n_features, seed) != (self.vectorizer.dims, self.vectorizer.n_features, self.vectorizer.seed):
+            self.vectorizer = ReviewVectorizer(n_features, dims, seed=seed)
+        self.vectorizer.df = model["df"]
+        self.vectorizer.n_docs = int(model["n_docs"])
+        self.centroids = model["centroids"] if model["centroids"].size else None
+        self.trained_rows = int(model["trained_rows"]) if self.centroids is not None else 0
+        self._model_mtime = mtime
+        self._vectors = None
+        self._inverted = None
+
+    def _refresh(self, repair: bool = False):
+        """
+        Catches up with rows and model changes committed by other writers.
+        With `repair` (only under the write lock), drops vector and list
+        rows appended after the last committed metadata by an interrupted add.
+        """
+        self._load_model()
+        (rows,) = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM reviews").fetchone()
+        if rows != self.rows:
+            self.rows = rows
+            self._inverted = None
+        if repair:
+            for path, itemsize in ((self._vectors_path, 2 * self.dims), (self._lists_path, 4)):
+                if os.path.exists(path) and os.path.getsize(path) > self.rows * itemsize:
+                    os.truncate(path, self.rows * itemsize)
+
+    @contextmanager
+    def _writing(self):
+        """Holds the index's exclusive write lock (across processes), caught up with other writers."""
+        if self.read_only:
+            raise PermissionError(f"similarity index at {self.directory} is open read-only")
+        with self._lock, open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh(repair=True)
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_model(self):
+        temp_path = self._model_path + ".tmp.npz"
+        np.savez(temp_path, df=self.vectorizer.df, n_docs=self.vectorizer.n_docs, dims=self.dims,
+                 n_features=self.vectorizer.n_features, seed=self.vectorizer.seed, trained_rows=self.trained_rows,
+                 centroids=self.centroids if self.trained else np.zeros((0, self.dims), dtype=np.float32))
+        os.replace(temp_path, self._model_path)
+        self._model_mtime = os.stat(self._model_path).st_mtime_ns
+
+    def vectors(self) -> np.ndarray:
+        """All stored vectors, memory-mapped (float16, one row per review)."""
+        if self._vectors is None or len(self._vectors) != self.rows:
+            self._vectors = (np.memmap(self._vectors_path, dtype=np.float16, mode="r", shape=(self.rows, self.dims))
+                             if self.rows else np.zeros((0, self.dims), dtype=np.float16))
+        return self._vectors
+
+    def _lists(self) -> np.ndarray:
+        return np.fromfile(self._lists_path, dtype=np.int32, count=self.rows) if self.rows else np.zeros(0, dtype=np.int32)
+
+    def _inverted_lists(self):
+        """(rows sorted by list, start offset of each list), rebuilt after adds."""
+        if self._inverted is None:
+            lists = self._lists()
+            order = np.argsort(lists, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1))
+            self._inverted = (order, offsets)
+        return self._inverted
+
+    # --- Adding reviews ---
+
+    def add_reviews(self, reviews: Iterable[Dict[str, Any]], dataset: str = "") -> int:
+        """
+        Indexes the reviews not indexed before (identified by id and text).
+
+        Returns:
+            The number of reviews added.
+        """
+        reviews = list(reviews)
+        texts = [review_text(review) for review in reviews]
+        keys = [(str(review.get('id') or ""), content_hash(text)) for review, text in zip(reviews, texts)]
+        with self._writing():
+            fresh, seen = [], set()
+            for start in range(0, len(keys), 400):
+                chunk = keys[start:start + 400]
+                placeholders = ",".join("(?, ?)" for _ in chunk)
+                rows = self._conn.execute(
+                    f"SELECT review_id, content_hash FROM reviews WHERE (review_id, content_hash) IN (VALUES {placeholders})",
+                    [value for key in chunk for value in key],
+                ).fetchall()
+                seen.update((review_id, bytes(digest)) for review_id, digest in rows)
+            for i, key in enumerate(keys):
+                if key not in seen and texts[i].strip():
+                    seen.add(key)
+                    fresh.append(i)
+            if not fresh:
+                return 0
+
+            counts = self.vectorizer.term_counts([texts[i] for i in fresh])
+            self.vectorizer.observe(counts)
+            vectors = self.vectorizer.transform(counts)
+            lists = nearest_centroid(vectors, self.centroids) if self.trained else np.full(len(fresh), -1, np.int32)
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.astype(np.float16).tobytes())
+            with open(self._lists_path, "ab") as f:
+                f.write(lists.astype(np.int32).tobytes())
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO reviews (row, dataset, review_id, content_hash, rating, date, text) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(self.rows + n, dataset, keys[i][0], keys[i][1], reviews[i].get('rating'),
+                      str(reviews[i]['date'])[:10] if reviews[i].get('date') else None, texts[i])
+                     for n, i in enumerate(fresh)],
+                )
+            self.rows += len(fresh)
+            self._inverted = None
+            if (not self.trained and self.rows >= self.train_min_rows) or \
+                    (self.trained and self.rows >= RETRAIN_GROWTH * self.trained_rows):
+                self._train()
+            else:
+                self._save_model()
+        return len(fresh)
+
+    def add_file(self, path: str, chunk_size: int = 20000) -> int:
+        """Indexes a review dataset (NDJSON or JSON array); returns the number of reviews added."""
+        added = sum(self.add_reviews(chunk, dataset=path) for chunk in iter_review_chunks(path, chunk_size))
+        with self._writing(), self._conn:
+            self._conn.execute(
+                "INSERT INTO datasets (path, size, reviews) VALUES (?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET size = excluded.size, reviews = reviews + excluded.reviews",
+                (os.path.abspath(path), os.path.getsize(path), added),
+            )
+        return added
+
+    def add_directory(self, directory: str) -> int:
+        """Indexes every review dataset in `directory` that is new or changed since it was indexed."""
+        with self._writing():
+            indexed = dict(self._conn.execute("SELECT path, size FROM datasets").fetchall())
+        added = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path) or not name.endswith(NDJSON_EXTENSIONS + (".json",)):
+                continue
+            if indexed.get(os.path.abspath(path)) == os.path.getsize(path):
+                continue
+            try:
+                added += self.add_file(path)
+            except ValueError:
+                continue    # Not a review dataset
+        return added
+
+    # --- IVF ---
+
+    def train(self, nlist: Optional[int] = None, seed: int = 0):
+        """(Re)computes the IVF centroids from a sample of the rows and reassigns every row."""
+        with self._writing():
+            self._train(nlist, seed)
+
+    def _train(self, nlist: Optional[int] = None, seed: int = 0):
+        vectors = self.vectors()
+        nlist = nlist or default_nlist(self.rows)
+        rng = np.random.default_rng(seed)
+        sample_size = min(self.rows, nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(self.rows, sample_size, replace=False))], dtype=np.float32)
+        self.centroids = spherical_kmeans(sample, nlist, seed=seed)
+        temp_path = self._lists_path + ".tmp"
+        nearest_centroid(vectors, self.centroids).tofile(temp_path)
+        os.replace(temp_path, self._lists_path)
+        self.trained_rows = self.rows
+        self._inverted = None
+        self._save_model()
+
+    def rebuild(self, chunk_size: int = 50000):
+        """
+        Recomputes every vector with the current document frequencies (rows
+        added early were weighted with the frequencies known then), then
+        retrains the IVF lists.
+        """
+        with self._writing():
+            temp_path = self._vectors_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                for start in range(0, self.rows, chunk_size):
+                    texts = [text for (text,) in self._conn.execute(
+                        "SELECT text FROM reviews WHERE row >= ? AND row < ? ORDER BY row", (start, start + chunk_size))]
+                    f.write(self.vectorizer.transform(self.vectorizer.term_counts(texts)).astype(np.float16).tobytes())
+            self._vectors = None
+            os.replace(temp_path, self._vectors_path)
+            if self.rows:
+                self._train()
+
+    # --- Search ---
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if not self.trained:
+            return np.arange(self.rows)
+        order, offsets = self._inverted_lists()
+        probe = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe]))
+
+    def _top(self, query: np.ndarray, k: int, nprobe: Optional[int], exclude: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            rows = self._candidates(query, nprobe or self.nprobe)
+            if exclude is not None:
+                rows = rows[rows != exclude]
+            if not len(rows):
+                return []
+            vectors = self.vectors()
+            scores = np.concatenate([np.asarray(vectors[rows[start:start + _BLOCK]], dtype=np.float32) @ query
+                                     for start in range(0, len(rows), _BLOCK)])
+            best = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return self._describe(rows[best], scores[best])
+
+    def _describe(self, rows: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        placeholders = ",".join("?" for _ in rows)
+        meta = {row[0]: row for row in self._conn.execute(
+            f"SELECT row, dataset, review_id, rating, date, text FROM reviews WHERE row IN ({placeholders})",
+            [int(row) for row in rows])}
+        return [
+            {"score": float(score), "row": int(row), "dataset": meta[row][1], "review_id": meta[row][2],
+             "rating": meta[row][3], "date": meta[row][4], "text": meta[row][5]}
+            for row, score in zip(rows.tolist(), scores)
+        ]
+
+    def search(self, text: str, k: int = 10, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The `k` indexed reviews most similar to `text` (a review or a complaint), best first."""
+        with self._lock:
+            self._refresh()
+            query = self.vectorizer.transform(self.vectorizer.term_counts([text]))[0]
+        return self._top(query, k, nprobe)
+
+    def similar_to(self, review_id: str, k: int = 10, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """The `k` reviews most similar to an indexed review (its first match by id)."""
+        with self._lock:
+            self._refresh()
+            found = self._conn.execute("SELECT row FROM reviews WHERE review_id = ? ORDER BY row LIMIT 1",
+                                       (review_id,)).fetchone()
+            if found is None:
+                raise KeyError(f"review {review_id!r} is not indexed")
+            row = found[0]
+            query = np.asarray(self.vectors()[row], dtype=np.float32)
+        return self._top(query, k, nprobe, exclude=row)
+
+    def search_vectors(self, queries: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+                       exact: bool = False) -> np.ndarray:
+        """Row numbers of the `k` nearest rows of each query vector (for evaluation; exact = brute force)."""
+        results = np.zeros((len(queries), k), dtype=np.int64)
+        with self._lock:
+            self._refresh()
+            vectors = self.vectors()
+            for i, query in enumerate(queries):
+                rows = np.arange(self.rows) if exact else self._candidates(query, nprobe or self.nprobe)
+                scores = np.concatenate([np.asarray(vectors[rows[start:start + _BLOCK]], dtype=np.float32) @ query
+                                         for start in range(0, len(rows), _BLOCK)])
+                best = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+                best = rows[best[np.argsort(-scores[best])]]
+                results[i, :len(best)] = best
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            datasets = self._conn.execute("SELECT COUNT(*) FROM datasets").fetchone()[0]
+        return {"reviews": self.rows, "datasets": datasets, "dims": self.dims, "trained": self.trained,
+                "lists": len(self.centroids) if self.trained else 0, "trained_rows": self.trained_rows,
+                "vector_bytes": self.rows * self.dims * 2}
+
+    def close(self):
+        with self._lock:
+            self._vectors = None
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trendvisor similarity index over collected reviews.")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Index review datasets (files, or directories of them).")
+    add.add_argument("paths", nargs="+")
+    search = commands.add_parser("search", help="Reviews similar to a text, e.g. a complaint.")
+    search.add_argument("text")
+    similar = commands.add_parser("similar", help="Reviews similar to an indexed review.")
+    similar.add_argument("review_id")
+    for command in (search, similar):
+        command.add_argument("-k", type=int, default=10)
+        command.add_argument("--nprobe", type=int, default=None, help="Inverted lists scanned per query.")
+    commands.add_parser("rebuild", help="Recompute all vectors with the current term weights and retrain.")
+    commands.add_parser("stats")
+    args = parser.parse_args()
+
+    index = SimilarityIndex(args.index_dir, read_only=args.command in ("search", "similar", "stats"))
+    try:
+        if args.command == "add":
+            result = {"added": sum(index.add_directory(path) if os.path.isdir(path) else index.add_file(path)
+                                   for path in args.paths), **index.stats()}
+        elif args.command == "search":
+            result = index.search(args.text, args.k, args.nprobe)
+        elif args.command == "similar":
+            result = index.similar_to(args.review_id, args.k, args.nprobe)
+        elif args.command == "rebuild":
+            index.rebuild()
+            result = index.stats()
+        else:
+            result = index.stats()
+    finally:
+        index.close()
+    json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == '__main__':
+    main()
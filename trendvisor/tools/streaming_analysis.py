@@ -0,0 +1,77 @@
+"""
+Trendvisor Streaming Analysis
+Consumes NDJSON review chunks while a collection is still running, keeps
+running aggregates and renders a lightweight provisional report.
+"""
+import html
+import os
+import time
+from typing import Optional
+
+from trendvisor.tools.aggregates import ReviewAggregates
+from trendvisor.tools.review_io import read_review_range
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'results')
+
+
+class StreamingAnalysis:
+    """Running analysis state for one task's in-progress collection."""
+
+    def __init__(self, task_id: str, data_path: str):
+        self.task_id = task_id
+        self.data_path = data_path
+        self.offset = 0
+        self.aggregates = ReviewAggregates()
+        self.last_report_at: Optional[float] = None
+
+    def consume(self, end_offset: int) -> int:
+        """
+        Reads everything between the last consumed offset and `end_offset`.
+        Reading from our own offset (rather than the event's start offset)
+        also covers missed or duplicated progress events.
+
+        Returns:
+            The number of reviews consumed.
+        """
+        if end_offset <= self.offset:
+            return 0
+        reviews = read_review_range(self.data_path, self.offset, end_offset)
+        self.aggregates.update(reviews)
+        self.offset = end_offset
+        return len(reviews)
+
+    def report_due(self, min_interval: float) -> bool:
+        """True for the first report, then at most once every `min_interval` seconds."""
+        return self.last_report_at is None or time.monotonic() - self.last_report_at >= min_interval
+
+    def write_provisional_report(self, output_dir: str = RESULTS_DIR) -> str:
+        """Writes a small HTML summary of the reviews seen so far."""
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(output_dir, f"{self.task_id}_report.provisional.html")
+        summary = self.aggregates.to_dict()
+        peak = max(summary["rating_histogram"].values(), default=1)
+        rows = "\n".join(
+            f"<tr><td>{html.escape(rating)}</td><td>{count}</td>"
+            f"<td><div style=\"background:#4c78a8;height:12px;width:{300 * count // peak}px\"></div></td></tr>"
+            for rating, count in summary["rating_histogram"].items()
+        )
+        mean_rating = summary["mean_rating"]
+        html_content = f"""<html>
+<head><title>Trendvisor Provisional Report - {html.escape(self.task_id)}</title></head>
+<body>
+    <h1>Provisional Analysis Report</h1>
+    <p>Collection in progress; generated {time.strftime('%Y-%m-%d %H:%M:%S')}.</p>
+    <ul>
+        <li>Reviews so far: {summary["count"]}</li>
+        <li>Mean rating: {f"{mean_rating:.2f}" if mean_rating is not None else "N/A"}</li>
+        <li>Mean review length: {summary["mean_length"]:.1f} characters</li>
+    </ul>
+    <h2>Rating Distribution</h2>
+    <table>{rows}</table>
+</body>
+</html>
+"""
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        self.last_report_at = time.monotonic()
+        return report_path
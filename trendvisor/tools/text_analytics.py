@@ -0,0 +1,391 @@
+"""
+Trendvisor Text Analytics
+Batch keyword, sentiment and aspect analysis of review text. Every batch is
+turned into one sparse hashed term matrix, and all per-review scores are
+sparse matrix products against it, so there are no per-row Python loops
+and memory is bounded by the batch size and the hash width rather than by
+the vocabulary or the number of reviews.
+"""
+import struct
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from trendvisor.tools.feature_cache import FeatureCache, content_hash
+
+# Bump when tokenization, lexicons or scoring change: cached features and
+# reports keyed on it are invalidated.
+TEXT_ANALYTICS_VERSION = "1"
+
+N_FEATURES = 2 ** 20
+
+POSITIVE_TERMS = [
+    "great", "good", "love", "loved", "excellent", "amazing", "perfect", "best", "nice", "light",
+    "smooth", "gentle", "moisturizing", "recommend", "happy", "soft", "fresh", "effective", "awesome",
+    "좋아요", "좋습니다", "최고", "추천", "만족", "촉촉", "순해요",
+]
+NEGATIVE_TERMS = [
+    "terrible", "bad", "hate", "hated", "awful", "worst", "poor", "sticky", "greasy", "oily", "irritation",
+    "irritating", "breakout", "broke", "burn", "burning", "overpriced", "leaked", "disappointed", "waste",
+    "별로", "최악", "실망", "끈적", "따가워요", "트러블",
+]
+ASPECT_TERMS = {
+    "texture": ["texture", "sticky", "greasy", "oily", "light", "smooth", "heavy", "absorbs", "끈적", "촉촉", "제형"],
+    "scent": ["scent", "smell", "fragrance", "perfume", "향"],
+    "price": ["price", "value", "cheap", "expensive", "overpriced", "가격", "가성비"],
+    "packaging": ["packaging", "bottle", "tube", "pump", "leaked", "cap", "용기", "포장"],
+    "protection": ["spf", "protection", "uv", "sunburn", "burn", "cast", "자외선", "백탁"],
+    "skin": ["skin", "breakout", "irritation", "sensitive", "acne", "broke", "피부", "트러블"],
+}
+
+
+@dataclass
+class BatchFeatures:
+    """Per-review features for one batch of texts."""
+    unigrams: sp.csr_matrix        # (n, N_FEATURES) hashed term counts
+    bigrams: sp.csr_matrix         # (n, N_FEATURES) hashed bigram counts
+    n_tokens: np.ndarray           # (n,) tokens after stop-word removal
+    sentiment: np.ndarray          # (n,) mean polarity of lexicon hits, in [-1, 1]
+    aspect_mentions: sp.csr_matrix # (n, n_aspects) lexicon hits per aspect
+
+    def __len__(self) -> int:
+        return self.unigrams.shape[0]
+
+    def take(self, rows: np.ndarray) -> "BatchFeatures":
+        """Returns the features of `rows`, in that order."""
+        return BatchFeatures(
+            unigrams=self.unigrams[rows],
+            bigrams=self.bigrams[rows],
+            n_tokens=self.n_tokens[rows],
+            sentiment=self.sentiment[rows],
+            aspect_mentions=self.aspect_mentions[rows],
+        )
+
+
+def stack_features(parts: List[BatchFeatures]) -> BatchFeatures:
+    if len(parts) == 1:
+        return parts[0]
+    return BatchFeatures(
+        unigrams=sp.vstack([p.unigrams for p in parts], format="csr"),
+        bigrams=sp.vstack([p.bigrams for p in parts], format="csr"),
+        n_tokens=np.concatenate([p.n_tokens for p in parts]),
+        sentiment=np.concatenate([p.sentiment for p in parts]),
+        aspect_mentions=sp.vstack([p.aspect_mentions for p in parts], format="csr"),
+    )
+
+
+# Cached per-review payload: a fixed header, then the aspect counts and the
+# (column, count) pairs of the non-zero unigram and bigram entries.
+_PAYLOAD_HEADER = struct.Struct("<ifII")  # n_tokens, sentiment, n_unigrams, n_bigrams
+
+
+def encode_features(features: BatchFeatures) -> List[bytes]:
+    """Serializes each review's features into a compact payload for the feature cache."""
+    aspects = features.aspect_mentions.toarray().astype("<u2")
+    matrices = []
+    for matrix in (features.unigrams, features.bigrams):
+        matrices.append((
+            matrix.indptr,
+            matrix.indices.astype("<u4"),
+            np.minimum(matrix.data, np.iinfo(np.uint16).max).astype("<u2"),
+        ))
+    (u_ptr, u_idx, u_cnt), (b_ptr, b_idx, b_cnt) = matrices
+    n_tokens, sentiment = features.n_tokens.tolist(), features.sentiment.tolist()
+    payloads = []
+    for i in range(len(features)):
+        u0, u1, b0, b1 = u_ptr[i], u_ptr[i + 1], b_ptr[i], b_ptr[i + 1]
+        payloads.append(b"".join((
+            _PAYLOAD_HEADER.pack(n_tokens[i], sentiment[i], u1 - u0, b1 - b0),
+            aspects[i].tobytes(),
+            u_idx[u0:u1].tobytes(), u_cnt[u0:u1].tobytes(),
+            b_idx[b0:b1].tobytes(), b_cnt[b0:b1].tobytes(),
+        )))
+    return payloads
+
+
+def decode_features(payloads: List[bytes], n_features: int, n_aspects: int) -> BatchFeatures:
+    """Rebuilds BatchFeatures from payloads written by `encode_features`."""
+    n = len(payloads)
+    n_tokens = np.empty(n, dtype=np.int32)
+    sentiment = np.empty(n, dtype=np.float32)
+    aspects = np.empty((n, n_aspects), dtype=np.float32)
+    parts = {"u_idx": [], "u_cnt": [], "b_idx": [], "b_cnt": []}
+    u_len = np.zeros(n + 1, dtype=np.int64)
+    b_len = np.zeros(n + 1, dtype=np.int64)
+    for i, payload in enumerate(payloads):
+        n_tokens[i], sentiment[i], n_uni, n_bi = _PAYLOAD_HEADER.unpack_from(payload)
+        offset = _PAYLOAD_HEADER.size
+        aspects[i] = np.frombuffer(payload, "<u2", n_aspects, offset)
+        offset += 2 * n_aspects
+        for name, dtype, count in (("u_idx", "<u4", n_uni), ("u_cnt", "<u2", n_uni),
+                                   ("b_idx", "<u4", n_bi), ("b_cnt", "<u2", n_bi)):
+            parts[name].append(np.frombuffer(payload, dtype, count, offset))
+            offset += np.dtype(dtype).itemsize * count
+        u_len[i + 1], b_len[i + 1] = n_uni, n_bi
+
+    def matrix(indices, counts, lengths):
+        return sp.csr_matrix(
+            (np.concatenate(counts).astype(np.float32), np.concatenate(indices).astype(np.int32),
+             np.cumsum(lengths)),
+            shape=(n, n_features),
+        )
+
+    return BatchFeatures(
+        unigrams=matrix(parts["u_idx"], parts["u_cnt"], u_len),
+        bigrams=matrix(parts["b_idx"], parts["b_cnt"], b_len),
+        n_tokens=n_tokens,
+        sentiment=sentiment,
+        aspect_mentions=sp.csr_matrix(aspects),
+    )
+
+
+class TextAnalyzer:
+    """Turns batches of review text into sparse features and lexicon scores."""
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.n_features = n_features
+        options = dict(n_features=n_features, alternate_sign=False, norm=None,
+                       stop_words="english", dtype=np.float32)
+        self.unigram_vectorizer = HashingVectorizer(ngram_range=(1, 1), **options)
+        self.bigram_vectorizer = HashingVectorizer(ngram_range=(2, 2), **options)
+        self.aspects = list(ASPECT_TERMS)
+
+        # Lexicons become vectors/matrices over the same hashed feature space.
+        self.sentiment_weights = np.zeros(n_features, dtype=np.float32)
+        self.sentiment_weights[self._lexicon_buckets(POSITIVE_TERMS)] = 1.0
+        self.sentiment_weights[self._lexicon_buckets(NEGATIVE_TERMS)] = -1.0
+        self.lexicon_mask = (self.sentiment_weights != 0).astype(np.float32)
+
+        rows, cols = [], []
+        for column, aspect in enumerate(self.aspects):
+            buckets = self._lexicon_buckets(ASPECT_TERMS[aspect])
+            rows.extend(buckets)
+            cols.extend([column] * len(buckets))
+        self.aspect_matrix = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(n_features, len(self.aspects)),
+        )
+        # Duplicate buckets (a term listed twice) should still count once.
+        self.aspect_matrix.data[:] = 1.0
+
+    @property
+    def cache_version(self) -> str:
+        """Feature-cache version: cached features are only valid for the same version and hash width."""
+        return f"{TEXT_ANALYTICS_VERSION}-{self.n_features}"
+
+    def _lexicon_buckets(self, terms: List[str]) -> List[int]:
+        return [int(b) for b in self.term_buckets(terms) if b >= 0]
+
+    def term_buckets(self, terms: List[str], vectorizer: Optional[HashingVectorizer] = None) -> np.ndarray:
+        """Returns the hashed column of each term, or -1 if the analyzer drops it (e.g. a stop word)."""
+        vectorizer = vectorizer or self.unigram_vectorizer
+        matrix = vectorizer.transform(terms).tocsr()
+        buckets = np.full(len(terms), -1, dtype=np.int64)
+        present = np.diff(matrix.indptr) > 0
+        buckets[present] = matrix.indices[matrix.indptr[:-1][present]]
+        return buckets
+
+    def transform(self, texts: List[str]) -> BatchFeatures:
+        """Computes features for a batch of texts in a handful of sparse operations."""
+        unigrams = self.unigram_vectorizer.transform(texts).tocsr()
+        bigrams = self.bigram_vectorizer.transform(texts).tocsr()
+        n_tokens = np.asarray(unigrams.sum(axis=1)).ravel()
+        polarity = unigrams @ self.sentiment_weights
+        hits = unigrams @ self.lexicon_mask
+        sentiment = np.divide(polarity, hits, out=np.zeros_like(polarity), where=hits > 0)
+        return BatchFeatures(
+            unigrams=unigrams,
+            bigrams=bigrams,
+            n_tokens=n_tokens.astype(np.int32),
+            sentiment=sentiment.astype(np.float32),
+            aspect_mentions=(unigrams @ self.aspect_matrix).tocsr(),
+        )
+
+    def transform_cached(self, texts: List[str], ids: List[str], cache: FeatureCache) -> BatchFeatures:
+        """
+        Like `transform`, but reuses cached features for reviews whose id and
+        text are unchanged and only computes (and caches) the rest.
+        """
+        keys = [(review_id, content_hash(text)) for review_id, text in zip(ids, texts)]
+        payloads = cache.get_many(keys)
+        hits = [i for i, payload in enumerate(payloads) if payload is not None]
+        misses = [i for i, payload in enumerate(payloads) if payload is None]
+        parts = []
+        if hits:
+            parts.append(decode_features([payloads[i] for i in hits], self.n_features, len(self.aspects)))
+        if misses:
+            computed = self.transform([texts[i] for i in misses])
+            cache.put_many(zip([keys[i] for i in misses], encode_features(computed)))
+            parts.append(computed)
+        features = stack_features(parts)
+        if hits and misses:
+            # Rows are stacked hits-then-misses; restore the input order.
+            features = features.take(np.argsort(np.array(hits + misses)))
+        return features
+
+
+class TextAnalytics:
+    """
+    Mergeable corpus-level text statistics. Keeps hashed term totals and
+    per-aspect sums, plus a bounded sample of real terms so that the top
+    hashed columns can be reported as words.
+    """
+
+    def __init__(self, analyzer: TextAnalyzer, vocab_sample_docs: int = 20000):
+        self.analyzer = analyzer
+        self.vocab_sample_docs = vocab_sample_docs
+        n_features = analyzer.n_features
+        self.reviews = 0
+        self.weight_total = 0.0
+        self.unigram_totals = np.zeros(n_features, dtype=np.float64)
+        self.bigram_totals = np.zeros(n_features, dtype=np.float64)
+        self.sentiment_sum = 0.0
+        self.polarity_counts = Counter()
+        n_aspects = len(analyzer.aspects)
+        self.aspect_mentions = np.zeros(n_aspects, dtype=np.float64)
+        self.aspect_sentiment = np.zeros(n_aspects, dtype=np.float64)
+        self._sampled_docs = 0
+        self._unigram_sample = Counter()
+        self._bigram_sample = Counter()
+
+    def add(self, features: BatchFeatures, texts: Optional[List[str]] = None, weights: Optional[np.ndarray] = None):
+        """
+        Folds a batch into the totals. `weights` (e.g. duplicate-cluster sizes)
+        scale each review's contribution; `texts` feed the vocabulary sample.
+        """
+        n = len(features)
+        weights = np.ones(n, dtype=np.float64) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.reviews += n
+        self.weight_total += float(weights.sum())
+        self.unigram_totals += np.asarray(features.unigrams.T @ weights).ravel()
+        self.bigram_totals += np.asarray(features.bigrams.T @ weights).ravel()
+        self.sentiment_sum += float(features.sentiment @ weights)
+        labels = np.sign(np.where(np.abs(features.sentiment) < 0.05, 0.0, features.sentiment)).astype(int)
+        for label, name in ((1, "positive"), (-1, "negative"), (0, "neutral")):
+            self.polarity_counts[name] += float(weights[labels == label].sum())
+        mentioned = features.aspect_mentions.copy()
+        mentioned.data[:] = 1.0
+        self.aspect_mentions += np.asarray(mentioned.T @ weights).ravel()
+        self.aspect_sentiment += np.asarray(mentioned.T @ (weights * features.sentiment)).ravel()
+        if texts is not None:
+            self._sample_vocabulary(texts)
+
+    def _sample_vocabulary(self, texts: List[str]):
+        remaining = self.vocab_sample_docs - self._sampled_docs
+        if remaining <= 0:
+            return
+        sample = texts[:remaining]
+        unigram_analyzer = self.analyzer.unigram_vectorizer.build_analyzer()
+        bigram_analyzer = self.analyzer.bigram_vectorizer.build_analyzer()
+        for text in sample:
+            self._unigram_sample.update(unigram_analyzer(text))
+            self._bigram_sample.update(bigram_analyzer(text))
+        self._sampled_docs += len(sample)
+
+    def merge(self, other: "TextAnalytics") -> "TextAnalytics":
+        self.reviews += other.reviews
+        self.weight_total += other.weight_total
+        self.unigram_totals += other.unigram_totals
+        self.bigram_totals += other.bigram_totals
+        self.sentiment_sum += other.sentiment_sum
+        self.polarity_counts.update(other.polarity_counts)
+        self.aspect_mentions += other.aspect_mentions
+        self.aspect_sentiment += other.aspect_sentiment
+        self._unigram_sample.update(other._unigram_sample)
+        self._bigram_sample.update(other._bigram_sample)
+        self._sampled_docs += other._sampled_docs
+        return self
+
+    def _top_terms(self, totals: np.ndarray, sample: Counter, vectorizer: HashingVectorizer, top_k: int) -> List[Tuple[str, float]]:
+        if not totals.any():
+            return []
+        k = min(top_k, int(np.count_nonzero(totals)))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind="stable")]
+        names: Dict[int, str] = {}
+        if sample:
+            terms = [term for term, _ in sample.most_common()]
+            buckets = self.analyzer.term_buckets(terms, vectorizer)
+            for term, bucket in zip(terms, buckets.tolist()):
+                if bucket >= 0:
+                    names.setdefault(bucket, term)  # most frequent sampled term wins
+        return [(names.get(int(b), f"#{int(b)}"), float(totals[b])) for b in top]
+
+    def summary(self, top_k: int = 20) -> Dict[str, Any]:
+        """Returns a JSON-serializable summary of the corpus."""
+        weight_total = self.weight_total or 1.0
+        aspects = {}
+        for i, aspect in enumerate(self.analyzer.aspects):
+            mentions = self.aspect_mentions[i]
+            aspects[aspect] = {
+                "mentions": float(mentions),
+                "share": float(mentions / weight_total),
+                "mean_sentiment": float(self.aspect_sentiment[i] / mentions) if mentions else None,
+            }
+        return {
+            "version": TEXT_ANALYTICS_VERSION,
+            "reviews": self.reviews,
+            "weighted_reviews": self.weight_total,
+            "sentiment": {
+                "mean": self.sentiment_sum / weight_total,
+                "positive": self.polarity_counts["positive"],
+                "negative": self.polarity_counts["negative"],
+                "neutral": self.polarity_counts["neutral"],
+            },
+            "top_keywords": self._top_terms(self.unigram_totals, self._unigram_sample,
+                                            self.analyzer.unigram_vectorizer, top_k),
+            "top_bigrams": self._top_terms(self.bigram_totals, self._bigram_sample,
+                                           self.analyzer.bigram_vectorizer, top_k),
+            "aspects": aspects,
+        }
+
+
+def iter_batches(texts: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    for text in texts:
+        batch.append(text or "")
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def analyze_texts(texts: Iterable[str], batch_size: int = 50000,
+                  analyzer: Optional[TextAnalyzer] = None, ids: Optional[Iterable[str]] = None,
+                  cache: Optional[FeatureCache] = None, weights: Optional[np.ndarray] = None,
+                  analytics: Optional[TextAnalytics] = None) -> Tuple[TextAnalytics, np.ndarray, np.ndarray]:
+    """
+    Analyzes an iterable of texts batch by batch. With a feature `cache`,
+    reviews are keyed by their `ids` (if given) and text hash, and only
+    new or changed reviews are transformed. `weights` (one per text, e.g.
+    duplicate-cluster sizes) scale each review's share of the corpus totals.
+    Passing `analytics` accumulates into it, e.g. across dataset chunks.
+
+    Returns:
+        The corpus TextAnalytics, plus per-review sentiment and token counts.
+    """
+    analyzer = analyzer or (analytics.analyzer if analytics is not None else TextAnalyzer())
+    analytics = analytics if analytics is not None else TextAnalytics(analyzer)
+    sentiment_parts, token_parts = [], []
+    id_batches = iter_batches(map(str, ids), batch_size) if ids is not None else None
+    weights = np.asarray(weights, dtype=np.float64) if weights is not None else None
+    offset = 0
+    for batch in iter_batches(texts, batch_size):
+        if cache is None:
+            features = analyzer.transform(batch)
+        else:
+            batch_ids = next(id_batches) if id_batches is not None else [""] * len(batch)
+            features = analyzer.transform_cached(batch, batch_ids, cache)
+        batch_weights = weights[offset:offset + len(batch)] if weights is not None else None
+        offset += len(batch)
+        analytics.add(features, texts=batch, weights=batch_weights)
+        sentiment_parts.append(features.sentiment)
+        token_parts.append(features.n_tokens)
+    sentiment = np.concatenate(sentiment_parts) if sentiment_parts else np.zeros(0, dtype=np.float32)
+    n_tokens = np.concatenate(token_parts) if token_parts else np.zeros(0, dtype=np.int32)
+    return analytics, sentiment, n_tokens
@@ -0,0 +1,506 @@
+"""
+Trendvisor Trend Engine
+Per-product time-series rollups of reviews by day, ISO week and month:
+review volume, rating mean and distribution, sentiment, and how many
+reviews mention each keyword. Rollups are plain sums, so a new collection
+only adds its not-yet-seen reviews into the buckets they fall in (and an
+edited review swaps its old contribution for the new one), and rolling
+windows, period-over-period deltas and keyword velocity are answered from
+the rollups without rescanning raw data.
+
+Usage:
+    python -m trendvisor.tools.trends ingest "sunscreen" data/task_..._reviews.ndjson
+    python -m trendvisor.tools.trends delta "sunscreen" --granularity week
+    python -m trendvisor.tools.trends velocity "sunscreen" --granularity month
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from trendvisor.tools.aggregates import review_text
+from trendvisor.tools.feature_cache import content_hash
+from trendvisor.tools.review_io import iter_review_chunks
+from trendvisor.tools.text_analytics import TextAnalyzer
+
+DEFAULT_TRENDS_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'trends.sqlite3')
+
+GRANULARITIES = ("day", "week", "month")
+RATING_LEVELS = (1, 2, 3, 4, 5)
+
+# Summed columns of a rollup bucket, in storage order
+METRIC_COLUMNS = ("reviews", "rated", "rating_sum", "r1", "r2", "r3", "r4", "r5",
+                  "sentiment_sum", "positive", "negative")
+
+# Keeps each SQL statement well under SQLite's bound-parameter limit.
+_QUERY_CHUNK = 400
+
+_NUMERIC = re.compile(r"^\d+$")
+
+DateLike = Union[str, datetime.date]
+
+
+def product_key(goal: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """The product a task's reviews roll up under: params["product"], else the normalized goal."""
+    product = (params or {}).get("product") or goal
+    return " ".join(str(product).lower().split())
+
+
+def review_key(review_id: str, digest: bytes) -> str:
+    """Identifies a review within a product: its id, or its text's hash when it has none."""
+    return review_id or f"text:{digest.hex()}"
+
+
+def _as_date(value: Any) -> Optional[datetime.date]:
+    if isinstance(value, datetime.date):
+        return value
+    if value is None or value != value:  # None or NaN
+        return None
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def bucket_start(day: datetime.date, granularity: str) -> datetime.date:
+    """The first day of the bucket containing `day`: itself, its ISO week's Monday, or its month's 1st."""
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"unknown granularity {granularity!r}")
+
+
+def shift_bucket(bucket: datetime.date, granularity: str, n: int) -> datetime.date:
+    """The bucket `n` buckets after (or before, for negative `n`) `bucket`."""
+    if granularity == "day":
+        return bucket + datetime.timedelta(days=n)
+    if granularity == "week":
+        return bucket + datetime.timedelta(weeks=n)
+    if granularity == "month":
+        months = bucket.year * 12 + bucket.month - 1 + n
+        return datetime.date(months // 12, months % 12 + 1, 1)
+    raise ValueError(f"unknown granularity {granularity!r}")
+
+
+def bucket_metrics(sums: np.ndarray) -> Dict[str, Any]:
+    """Turns a bucket's (or a window's) summed METRIC_COLUMNS into reported metrics."""
+    reviews, rated, rating_sum = int(sums[0]), int(sums[1]), float(sums[2])
+    ratings = sums[3:8]
+    return {
+        "reviews": reviews,
+        "mean_rating": rating_sum / rated if rated else None,
+        "rating_distribution": {str(level): int(count) for level, count in zip(RATING_LEVELS, ratings)},
+        "mean_sentiment": float(sums[8]) / reviews if reviews else None,
+        "positive_share": float(sums[9]) / reviews if reviews else None,
+        "negative_share": float(sums[10]) / reviews if reviews else None,
+    }
+
+
+def _change(current: Optional[float], previous: Optional[float]) -> Dict[str, Optional[float]]:
+    if current is None or previous is None:
+        return {"current": current, "previous": previous, "delta": None, "relative": None}
+    return {
+        "current": current,
+        "previous": previous,
+        "delta": current - previous,
+        "relative": (current - previous) / previous if previous else None,
+    }
+
+
+class TrendStore:
+    """SQLite-backed incremental rollups of reviews per product and time bucket."""
+
+    def __init__(self, path: str = DEFAULT_TRENDS_PATH, analyzer: Optional[TextAnalyzer] = None):
+        self.path = path
+        self._analyzer = analyzer
+        self._tokenize = None
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        metrics = ",\n".join(f"{column} {'REAL' if column.endswith('_sum') else 'INTEGER'} NOT NULL DEFAULT 0"
+                             for column in METRIC_COLUMNS)
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS rollups (
+                product TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                {metrics},
+                PRIMARY KEY (product, granularity, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS keywords (
+                product TEXT NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                reviews INTEGER NOT NULL,
+                PRIMARY KEY (product, granularity, bucket, keyword)
+            ) WITHOUT ROWID;
+            -- What each ingested review added, so an edit can take it back out.
+            -- day is NULL for reviews that were not bucketed, metrics NULL if unknown.
+            CREATE TABLE IF NOT EXISTS contributions (
+                product TEXT NOT NULL,
+                review_key TEXT NOT NULL,
+                content_hash BLOB NOT NULL,
+                day TEXT,
+                metrics BLOB,
+                keywords TEXT NOT NULL DEFAULT '[]',
+                PRIMARY KEY (product, review_key)
+            ) WITHOUT ROWID;
+        """)
+        self._migrate_ingested()
+        self._conn.commit()
+
+    def _migrate_ingested(self):
+        """
+        Moves the (product, review id, text hash) rows of stores created before
+        contributions were recorded. Their contributions are unknown, so an
+        edit of one of those reviews adds the new version without removing
+        the old one.
+        """
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ingested'").fetchone():
+            rows = self._conn.execute("SELECT product, review_id, content_hash FROM ingested").fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO contributions (product, review_key, content_hash) VALUES (?, ?, ?)",
+                [(product, review_key(review_id, bytes(digest)), digest) for product, review_id, digest in rows],
+            )
+            self._conn.execute("DROP TABLE ingested")
+
+    @property
+    def analyzer(self) -> TextAnalyzer:
+        if self._analyzer is None:
+            self._analyzer = TextAnalyzer()
+        return self._analyzer
+
+    def _keywords(self, text: str) -> set:
+        """The distinct keywords of a review: the analyzer's tokens, minus stop words and numbers."""
+        if self._tokenize is None:
+            self._tokenize = self.analyzer.unigram_vectorizer.build_analyzer()
+        return {token for token in self._tokenize(text) if not _NUMERIC.match(token)}
+
+    # --- Ingestion ---
+
+    def _ingested(self, product: str, keys: List[str]) -> Dict[str, tuple]:
+        """The stored (content hash, day, metrics, keywords) of the reviews of `product` among `keys`."""
+        found = {}
+        for start in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[start:start + _QUERY_CHUNK]
+            rows = self._conn.execute(
+                f"SELECT review_key, content_hash, day, metrics, keywords FROM contributions "
+                f"WHERE product = ? AND review_key IN ({', '.join('?' * len(chunk))})",
+                [product] + chunk,
+            ).fetchall()
+            for key, digest, day, metrics, keywords in rows:
+                found[key] = (bytes(digest), day, metrics, keywords)
+        return found
+
+    def _contributions(self, reviews: List[Dict[str, Any]]) -> List[Tuple[Optional[str], np.ndarray, List[str]]]:
+        """What each review adds to its buckets: its ISO day (None if undated), metric row and keywords."""
+        texts = [review_text(review) for review in reviews]
+        sentiment = self.analyzer.transform(texts).sentiment if texts else np.zeros(0)
+        contributions = []
+        for review, text, score in zip(reviews, texts, sentiment):
+            day = _as_date(review.get('date'))
+            row = np.zeros(len(METRIC_COLUMNS))
+            if day is None:
+                contributions.append((None, row, []))
+                continue
+            row[0] = 1
+            rating = review.get('rating')
+            if rating is not None:
+                row[1], row[2] = 1, float(rating)
+                level = int(round(float(rating)))
+                if level in RATING_LEVELS:
+                    row[2 + level] = 1
+            row[8] = score
+            row[9], row[10] = score > 0, score < 0
+            contributions.append((day.isoformat(), row, sorted(self._keywords(text))))
+        return contributions
+
+    @staticmethod
+    def _rollup(added, removed):
+        """Sums contributions (minus the `removed` ones) into per-(granularity, bucket) metric and keyword deltas."""
+        sums: Dict[Tuple[str, str], np.ndarray] = defaultdict(lambda: np.zeros(len(METRIC_COLUMNS)))
+        keywords: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        for sign, contributions in ((1, added), (-1, removed)):
+            for day, row, terms in contributions:
+                if day is None:
+                    continue
+                day = datetime.date.fromisoformat(day)
+                for granularity in GRANULARITIES:
+                    key = (granularity, bucket_start(day, granularity).isoformat())
+                    sums[key] += sign * row
+                    keywords[key].update({term: sign for term in terms})
+        return sums, keywords
+
+    def ingest(self, product: str, reviews: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds the reviews of `product` not ingested before to their buckets.
+        Reviews are identified by id (by text when they have none). A review
+        whose text changed since it was ingested replaces its earlier
+        version, whose contribution is subtracted. Re-ingesting a dataset
+        (or an overlapping collection) therefore counts nothing twice, even
+        when several processes share the store. Reviews without a usable
+        date are recorded but not bucketed.
+
+        Returns:
+            The number of new or edited reviews.
+        """
+        latest: Dict[str, int] = {}
+        digests: Dict[str, bytes] = {}
+        reviews = list(reviews)
+        for i, review in enumerate(reviews):
+            digest = content_hash(review_text(review))
+            key = review_key(str(review.get('id') or ""), digest)
+            latest[key], digests[key] = i, digest  # Of one review listed twice, the last version wins
+        keys = list(latest)
+        with self._lock:
+            stored = self._ingested(product, keys)
+            changed = [key for key in keys if key not in stored or stored[key][0] != digests[key]]
+            if not changed:
+                return 0
+            # Scored before taking the write lock; re-checked under it in case
+            # another process ingested some of the same reviews meanwhile.
+            scored = dict(zip(changed, self._contributions([reviews[latest[key]] for key in changed])))
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                stored = self._ingested(product, keys)
+                changed = [key for key in keys if key not in stored or stored[key][0] != digests[key]]
+                if not changed:
+                    return 0
+                missing = [key for key in changed if key not in scored]
+                scored.update(zip(missing, self._contributions([reviews[latest[key]] for key in missing])))
+                removed = [
+                    (stored[key][1], np.frombuffer(stored[key][2]), json.loads(stored[key][3]))
+                    for key in changed if key in stored and stored[key][2] is not None
+                ]
+                sums, keywords = self._rollup([scored[key] for key in changed], removed)
+                self._apply(product, sums, keywords)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO contributions (product, review_key, content_hash, day, metrics, keywords) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(product, key, digests[key], scored[key][0], scored[key][1].tobytes(),
+                      json.dumps(scored[key][2], ensure_ascii=False)) for key in changed],
+                )
+        return len(changed)
+
+    def _apply(self, product: str, sums, keywords):
+        """Adds metric and keyword deltas to the rollups, dropping buckets and keywords left at zero."""
+        assignments = ", ".join(f"{column} = {column} + excluded.{column}" for column in METRIC_COLUMNS)
+        self._conn.executemany(
+            f"INSERT INTO rollups (product, granularity, bucket, {', '.join(METRIC_COLUMNS)}) "
+            f"VALUES (?, ?, ?{', ?' * len(METRIC_COLUMNS)}) "
+            f"ON CONFLICT (product, granularity, bucket) DO UPDATE SET {assignments}",
+            [(product, granularity, bucket) + tuple(row.tolist()) for (granularity, bucket), row in sums.items()],
+        )
+        self._conn.executemany(
+            "DELETE FROM rollups WHERE product = ? AND granularity = ? AND bucket = ? AND reviews <= 0",
+            [(product, granularity, bucket) for (granularity, bucket), row in sums.items() if row[0] < 0],
+        )
+        deltas = [(product, granularity, bucket, keyword, count)
+                  for (granularity, bucket), counts in keywords.items() for keyword, count in counts.items() if count]
+        self._conn.executemany(
+            "INSERT INTO keywords (product, granularity, bucket, keyword, reviews) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (product, granularity, bucket, keyword) DO UPDATE SET reviews = reviews + excluded.reviews",
+            deltas,
+        )
+        self._conn.executemany(
+            "DELETE FROM keywords WHERE product = ? AND granularity = ? AND bucket = ? AND keyword = ? AND reviews <= 0",
+            [delta[:4] for delta in deltas if delta[4] < 0],
+        )
+
+    def ingest_file(self, product: str, path: str, chunk_size: int = 5000) -> int:
+        """Ingests a review dataset (NDJSON or JSON array) in chunks; returns the number of new reviews."""
+        return sum(self.ingest(product, chunk) for chunk in iter_review_chunks(path, chunk_size))
+
+    # --- Queries ---
+
+    def products(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT product FROM rollups WHERE granularity = 'day'").fetchall()
+        return [product for (product,) in rows]
+
+    def latest_bucket(self, product: str, granularity: str = "day") -> Optional[datetime.date]:
+        """The most recent bucket of `product` with reviews."""
+        with self._lock:
+            (bucket,) = self._conn.execute(
+                "SELECT MAX(bucket) FROM rollups WHERE product = ? AND granularity = ?", (product, granularity),
+            ).fetchone()
+        return datetime.date.fromisoformat(bucket) if bucket else None
+
+    def _resolve(self, product: str, granularity: str, at: Optional[DateLike]) -> Optional[datetime.date]:
+        if at is None:
+            return self.latest_bucket(product, granularity)
+        return bucket_start(_as_date(at), granularity)
+
+    def _dense(self, product: str, granularity: str, first: datetime.date, last: datetime.date):
+        """Bucket starts from `first` to `last`, and their summed metrics (zeros where empty)."""
+        buckets = []
+        bucket = first
+        while bucket <= last:
+            buckets.append(bucket)
+            bucket = shift_bucket(bucket, granularity, 1)
+        index = {bucket.isoformat(): i for i, bucket in enumerate(buckets)}
+        sums = np.zeros((len(buckets), len(METRIC_COLUMNS)))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT bucket, {', '.join(METRIC_COLUMNS)} FROM rollups "
+                f"WHERE product = ? AND granularity = ? AND bucket BETWEEN ? AND ?",
+                (product, granularity, first.isoformat(), last.isoformat()),
+            ).fetchall()
+        for bucket, *values in rows:
+            sums[index[bucket]] = values
+        return buckets, sums
+
+    def series(self, product: str, granularity: str = "day", start: Optional[DateLike] = None,
+               end: Optional[DateLike] = None, periods: int = 30) -> List[Dict[str, Any]]:
+        """
+        Metrics of every bucket from `start` to `end` (default: the `periods`
+        buckets up to the latest one), including empty buckets.
+        """
+        last = self._resolve(product, granularity, end)
+        if last is None:
+            return []
+        first = bucket_start(_as_date(start), granularity) if start else shift_bucket(last, granularity, 1 - periods)
+        buckets, sums = self._dense(product, granularity, first, last)
+        return [dict(bucket=bucket.isoformat(), **bucket_metrics(row)) for bucket, row in zip(buckets, sums)]
+
+    def rolling(self, product: str, window: int = 7, granularity: str = "day",
+                periods: int = 30, end: Optional[DateLike] = None) -> List[Dict[str, Any]]:
+        """
+        Rolling-window trend: for each of the `periods` buckets up to `end`,
+        the metrics of the `window` buckets ending there (e.g. the trailing
+        7-day mean rating for each of the last 30 days).
+        """
+        last = self._resolve(product, granularity, end)
+        if last is None:
+            return []
+        first = shift_bucket(last, granularity, 2 - periods - window)
+        buckets, sums = self._dense(product, granularity, first, last)
+        cumulative = np.vstack([np.zeros(len(METRIC_COLUMNS)), np.cumsum(sums, axis=0)])
+        return [
+            dict(bucket=buckets[i].isoformat(), window=window,
+                 **bucket_metrics(cumulative[i + 1] - cumulative[i + 1 - window]))
+            for i in range(window - 1, len(buckets))
+        ]
+
+    def delta(self, product: str, granularity: str = "week", at: Optional[DateLike] = None) -> Dict[str, Any]:
+        """Period-over-period change: the bucket containing `at` (default: the latest) against the one before."""
+        current = self._resolve(product, granularity, at)
+        if current is None:
+            return {}
+        previous = shift_bucket(current, granularity, -1)
+        _, sums = self._dense(product, granularity, previous, current)
+        before, now = bucket_metrics(sums[0]), bucket_metrics(sums[1])
+        changes = {metric: _change(now[metric], before[metric])
+                   for metric in ("reviews", "mean_rating", "mean_sentiment", "positive_share", "negative_share")}
+        changes["rating_distribution"] = {
+            level: _change(now["rating_distribution"][level], before["rating_distribution"][level])
+            for level in now["rating_distribution"]
+        }
+        return {"granularity": granularity, "period": current.isoformat(), "previous_period": previous.isoformat(),
+                "changes": changes}
+
+    def keyword_velocity(self, product: str, granularity: str = "week", at: Optional[DateLike] = None,
+                         top_k: int = 10, min_reviews: int = 2) -> Dict[str, Any]:
+        """
+        Keywords whose mentions changed most between the bucket containing
+        `at` (default: the latest) and the one before: reviews mentioning
+        each keyword per period, the difference, and growth as a ratio.
+        Keywords with fewer than `min_reviews` mentions in both periods are skipped.
+        """
+        current = self._resolve(product, granularity, at)
+        if current is None:
+            return {}
+        previous = shift_bucket(current, granularity, -1)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT keyword, bucket, reviews FROM keywords "
+                "WHERE product = ? AND granularity = ? AND bucket IN (?, ?)",
+                (product, granularity, current.isoformat(), previous.isoformat()),
+            ).fetchall()
+        counts: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for keyword, bucket, reviews in rows:
+            counts[keyword][bucket == current.isoformat()] = reviews
+        entries = [
+            {"keyword": keyword, "previous": before, "current": now, "velocity": now - before,
+             "growth": (now + 1) / (before + 1)}
+            for keyword, (before, now) in counts.items() if max(before, now) >= min_reviews
+        ]
+        entries.sort(key=lambda entry: (-entry["velocity"], -entry["current"], entry["keyword"]))
+        rising = [entry for entry in entries if entry["velocity"] > 0][:top_k]
+        falling = [entry for entry in reversed(entries) if entry["velocity"] < 0][:top_k]
+        return {"granularity": granularity, "period": current.isoformat(), "previous_period": previous.isoformat(),
+                "rising": rising, "falling": falling}
+
+    def summary(self, product: str) -> Dict[str, Any]:
+        """The trend overview stored with an analysis task (see AnalysisAgent)."""
+        latest = self.latest_bucket(product)
+        return {
+            "product": product,
+            "latest_day": latest.isoformat() if latest else None,
+            "rolling_30d": (self.rolling(product, window=30, periods=1) or [None])[-1],
+            "weekly": self.delta(product, "week"),
+            "monthly": self.delta(product, "month"),
+            "keyword_velocity": self.keyword_velocity(product, "week"),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trendvisor trend rollups: ingest review datasets and query trends.")
+    parser.add_argument("--db", default=DEFAULT_TRENDS_PATH, help="SQLite file holding the rollups.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Add a dataset's new reviews to a product's rollups.")
+    ingest.add_argument("product")
+    ingest.add_argument("paths", nargs="+", help="NDJSON or JSON array review files.")
+    for name, help_text in (("series", "Metrics per bucket."), ("rolling", "Rolling-window metrics."),
+                            ("delta", "Period-over-period change."), ("velocity", "Fastest rising and falling keywords."),
+                            ("summary", "Trend overview.")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("product")
+        command.add_argument("--granularity", choices=GRANULARITIES, default="day" if name in ("series", "rolling") else "week")
+        command.add_argument("--at", default=None, help="A day in the (last) period of interest; default: the latest.")
+        command.add_argument("--periods", type=int, default=30)
+        command.add_argument("--window", type=int, default=7)
+        command.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    store = TrendStore(args.db)
+    product = product_key(args.product)
+    try:
+        if args.command == "ingest":
+            result = {"product": product, "new_reviews": sum(store.ingest_file(product, path) for path in args.paths)}
+        elif args.command == "series":
+            result = store.series(product, args.granularity, end=args.at, periods=args.periods)
+        elif args.command == "rolling":
+            result = store.rolling(product, args.window, args.granularity, args.periods, end=args.at)
+        elif args.command == "delta":
+            result = store.delta(product, args.granularity, args.at)
+        elif args.command == "velocity":
+            result = store.keyword_velocity(product, args.granularity, args.at, top_k=args.top_k)
+        else:
+            result = store.summary(product)
+    finally:
+        store.close()
+    json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+
+
+if __name__ == '__main__':
+    main()